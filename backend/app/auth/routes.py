@@ -274,7 +274,6 @@ def forgot_password(payload: ForgotPasswordRequest):
     email = payload.email.lower().strip()
     
     with get_connection() as conn:
-        _ensure_password_reset_table(conn)
         
         # Buscar usuario por email
         user = conn.execute(
@@ -331,7 +330,6 @@ def reset_password(payload: ResetPasswordRequest):
         )
     
     with get_connection() as conn:
-        _ensure_password_reset_table(conn)
         
         # Buscar token válido
         token_data = conn.execute(
@@ -0,0 +1,49 @@
+"""
+Clientes boto3 compartidos (Textract, S3, Transcribe...).
+
+Crear un cliente cuesta decenas de ms (carga de modelos de servicio,
+credenciales, pool HTTP nuevo) y se hacía en cada petición. Los clientes de
+boto3 son seguros entre hilos, así que se crea uno por servicio, región y
+endpoint y se reutiliza; solo la creación se serializa con un lock porque
+la sesión por defecto de boto3 no lo es.
+"""
+
+import os
+import threading
+from typing import Any, Optional
+
+try:
+    import boto3
+except Exception:  # pragma: no cover - optional dependency
+    boto3 = None
+
+from app.core.config import settings
+
+_clients: dict[tuple[str, str, str], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def default_region() -> str:
+    return settings.aws_region or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+
+
+def get_client(service: str, region: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """Cliente boto3 de `service`; `endpoint_url` apunta a un stand-in local (MinIO, stubs)."""
+    if not boto3:
+        raise RuntimeError("Falta dependencia boto3 en el backend.")
+    key = (service, region or default_region(), endpoint_url or "")
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = boto3.client(service, region_name=key[1], endpoint_url=endpoint_url or None)
+            _clients[key] = client
+    return client
+
+
+def reset_clients() -> None:
+    """Descarta los clientes (p. ej. después de rotar credenciales)."""
+    with _clients_lock:
+        _clients.clear()
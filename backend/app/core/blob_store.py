@@ -0,0 +1,152 @@
+"""
+Almacén de contenido por SHA-256 para los archivos de /media.
+
+Cada archivo subido se guarda una sola vez en `media/.blobs/ab/cd/<sha256>`
+y las rutas lógicas que usan las tablas (`/media/recepcion/...`,
+`/media/expedientes/...`) son hard links a ese blob. Así:
+
+- volver a subir la misma foto no ocupa disco extra;
+- el espejo de fotos de recepción al expediente y la copia de fotos de
+  paquetes son un link, no una copia;
+- el conteo de referencias lo lleva el sistema de archivos (st_nlink): al
+  borrar la última ruta lógica, `release` borra también el blob, y
+  `prune_orphans` limpia los que quedaron sin rutas (borrados de carpetas).
+
+Las filas guardan el hash en `blob_sha256`. Si el sistema de archivos no
+permite hard links se copia el archivo y simplemente no hay dedupe.
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.core import storage
+from app.core.services import service_registry
+
+MEDIA_ROOT = Path(__file__).resolve().parent.parent / "media"
+# Dentro de media para que blobs y rutas lógicas queden en el mismo volumen (hard links).
+BLOB_DIR_NAME = ".blobs"
+
+BLOB_TABLES = ("recepcion_media", "paquetes_piezas_media", "expediente_archivos")
+
+PRUNE_INTERVAL_SECONDS = 6 * 3600
+
+_prune_stop = threading.Event()
+_prune_thread: Optional[threading.Thread] = None
+
+
+def ensure_blob_columns(conn) -> None:
+    for table in BLOB_TABLES:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS blob_sha256 VARCHAR(64)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_blob_sha256 ON {table} (blob_sha256)")
+
+
+def blob_root() -> Path:
+    return MEDIA_ROOT / BLOB_DIR_NAME
+
+
+def blob_path(sha256: str) -> Path:
+    return blob_root() / sha256[:2] / sha256[2:4] / sha256
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Hard link de `source` en `target`; copia si el link no es posible."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        # Otro volumen o sistema de archivos sin hard links
+        shutil.copy2(source, target)
+
+
+def store(tmp_path: Path, sha256: str, target: Path) -> None:
+    """
+    Registra `tmp_path` (ya escrito y con fsync) como blob `sha256` y lo publica
+    en `target`. Si el blob ya existía se descarta `tmp_path`.
+    """
+    blob = blob_path(sha256)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        # os.link falla si el blob existe: dos subidas iguales al mismo tiempo no se pisan.
+        os.link(tmp_path, blob)
+    except FileExistsError:
+        pass
+    except OSError:
+        # Sin hard links no hay dedupe: el temporal pasa a ser el archivo lógico.
+        os.replace(tmp_path, target)
+        return
+    try:
+        link_or_copy(blob, target)
+    except FileNotFoundError:
+        # prune_orphans borró el blob entre os.link y la publicación
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def release(path: Path, sha256: Optional[str] = None) -> None:
+    """Borra una ruta lógica (también del bucket) y, si era la última referencia, su blob."""
+    storage.unpublish(path)
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return
+    if not sha256:
+        return
+    blob = blob_path(sha256)
+    try:
+        if blob.stat().st_nlink <= 1:
+            blob.unlink()
+    except OSError:
+        pass
+
+
+def prune_orphans() -> int:
+    """Borra blobs que ya no tienen rutas lógicas (st_nlink == 1)."""
+    removed = 0
+    root = blob_root()
+    if not root.is_dir():
+        return 0
+    for blob in root.glob("*/*/*"):
+        try:
+            if blob.is_file() and blob.stat().st_nlink <= 1:
+                blob.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _prune_loop() -> None:
+    while not _prune_stop.is_set():
+        try:
+            removed = prune_orphans()
+            if removed:
+                print(f"[Media] {removed} blobs sin referencias eliminados")
+        except Exception as exc:
+            print(f"[Media] Error limpiando blobs: {exc}")
+        _prune_stop.wait(PRUNE_INTERVAL_SECONDS)
+
+
+def start_prune() -> None:
+    global _prune_thread
+    if _prune_thread and _prune_thread.is_alive():
+        return
+    _prune_stop.clear()
+    _prune_thread = threading.Thread(target=_prune_loop, name="media-blob-prune", daemon=True)
+    _prune_thread.start()
+
+
+def stop_prune() -> None:
+    _prune_stop.set()
+    if _prune_thread and _prune_thread.is_alive():
+        _prune_thread.join(timeout=10)
+
+
+service_registry.register("media_blob_prune", start_prune, stop_prune)
@@ -6,14 +6,63 @@ class Settings(BaseSettings):
     app_name: str = "LaMarinaCC"
     env: str = "local"
     database_url: str
+    db_pool_enabled: bool = True
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_max_idle_seconds: float = 300.0  # Cierra conexiones ociosas por encima de min_size
+    db_pool_max_lifetime_seconds: float = 1800.0  # Recicla conexiones aunque estén sanas
+    db_pool_check_connections: bool = True
+    db_statement_timeout_ms: int = 0  # 0 = sin límite
+    db_auto_migrate: bool = True  # Aplica app.core.migrations al arrancar
+    taller_board_cache_ttl_seconds: float = 5.0  # 0 = sin caché del tablero de áreas
+    events_enabled: bool = True  # Canal LISTEN/NOTIFY para /events/stream
+    events_heartbeat_seconds: float = 15.0
+    rpa_queue_max_workers: int = 3  # Tareas RPA simultáneas por proceso
+    rpa_queue_type_limits: str = ""  # "qualitas_piezas=1,chubb_extract=1"; 1 por tipo si no se indica
+    rpa_queue_poll_seconds: float = 30.0  # Respaldo si no llega el NOTIFY
+    rpa_queue_lease_seconds: int = 180
+    rpa_queue_retry_base_seconds: int = 60
+    rpa_queue_retry_max_seconds: int = 3600
+    services_enabled: bool = True  # Worker RPA y schedulers (solo en el proceso líder)
+    services_leader_retry_seconds: float = 30.0
+    recepcion_pdf_cache_dir: str = ""  # Vacío = backend/cache/recepcion_pdf
+    recepcion_pdf_cache_max_mb: int = 500
+    recepcion_pdf_cache_max_age_days: float = 30.0
+    render_pool_workers: int = 2  # Procesos para PDF/xlsx; 0 = generar en el hilo de la petición
+    render_queue_max: int = 8  # Documentos en curso + en espera antes de responder 503
+    render_timeout_seconds: float = 120.0
+    media_derivatives_enabled: bool = True
+    media_derivatives_format: str = "jpeg"  # thumb y web: "jpeg" o "webp"; print siempre JPEG
+    upload_max_image_mb: int = 25
+    upload_max_video_mb: int = 50  # subir también client_max_body_size en infra/nginx
+    upload_max_document_mb: int = 50
+    media_accel_redirect_prefix: str = ""  # p. ej. "/_media_internal/" con la location interna de infra/nginx
+    media_storage_backend: str = "local"  # "local" (app/media) o "s3" (bucket + URLs firmadas)
+    media_s3_bucket: str = ""
+    media_s3_prefix: str = "media/"
+    media_s3_region: str = ""  # vacío = aws_region
+    media_s3_endpoint_url: str = ""  # MinIO u otro S3 compatible; vacío = AWS
+    media_s3_public_endpoint_url: str = ""  # host de las URLs firmadas si el navegador no ve endpoint_url
+    media_s3_presign_seconds: int = 900
+    media_s3_sync_local: bool = False  # subir al arrancar los archivos que solo están en disco
+    media_cache_max_mb: int = 5120  # con s3: tamaño máximo de la caché local en app/media (0 = sin límite)
+    media_cache_max_age_days: float = 14.0  # con s3: días sin uso antes de borrar de la caché (0 = nunca)
     cors_origins: str = ""
+    ocr_cache_enabled: bool = True  # Textract una sola vez por documento (SHA-256)
+    ocr_job_workers: int = 2  # Extracciones asíncronas en paralelo por proceso
+    ocr_job_stale_minutes: int = 15  # Jobs sin cambios en este tiempo se dan por fallidos (proceso caído)
+    ocr_job_retention_days: float = 7.0  # Jobs más viejos se borran (0 = nunca)
     aws_region: str = "us-east-1"
+    aws_textract_endpoint_url: str = ""  # stand-in local de Textract; vacío = AWS
     aws_transcribe_bucket: str = ""
     aws_transcribe_language_code: str = "es-MX"
     aws_transcribe_identify_language: bool = False
     aws_transcribe_language_options: str = "es-US,es-ES"
     aws_transcribe_timeout_seconds: int = 30  # Timeout más agresivo para audio corto
     aws_transcribe_poll_seconds: int = 1  # Polling más frecuente
+    aws_transcribe_endpoint_url: str = ""  # stand-in local de Transcribe y su bucket S3; vacío = AWS
+    aws_transcribe_streaming: bool = False  # wav/flac/ogg por streaming (requiere amazon-transcribe)
     whatsapp_graph_api_base_url: str = "https://graph.facebook.com"
     whatsapp_api_version: str = "v22.0"
     whatsapp_phone_number_id: str = ""
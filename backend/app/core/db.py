@@ -1,5 +1,16 @@
+import atexit
 import os
+import threading
+from contextlib import asynccontextmanager
+
 import psycopg
+from psycopg.rows import tuple_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+
+_pool: ConnectionPool | None = None
+_async_pool: AsyncConnectionPool | None = None
+_pool_lock = threading.Lock()
 
 
 def _normalize_dsn(dsn: str) -> str:
@@ -8,12 +19,206 @@ def _normalize_dsn(dsn: str) -> str:
     return dsn
 
 
-def get_connection():
+def _database_url() -> str:
     # Usar directamente la variable de entorno, ignorar settings
     database_url = os.environ.get("DATABASE_URL")
     if not database_url:
         # Fallback a settings solo si no hay variable de entorno
         from app.core.config import settings
         database_url = settings.database_url
-    
-    return psycopg.connect(_normalize_dsn(database_url), autocommit=True)
+    return _normalize_dsn(database_url)
+
+
+def _connection_kwargs() -> dict:
+    from app.core.config import settings
+
+    kwargs: dict = {"autocommit": True}
+    statement_timeout_ms = max(0, int(settings.db_statement_timeout_ms or 0))
+    if statement_timeout_ms:
+        kwargs["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return kwargs
+
+
+def _pool_options() -> dict:
+    from app.core.config import settings
+
+    min_size = max(0, int(settings.db_pool_min_size))
+    max_size = max(1, min_size, int(settings.db_pool_max_size))
+    return {
+        "kwargs": _connection_kwargs(),
+        "min_size": min_size,
+        "max_size": max_size,
+        "timeout": float(settings.db_pool_timeout_seconds),
+        "max_idle": float(settings.db_pool_max_idle_seconds),
+        "max_lifetime": float(settings.db_pool_max_lifetime_seconds),
+    }
+
+
+def _pool_enabled() -> bool:
+    from app.core.config import settings
+
+    return bool(settings.db_pool_enabled)
+
+
+def _check_enabled() -> bool:
+    from app.core.config import settings
+
+    return bool(settings.db_pool_check_connections)
+
+
+def _reset_connection(conn) -> None:
+    # Los endpoints cambian row_factory/autocommit sobre la conexión; se
+    # restauran antes de devolverla al pool para que el siguiente uso la
+    # reciba como si fuera nueva.
+    conn.autocommit = True
+    conn.row_factory = tuple_row
+
+
+async def _reset_async_connection(conn) -> None:
+    await conn.set_autocommit(True)
+    conn.row_factory = tuple_row
+
+
+class PooledConnection:
+    """Conexión prestada por el pool con la misma interfaz que psycopg.Connection.
+
+    `with get_connection() as conn:` hace commit/rollback igual que psycopg y,
+    en lugar de cerrar la conexión, la regresa al pool. `close()` también la
+    regresa y puede llamarse más de una vez.
+    """
+
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool: ConnectionPool, conn: psycopg.Connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def _connection(self) -> psycopg.Connection:
+        conn = self._conn
+        if conn is None:
+            raise psycopg.OperationalError("the connection is closed")
+        return conn
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._connection(), name, value)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            if not conn.closed:
+                if exc_type:
+                    conn.rollback()
+                else:
+                    conn.commit()
+        finally:
+            self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._conn is None or self._conn.closed
+
+    def close(self) -> None:
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        self._pool.putconn(conn)
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                _database_url(),
+                name="lamarinacc",
+                open=True,
+                check=ConnectionPool.check_connection if _check_enabled() else None,
+                reset=_reset_connection,
+                **_pool_options(),
+            )
+            atexit.register(close_pool)
+    return _pool
+
+
+def get_connection():
+    if not _pool_enabled():
+        return psycopg.connect(_database_url(), **_connection_kwargs())
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn())
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    global _async_pool
+    if _async_pool is None:
+        pool = AsyncConnectionPool(
+            _database_url(),
+            name="lamarinacc-async",
+            open=False,
+            check=AsyncConnectionPool.check_connection if _check_enabled() else None,
+            reset=_reset_async_connection,
+            **_pool_options(),
+        )
+        await pool.open()
+        if _async_pool is None:
+            _async_pool = pool
+        else:
+            await pool.close()
+    return _async_pool
+
+
+@asynccontextmanager
+async def get_async_connection():
+    if not _pool_enabled():
+        conn = await psycopg.AsyncConnection.connect(_database_url(), **_connection_kwargs())
+        async with conn:
+            yield conn
+        return
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def connect_async_dedicated(**kwargs) -> psycopg.AsyncConnection:
+    """Conexión asíncrona propia, fuera del pool (LISTEN necesita mantenerla abierta)."""
+    return await psycopg.AsyncConnection.connect(_database_url(), **{**_connection_kwargs(), **kwargs})
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    pool, _async_pool = _async_pool, None
+    if pool is not None:
+        await pool.close()
+
+
+def get_pool_stats() -> dict:
+    stats: dict = {"enabled": _pool_enabled()}
+    for key, pool in (("sync", _pool), ("async", _async_pool)):
+        if pool is None:
+            stats[key] = None
+            continue
+        stats[key] = {
+            "name": pool.name,
+            "min_size": pool.min_size,
+            "max_size": pool.max_size,
+            **pool.get_stats(),
+        }
+    return stats
@@ -0,0 +1,191 @@
+"""
+Canal de eventos en vivo basado en LISTEN/NOTIFY de PostgreSQL.
+
+Los triggers de las tablas que ven las pantallas (etapas y asignaciones de
+taller, rpa_tasks, mensajes de WhatsApp) publican en el canal
+`lamarinacc_events`. Cada proceso de la API mantiene una sola conexión en
+LISTEN y reparte los eventos a los clientes suscritos por SSE
+(`GET /events/stream?topics=taller,rpa`) y a los handlers internos, por
+ejemplo para invalidar cachés en todos los workers.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+from app.core.db import connect_async_dedicated
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "lamarinacc_events"
+
+# tabla -> tópico con el que se publica
+NOTIFY_TABLES: dict[str, str] = {
+    "taller_ot_etapas": "taller",
+    "taller_estacion_asignaciones": "taller",
+    "rpa_tasks": "rpa",
+    "whatsapp_chat_messages": "whatsapp",
+}
+
+# Columnas cuyo cambio por sí solo no se publica (el heartbeat del worker de RPA
+# renueva el lease de cada tarea en curso y no le interesa a nadie).
+NOTIFY_IGNORED_COLUMNS: dict[str, tuple[str, ...]] = {
+    "rpa_tasks": ("heartbeat_at", "lease_expires_at"),
+}
+
+_SUBSCRIBER_QUEUE_SIZE = 100
+_RECONNECT_MAX_SECONDS = 30.0
+
+
+def ensure_notify_triggers(conn) -> None:
+    conn.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION lamarinacc_notify_change() RETURNS trigger AS $$
+        DECLARE
+            row_data JSONB;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                row_data := to_jsonb(OLD);
+            ELSE
+                row_data := to_jsonb(NEW);
+            END IF;
+            PERFORM pg_notify(
+                '{EVENTS_CHANNEL}',
+                jsonb_strip_nulls(jsonb_build_object(
+                    'topic', TG_ARGV[0],
+                    'table', TG_TABLE_NAME,
+                    'op', TG_OP,
+                    'id', row_data->'id',
+                    'recepcion_id', row_data->'recepcion_id',
+                    'status', row_data->'status',
+                    'wa_id', row_data->'wa_id'
+                ))::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table, topic in NOTIFY_TABLES.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify ON {table}")
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify_update ON {table}")
+        ignored = NOTIFY_IGNORED_COLUMNS.get(table)
+        if not ignored:
+            conn.execute(
+                f"""
+                CREATE TRIGGER trg_{table}_notify
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION lamarinacc_notify_change('{topic}')
+                """
+            )
+            continue
+        # WHEN con OLD no se permite en triggers de INSERT: el UPDATE va en su propio trigger
+        columns = ", ".join(f"'{column}'" for column in ignored)
+        conn.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_notify
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION lamarinacc_notify_change('{topic}')
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TRIGGER trg_{table}_notify_update
+            AFTER UPDATE ON {table}
+            FOR EACH ROW
+            WHEN ((to_jsonb(OLD) - ARRAY[{columns}]) IS DISTINCT FROM (to_jsonb(NEW) - ARRAY[{columns}]))
+            EXECUTE FUNCTION lamarinacc_notify_change('{topic}')
+            """
+        )
+
+
+def publish(conn, topic: str, data: dict[str, Any] | None = None) -> None:
+    """Publica un evento desde código (para cambios que no pasan por una tabla con trigger)."""
+    payload = {"topic": topic, **(data or {})}
+    conn.execute("SELECT pg_notify(%s, %s)", (EVENTS_CHANNEL, json.dumps(payload, default=str)))
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+
+class EventBroker:
+    """Una conexión LISTEN por proceso, repartida a colas de suscriptores."""
+
+    def __init__(self) -> None:
+        self._subscribers: set[tuple[frozenset[str] | None, asyncio.Queue]] = set()
+        self._handlers: dict[str, list[Callable[[dict[str, Any]], None]]] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add_handler(self, topic: str, handler: Callable[[dict[str, Any]], None]) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._listen_forever(), name="lamarinacc-events")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    @asynccontextmanager
+    async def subscribe(self, topics: set[str] | None = None):
+        entry = (frozenset(topics) if topics else None, asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE))
+        self._subscribers.add(entry)
+        try:
+            yield entry[1]
+        finally:
+            self._subscribers.discard(entry)
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        topic = event.get("topic")
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(event)
+            except Exception as exc:
+                logger.warning(f"[Events] Handler de '{topic}' falló: {exc}")
+
+        for topics, queue in list(self._subscribers):
+            if topics is not None and topic not in topics:
+                continue
+            if queue.full():
+                # Cliente lento: se descarta el evento más viejo; el cliente recarga de todos modos.
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _listen_forever(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                conn = await connect_async_dedicated(autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {EVENTS_CHANNEL}")
+                    logger.info(f"[Events] Escuchando canal {EVENTS_CHANNEL}")
+                    delay = 1.0
+                    async for notify in conn.notifies():
+                        try:
+                            event = json.loads(notify.payload)
+                        except ValueError:
+                            event = {"topic": notify.payload}
+                        self.dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning(f"[Events] Conexión LISTEN perdida: {exc}; reintento en {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _RECONNECT_MAX_SECONDS)
+
+
+event_broker = EventBroker()
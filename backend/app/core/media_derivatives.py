@@ -0,0 +1,276 @@
+"""
+Derivados de imagen (thumb, web, print) para recepcion_media,
+paquetes_piezas_media y expediente_archivos.
+
+Las fotos se guardaban solo a resolución de cámara: las listas descargaban
+imágenes de varios MB y el PDF de inventario incrustaba los originales. Al
+subir una foto se agenda `generate_derivatives` (BackgroundTasks) que, con la
+orientación EXIF ya aplicada, guarda junto al original:
+
+- `<nombre>_thumb.<ext>`  lado mayor 320 px, para cuadrículas
+- `<nombre>_web.<ext>`    lado mayor 1280 px, para visores
+- `<nombre>_print.jpg`    lado mayor 1600 px, para los PDF (JPEG: reportlab lo incrusta sin recodificar)
+
+Las rutas quedan en la columna `derivatives` (JSONB) de cada tabla y salen en
+las APIs de listado. Las fotos anteriores a este cambio las completa el
+servicio `media_derivatives` en segundo plano.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from psycopg.rows import dict_row
+
+from app.core import blob_store, storage
+from app.core.config import settings
+from app.core.db import get_connection
+from app.core.services import service_registry
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # pragma: no cover - optional dependency
+    Image = None
+    ImageOps = None
+
+# nombre -> (lado mayor en px, calidad)
+DERIVATIVE_SPECS: dict[str, tuple[int, int]] = {
+    "print": (1600, 85),
+    "web": (1280, 80),
+    "thumb": (320, 70),
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# tabla -> columna con la ruta /media/... del original
+MEDIA_TABLES: dict[str, str] = {
+    "recepcion_media": "file_path",
+    "paquetes_piezas_media": "file_path",
+    "expediente_archivos": "archivo_path",
+}
+
+BACKFILL_BATCH_SIZE = 25
+
+_APP_ROOT = Path(__file__).resolve().parent.parent
+_backfill_stop = threading.Event()
+_backfill_thread: Optional[threading.Thread] = None
+
+
+def ensure_media_derivatives_columns(conn) -> None:
+    for table in ("paquetes_piezas_media", "expediente_archivos"):
+        conn.execute(
+            f"""
+            ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS derivatives JSONB NOT NULL DEFAULT '{{}}'::jsonb
+            """
+        )
+
+
+def is_image_path(relative_path: Optional[str]) -> bool:
+    return Path(str(relative_path or "")).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def disk_path(relative_path: str) -> Path:
+    return _APP_ROOT / str(relative_path or "").lstrip("/")
+
+
+def derivative_paths(derivatives: Optional[dict[str, Any]]) -> list[str]:
+    """Rutas /media/... guardadas en `derivatives` (ignora marcas como "error")."""
+    return [
+        value
+        for value in (derivatives or {}).values()
+        if isinstance(value, str) and value.startswith("/media/")
+    ]
+
+
+def remove_derivative_files(derivatives: Optional[dict[str, Any]]) -> None:
+    for relative_path in derivative_paths(derivatives):
+        storage.unpublish(relative_path)
+        try:
+            disk_path(relative_path).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def print_path(relative_path: Optional[str], derivatives: Optional[dict[str, Any]]) -> Optional[str]:
+    """
+    Ruta para incrustar en PDF: el derivado "print" si existe, si no el original.
+    Con almacenamiento S3 se baja antes al disco: el PDF se genera en otro proceso.
+    """
+    candidate = (derivatives or {}).get("print")
+    if isinstance(candidate, str) and candidate and storage.local_file(candidate):
+        return candidate
+    storage.local_file(relative_path)
+    return relative_path
+
+
+def _web_format() -> tuple[str, str]:
+    if str(settings.media_derivatives_format or "").strip().lower() == "webp":
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def _flatten_rgb(img):
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def create_image_derivatives(relative_path: str) -> dict[str, str]:
+    """Genera los derivados de `relative_path` y regresa {nombre: ruta /media/...}."""
+    if Image is None or not is_image_path(relative_path):
+        return {}
+    source = storage.local_file(relative_path) or disk_path(relative_path)
+    relative_dir = str(relative_path).rsplit("/", 1)[0]
+    web_format, web_extension = _web_format()
+    largest = max(size for size, _ in DERIVATIVE_SPECS.values())
+
+    created: dict[str, str] = {}
+    with Image.open(source) as opened:
+        # draft() deja que el decodificador JPEG reduzca por 1/2, 1/4 u 1/8 al leer.
+        opened.draft("RGB", (largest, largest))
+        img = _flatten_rgb(ImageOps.exif_transpose(opened))
+
+    # De mayor a menor: cada tamaño se reduce a partir del anterior.
+    for name, (size, quality) in sorted(DERIVATIVE_SPECS.items(), key=lambda item: -item[1][0]):
+        if max(img.size) > size:
+            img = img.copy()
+            img.thumbnail((size, size), Image.LANCZOS)
+        if name == "print":
+            image_format, extension = "JPEG", ".jpg"
+        else:
+            image_format, extension = web_format, web_extension
+        filename = f"{source.stem}_{name}{extension}"
+        target = source.with_name(filename)
+        tmp_target = target.with_name(f".{filename}.tmp")
+        img.save(tmp_target, format=image_format, quality=quality, optimize=True)
+        tmp_target.replace(target)
+        storage.publish(target)
+        created[name] = f"{relative_dir}/{filename}"
+    return created
+
+
+def generate_derivatives(table: str, relative_path: str) -> dict[str, Any]:
+    """
+    Genera los derivados y los guarda en todas las filas de `table` que apuntan
+    a `relative_path` (paquetes_piezas_media duplica filas al asignar piezas).
+    """
+    path_column = MEDIA_TABLES[table]
+    if not settings.media_derivatives_enabled or not is_image_path(relative_path):
+        return {}
+    try:
+        derivatives: dict[str, Any] = create_image_derivatives(relative_path)
+    except Exception as exc:
+        # Se marca para que el backfill no lo reintente en cada arranque.
+        print(f"[Media] No se generaron derivados de {relative_path}: {exc}")
+        derivatives = {"error": str(exc)[:200]}
+    if not derivatives:
+        return {}
+
+    with get_connection() as conn:
+        updated = conn.execute(
+            f"UPDATE {table} SET derivatives = derivatives || %s::jsonb WHERE {path_column} = %s",
+            (json.dumps(derivatives), relative_path),
+        ).rowcount
+    if not updated:
+        # El archivo se borró mientras se generaban los derivados.
+        remove_derivative_files(derivatives)
+        return {}
+    return derivatives
+
+
+def copy_derivatives(derivatives: Optional[dict[str, Any]], target_file_path: Path, target_relative_path: str) -> dict[str, str]:
+    """Enlaza los derivados existentes junto a una copia del original (p. ej. al expediente)."""
+    relative_dir = str(target_relative_path).rsplit("/", 1)[0]
+    copied: dict[str, str] = {}
+    for name, relative_path in (derivatives or {}).items():
+        if not isinstance(relative_path, str) or not relative_path.startswith("/media/"):
+            continue
+        source = storage.local_file(relative_path)
+        if source is None:
+            continue
+        filename = f"{target_file_path.stem}_{name}{source.suffix}"
+        target = target_file_path.with_name(filename)
+        try:
+            blob_store.link_or_copy(source, target)
+        except OSError:
+            continue
+        storage.publish(target)
+        copied[name] = f"{relative_dir}/{filename}"
+    return copied
+
+
+def _pending_rows(table: str, limit: int) -> list[dict[str, Any]]:
+    path_column = MEDIA_TABLES[table]
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        return conn.execute(
+            f"""
+            SELECT DISTINCT {path_column} AS path
+            FROM {table}
+            WHERE derivatives = '{{}}'::jsonb
+              AND {path_column} ~* '\\.(jpe?g|png|webp)$'
+            LIMIT %s
+            """,
+            (limit,),
+        ).fetchall()
+
+
+def backfill(tables: Iterable[str] = tuple(MEDIA_TABLES), batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Genera derivados de las fotos que aún no los tienen; regresa cuántas procesó."""
+    processed = 0
+    for table in tables:
+        seen: set[str] = set()
+        while not _backfill_stop.is_set():
+            rows = [row for row in _pending_rows(table, batch_size) if row["path"] not in seen]
+            if not rows:
+                break
+            for row in rows:
+                if _backfill_stop.is_set():
+                    break
+                relative_path = row["path"]
+                seen.add(relative_path)
+                if storage.local_file(relative_path) is None:
+                    derivatives = {"error": "archivo no encontrado"}
+                    with get_connection() as conn:
+                        conn.execute(
+                            f"UPDATE {table} SET derivatives = %s::jsonb WHERE {MEDIA_TABLES[table]} = %s",
+                            (json.dumps(derivatives), relative_path),
+                        )
+                else:
+                    generate_derivatives(table, relative_path)
+                processed += 1
+    return processed
+
+
+def _run_backfill() -> None:
+    try:
+        processed = backfill()
+        if processed:
+            print(f"[Media] Derivados generados para {processed} archivos existentes")
+    except Exception as exc:
+        print(f"[Media] Error en backfill de derivados: {exc}")
+
+
+def start_backfill() -> None:
+    global _backfill_thread
+    if not settings.media_derivatives_enabled or Image is None:
+        return
+    if _backfill_thread and _backfill_thread.is_alive():
+        return
+    _backfill_stop.clear()
+    _backfill_thread = threading.Thread(target=_run_backfill, name="media-derivatives", daemon=True)
+    _backfill_thread.start()
+
+
+def stop_backfill() -> None:
+    _backfill_stop.set()
+    if _backfill_thread and _backfill_thread.is_alive():
+        _backfill_thread.join(timeout=10)
+
+
+service_registry.register("media_derivatives", start_backfill, stop_backfill)
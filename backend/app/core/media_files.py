@@ -0,0 +1,201 @@
+"""
+Entrega de archivos de /media (fotos, videos, PDFs subidos).
+
+- ETag fuerte: el SHA-256 guardado en `blob_sha256` cuando el archivo está en
+  el blob store; si no, uno derivado de inode/tamaño/mtime.
+- Los archivos con hash conocido nunca cambian de contenido (cada subida
+  lleva un nombre nuevo), así que van con `Cache-Control: immutable`.
+- `If-None-Match` responde 304 y `Range` responde 206, para que los videos
+  de recepción se puedan adelantar sin descargarlos completos.
+- Con MEDIA_ACCEL_REDIRECT_PREFIX la API solo valida la ruta y responde
+  `X-Accel-Redirect`; nginx manda los bytes con sendfile (infra/nginx).
+- Con almacenamiento S3 (app.core.storage) responde 307 a una URL firmada
+  del bucket y no toca el disco.
+"""
+
+import mimetypes
+import os
+import re
+import stat as stat_module
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+from app.core import blob_store, storage
+from app.core.config import settings
+from app.core.db import get_connection
+
+MEDIA_ROOT = Path(__file__).resolve().parent.parent / "media"
+LEGACY_MEDIA_ROOT = Path(__file__).resolve().parent.parent.parent / "media"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+RANGE_CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Rutas lógicas por tabla para buscar el hash guardado
+_HASH_LOOKUP_SQL = """
+    SELECT blob_sha256 FROM recepcion_media WHERE file_path = %(path)s AND blob_sha256 IS NOT NULL
+    UNION ALL
+    SELECT blob_sha256 FROM expediente_archivos WHERE archivo_path = %(path)s AND blob_sha256 IS NOT NULL
+    UNION ALL
+    SELECT blob_sha256 FROM paquetes_piezas_media WHERE file_path = %(path)s AND blob_sha256 IS NOT NULL
+    LIMIT 1
+"""
+
+
+def ensure_media_path_indexes(conn) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recepcion_media_file_path ON recepcion_media (file_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_expediente_archivos_archivo_path ON expediente_archivos (archivo_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_paquetes_piezas_media_file_path ON paquetes_piezas_media (file_path)")
+
+
+@lru_cache(maxsize=2)
+def _resolved_root(root: Path) -> Path:
+    return root.resolve()
+
+
+def _validate_media_path(file_path: str) -> Path:
+    requested = Path(file_path)
+    if requested.is_absolute() or ".." in requested.parts:
+        raise HTTPException(status_code=400, detail="Ruta de archivo invalida")
+    if requested.parts and requested.parts[0] == blob_store.BLOB_DIR_NAME:
+        # Los blobs solo se sirven a través de sus rutas lógicas
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return requested
+
+
+def _resolve_media(file_path: str) -> tuple[Path, os.stat_result, bool]:
+    """Ruta en disco, stat y si está bajo MEDIA_ROOT (la única carpeta que ve nginx)."""
+    requested = _validate_media_path(file_path)
+    for base_dir in (MEDIA_ROOT, LEGACY_MEDIA_ROOT):
+        candidate = base_dir / requested
+        try:
+            file_stat = candidate.stat()
+        except OSError:
+            continue
+        if not stat_module.S_ISREG(file_stat.st_mode):
+            continue
+        # Los symlinks no deben sacar al cliente de la carpeta de media
+        resolved_base = _resolved_root(base_dir)
+        if not candidate.resolve().is_relative_to(resolved_base):
+            continue
+        return candidate, file_stat, base_dir == MEDIA_ROOT
+
+    raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+
+@lru_cache(maxsize=4096)
+def _stored_hash(relative_path: str, st_ino: int, st_mtime_ns: int) -> Optional[str]:
+    # inode/mtime en la llave: si la ruta pasa a ser otro archivo se vuelve a consultar
+    with get_connection() as conn:
+        row = conn.execute(_HASH_LOOKUP_SQL, {"path": relative_path}).fetchone()
+    return row[0] if row else None
+
+
+def _etag(relative_path: str, file_stat: os.stat_result) -> tuple[str, bool]:
+    """(ETag, es inmutable)."""
+    try:
+        digest = _stored_hash(relative_path, file_stat.st_ino, file_stat.st_mtime_ns)
+    except Exception:
+        # Sin base de datos se sirve igual, con la ETag de stat (no queda en caché)
+        digest = None
+    if digest:
+        return f'"{digest}"', True
+    return f'"{file_stat.st_ino:x}-{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"', False
+
+
+def _etag_matches(header_value: Optional[str], etag: str) -> bool:
+    if not header_value:
+        return False
+    candidates = [item.strip() for item in header_value.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _parse_range(header_value: str, size: int) -> Optional[tuple[int, int]]:
+    """Rango simple `bytes=a-b`; None si hay que mandar el archivo completo."""
+    match = _RANGE_RE.match(header_value.strip())
+    if not match:
+        # Varios rangos o formato desconocido: se ignora y se manda todo (RFC 9110)
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        if length <= 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return size - length, size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    remaining = end - start + 1
+    with path.open("rb") as handle:
+        handle.seek(start)
+        while remaining > 0:
+            chunk = handle.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _presigned_redirect(file_path: str) -> Response:
+    _validate_media_path(file_path)
+    url = storage.presigned_url(f"/media/{file_path}")
+    if not url:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    # El navegador reusa la redirección mientras la firma siga vigente
+    max_age = max(0, int(settings.media_s3_presign_seconds) // 2)
+    return RedirectResponse(url, status_code=307, headers={"Cache-Control": f"private, max-age={max_age}"})
+
+
+def media_response(request: Request, file_path: str) -> Response:
+    if storage.is_remote():
+        return _presigned_redirect(file_path)
+
+    disk_path, file_stat, in_media_root = _resolve_media(file_path)
+    etag, immutable = _etag(f"/media/{file_path}", file_stat)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(disk_path.name)[0] or "application/octet-stream"
+    accel_prefix = (settings.media_accel_redirect_prefix or "").strip()
+    if accel_prefix and in_media_root:
+        # nginx resuelve Range, HEAD y sendfile con la location interna
+        headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{quote(file_path)}"
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, file_stat.st_size)
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _iter_file_range(disk_path, start, end),
+                status_code=206,
+                headers=headers,
+                media_type=media_type,
+            )
+
+    return FileResponse(disk_path, headers=headers, media_type=media_type, stat_result=file_stat)
@@ -0,0 +1,187 @@
+"""
+Migraciones de esquema versionadas.
+
+Los bloques DDL idempotentes de cada módulo (CREATE TABLE IF NOT EXISTS,
+ADD COLUMN IF NOT EXISTS, índices y catálogos semilla) se registran aquí en
+orden y se aplican una sola vez, al arrancar la API o desde la línea de
+comandos, en lugar de ejecutarse en cada petición:
+
+    python -m app.core.migrations          # aplica las pendientes
+    python -m app.core.migrations --list   # muestra el estado
+
+Cada versión aplicada queda en la tabla schema_version. Para cambiar un
+esquema existente se agrega una versión nueva; nunca se edita una ya aplicada.
+"""
+
+import argparse
+import importlib
+import logging
+from dataclasses import dataclass
+
+from psycopg.rows import tuple_row
+
+from app.core.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Llave de pg_advisory_lock para que varios workers no migren al mismo tiempo.
+MIGRATIONS_LOCK_ID = 872_341_001
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    description: str
+    target: str  # "modulo:funcion"; la función recibe la conexión
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration("0001", "password_reset_tokens", "app.auth.routes:_ensure_password_reset_table"),
+    Migration("0002", "recepcion_media", "app.modules.recepcion.routes:ensure_recepcion_media_table"),
+    Migration("0003", "inventario_recepcion", "app.modules.recepcion.routes:ensure_inventario_recepcion_table"),
+    Migration(
+        "0004",
+        "orden_admision.transmision",
+        "app.modules.recepcion.routes:ensure_orden_admision_transmision_column",
+    ),
+    Migration("0005", "recepcion_citas", "app.modules.recepcion.routes:ensure_recepcion_citas_table"),
+    Migration("0006", "expediente_archivos.categoria", "app.modules.expedientes.routes:_ensure_categoria_column"),
+    Migration("0007", "expediente_archivos.anotaciones", "app.modules.expedientes.routes:_ensure_anotaciones_column"),
+    Migration("0008", "valuacion_detalle importes", "app.modules.valuacion_danos.routes:_ensure_detalle_columns"),
+    Migration("0009", "proveedores.activo", "app.modules.inventario.routes:ensure_proveedores_schema"),
+    Migration("0010", "paquetes_piezas", "app.modules.inventario.routes:ensure_paquetes_piezas_tables"),
+    Migration("0011", "taller etapas, catalogos y OT", "app.modules.taller.routes:_ensure_taller_schema"),
+    Migration("0012", "whatsapp_chat_messages", "app.main:_ensure_whatsapp_chat_tables"),
+    Migration(
+        "0013",
+        "aseguradora_credenciales autosync",
+        "app.modules.administracion.routes:_ensure_credenciales_columns",
+    ),
+    Migration(
+        "0014",
+        "rpa_piezas_execution_log",
+        "app.modules.administracion.routes:_ensure_piezas_execution_log_table",
+    ),
+    Migration("0015", "rpa_tasks", "app.modules.administracion.rpa_queue:ensure_tasks_table"),
+    Migration("0016", "qualitas_indicadores", "app.modules.administracion.qualitas_indicadores:ensure_table_exists"),
+    Migration("0017", "chubb_indicadores y chubb_expedientes", "app.modules.administracion.chubb_indicadores:ensure_tables_exists"),
+    Migration("0018", "taller_ot_etapas de recepciones existentes", "app.modules.taller.routes:_backfill_ot_stages"),
+    Migration("0019", "indices dashboard de taller", "app.modules.taller.routes:_ensure_taller_dashboard_indexes"),
+    Migration("0020", "indices OTs disponibles por area", "app.modules.taller.routes:_ensure_taller_disponibles_indexes"),
+    Migration("0021", "triggers NOTIFY para eventos en vivo", "app.core.events:ensure_notify_triggers"),
+    Migration("0022", "rpa_tasks prioridad, back-off y lease", "app.modules.administracion.rpa_queue:ensure_tasks_queue_columns"),
+    Migration("0023", "rpa_task_log_lines", "app.modules.administracion.rpa_queue:ensure_task_log_lines_table"),
+    Migration("0024", "rpa_jobs y rpa_job_log_lines", "app.modules.administracion.rpa_job_store:ensure_rpa_jobs_tables"),
+    Migration(
+        "0025",
+        "recepcion_media.derivatives",
+        "app.modules.recepcion.routes:ensure_recepcion_media_derivatives_column",
+    ),
+    Migration(
+        "0026",
+        "paquetes_piezas_media y expediente_archivos derivatives",
+        "app.core.media_derivatives:ensure_media_derivatives_columns",
+    ),
+    Migration("0027", "blob_sha256 en tablas de media", "app.core.blob_store:ensure_blob_columns"),
+    Migration("0028", "indices por ruta en tablas de media", "app.core.media_files:ensure_media_path_indexes"),
+    Migration("0029", "cache de OCR y jobs de extraccion", "app.modules.recepcion.ocr_cache:ensure_ocr_tables"),
+    Migration("0030", "secuencia de folios de recepcion", "app.modules.recepcion.folios:ensure_folio_sequence"),
+    Migration(
+        "0031",
+        "identidad de vehiculos por placa y serie",
+        "app.modules.recepcion.vehiculos:ensure_vehiculo_identidades",
+    ),
+    Migration("0032", "NOTIFY de rpa_tasks sin heartbeats", "app.core.events:ensure_notify_triggers"),
+    Migration("0033", "service_controls", "app.core.services:ensure_service_controls_table"),
+    Migration(
+        "0034",
+        "placa y serie TEXT en vehiculo_identidades",
+        "app.modules.recepcion.vehiculos:widen_vehiculo_identidades",
+    ),
+)
+
+
+def _resolve(target: str):
+    module_name, func_name = target.split(":", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _ensure_schema_version_table(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version VARCHAR(50) PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def _applied_versions(conn) -> set[str]:
+    conn.row_factory = tuple_row
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version").fetchall()}
+
+
+def apply_migrations() -> list[str]:
+    """Aplica las migraciones pendientes en orden y regresa las versiones aplicadas."""
+    applied_now: list[str] = []
+    with get_connection() as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+        try:
+            _ensure_schema_version_table(conn)
+            applied = _applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                apply = _resolve(migration.target)
+                with conn.transaction():
+                    apply(conn)
+                    conn.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (migration.version, migration.description),
+                    )
+                conn.row_factory = tuple_row
+                applied_now.append(migration.version)
+                logger.info(f"[Migrations] {migration.version} aplicada: {migration.description}")
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+    return applied_now
+
+
+def migration_status() -> list[dict]:
+    with get_connection() as conn:
+        _ensure_schema_version_table(conn)
+        conn.row_factory = tuple_row
+        applied = {
+            row[0]: row[1]
+            for row in conn.execute("SELECT version, applied_at FROM schema_version").fetchall()
+        }
+    return [
+        {
+            "version": migration.version,
+            "description": migration.description,
+            "applied_at": applied.get(migration.version),
+        }
+        for migration in MIGRATIONS
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migraciones de esquema de LaMarinaCC")
+    parser.add_argument("--list", action="store_true", help="Solo muestra el estado de cada versión")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.list:
+        for item in migration_status():
+            state = item["applied_at"].isoformat() if item["applied_at"] else "pendiente"
+            print(f"{item['version']}  {item['description']:<45} {state}")
+        return
+
+    applied = apply_migrations()
+    print(f"[Migrations] {len(applied)} migraciones aplicadas" if applied else "[Migrations] Esquema al día")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Servicio de render de documentos (PDF de recepción, PDF de inventario de
+paquetes, presupuesto xlsx de Qualitas).
+
+reportlab y xlsxwriter son puro CPU y retienen el GIL, así que varios PDF a
+la vez frenaban al resto de los endpoints del threadpool de FastAPI. Aquí los
+builders corren en un ProcessPoolExecutor acotado:
+
+- cada proceso del pool registra fuentes y precarga plantillas al arrancar
+  (RENDER_WARMUPS), así que el primer documento no paga ese costo;
+- si ya hay `render_queue_max` documentos en curso o esperando, se responde
+  503 en lugar de encolar sin límite. Un documento que excedió el timeout
+  sigue contando hasta que su proceso termina de verdad;
+- si un proceso del pool muere, el pool se descarta y se responde 503 con
+  Retry-After; la siguiente llamada crea uno nuevo;
+- `render_stats()` (GET /health/render) da conteos y tiempos por builder.
+
+Los builders deben ser funciones de nivel módulo y recibir/regresar datos
+serializables con pickle (dicts, listas, modelos pydantic, bytes).
+"""
+
+import importlib
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# "modulo:funcion" que cada proceso del pool ejecuta al iniciar.
+RENDER_WARMUPS: tuple[str, ...] = (
+    "app.modules.recepcion.routes:warm_pdf_render_worker",
+    "app.modules.inventario.pdf_generator:_register_fonts",
+)
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_stats: dict[str, dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def _init_worker(warmups: tuple[str, ...]) -> None:
+    for target in warmups:
+        module_name, func_name = target.split(":", 1)
+        try:
+            getattr(importlib.import_module(module_name), func_name)()
+        except Exception as exc:
+            print(f"[Render] Warmup {target} falló: {exc}")
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: el proceso de la API tiene hilos y conexiones abiertas que no deben heredarse.
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, int(settings.render_pool_workers)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(RENDER_WARMUPS,),
+            )
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _release_slot(_future: Any = None) -> None:
+    global _in_flight
+    with _stats_lock:
+        _in_flight -= 1
+
+
+def shutdown_render_pool() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _record(name: str, elapsed_ms: float, ok: bool) -> None:
+    with _stats_lock:
+        item = _stats.setdefault(
+            name, {"count": 0, "errors": 0, "rejected": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        )
+        item["count"] += 1
+        if not ok:
+            item["errors"] += 1
+        item["total_ms"] += elapsed_ms
+        item["max_ms"] = max(item["max_ms"], elapsed_ms)
+        item["last_ms"] = elapsed_ms
+
+
+def _record_rejected(name: str) -> None:
+    with _stats_lock:
+        item = _stats.setdefault(
+            name, {"count": 0, "errors": 0, "rejected": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        )
+        item["rejected"] += 1
+
+
+def render(builder: Callable[..., bytes], *args: Any, **kwargs: Any) -> bytes:
+    """Ejecuta `builder(*args, **kwargs)` en el pool y regresa sus bytes."""
+    global _in_flight
+    name = builder.__name__
+    with _stats_lock:
+        if _in_flight >= max(1, int(settings.render_queue_max)):
+            busy = True
+        else:
+            busy = False
+            _in_flight += 1
+    if busy:
+        _record_rejected(name)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hay demasiados documentos generándose; intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "5"},
+        )
+
+    started = time.perf_counter()
+    ok = False
+    future = None
+    try:
+        if int(settings.render_pool_workers) <= 0:
+            result = builder(*args, **kwargs)
+        else:
+            executor = _get_executor()
+            try:
+                future = executor.submit(builder, *args, **kwargs)
+                # El cupo se libera cuando el proceso termina, no cuando la petición deja de esperar:
+                # cancel() no detiene un builder que ya está corriendo.
+                future.add_done_callback(_release_slot)
+                result = future.result(timeout=float(settings.render_timeout_seconds))
+            except FutureTimeoutError:
+                future.cancel()
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="La generación del documento tardó demasiado.",
+                )
+            except BrokenProcessPool:
+                # Un proceso del pool murió (p. ej. por memoria); se crea uno nuevo en la siguiente llamada.
+                logger.error(f"[Render] Pool roto al generar {name}; se reinicia")
+                _discard_executor(executor)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="El generador de documentos se está reiniciando; intenta de nuevo en unos segundos.",
+                    headers={"Retry-After": "5"},
+                )
+        ok = True
+        return result
+    finally:
+        if future is None:
+            _release_slot()
+        _record(name, (time.perf_counter() - started) * 1000, ok)
+
+
+def render_stats() -> dict[str, Any]:
+    with _stats_lock:
+        builders = {
+            name: {
+                **{key: (round(value, 1) if key.endswith("_ms") else int(value)) for key, value in item.items()},
+                "avg_ms": round(item["total_ms"] / item["count"], 1) if item["count"] else 0.0,
+            }
+            for name, item in _stats.items()
+        }
+        in_flight = _in_flight
+    return {
+        "workers": max(0, int(settings.render_pool_workers)),
+        "queue_max": max(1, int(settings.render_queue_max)),
+        "in_flight": in_flight,
+        "builders": builders,
+    }
@@ -0,0 +1,326 @@
+"""
+Servicios de fondo (worker de la cola RPA, schedulers) arrancados desde el
+lifespan de FastAPI.
+
+Importar un módulo solo registra su servicio; ningún hilo arranca al importar,
+así que los scripts de línea de comandos, las migraciones y los workers extra
+de uvicorn cargan rápido y sin efectos secundarios.
+
+Con varios workers solo uno debe correr los schedulers y el worker de la cola.
+Cada proceso intenta tomar un advisory lock de PostgreSQL con una conexión
+propia; el que lo obtiene es el líder y arranca los servicios `leader_only`.
+Los demás reintentan cada `services_leader_retry_seconds`: si el líder muere,
+su conexión se cierra, el lock se libera y otro proceso toma el relevo.
+
+Los endpoints que encienden, apagan o configuran un scheduler pueden caer en
+cualquier worker, así que no tocan los hilos: `request` guarda el estado
+deseado en service_controls y avisa por NOTIFY; el líder lo aplica (también al
+tomar el relevo) y publica ahí mismo el estado real, que `control_status`
+devuelve desde cualquier proceso.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.db import connect_async_dedicated, get_connection
+from app.core.events import event_broker, publish
+
+logger = logging.getLogger(__name__)
+
+# Llave de pg_advisory_lock del proceso líder (ver MIGRATIONS_LOCK_ID, RPA_CLAIM_LOCK_ID).
+SERVICES_LEADER_LOCK_ID = 872_341_010
+
+SERVICES_TOPIC = "services"
+_REQUEST_POLL_SECONDS = 0.25
+
+
+@dataclass
+class Service:
+    name: str
+    start: Callable[[], Any]
+    stop: Callable[[], Any]
+    leader_only: bool = True
+
+
+@dataclass
+class Control:
+    name: str
+    apply: Callable[[dict[str, Any]], Any]  # recibe el estado deseado acumulado
+    status: Callable[[], dict[str, Any]]
+
+
+def ensure_service_controls_table(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS service_controls (
+            name VARCHAR(100) PRIMARY KEY,
+            desired JSONB NOT NULL DEFAULT '{}'::jsonb,
+            version BIGINT NOT NULL DEFAULT 0,
+            applied_version BIGINT NOT NULL DEFAULT 0,
+            status JSONB,
+            status_instance VARCHAR(255),
+            status_at TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+
+
+class ServiceRegistry:
+    """Servicios registrados por los módulos; el lifespan los arranca y detiene."""
+
+    def __init__(self) -> None:
+        self._services: dict[str, Service] = {}
+        self._started: list[str] = []
+        self._controls: dict[str, Control] = {}
+        self._applied_controls: dict[str, int] = {}
+        self._controls_lock = threading.Lock()
+        self._control_tasks: set[asyncio.Task] = set()
+        self._leader_conn = None
+        self._task: asyncio.Task | None = None
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        event_broker.add_handler(SERVICES_TOPIC, self._on_control_event)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_conn is not None
+
+    def register(
+        self,
+        name: str,
+        start: Callable[[], Any],
+        stop: Callable[[], Any],
+        *,
+        leader_only: bool = True,
+    ) -> None:
+        self._services[name] = Service(name, start, stop, leader_only)
+
+    def register_control(
+        self,
+        name: str,
+        apply: Callable[[dict[str, Any]], Any],
+        status: Callable[[], dict[str, Any]],
+    ) -> None:
+        """Algo que los endpoints configuran (un scheduler) pero que solo el líder ejecuta."""
+        self._controls[name] = Control(name, apply, status)
+
+    def request(self, name: str, desired: dict[str, Any], wait_seconds: float = 5.0) -> Optional[dict[str, Any]]:
+        """
+        Pide al líder un cambio de estado de `name` (se combina con lo pedido antes).
+
+        Regresa el estado del control ya aplicado, o None si el líder no lo
+        aplicó dentro de `wait_seconds` (queda guardado y lo aplicará).
+        """
+        if name not in self._controls:
+            raise KeyError(name)
+        with get_connection() as conn:
+            row = conn.execute(
+                """
+                INSERT INTO service_controls (name, desired, version)
+                VALUES (%s, %s::jsonb, 1)
+                ON CONFLICT (name) DO UPDATE SET
+                    desired = service_controls.desired || EXCLUDED.desired,
+                    version = service_controls.version + 1,
+                    updated_at = LOCALTIMESTAMP
+                RETURNING version
+                """,
+                (name, json.dumps(desired, default=str)),
+            ).fetchone()
+            publish(conn, SERVICES_TOPIC, {"control": name})
+        version = row[0]
+
+        if self.is_leader:
+            self.sync_controls()
+        deadline = time.monotonic() + max(0.0, wait_seconds)
+        while True:
+            applied = self._read_control(name)
+            if applied and applied[0] >= version:
+                return self.control_status(name)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(_REQUEST_POLL_SECONDS)
+
+    def control_status(self, name: str) -> Optional[dict[str, Any]]:
+        """Estado del control: en vivo en el líder, la última foto publicada en los demás."""
+        control = self._controls.get(name)
+        if control is None:
+            raise KeyError(name)
+        if self.is_leader:
+            return control.status()
+        applied = self._read_control(name)
+        return applied[1] if applied else None
+
+    def sync_controls(self) -> None:
+        """Aplica los estados pedidos que este líder no ha aplicado y publica el estado de cada control."""
+        if not self._controls:
+            return
+        with self._controls_lock, get_connection() as conn:
+            rows = conn.execute(
+                "SELECT name, desired, version FROM service_controls WHERE name = ANY(%s)",
+                (list(self._controls),),
+            ).fetchall()
+            for name, desired, version in rows:
+                if self._applied_controls.get(name) == version:
+                    continue
+                try:
+                    self._controls[name].apply(desired or {})
+                    logger.info(f"[Services] {name} aplicado: {desired}")
+                except Exception as exc:
+                    logger.error(f"[Services] No se pudo aplicar {name}: {exc}")
+                self._applied_controls[name] = version
+
+            for name, control in self._controls.items():
+                try:
+                    snapshot = control.status()
+                except Exception as exc:
+                    snapshot = {"name": name, "running": False, "error": str(exc)}
+                conn.execute(
+                    """
+                    INSERT INTO service_controls (name, applied_version, status, status_instance, status_at)
+                    VALUES (%s, %s, %s::jsonb, %s, LOCALTIMESTAMP)
+                    ON CONFLICT (name) DO UPDATE SET
+                        applied_version = EXCLUDED.applied_version,
+                        status = EXCLUDED.status,
+                        status_instance = EXCLUDED.status_instance,
+                        status_at = EXCLUDED.status_at
+                    """,
+                    (
+                        name,
+                        self._applied_controls.get(name, 0),
+                        json.dumps(snapshot, default=str),
+                        self.instance_id,
+                    ),
+                )
+
+    def _read_control(self, name: str) -> Optional[tuple[int, Optional[dict[str, Any]]]]:
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT applied_version, status FROM service_controls WHERE name = %s",
+                (name,),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _on_control_event(self, _event: dict[str, Any]) -> None:
+        if not self.is_leader:
+            return
+        task = asyncio.get_running_loop().create_task(self._sync_controls_async())
+        self._control_tasks.add(task)
+        task.add_done_callback(self._control_tasks.discard)
+
+    async def _sync_controls_async(self) -> None:
+        try:
+            await asyncio.to_thread(self.sync_controls)
+        except Exception as exc:
+            logger.warning(f"[Services] No se pudieron sincronizar los controles: {exc}")
+
+    async def start(self) -> None:
+        for service in self._services.values():
+            if not service.leader_only:
+                await self._start_service(service)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._elect_forever(), name="lamarinacc-services")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for name in reversed(list(self._started)):
+            await self._stop_service(self._services[name])
+        await self._release_leadership()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "instance": self.instance_id,
+            "leader": self.is_leader,
+            "running": list(self._started),
+            "registered": sorted(self._services),
+            "controls": sorted(self._controls),
+        }
+
+    async def _start_service(self, service: Service) -> None:
+        if service.name in self._started:
+            return
+        try:
+            await asyncio.to_thread(service.start)
+            self._started.append(service.name)
+            logger.info(f"[Services] {service.name} iniciado")
+        except Exception as exc:
+            logger.error(f"[Services] No se pudo iniciar {service.name}: {exc}")
+
+    async def _stop_service(self, service: Service) -> None:
+        if service.name not in self._started:
+            return
+        self._started.remove(service.name)
+        try:
+            await asyncio.to_thread(service.stop)
+            logger.info(f"[Services] {service.name} detenido")
+        except Exception as exc:
+            logger.warning(f"[Services] Error deteniendo {service.name}: {exc}")
+
+    async def _elect_forever(self) -> None:
+        retry = max(1.0, float(settings.services_leader_retry_seconds))
+        while True:
+            try:
+                if self._leader_conn is None:
+                    if await self._try_acquire_leadership():
+                        logger.info(f"[Services] {self.instance_id} es el proceso líder")
+                        for service in self._services.values():
+                            if service.leader_only:
+                                await self._start_service(service)
+                else:
+                    # El lock vive mientras viva la conexión; si se cae, otro proceso puede tomarlo.
+                    await self._leader_conn.execute("SELECT 1")
+                if self._leader_conn is not None:
+                    # Lo pedido mientras otro era líder (o sin NOTIFY) y la foto de estado para los demás
+                    await self._sync_controls_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if self._leader_conn is not None:
+                    logger.warning(f"[Services] Se perdió el liderazgo: {exc}")
+                    for service in reversed(list(self._services.values())):
+                        if service.leader_only:
+                            await self._stop_service(service)
+                    await self._release_leadership()
+                else:
+                    logger.warning(f"[Services] Elección de líder falló: {exc}")
+            await asyncio.sleep(retry)
+
+    async def _try_acquire_leadership(self) -> bool:
+        conn = await connect_async_dedicated(autocommit=True)
+        try:
+            cursor = await conn.execute("SELECT pg_try_advisory_lock(%s)", (SERVICES_LEADER_LOCK_ID,))
+            row = await cursor.fetchone()
+        except Exception:
+            await conn.close()
+            raise
+        if row and row[0]:
+            self._leader_conn = conn
+            return True
+        await conn.close()
+        return False
+
+    async def _release_leadership(self) -> None:
+        conn, self._leader_conn = self._leader_conn, None
+        self._applied_controls.clear()
+        if conn is None:
+            return
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+service_registry = ServiceRegistry()
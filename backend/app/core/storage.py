@@ -0,0 +1,519 @@
+"""
+Almacenamiento de los archivos de /media: disco local o bucket S3 compatible.
+
+Con MEDIA_STORAGE_BACKEND=local (default) todo sigue igual: la carpeta
+`app/media` es el almacenamiento y la API entrega los bytes.
+
+Con MEDIA_STORAGE_BACKEND=s3 el bucket es la fuente de verdad y `app/media`
+queda como caché local de cada nodo:
+
+- `publish` sube cada archivo escrito (subidas, derivados, espejos) con la
+  misma ruta lógica como llave (`<prefijo>recepcion/12/photo_x.jpg`);
+- `/media/...` responde 307 a una URL firmada de GET, así la API ya no
+  transmite fotos ni videos y puede correr en varios nodos;
+- `local_file` baja el archivo a la caché cuando un proceso lo necesita en
+  disco (PDF, derivados) y el nodo no lo tiene; `open_media` lo lee del
+  bucket por partes sin pasar por el disco (ZIPs de galería y expediente);
+- el servicio `media_cache_prune` recorta la caché por antigüedad de uso y
+  tamaño (MEDIA_CACHE_MAX_AGE_DAYS / MEDIA_CACHE_MAX_MB), borrando solo lo
+  que ya está en el bucket con el mismo tamaño;
+- con MEDIA_S3_SYNC_LOCAL=true el servicio `media_storage_sync` sube al
+  arrancar lo que solo está en disco (los archivos anteriores al cambio).
+  Es para la migración: con varios nodos una caché vieja podría revivir
+  archivos que otro nodo ya borró.
+
+Para pruebas locales basta un MinIO (docker-compose.dev.yml, perfil
+"storage") con MEDIA_S3_ENDPOINT_URL.
+"""
+
+import mimetypes
+import os
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.services import service_registry
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+except Exception:  # pragma: no cover - optional dependency
+    boto3 = None
+    BotoConfig = None
+
+MEDIA_ROOT = Path(__file__).resolve().parent.parent / "media"
+LEGACY_MEDIA_ROOT = Path(__file__).resolve().parent.parent.parent / "media"
+
+_backend = None
+_backend_lock = threading.Lock()
+_sync_stop = threading.Event()
+_sync_thread: Optional[threading.Thread] = None
+_cache_prune_stop = threading.Event()
+_cache_prune_thread: Optional[threading.Thread] = None
+
+CACHE_PRUNE_INTERVAL_SECONDS = 6 * 3600
+
+PathLike = Union[str, Path]
+# (lector, tamaño en bytes, mtime) de un archivo abierto con `open_media`
+MediaStream = tuple[BinaryIO, int, float]
+
+
+class LocalStorage:
+    """`app/media` es el almacenamiento: no hay nada que subir ni firmar."""
+
+    name = "local"
+    remote = False
+
+    def put(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        pass
+
+    def get(self, key: str, target: Path) -> bool:
+        return False
+
+    def open(self, key: str) -> Optional[MediaStream]:
+        return None
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        pass
+
+    def copy(self, source_key: str, target_key: str) -> None:
+        pass
+
+    def presigned_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        return None
+
+    def list_sizes(self) -> dict[str, int]:
+        return {}
+
+
+class S3Storage:
+    """Bucket S3 (o MinIO) con URLs firmadas de GET."""
+
+    name = "s3"
+    remote = True
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        region: str = "",
+        endpoint_url: str = "",
+        public_endpoint_url: str = "",
+        presign_seconds: int = 900,
+    ) -> None:
+        if not boto3:
+            raise RuntimeError("Falta dependencia boto3 para MEDIA_STORAGE_BACKEND=s3")
+        if not bucket:
+            raise RuntimeError("MEDIA_S3_BUCKET no configurado")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_seconds = max(60, int(presign_seconds))
+        config = BotoConfig(
+            signature_version="s3v4",
+            # MinIO y la mayoría de los S3 compatibles solo aceptan rutas /bucket/llave
+            s3={"addressing_style": "path" if endpoint_url else "auto"},
+            retries={"max_attempts": 3, "mode": "standard"},
+        )
+        self.client = boto3.client("s3", region_name=region or None, endpoint_url=endpoint_url or None, config=config)
+        # Las URLs firmadas llevan el host que ve el navegador (p. ej. localhost:9000 en lugar de minio:9000)
+        if public_endpoint_url and public_endpoint_url != endpoint_url:
+            self.presign_client = boto3.client(
+                "s3", region_name=region or None, endpoint_url=public_endpoint_url, config=config
+            )
+        else:
+            self.presign_client = self.client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type or mimetypes.guess_type(source.name)[0] or "application/octet-stream"}
+        # upload_file lee del disco por partes (multipart arriba de 8 MB): no carga videos en memoria
+        self.client.upload_file(str(source), self.bucket, self._key(key), ExtraArgs=extra)
+
+    def get(self, key: str, target: Path) -> bool:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{uuid4().hex}.part")
+        try:
+            self.client.download_file(self.bucket, self._key(key), str(tmp_path))
+        except Exception as exc:
+            tmp_path.unlink(missing_ok=True)
+            if _is_not_found(exc):
+                return False
+            raise
+        os.replace(tmp_path, target)
+        return True
+
+    def open(self, key: str) -> Optional[MediaStream]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as exc:
+            if _is_not_found(exc):
+                return None
+            raise
+        return response["Body"], int(response.get("ContentLength") or 0), response["LastModified"].timestamp()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def delete_prefix(self, prefix: str) -> None:
+        batch: list[dict[str, str]] = []
+        for key, _ in self._iter_objects(self._key(prefix)):
+            batch.append({"Key": key})
+            if len(batch) == 1000:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True})
+                batch = []
+        if batch:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch, "Quiet": True})
+
+    def copy(self, source_key: str, target_key: str) -> None:
+        self.client.copy(
+            {"Bucket": self.bucket, "Key": self._key(source_key)},
+            self.bucket,
+            self._key(target_key),
+        )
+
+    def presigned_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.presign_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=self.presign_seconds
+        )
+
+    def list_sizes(self) -> dict[str, int]:
+        return {
+            key[len(self.prefix):]: size
+            for key, size in self._iter_objects(self.prefix)
+        }
+
+    def _iter_objects(self, prefix: str) -> Iterator[tuple[str, int]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents") or []:
+                yield item["Key"], int(item.get("Size") or 0)
+
+
+def _is_not_found(exc: Exception) -> bool:
+    code = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+    return code in {"404", "NoSuchKey", "NotFound"}
+
+
+def _build_backend():
+    backend_name = str(settings.media_storage_backend or "local").strip().lower()
+    if backend_name == "s3":
+        return S3Storage(
+            bucket=settings.media_s3_bucket.strip(),
+            prefix=settings.media_s3_prefix.strip(),
+            region=settings.media_s3_region.strip() or settings.aws_region,
+            endpoint_url=settings.media_s3_endpoint_url.strip(),
+            public_endpoint_url=settings.media_s3_public_endpoint_url.strip(),
+            presign_seconds=settings.media_s3_presign_seconds,
+        )
+    if backend_name != "local":
+        print(f"[Storage] MEDIA_STORAGE_BACKEND={backend_name!r} desconocido; se usa local")
+    return LocalStorage()
+
+
+def get_storage():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+
+def is_remote() -> bool:
+    return get_storage().remote
+
+
+def media_key(path: PathLike) -> Optional[str]:
+    """Llave del archivo: ruta relativa a app/media (acepta `/media/...` o una ruta en disco)."""
+    if isinstance(path, Path):
+        for root in (MEDIA_ROOT, LEGACY_MEDIA_ROOT):
+            try:
+                return path.relative_to(root).as_posix()
+            except ValueError:
+                continue
+        return None
+    value = str(path or "").strip()
+    if not value.startswith("/media/"):
+        return None
+    key = value[len("/media/"):]
+    if not key or ".." in Path(key).parts:
+        return None
+    return key
+
+
+def publish(path: Path, content_type: Optional[str] = None, *, required: bool = False) -> None:
+    """
+    Sube un archivo recién escrito en app/media. Con `required` el error se
+    propaga (subidas de usuario); si no, solo se registra y lo recoge el sync.
+    """
+    backend = get_storage()
+    if not backend.remote:
+        return
+    key = media_key(path)
+    if key is None:
+        return
+    try:
+        backend.put(key, path, content_type)
+    except Exception as exc:
+        if required:
+            raise
+        print(f"[Storage] No se subió {key}: {exc}")
+
+
+def unpublish(path: PathLike) -> None:
+    backend = get_storage()
+    if not backend.remote:
+        return
+    key = media_key(path)
+    if key is None:
+        return
+    try:
+        backend.delete(key)
+    except Exception as exc:
+        print(f"[Storage] No se borró {key}: {exc}")
+
+
+def unpublish_dir(path: Path) -> None:
+    """Borra del bucket todo lo que está bajo una carpeta de app/media."""
+    backend = get_storage()
+    if not backend.remote:
+        return
+    key = media_key(path)
+    if not key:
+        return
+    try:
+        backend.delete_prefix(f"{key.rstrip('/')}/")
+    except Exception as exc:
+        print(f"[Storage] No se borró la carpeta {key}: {exc}")
+
+
+def move(source: str, target: str) -> None:
+    """Mueve en el bucket un archivo cuya ruta lógica cambió (el disco lo mueve el llamador)."""
+    backend = get_storage()
+    source_key, target_key = media_key(source), media_key(target)
+    if not backend.remote or not source_key or not target_key or source_key == target_key:
+        return
+    try:
+        backend.copy(source_key, target_key)
+        backend.delete(source_key)
+    except Exception as exc:
+        print(f"[Storage] No se movió {source_key} a {target_key}: {exc}")
+
+
+def local_file(relative_path: Optional[str]) -> Optional[Path]:
+    """Ruta en disco de `/media/...`, bajándola del bucket si este nodo no la tiene."""
+    key = media_key(str(relative_path or ""))
+    if key is None:
+        return None
+    path = MEDIA_ROOT / key
+    if path.is_file():
+        return path
+    legacy_path = LEGACY_MEDIA_ROOT / key
+    if legacy_path.is_file():
+        return legacy_path
+    backend = get_storage()
+    if not backend.remote:
+        return None
+    try:
+        return path if backend.get(key, path) else None
+    except Exception as exc:
+        print(f"[Storage] No se pudo bajar {key}: {exc}")
+        return None
+
+
+def has_media(relative_path: Optional[str]) -> bool:
+    """Si `/media/...` puede existir sin bajarlo: en disco, o en el bucket (se sabe al abrirlo)."""
+    key = media_key(str(relative_path or ""))
+    if key is None:
+        return False
+    if get_storage().remote:
+        return True
+    return (MEDIA_ROOT / key).is_file() or (LEGACY_MEDIA_ROOT / key).is_file()
+
+
+def open_media(relative_path: Optional[str]) -> Optional[MediaStream]:
+    """
+    Abre `/media/...` para leerlo por partes: del disco si este nodo lo tiene,
+    si no directo del bucket, sin guardarlo en la caché.
+    """
+    key = media_key(str(relative_path or ""))
+    if key is None:
+        return None
+    for root in (MEDIA_ROOT, LEGACY_MEDIA_ROOT):
+        path = root / key
+        try:
+            source = path.open("rb")
+        except OSError:
+            continue
+        stat = os.fstat(source.fileno())
+        return source, stat.st_size, stat.st_mtime
+    backend = get_storage()
+    if not backend.remote:
+        return None
+    try:
+        return backend.open(key)
+    except Exception as exc:
+        print(f"[Storage] No se pudo leer {key}: {exc}")
+        return None
+
+
+def presigned_url(relative_path: str, filename: Optional[str] = None) -> Optional[str]:
+    """URL firmada de GET en el bucket; None con el almacenamiento local."""
+    backend = get_storage()
+    if not backend.remote:
+        return None
+    key = media_key(relative_path)
+    return backend.presigned_url(key, filename) if key else None
+
+
+def _iter_local_files() -> Iterator[tuple[str, Path]]:
+    seen: set[str] = set()
+    for root in (MEDIA_ROOT, LEGACY_MEDIA_ROOT):
+        if not root.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            # .blobs y temporales (.part/.tmp) no son rutas lógicas
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = Path(dirpath) / filename
+                key = path.relative_to(root).as_posix()
+                if key not in seen:
+                    seen.add(key)
+                    yield key, path
+
+
+def sync_local_media() -> int:
+    """Sube al bucket los archivos de disco que faltan o cambiaron de tamaño."""
+    backend = get_storage()
+    if not backend.remote:
+        return 0
+    remote_sizes = backend.list_sizes()
+    uploaded = 0
+    for key, path in _iter_local_files():
+        if _sync_stop.is_set():
+            break
+        try:
+            size = path.stat().st_size
+            if remote_sizes.get(key) == size:
+                continue
+            backend.put(key, path)
+            uploaded += 1
+        except Exception as exc:
+            print(f"[Storage] No se sincronizó {key}: {exc}")
+    return uploaded
+
+
+def _run_sync() -> None:
+    try:
+        uploaded = sync_local_media()
+        print(f"[Storage] Sincronización terminada: {uploaded} archivos locales subidos al bucket")
+    except Exception as exc:
+        print(f"[Storage] Error sincronizando media: {exc}")
+
+
+def start_sync() -> None:
+    global _sync_thread
+    if not settings.media_s3_sync_local or not is_remote():
+        return
+    if _sync_thread and _sync_thread.is_alive():
+        return
+    _sync_stop.clear()
+    _sync_thread = threading.Thread(target=_run_sync, name="media-storage-sync", daemon=True)
+    _sync_thread.start()
+
+
+def stop_sync() -> None:
+    _sync_stop.set()
+    if _sync_thread and _sync_thread.is_alive():
+        _sync_thread.join(timeout=10)
+
+
+def prune_cache() -> int:
+    """
+    Con el bucket como fuente de verdad, borra de app/media lo que no se ha
+    usado en MEDIA_CACHE_MAX_AGE_DAYS y, si aún pasa de MEDIA_CACHE_MAX_MB,
+    lo usado hace más tiempo. Solo borra archivos que ya están en el bucket
+    con el mismo tamaño: lo que falta por subir se queda para el sync.
+    """
+    backend = get_storage()
+    if not backend.remote:
+        return 0
+    max_age_seconds = max(0.0, float(settings.media_cache_max_age_days)) * 86400
+    max_bytes = max(0, int(settings.media_cache_max_mb)) * 1024 * 1024
+    if not max_age_seconds and not max_bytes:
+        return 0
+
+    remote_sizes = backend.list_sizes()
+    entries = []
+    for key, path in _iter_local_files():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        # mtime no se toca al leer (las huellas del PDF de recepción lo usan): el último uso es atime
+        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, key, path))
+    entries.sort()
+
+    now = time.time()
+    removed = 0
+    total = sum(size for _, size, _, _ in entries)
+    for used_at, size, key, path in entries:
+        if _cache_prune_stop.is_set():
+            break
+        expired = max_age_seconds and now - used_at > max_age_seconds
+        oversized = max_bytes and total > max_bytes
+        if not expired and not oversized:
+            continue
+        if remote_sizes.get(key) != size:
+            continue
+        # Las rutas lógicas son hard links a .blobs: el blob huérfano lo borra media_blob_prune
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _cache_prune_loop() -> None:
+    while not _cache_prune_stop.is_set():
+        try:
+            removed = prune_cache()
+            if removed:
+                print(f"[Storage] {removed} archivos de la caché local eliminados")
+        except Exception as exc:
+            print(f"[Storage] Error recortando la caché local: {exc}")
+        _cache_prune_stop.wait(CACHE_PRUNE_INTERVAL_SECONDS)
+
+
+def start_cache_prune() -> None:
+    global _cache_prune_thread
+    if not is_remote():
+        return
+    if _cache_prune_thread and _cache_prune_thread.is_alive():
+        return
+    _cache_prune_stop.clear()
+    _cache_prune_thread = threading.Thread(target=_cache_prune_loop, name="media-cache-prune", daemon=True)
+    _cache_prune_thread.start()
+
+
+def stop_cache_prune() -> None:
+    _cache_prune_stop.set()
+    if _cache_prune_thread and _cache_prune_thread.is_alive():
+        _cache_prune_thread.join(timeout=10)
+
+
+service_registry.register("media_storage_sync", start_sync, stop_sync)
+# La caché es de cada nodo: corre en todos los procesos, no solo en el líder.
+service_registry.register("media_cache_prune", start_cache_prune, stop_cache_prune, leader_only=False)
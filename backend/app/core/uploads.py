@@ -0,0 +1,116 @@
+"""
+Guardado de archivos subidos (fotos, videos, PDFs) en /media.
+
+Antes cada endpoint hacía `buffer.write(file.file.read())`, que carga el
+archivo completo en memoria; con videos de recepción eso son cientos de MB
+por petición. `save_upload` copia el UploadFile por bloques a un archivo
+temporal en la misma carpeta, calcula SHA-256 y tamaño al vuelo, corta con
+413 si se pasa del límite del tipo de archivo, hace fsync y renombra de
+forma atómica: nunca queda un archivo a medias con el nombre final.
+
+Con `dedupe=True` (default) el contenido se guarda en app.core.blob_store y
+`target` queda como hard link al blob; el hash va en `blob_sha256` de la fila.
+Con almacenamiento S3 (app.core.storage) el archivo se sube antes de responder.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.core import blob_store, storage
+from app.core.config import settings
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".heic"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".webm", ".m4v", ".3gp", ".avi"}
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+
+
+def max_upload_bytes(extension: str) -> int:
+    """Límite por tipo de archivo según la extensión (ver UPLOAD_MAX_*_MB)."""
+    extension = (extension or "").lower()
+    if extension in VIDEO_EXTENSIONS:
+        limit_mb = settings.upload_max_video_mb
+    elif extension in IMAGE_EXTENSIONS:
+        limit_mb = settings.upload_max_image_mb
+    else:
+        limit_mb = settings.upload_max_document_mb
+    return max(1, int(limit_mb)) * 1024 * 1024
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def save_upload(
+    upload: UploadFile,
+    target: Path,
+    *,
+    max_bytes: Optional[int] = None,
+    allow_empty: bool = True,
+    dedupe: bool = True,
+) -> StoredUpload:
+    """Guarda `upload` en `target` por bloques y regresa ruta, tamaño y SHA-256."""
+    limit = max_bytes if max_bytes is not None else max_upload_bytes(target.suffix)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp_path.open("wb") as out:
+            while True:
+                chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"El archivo supera el límite de {limit // (1024 * 1024)} MB",
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+            if not size and not allow_empty:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archivo vacío")
+            out.flush()
+            os.fsync(out.fileno())
+        sha256 = digest.hexdigest()
+        if dedupe:
+            blob_store.store(tmp_path, sha256, target)
+        else:
+            os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    _fsync_dir(target.parent)
+    try:
+        storage.publish(target, upload.content_type, required=True)
+    except Exception as exc:
+        blob_store.release(target, sha256 if dedupe else None)
+        print(f"[Storage] Error subiendo {target.name}: {exc}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="No se pudo guardar el archivo en el almacenamiento",
+        ) from exc
+    return StoredUpload(path=target, size=size, sha256=sha256)
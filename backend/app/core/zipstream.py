@@ -0,0 +1,126 @@
+"""
+ZIP en streaming para las descargas de galerías y expedientes.
+
+Antes el ZIP completo se armaba en un BytesIO con ZIP_DEFLATED antes de
+mandar el primer byte: un expediente de 300 fotos ocupaba cientos de MB de
+RAM y se volvían a comprimir JPEGs que ya vienen comprimidos. Aquí zipfile
+escribe sobre un destino sin seek (usa data descriptors), cada bloque se
+entrega a la respuesta en cuanto se lee del disco, las fotos y videos van
+ZIP_STORED y solo PDFs/texto se comprimen. ZIP64 se activa solo cuando un
+archivo o el total lo requieren.
+
+Una entrada puede ser una ruta en disco o una función que abre el archivo
+(`storage.open_media`): con el bucket S3 cada objeto se lee del bucket
+justo cuando le toca, sin bajar todo a la caché antes del primer byte.
+"""
+
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+from fastapi.responses import StreamingResponse
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Formatos ya comprimidos: deflate solo gasta CPU.
+STORED_EXTENSIONS = {
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".webp",
+    ".gif",
+    ".heic",
+    ".mp4",
+    ".mov",
+    ".webm",
+    ".m4v",
+    ".mp3",
+    ".m4a",
+    ".zip",
+}
+
+
+# Abre el archivo al momento de escribirlo: (lector, tamaño, mtime) o None si ya no existe.
+ZipOpener = Callable[[], Optional[tuple[BinaryIO, int, float]]]
+ZipSource = Union[Path, ZipOpener]
+
+
+class _ChunkSink:
+    """Destino de ZipFile sin seek/tell; acumula lo escrito hasta que se drena."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _open_entry(source: ZipSource, arcname: str) -> Optional[tuple[BinaryIO, ZipInfo]]:
+    if isinstance(source, Path):
+        try:
+            reader = source.open("rb")
+        except OSError:
+            return None
+        info = ZipInfo.from_file(source, arcname=arcname)
+        suffix = source.suffix
+    else:
+        opened = source()
+        if opened is None:
+            return None
+        reader, size, mtime = opened
+        # ZIP no representa fechas anteriores a 1980
+        info = ZipInfo(arcname, date_time=time.localtime(max(mtime, 315532800))[:6])
+        info.file_size = size
+        info.external_attr = 0o644 << 16
+        suffix = Path(arcname).suffix
+    info.compress_type = ZIP_STORED if suffix.lower() in STORED_EXTENSIONS else ZIP_DEFLATED
+    return reader, info
+
+
+def iter_zip(entries: Iterable[tuple[ZipSource, str]], chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    """Genera el ZIP de `entries` (ruta en disco o función que lo abre, nombre dentro del ZIP) por bloques."""
+    sink = _ChunkSink()
+    with ZipFile(sink, "w", allowZip64=True) as zip_file:
+        for source, arcname in entries:
+            opened = _open_entry(source, arcname)
+            if opened is None:
+                # Se borró después de armar la lista: se omite
+                continue
+            reader, info = opened
+            try:
+                # file_size viene de stat() o del bucket: zipfile decide con él si la entrada necesita ZIP64.
+                with zip_file.open(info, "w") as target:
+                    while True:
+                        chunk = reader.read(chunk_size)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            finally:
+                reader.close()
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def zip_response(entries: list[tuple[ZipSource, str]], filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,19 +1,28 @@
+import asyncio
 import json
 import re
 import unicodedata
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi import File, Form, HTTPException, Query, Request, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from pydantic import BaseModel
 from psycopg.rows import dict_row
-from fastapi.responses import FileResponse, PlainTextResponse, Response
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from uuid import uuid4
 from urllib.error import HTTPError, URLError
 from urllib.request import Request as UrlRequest, urlopen
 
+from app.core import storage
 from app.core.config import settings
-from app.core.db import get_connection
+from app.core.db import close_async_pool, close_pool, get_connection, get_pool, get_pool_stats
+from app.core.events import event_broker, format_sse
+from app.core.media_files import media_response
+from app.core.migrations import apply_migrations
+from app.core.rendering import render_stats, shutdown_render_pool
+from app.core.services import service_registry
+from app.core.uploads import save_upload
 from app.auth.routes import router as auth_router
 from app.modules.administracion.routes import router as administracion_router
 from app.modules.clientes.routes import router as clientes_router
@@ -22,6 +31,7 @@ from app.modules.expedientes.routes import router as expedientes_router
 from app.modules.reportes.routes import router as reportes_router
 from app.modules.inventario.routes import router as inventario_router
 from app.modules.pintura.routes import router as pintura_router
+from app.modules.recepcion import ocr_cache, transcripcion
 from app.modules.recepcion.routes import router as recepcion_router
 from app.modules.taller.routes import router as taller_router
 from app.modules.valuacion_danos.routes import router as valuacion_router
@@ -357,7 +367,34 @@ def _insert_whatsapp_chat_message(
     )
 
 
-app = FastAPI(title=settings.app_name)
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if settings.db_pool_enabled:
+        # Abre el pool al arrancar para que las primeras peticiones reciban conexiones tibias.
+        get_pool()
+    if settings.db_auto_migrate:
+        try:
+            apply_migrations()
+        except Exception as exc:
+            # Sin el esquema completo todas las rutas fallarían: mejor no arrancar
+            print(f"[startup] Error aplicando migraciones: {exc}")
+            close_pool()
+            raise
+    if settings.events_enabled:
+        await event_broker.start()
+    if settings.services_enabled:
+        await service_registry.start()
+    yield
+    await service_registry.stop()
+    shutdown_render_pool()
+    ocr_cache.shutdown()
+    await transcripcion.wait_for_cleanups()
+    await event_broker.stop()
+    await close_async_pool()
+    close_pool()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 origins = _parse_origins(settings.cors_origins)
 if origins:
@@ -388,18 +425,8 @@ app_media_dir.mkdir(parents=True, exist_ok=True)
 
 
 @app.get("/media/{file_path:path}")
-def serve_media(file_path: str):
-    requested = Path(file_path)
-    if requested.is_absolute() or ".." in requested.parts:
-        raise HTTPException(status_code=400, detail="Ruta de archivo invalida")
-
-    for base_dir in (app_media_dir, legacy_media_dir):
-        base_resolved = base_dir.resolve()
-        candidate = (base_dir / requested).resolve()
-        if str(candidate).startswith(str(base_resolved)) and candidate.exists() and candidate.is_file():
-            return FileResponse(candidate)
-
-    raise HTTPException(status_code=404, detail="Archivo no encontrado")
+def serve_media(file_path: str, request: Request):
+    return media_response(request, file_path)
 
 
 @app.get("/")
@@ -412,6 +439,45 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/health/db")
+def health_db():
+    return {"status": "ok", "pool": get_pool_stats()}
+
+
+@app.get("/health/services")
+def health_services():
+    return {"status": "ok", "services": service_registry.status()}
+
+
+@app.get("/health/render")
+def health_render():
+    return {"status": "ok", "render": render_stats()}
+
+
+@app.get("/events/stream")
+async def stream_events(request: Request, topics: str = Query(default="")):
+    """SSE con los cambios publicados por LISTEN/NOTIFY (tópicos: taller, rpa, whatsapp)."""
+    wanted = {topic.strip() for topic in topics.split(",") if topic.strip()} or None
+    heartbeat = max(1.0, float(settings.events_heartbeat_seconds))
+
+    async def event_generator():
+        async with event_broker.subscribe(wanted) as queue:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/webhooks/whatsapp")
 def verify_whatsapp_webhook(
     hub_mode: str | None = Query(default=None, alias="hub.mode"),
@@ -441,7 +507,6 @@ class WhatsAppChatSendRequest(BaseModel):
 def list_whatsapp_conversations(limit: int = 50):
     safe_limit = max(1, min(limit, 200))
     with get_connection() as conn:
-        _ensure_whatsapp_chat_tables(conn)
         conn.row_factory = dict_row
         rows = conn.execute(
             """
@@ -486,7 +551,6 @@ def list_whatsapp_messages(wa_id: str, limit: int = 100):
     _, last10 = _phone_match_tokens(wa_id_digits)
     safe_limit = max(1, min(limit, 500))
     with get_connection() as conn:
-        _ensure_whatsapp_chat_tables(conn)
         conn.row_factory = dict_row
         rows = conn.execute(
             """
@@ -552,7 +616,6 @@ def send_whatsapp_chat_message(payload: WhatsAppChatSendRequest):
 
     message_id = ((meta_response.get("messages") or [{}])[0] or {}).get("id")
     with get_connection() as conn:
-        _ensure_whatsapp_chat_tables(conn)
         _insert_whatsapp_chat_message(
             conn,
             wa_id=wa_id_for_store,
@@ -593,18 +656,17 @@ async def send_whatsapp_chat_media_message(
     upload_dir.mkdir(parents=True, exist_ok=True)
     target_path = upload_dir / unique_name
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Archivo vacío")
-    with target_path.open("wb") as out:
-        out.write(content)
-
-    public_base = (settings.whatsapp_pdf_public_base_url or "").strip()
-    if not public_base:
-        public_base = str(request.base_url).rstrip("/")
-    else:
-        public_base = public_base.rstrip("/")
-    media_link = f"{public_base}/media/whatsapp_chat_uploads/{unique_name}"
+    await asyncio.to_thread(save_upload, file, target_path, allow_empty=False)
+
+    # Con almacenamiento S3, Meta descarga directo del bucket con la URL firmada
+    media_link = storage.presigned_url(f"/media/whatsapp_chat_uploads/{unique_name}")
+    if not media_link:
+        public_base = (settings.whatsapp_pdf_public_base_url or "").strip()
+        if not public_base:
+            public_base = str(request.base_url).rstrip("/")
+        else:
+            public_base = public_base.rstrip("/")
+        media_link = f"{public_base}/media/whatsapp_chat_uploads/{unique_name}"
     media_type = _detect_media_type(file.filename, file.content_type or "")
 
     try:
@@ -623,7 +685,6 @@ async def send_whatsapp_chat_media_message(
     if caption.strip():
         preview_text = f"{preview_text}\n{caption.strip()}"
     with get_connection() as conn:
-        _ensure_whatsapp_chat_tables(conn)
         _insert_whatsapp_chat_message(
             conn,
             wa_id=wa_id_for_store,
@@ -653,7 +714,6 @@ async def send_whatsapp_chat_media_message(
 async def receive_whatsapp_webhook(request: Request):
     payload = await request.json()
     with get_connection() as conn:
-        _ensure_whatsapp_chat_tables(conn)
 
         entries = payload.get("entry") or []
         for entry in entries:
@@ -730,7 +790,6 @@ async def receive_whatsapp_webhook(request: Request):
                 if not to_phone:
                     continue
                 with get_connection() as conn:
-                    _ensure_whatsapp_chat_tables(conn)
                     if not _should_send_auto_reply(conn, to_phone):
                         continue
                 reply = _resolve_auto_reply(user_text)
@@ -740,7 +799,6 @@ async def receive_whatsapp_webhook(request: Request):
                     meta_response = _send_whatsapp_text_message(to_phone=to_phone, text=reply)
                     message_id = ((meta_response.get("messages") or [{}])[0] or {}).get("id")
                     with get_connection() as conn:
-                        _ensure_whatsapp_chat_tables(conn)
                         _insert_whatsapp_chat_message(
                             conn,
                             wa_id=to_phone,
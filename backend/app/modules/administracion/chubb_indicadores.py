@@ -73,81 +73,77 @@ class ExpedienteItem(BaseModel):
 # FUNCIONES DE BASE DE DATOS
 # ============================================================================
 
-def ensure_tables_exists():
+def ensure_tables_exists(conn):
     """Crea las tablas de indicadores y expedientes si no existen."""
-    with get_connection() as conn:
-        # Tabla de indicadores
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS chubb_indicadores (
-                id SERIAL PRIMARY KEY,
-                taller_id VARCHAR(50) NOT NULL,
-                taller_nombre VARCHAR(255),
-                fecha_extraccion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                trabajo_en_progreso INTEGER DEFAULT 0,
-                por_autorizar INTEGER DEFAULT 0,
-                autorizadas INTEGER DEFAULT 0,
-                rechazadas INTEGER DEFAULT 0,
-                complementos INTEGER DEFAULT 0,
-                perdida_total INTEGER DEFAULT 0,
-                total_expedientes INTEGER DEFAULT 0,
-                raw_data JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Tabla de expedientes
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS chubb_expedientes (
-                id SERIAL PRIMARY KEY,
-                num_expediente VARCHAR(100) NOT NULL,
-                tipo_vehiculo VARCHAR(255),
-                estado VARCHAR(100) NOT NULL,
-                fecha_creacion TIMESTAMP,
-                fecha_inspeccion TIMESTAMP,
-                fecha_actualizacion TIMESTAMP,
-                placas VARCHAR(50),
-                asignado_a VARCHAR(255),
-                compania VARCHAR(100),
-                estatus_audatrace VARCHAR(100),
-                fecha_accidente TIMESTAMP,
-                fecha_extraccion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(num_expediente, fecha_extraccion)
-            )
-        """)
-        
-        # Agregar columna estatus_audatrace si no existe (migración)
-        try:
-            conn.execute("""
-                ALTER TABLE chubb_expedientes 
-                ADD COLUMN IF NOT EXISTS estatus_audatrace VARCHAR(100)
-            """)
-        except Exception as e:
-            # Columna ya existe o error de migración
-            pass
-        
-        # Agregar columna trabajo_en_progreso si no existe (migración)
-        try:
-            conn.execute("""
-                ALTER TABLE chubb_indicadores 
-                ADD COLUMN IF NOT EXISTS trabajo_en_progreso INTEGER DEFAULT 0
-            """)
-        except Exception as e:
-            # Columna ya existe o error de migración
-            pass
-        
-        # Crear índices
+    # Tabla de indicadores
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chubb_indicadores (
+            id SERIAL PRIMARY KEY,
+            taller_id VARCHAR(50) NOT NULL,
+            taller_nombre VARCHAR(255),
+            fecha_extraccion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            trabajo_en_progreso INTEGER DEFAULT 0,
+            por_autorizar INTEGER DEFAULT 0,
+            autorizadas INTEGER DEFAULT 0,
+            rechazadas INTEGER DEFAULT 0,
+            complementos INTEGER DEFAULT 0,
+            perdida_total INTEGER DEFAULT 0,
+            total_expedientes INTEGER DEFAULT 0,
+            raw_data JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Tabla de expedientes
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chubb_expedientes (
+            id SERIAL PRIMARY KEY,
+            num_expediente VARCHAR(100) NOT NULL,
+            tipo_vehiculo VARCHAR(255),
+            estado VARCHAR(100) NOT NULL,
+            fecha_creacion TIMESTAMP,
+            fecha_inspeccion TIMESTAMP,
+            fecha_actualizacion TIMESTAMP,
+            placas VARCHAR(50),
+            asignado_a VARCHAR(255),
+            compania VARCHAR(100),
+            estatus_audatrace VARCHAR(100),
+            fecha_accidente TIMESTAMP,
+            fecha_extraccion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(num_expediente, fecha_extraccion)
+        )
+    """)
+    
+    # Agregar columna estatus_audatrace si no existe (migración)
+    try:
         conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chubb_expedientes_estado 
-            ON chubb_expedientes(estado)
+            ALTER TABLE chubb_expedientes 
+            ADD COLUMN IF NOT EXISTS estatus_audatrace VARCHAR(100)
         """)
+    except Exception as e:
+        # Columna ya existe o error de migración
+        pass
+    
+    # Agregar columna trabajo_en_progreso si no existe (migración)
+    try:
         conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chubb_expedientes_fecha_ext 
-            ON chubb_expedientes(fecha_extraccion DESC)
+            ALTER TABLE chubb_indicadores 
+            ADD COLUMN IF NOT EXISTS trabajo_en_progreso INTEGER DEFAULT 0
         """)
-        
-        conn.commit()
-
+    except Exception as e:
+        # Columna ya existe o error de migración
+        pass
+    
+    # Crear índices
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chubb_expedientes_estado 
+        ON chubb_expedientes(estado)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chubb_expedientes_fecha_ext 
+        ON chubb_expedientes(fecha_extraccion DESC)
+    """)
 
 def save_indicadores(data: Dict[str, Any]) -> int:
     """Guarda los indicadores extraídos en la base de datos."""
@@ -156,8 +152,6 @@ def save_indicadores(data: Dict[str, Any]) -> int:
     
     logger.info(f"[save_indicadores] Iniciando guardado de datos: {data.get('taller_nombre', 'N/A')}")
     
-    ensure_tables_exists()
-    
     # Extraer valores de los estados (del RPA) o calcular desde expedientes
     estados = data.get('estados', {})
     expedientes = data.get('expedientes', [])
@@ -254,8 +248,6 @@ def save_expedientes(expedientes: List[Dict[str, Any]], fecha_extraccion: str):
     if expedientes:
         logger.info(f"[save_expedientes] Primer expediente: {expedientes[0].get('num_expediente')}")
     
-    ensure_tables_exists()
-    
     def parse_date(value):
         """Convierte valor a fecha o NULL si está vacío.
         Soporta formato español: '27/02/2026 11:07:33 a. m.' -> '2026-02-27 11:07:33'
@@ -372,7 +364,6 @@ def serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
 
 def get_latest_indicadores() -> Optional[Dict[str, Any]]:
     """Obtiene los indicadores más recientes."""
-    ensure_tables_exists()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -390,7 +381,6 @@ def get_latest_indicadores() -> Optional[Dict[str, Any]]:
 
 def get_indicadores_history(limit: int = 30) -> List[Dict[str, Any]]:
     """Obtiene el historial de indicadores."""
-    ensure_tables_exists()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -409,7 +399,6 @@ def get_indicadores_history(limit: int = 30) -> List[Dict[str, Any]]:
 
 def get_latest_expedientes(limit: int = 500, estado: Optional[str] = None) -> list:
     """Obtiene los últimos expedientes extraídos (solo última extracción)."""
-    ensure_tables_exists()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -732,7 +721,6 @@ async def get_expedientes(estado: Optional[str] = None, limit: int = 500):
 @router.get("/expedientes/estados")
 async def get_estados_disponibles():
     """Obtiene la lista de estados disponibles con conteos."""
-    ensure_tables_exists()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -778,7 +766,6 @@ async def get_expedientes_pendientes(limit: int = 50):
     Obtiene expedientes CHUBB autorizados sin información de AudaTrace (Inpart).
     Estos son los expedientes que necesitan extraerse sus piezas.
     """
-    ensure_tables_exists()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
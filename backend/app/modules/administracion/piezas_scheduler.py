@@ -17,6 +17,7 @@ from app.modules.administracion.rpa_queue import (
     create_task, TaskType
 )
 from app.core.db import get_connection
+from app.core.services import service_registry
 
 logger = logging.getLogger(__name__)
 
@@ -70,13 +71,6 @@ def _get_schedule_time_from_db() -> Tuple[int, int]:
     """
     try:
         with get_connection() as conn:
-            # Asegurar que las columnas existan
-            conn.execute("""
-                ALTER TABLE aseguradora_credenciales 
-                ADD COLUMN IF NOT EXISTS autosync_piezas BOOLEAN NOT NULL DEFAULT FALSE,
-                ADD COLUMN IF NOT EXISTS synctime_piezas VARCHAR(5) DEFAULT '06:00'
-            """)
-            
             row = conn.execute(
                 """
                 SELECT synctime_piezas 
@@ -332,8 +326,8 @@ def start_piezas_scheduler():
 
 def stop_piezas_scheduler():
     """Detiene el scheduler de piezas."""
-    scheduler = get_piezas_scheduler()
-    scheduler.stop()
+    if _piezas_scheduler is not None:
+        _piezas_scheduler.stop()
 
 
 def force_run_piezas() -> Dict[str, str]:
@@ -348,7 +342,31 @@ def get_piezas_scheduler_status() -> Dict[str, Any]:
     return scheduler.get_status()
 
 
-# Iniciar automáticamente al importar el módulo
+def apply_piezas_control(desired: Dict[str, Any]) -> None:
+    """
+    Aplica en el proceso líder lo pedido desde /admin/piezas-scheduler.
+    
+    desired: {"running": bool, "enabled": bool, "hour": int, "minute": int}
+    """
+    global _piezas_scheduler
+    
+    if not desired.get("running", True):
+        stop_piezas_scheduler()
+        return
+    
+    with _scheduler_lock:
+        scheduler = _piezas_scheduler
+        if scheduler is None or not scheduler._running:
+            # Instancia nueva: el hilo de una detenida puede seguir en su espera y saldrá solo
+            scheduler = _piezas_scheduler = PiezasScheduler()
+    
+    if "enabled" in desired:
+        scheduler.set_enabled(bool(desired["enabled"]))
+    if desired.get("hour") is not None:
+        scheduler.set_schedule(int(desired["hour"]), int(desired.get("minute") or 0))
+    scheduler.start()
+
+
 def init_piezas_scheduler():
     """Inicializa el scheduler de piezas."""
     try:
@@ -359,5 +377,6 @@ def init_piezas_scheduler():
         logger.error(f"[PiezasScheduler] Error al iniciar: {e}")
 
 
-# Inicializar al importar el módulo (con delay para permitir que el servidor cargue)
-threading.Timer(35, init_piezas_scheduler).start()
+# Lo arranca el lifespan de la API en el proceso líder (app.core.services)
+service_registry.register("piezas_scheduler", init_piezas_scheduler, stop_piezas_scheduler)
+service_registry.register_control("piezas_scheduler", apply_piezas_control, get_piezas_scheduler_status)
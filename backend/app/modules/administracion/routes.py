@@ -27,7 +27,7 @@ router.include_router(rpa_queue_router)
 from app.modules.administracion.autosync_routes import router as autosync_router
 router.include_router(autosync_router)
 
-# Importar schedulers para iniciarlos automáticamente
+# Importar schedulers para registrarlos; arrancan con el lifespan en el proceso líder
 try:
     from app.modules.administracion import rpa_scheduler
 except Exception as e:
@@ -217,21 +217,22 @@ def delete_profile(profile_id: int):
 # CREDENCIALES DE ASEGURADORAS (RPA)
 # ============================================================================
 
+def _ensure_credenciales_columns(conn):
+    """Columnas de programación de autosync agregadas después de la tabla original."""
+    conn.execute("""
+        ALTER TABLE aseguradora_credenciales 
+        ADD COLUMN IF NOT EXISTS autosync_piezas BOOLEAN NOT NULL DEFAULT FALSE,
+        ADD COLUMN IF NOT EXISTS synctime_piezas VARCHAR(5) DEFAULT '06:00',
+        ADD COLUMN IF NOT EXISTS autosync_ordenes_mode VARCHAR(20) DEFAULT 'intervalo',
+        ADD COLUMN IF NOT EXISTS synctime_ordenes_diaria VARCHAR(5) DEFAULT '06:00'
+    """)
+
+
 @router.get("/credenciales")
 def list_credenciales():
     """Lista todas las credenciales de aseguradoras para RPA."""
     with get_connection() as conn:
         conn.row_factory = dict_row
-        # Asegurar que las columnas existan
-        conn.execute("""
-            ALTER TABLE aseguradora_credenciales 
-            ADD COLUMN IF NOT EXISTS autosync_piezas BOOLEAN NOT NULL DEFAULT FALSE,
-            ADD COLUMN IF NOT EXISTS synctime_piezas VARCHAR(5) DEFAULT '06:00',
-            ADD COLUMN IF NOT EXISTS autosync_ordenes_mode VARCHAR(20) DEFAULT 'intervalo',
-            ADD COLUMN IF NOT EXISTS synctime_ordenes_diaria VARCHAR(5) DEFAULT '06:00'
-        """)
-        conn.commit()
-        
         rows = conn.execute(
             """
             SELECT id, seguro, plataforma_url, usuario, password, taller_id, activo, 
@@ -275,15 +276,6 @@ def create_credencial(payload: dict):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="password requerido")
 
     with get_connection() as conn:
-        # Asegurar que las columnas existan
-        conn.execute("""
-            ALTER TABLE aseguradora_credenciales 
-            ADD COLUMN IF NOT EXISTS autosync_piezas BOOLEAN NOT NULL DEFAULT FALSE,
-            ADD COLUMN IF NOT EXISTS synctime_piezas VARCHAR(5) DEFAULT '06:00',
-            ADD COLUMN IF NOT EXISTS autosync_ordenes_mode VARCHAR(20) DEFAULT 'intervalo',
-            ADD COLUMN IF NOT EXISTS synctime_ordenes_diaria VARCHAR(5) DEFAULT '06:00'
-        """)
-        
         row = conn.execute(
             """
             INSERT INTO aseguradora_credenciales 
@@ -330,15 +322,6 @@ def update_credencial(credencial_id: int, payload: dict):
     values = list(updates.values()) + [credencial_id]
 
     with get_connection() as conn:
-        # Asegurar que las columnas existan
-        conn.execute("""
-            ALTER TABLE aseguradora_credenciales 
-            ADD COLUMN IF NOT EXISTS autosync_piezas BOOLEAN NOT NULL DEFAULT FALSE,
-            ADD COLUMN IF NOT EXISTS synctime_piezas VARCHAR(5) DEFAULT '06:00',
-            ADD COLUMN IF NOT EXISTS autosync_ordenes_mode VARCHAR(20) DEFAULT 'intervalo',
-            ADD COLUMN IF NOT EXISTS synctime_ordenes_diaria VARCHAR(5) DEFAULT '06:00'
-        """)
-        
         row = conn.execute(
             f"""
             UPDATE aseguradora_credenciales
@@ -385,6 +368,13 @@ def delete_credencial(credencial_id: int):
 # =====================================================
 # ENDPOINTS PARA SCHEDULER DE PIEZAS
 # =====================================================
+# El scheduler corre solo en el proceso líder: estos endpoints guardan lo pedido
+# con service_registry.request y leen el estado que publica el líder.
+
+def _request_piezas_scheduler(desired: dict):
+    from app.core.services import service_registry
+    return service_registry.request("piezas_scheduler", desired)
+
 
 @router.get("/piezas-scheduler/status")
 def get_piezas_scheduler_status():
@@ -392,10 +382,13 @@ def get_piezas_scheduler_status():
     Obtiene el estado del scheduler de piezas.
     """
     try:
-        from app.modules.administracion.piezas_scheduler import get_piezas_scheduler_status
-        return get_piezas_scheduler_status()
+        from app.core.services import service_registry
+        scheduler_status = service_registry.control_status("piezas_scheduler")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo estado: {str(e)}")
+    if scheduler_status is None:
+        return {"running": False, "message": "Sin estado publicado por el proceso líder"}
+    return scheduler_status
 
 
 @router.post("/piezas-scheduler/start")
@@ -404,12 +397,11 @@ def start_piezas_scheduler():
     Inicia el scheduler de piezas.
     """
     try:
-        from app.modules.administracion.piezas_scheduler import start_piezas_scheduler
-        scheduler = start_piezas_scheduler()
+        scheduler_status = _request_piezas_scheduler({"running": True})
         return {
             "success": True,
-            "message": "Scheduler de piezas iniciado",
-            "schedule_time": f"{scheduler.hour:02d}:{scheduler.minute:02d}"
+            "message": "Scheduler de piezas iniciado" if scheduler_status else "Inicio del scheduler de piezas solicitado",
+            "schedule_time": (scheduler_status or {}).get("schedule_time")
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error iniciando scheduler: {str(e)}")
@@ -421,8 +413,7 @@ def stop_piezas_scheduler():
     Detiene el scheduler de piezas.
     """
     try:
-        from app.modules.administracion.piezas_scheduler import stop_piezas_scheduler
-        stop_piezas_scheduler()
+        _request_piezas_scheduler({"running": False})
         return {"success": True, "message": "Scheduler de piezas detenido"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deteniendo scheduler: {str(e)}")
@@ -452,9 +443,7 @@ def enable_piezas_scheduler():
     Habilita el scheduler de piezas.
     """
     try:
-        from app.modules.administracion.piezas_scheduler import get_piezas_scheduler
-        scheduler = get_piezas_scheduler()
-        scheduler.set_enabled(True)
+        _request_piezas_scheduler({"enabled": True})
         return {"success": True, "message": "Scheduler de piezas habilitado"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error habilitando scheduler: {str(e)}")
@@ -466,9 +455,7 @@ def disable_piezas_scheduler():
     Deshabilita el scheduler de piezas.
     """
     try:
-        from app.modules.administracion.piezas_scheduler import get_piezas_scheduler
-        scheduler = get_piezas_scheduler()
-        scheduler.set_enabled(False)
+        _request_piezas_scheduler({"enabled": False})
         return {"success": True, "message": "Scheduler de piezas deshabilitado"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deshabilitando scheduler: {str(e)}")
@@ -498,9 +485,7 @@ def set_piezas_schedule(payload: dict):
         raise HTTPException(status_code=400, detail="minute debe estar entre 0 y 59")
     
     try:
-        from app.modules.administracion.piezas_scheduler import get_piezas_scheduler
-        scheduler = get_piezas_scheduler()
-        scheduler.set_schedule(hour, minute)
+        _request_piezas_scheduler({"hour": hour, "minute": minute})
         return {
             "success": True,
             "message": f"Horario actualizado a {hour:02d}:{minute:02d}",
@@ -514,31 +499,30 @@ def set_piezas_schedule(payload: dict):
 # TRACKING DE EJECUCIONES DE PIEZAS (MANUAL Y AUTOMÁTICA)
 # =====================================================
 
-def _ensure_piezas_execution_log_table():
+def _ensure_piezas_execution_log_table(conn):
     """Crea la tabla de log de ejecuciones si no existe."""
-    with get_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS rpa_piezas_execution_log (
-                id SERIAL PRIMARY KEY,
-                seguro VARCHAR(50) NOT NULL,  -- 'QUALITAS' o 'CHUBB'
-                execution_type VARCHAR(20) NOT NULL,  -- 'manual' o 'automatic'
-                job_id VARCHAR(100),
-                status VARCHAR(20) NOT NULL DEFAULT 'started',  -- 'started', 'completed', 'failed'
-                started_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMPTZ,
-                piezas_count INTEGER DEFAULT 0,
-                error_message TEXT,
-                metadata JSONB
-            )
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_piezas_log_seguro 
-            ON rpa_piezas_execution_log(seguro)
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_piezas_log_started 
-            ON rpa_piezas_execution_log(started_at DESC)
-        """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rpa_piezas_execution_log (
+            id SERIAL PRIMARY KEY,
+            seguro VARCHAR(50) NOT NULL,  -- 'QUALITAS' o 'CHUBB'
+            execution_type VARCHAR(20) NOT NULL,  -- 'manual' o 'automatic'
+            job_id VARCHAR(100),
+            status VARCHAR(20) NOT NULL DEFAULT 'started',  -- 'started', 'completed', 'failed'
+            started_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMPTZ,
+            piezas_count INTEGER DEFAULT 0,
+            error_message TEXT,
+            metadata JSONB
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_piezas_log_seguro 
+        ON rpa_piezas_execution_log(seguro)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_piezas_log_started 
+        ON rpa_piezas_execution_log(started_at DESC)
+    """)
 
 
 def log_piezas_execution_start(seguro: str, execution_type: str, job_id: str = None) -> int:
@@ -546,7 +530,6 @@ def log_piezas_execution_start(seguro: str, execution_type: str, job_id: str = N
     Registra el inicio de una ejecución de piezas.
     Retorna el ID del log creado.
     """
-    _ensure_piezas_execution_log_table()
     
     with get_connection() as conn:
         row = conn.execute(
@@ -604,7 +587,6 @@ def get_last_piezas_execution(seguro: str):
     - O la ejecución en curso si hay una
     """
     try:
-        _ensure_piezas_execution_log_table()
         
         with get_connection() as conn:
             conn.row_factory = dict_row
@@ -658,7 +640,6 @@ def get_piezas_execution_history(seguro: str, limit: int = 10):
     - limit: Cantidad de registros a retornar (default: 10)
     """
     try:
-        _ensure_piezas_execution_log_table()
         
         with get_connection() as conn:
             conn.row_factory = dict_row
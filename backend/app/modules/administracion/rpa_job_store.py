@@ -0,0 +1,257 @@
+"""
+Estado persistente de los jobs de /admin/rpa (adjudicación, piezas, extracción).
+
+Antes vivían en el diccionario `rpa_jobs` del proceso, así que se perdían al
+reiniciar y solo los veía el worker de uvicorn que los había creado. Ahora el
+estado, los contadores de avance y el log quedan en la base de datos y
+`/admin/rpa/status/{job_id}` responde igual desde cualquier worker.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from psycopg.rows import dict_row
+
+from app.core.db import get_connection
+from app.core.events import publish
+
+logger = logging.getLogger(__name__)
+
+# Columnas propias; cualquier otro dato del job (id_expediente, total_ordenes...) va en meta.
+_JOB_COLUMNS = (
+    "status",
+    "message",
+    "seguro",
+    "tipo",
+    "started_at",
+    "completed_at",
+    "output",
+    "error",
+    "log_file",
+    "resultado",
+    "progress_current",
+    "progress_total",
+)
+
+FINAL_STATUSES = ("completed", "failed", "completed_with_errors")
+
+# "[Progress] 3/10" (CHUBB piezas) o "[3/10] Procesando orden..." (adjudicación batch)
+_PROGRESS_RE = re.compile(r"\[(?:Progress\]\s*)?(\d+)/(\d+)")
+
+LOG_FLUSH_LINES = 20
+LOG_FLUSH_SECONDS = 1.0
+
+_log_buffers: Dict[str, Dict[str, Any]] = {}
+_log_lock = threading.Lock()
+
+
+def ensure_rpa_jobs_tables(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rpa_jobs (
+            job_id VARCHAR(120) PRIMARY KEY,
+            seguro VARCHAR(30),
+            tipo VARCHAR(50),
+            status VARCHAR(30) NOT NULL DEFAULT 'queued',
+            message TEXT,
+            started_at VARCHAR(40),
+            completed_at VARCHAR(40),
+            output TEXT,
+            error TEXT,
+            log_file TEXT,
+            resultado JSONB,
+            progress_current INTEGER,
+            progress_total INTEGER,
+            meta JSONB NOT NULL DEFAULT '{}'::jsonb,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rpa_jobs_created ON rpa_jobs (created_at DESC)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rpa_job_log_lines (
+            id BIGSERIAL PRIMARY KEY,
+            job_id VARCHAR(120) NOT NULL REFERENCES rpa_jobs(job_id) ON DELETE CASCADE,
+            line TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rpa_job_log_lines_job ON rpa_job_log_lines (job_id, id)")
+
+
+def _split_fields(data: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, Any]]:
+    columns = {key: value for key, value in data.items() if key in _JOB_COLUMNS}
+    meta = {key: value for key, value in data.items() if key not in _JOB_COLUMNS and key not in ("job_id", "logs")}
+    if isinstance(columns.get("resultado"), (dict, list)):
+        columns["resultado"] = json.dumps(columns["resultado"], ensure_ascii=False, default=str)
+    return columns, meta
+
+
+def create_job(data: Dict[str, Any]) -> str:
+    """Registra un job nuevo; `data` es el mismo diccionario que antes se guardaba en memoria."""
+    job_id = data["job_id"]
+    columns, meta = _split_fields(data)
+    columns.setdefault("status", "queued")
+    names = ["job_id", *columns.keys(), "meta"]
+    values = [job_id, *columns.values(), json.dumps(meta, ensure_ascii=False, default=str)]
+    with get_connection() as conn:
+        conn.execute(
+            f"INSERT INTO rpa_jobs ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})",
+            values,
+        )
+    return job_id
+
+
+def update_job(job_id: str, **fields) -> None:
+    """Actualiza columnas del job; los campos desconocidos se agregan a meta."""
+    if fields.get("status") in FINAL_STATUSES:
+        # Que el log quede completo antes de anunciar el estado final
+        flush_job_log(job_id)
+    columns, meta = _split_fields(fields)
+    assignments = [f"{key} = %s" for key in columns]
+    values: List[Any] = list(columns.values())
+    if meta:
+        assignments.append("meta = meta || %s::jsonb")
+        values.append(json.dumps(meta, ensure_ascii=False, default=str))
+    if not assignments:
+        return
+    assignments.append("updated_at = LOCALTIMESTAMP")
+    with get_connection() as conn:
+        conn.execute(f"UPDATE rpa_jobs SET {', '.join(assignments)} WHERE job_id = %s", [*values, job_id])
+        if fields.get("status"):
+            publish(conn, "rpa_jobs", {"job_id": job_id, "status": fields["status"]})
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        row = conn.execute("SELECT * FROM rpa_jobs WHERE job_id = %s", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job.update(job.pop("meta") or {})
+    return job
+
+
+def list_jobs(limit: int = 20) -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        rows = conn.execute(
+            """
+            SELECT * FROM rpa_jobs
+            ORDER BY COALESCE(NULLIF(started_at, ''), created_at::text) DESC
+            LIMIT %s
+            """,
+            (limit,),
+        ).fetchall()
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job.update(job.pop("meta") or {})
+        jobs.append(job)
+    return jobs
+
+
+def delete_job(job_id: str) -> None:
+    with get_connection() as conn:
+        conn.execute("DELETE FROM rpa_jobs WHERE job_id = %s", (job_id,))
+
+
+def append_job_log(job_id: str, line: str) -> None:
+    """Agrega una línea al log del job; se escribe en lotes."""
+    with _log_lock:
+        buffer = _log_buffers.setdefault(job_id, {"lines": [], "last_flush": time.time(), "progress": None})
+        buffer["lines"].append(str(line).replace("\x00", ""))
+        match = _PROGRESS_RE.search(line)
+        if match:
+            buffer["progress"] = (int(match.group(1)), int(match.group(2)))
+        due = (
+            len(buffer["lines"]) >= LOG_FLUSH_LINES
+            or time.time() - buffer["last_flush"] >= LOG_FLUSH_SECONDS
+        )
+    if due:
+        flush_job_log(job_id)
+
+
+def flush_job_log(job_id: str) -> None:
+    with _log_lock:
+        buffer = _log_buffers.get(job_id)
+        if not buffer or not buffer["lines"]:
+            return
+        pending, buffer["lines"] = buffer["lines"], []
+        progress, buffer["progress"] = buffer["progress"], None
+        buffer["last_flush"] = time.time()
+
+    try:
+        with get_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO rpa_job_log_lines (job_id, line)
+                SELECT %s, t.line
+                FROM unnest(%s::text[]) WITH ORDINALITY AS t(line, n)
+                ORDER BY t.n
+                """,
+                (job_id, pending),
+            )
+            if progress:
+                conn.execute(
+                    """
+                    UPDATE rpa_jobs
+                    SET progress_current = %s, progress_total = %s, updated_at = LOCALTIMESTAMP
+                    WHERE job_id = %s
+                    """,
+                    (progress[0], progress[1], job_id),
+                )
+            publish(conn, "rpa_jobs", {"job_id": job_id})
+    except Exception as exc:
+        logger.error(f"[RPA Jobs] Error guardando log de {job_id}: {exc}")
+
+
+def close_job_log(job_id: str) -> None:
+    flush_job_log(job_id)
+    with _log_lock:
+        _log_buffers.pop(job_id, None)
+
+
+def get_job_log_tail(job_id: str, lines: int = 50) -> tuple[int, List[str]]:
+    """Total de líneas y las últimas `lines`."""
+    with get_connection() as conn:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM rpa_job_log_lines WHERE job_id = %s", (job_id,)
+        ).fetchone()[0]
+        rows = conn.execute(
+            """
+            SELECT line FROM (
+                SELECT id, line FROM rpa_job_log_lines
+                WHERE job_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            ) tail
+            ORDER BY id ASC
+            """,
+            (job_id, lines),
+        ).fetchall()
+    return total, [f"{row[0]}\n" for row in rows]
+
+
+def get_job_log_lines(job_id: str, after: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        rows = conn.execute(
+            """
+            SELECT id AS offset, line
+            FROM rpa_job_log_lines
+            WHERE job_id = %s AND id > %s
+            ORDER BY id ASC
+            LIMIT %s
+            """,
+            (job_id, after, limit),
+        ).fetchall()
+    return [dict(row) for row in rows]
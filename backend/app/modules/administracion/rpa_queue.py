@@ -6,23 +6,46 @@ Este módulo proporciona:
 - Worker que procesa tareas en background
 - Notificaciones de estado
 - Reintentos automáticos
+
+Las tareas se toman con FOR UPDATE SKIP LOCKED, por prioridad (menor primero)
+y respetando un límite de tareas simultáneas por tipo. El worker despierta con
+el NOTIFY de rpa_tasks (app.core.events) y, como respaldo, cada
+RPA_QUEUE_POLL_SECONDS. Cada tarea en ejecución tiene un lease que el worker
+renueva; si el proceso muere, otra instancia la vuelve a encolar al vencer.
+Los fallos se reintentan con back-off exponencial hasta max_retries.
+
+Al detener el worker (apagado o pérdida del liderazgo) se matan los
+subprocesos de RPA en curso, se siguen renovando los leases hasta que sus
+threads terminan y las tareas interrumpidas vuelven a 'pending' sin gastar
+un reintento: el nuevo líder no las duplica mientras aún corren aquí.
 """
 
+import asyncio
 import json
+import logging
+import os
 import select
+import signal
+import socket
 import subprocess
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from enum import Enum
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from dataclasses import dataclass, asdict
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from psycopg.rows import dict_row
-from app.core.db import get_connection
+from app.core.config import settings
+from app.core.db import get_async_connection, get_connection
+from app.core.events import event_broker, format_sse, publish
+from app.core.services import service_registry
 
 router = APIRouter(prefix="/rpa-queue", tags=["rpa-queue"])
 
@@ -66,6 +89,7 @@ class RPATask:
 class CreateTaskRequest(BaseModel):
     type: TaskType
     params: Optional[Dict[str, Any]] = {}
+    priority: Optional[int] = None
 
 
 class TaskResponse(BaseModel):
@@ -79,53 +103,117 @@ class TaskResponse(BaseModel):
     error: Optional[str] = None
     logs: str = ""
     retry_count: int = 0
+    max_retries: int = 3
+    priority: int = 100
+    available_at: Optional[str] = None
+
+
+# Prioridad por defecto (menor = primero): las actualizaciones de indicadores
+# son cortas y no deben esperar detrás de una extracción de piezas.
+DEFAULT_PRIORITIES: Dict[str, int] = {
+    TaskType.QUALITAS_LOGIN.value: 50,
+    TaskType.QUALITAS_EXTRACT.value: 50,
+    TaskType.CHUBB_LOGIN.value: 50,
+    TaskType.CHUBB_EXTRACT.value: 50,
+    TaskType.QUALITAS_PIEZAS.value: 200,
+    TaskType.CHUBB_PIEZAS.value: 200,
+}
+
+# Llave de pg_advisory_xact_lock que serializa la toma de tareas entre procesos
+# para que los límites por tipo se respeten aunque haya varios workers.
+RPA_CLAIM_LOCK_ID = 872_341_007
 
 
 # ============================================================================
 # BASE DE DATOS
 # ============================================================================
 
-def ensure_tasks_table():
+def ensure_tasks_table(conn):
     """Crea la tabla de tareas si no existe."""
-    with get_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS rpa_tasks (
-                id VARCHAR(50) PRIMARY KEY,
-                type VARCHAR(50) NOT NULL,
-                status VARCHAR(20) NOT NULL DEFAULT 'pending',
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                started_at TIMESTAMP,
-                completed_at TIMESTAMP,
-                result JSONB,
-                error TEXT,
-                logs TEXT DEFAULT '',
-                retry_count INTEGER DEFAULT 0,
-                max_retries INTEGER DEFAULT 3,
-                params JSONB DEFAULT '{}'
-            )
-        """)
-        conn.commit()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rpa_tasks (
+            id VARCHAR(50) PRIMARY KEY,
+            type VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            result JSONB,
+            error TEXT,
+            logs TEXT DEFAULT '',
+            retry_count INTEGER DEFAULT 0,
+            max_retries INTEGER DEFAULT 3,
+            params JSONB DEFAULT '{}'
+        )
+    """)
+
+
+def ensure_task_log_lines_table(conn):
+    """Log de cada tarea, solo inserciones; el id sirve como offset para leer incrementos."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rpa_task_log_lines (
+            id BIGSERIAL PRIMARY KEY,
+            task_id VARCHAR(50) NOT NULL REFERENCES rpa_tasks(id) ON DELETE CASCADE,
+            stream VARCHAR(10) NOT NULL DEFAULT 'log',
+            line TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rpa_task_log_lines_task ON rpa_task_log_lines (task_id, id)"
+    )
 
 
-def create_task(task_type: TaskType, params: Dict[str, Any] = None) -> str:
+def ensure_tasks_queue_columns(conn):
+    """Columnas de prioridad, back-off y lease para la cola."""
+    conn.execute("ALTER TABLE rpa_tasks ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 100")
+    conn.execute(
+        "ALTER TABLE rpa_tasks ADD COLUMN IF NOT EXISTS available_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP"
+    )
+    conn.execute("ALTER TABLE rpa_tasks ADD COLUMN IF NOT EXISTS locked_by VARCHAR(120)")
+    conn.execute("ALTER TABLE rpa_tasks ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP")
+    conn.execute("ALTER TABLE rpa_tasks ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_rpa_tasks_pending
+        ON rpa_tasks (priority, available_at, created_at)
+        WHERE status = 'pending'
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_rpa_tasks_running_lease
+        ON rpa_tasks (lease_expires_at)
+        WHERE status = 'running'
+        """
+    )
+    # Las tareas que quedaron 'running' con el worker anterior no tienen lease;
+    # se marcan vencidas para que el primer worker las vuelva a encolar.
+    conn.execute(
+        "UPDATE rpa_tasks SET lease_expires_at = LOCALTIMESTAMP WHERE status = 'running' AND lease_expires_at IS NULL"
+    )
+
+
+def create_task(task_type: TaskType, params: Dict[str, Any] = None, priority: Optional[int] = None) -> str:
     """Crea una nueva tarea en la cola."""
-    ensure_tasks_table()
     
-    task_id = f"{task_type.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{int(time.time())}"
+    task_id = f"{task_type.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(3).hex()}"
+    if priority is None:
+        priority = DEFAULT_PRIORITIES.get(task_type.value, 100)
     
     with get_connection() as conn:
         conn.execute("""
-            INSERT INTO rpa_tasks (id, type, status, params)
-            VALUES (%s, %s, %s, %s)
-        """, (task_id, task_type.value, TaskStatus.PENDING.value, json.dumps(params or {})))
+            INSERT INTO rpa_tasks (id, type, status, params, priority)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (task_id, task_type.value, TaskStatus.PENDING.value, json.dumps(params or {}), priority))
         conn.commit()
     
+    _wakeup.set()
     return task_id
 
 
 def get_task(task_id: str) -> Optional[Dict[str, Any]]:
     """Obtiene una tarea por ID."""
-    ensure_tasks_table()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -139,7 +227,6 @@ def get_task(task_id: str) -> Optional[Dict[str, Any]]:
 
 def update_task(task_id: str, **kwargs):
     """Actualiza una tarea."""
-    ensure_tasks_table()
     
     allowed_fields = ['status', 'started_at', 'completed_at', 'result', 'error', 'logs', 'retry_count']
     updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
@@ -152,6 +239,8 @@ def update_task(task_id: str, **kwargs):
         updates['result'] = json.dumps(updates['result'])
     
     set_clause = ", ".join(f"{k} = %s" for k in updates.keys())
+    if updates.get('status') in _FINAL_STATUSES:
+        set_clause += ", locked_by = NULL, lease_expires_at = NULL"
     values = list(updates.values()) + [task_id]
     
     with get_connection() as conn:
@@ -162,9 +251,11 @@ def update_task(task_id: str, **kwargs):
         conn.commit()
 
 
+_FINAL_STATUSES = (TaskStatus.COMPLETED.value, TaskStatus.FAILED.value, TaskStatus.CANCELLED.value)
+
+
 def get_pending_tasks() -> List[Dict[str, Any]]:
-    """Obtiene las tareas pendientes."""
-    ensure_tasks_table()
+    """Obtiene las tareas pendientes en el orden en que se van a tomar."""
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -172,16 +263,158 @@ def get_pending_tasks() -> List[Dict[str, Any]]:
             SELECT * FROM rpa_tasks 
             WHERE status = 'pending' 
             AND retry_count < max_retries
-            ORDER BY created_at ASC
+            ORDER BY priority ASC, available_at ASC, created_at ASC
             LIMIT 10
         """).fetchall()
         
         return [dict(row) for row in rows]
 
 
+def _type_limits() -> Dict[str, int]:
+    """Límite de tareas simultáneas por tipo (1 por defecto; RPA_QUEUE_TYPE_LIMITS="qualitas_piezas=1,chubb_extract=2")."""
+    limits = {task_type.value: 1 for task_type in TaskType}
+    for item in (settings.rpa_queue_type_limits or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            limits[name.strip()] = int(value.strip())
+    return limits
+
+
+def claim_next_task(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Toma la siguiente tarea disponible cuyo tipo aún tenga cupo y le asigna un lease."""
+    limits = _type_limits()
+    lease_seconds = int(settings.rpa_queue_lease_seconds)
+    
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        with conn.transaction():
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (RPA_CLAIM_LOCK_ID,))
+            running = {
+                row["type"]: row["total"]
+                for row in conn.execute(
+                    "SELECT type, COUNT(*) AS total FROM rpa_tasks WHERE status = 'running' GROUP BY type"
+                ).fetchall()
+            }
+            available_types = [name for name, limit in limits.items() if running.get(name, 0) < limit]
+            if not available_types:
+                return None
+            
+            row = conn.execute("""
+                SELECT id FROM rpa_tasks
+                WHERE status = 'pending'
+                AND retry_count < max_retries
+                AND available_at <= LOCALTIMESTAMP
+                AND type = ANY(%s)
+                ORDER BY priority ASC, available_at ASC, created_at ASC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """, (available_types,)).fetchone()
+            if not row:
+                return None
+            
+            task = conn.execute("""
+                UPDATE rpa_tasks
+                SET status = 'running',
+                    locked_by = %s,
+                    heartbeat_at = LOCALTIMESTAMP,
+                    lease_expires_at = LOCALTIMESTAMP + make_interval(secs => %s)
+                WHERE id = %s
+                RETURNING *
+            """, (worker_id, lease_seconds, row["id"])).fetchone()
+    
+    return dict(task) if task else None
+
+
+def heartbeat_tasks(worker_id: str, task_ids: List[str]) -> None:
+    """Renueva el lease de las tareas que este worker sigue ejecutando."""
+    if not task_ids:
+        return
+    
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE rpa_tasks
+            SET heartbeat_at = LOCALTIMESTAMP,
+                lease_expires_at = LOCALTIMESTAMP + make_interval(secs => %s)
+            WHERE id = ANY(%s) AND locked_by = %s AND status = 'running'
+        """, (int(settings.rpa_queue_lease_seconds), task_ids, worker_id))
+
+
+def _retry_delay_sql() -> str:
+    # Back-off exponencial: base * 2^retry_count, con tope.
+    return "LEAST(%(retry_max)s, %(retry_base)s * POWER(2, retry_count))"
+
+
+def requeue_expired_tasks() -> List[str]:
+    """Vuelve a encolar (o da por fallidas) las tareas cuyo worker dejó de renovar el lease."""
+    
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            UPDATE rpa_tasks
+            SET retry_count = retry_count + 1,
+                status = CASE WHEN retry_count + 1 < max_retries THEN 'pending' ELSE 'failed' END,
+                available_at = LOCALTIMESTAMP + make_interval(secs => {_retry_delay_sql()}),
+                completed_at = CASE WHEN retry_count + 1 < max_retries THEN NULL ELSE LOCALTIMESTAMP END,
+                error = 'El worker dejó de responder (lease vencido)',
+                locked_by = NULL,
+                lease_expires_at = NULL
+            WHERE status = 'running' AND lease_expires_at < LOCALTIMESTAMP
+            RETURNING id
+        """, _retry_params()).fetchall()
+    
+    return [row[0] for row in rows]
+
+
+def release_interrupted_tasks(worker_id: str, task_ids: List[str]) -> List[str]:
+    """Regresa a 'pending' (sin contar reintento) las tareas que este worker interrumpió al detenerse."""
+    if not task_ids:
+        return []
+    
+    with get_connection() as conn:
+        rows = conn.execute("""
+            UPDATE rpa_tasks
+            SET status = 'pending',
+                available_at = LOCALTIMESTAMP,
+                completed_at = NULL,
+                error = 'Interrumpida al detener el worker; se vuelve a encolar',
+                locked_by = NULL,
+                lease_expires_at = NULL
+            WHERE id = ANY(%s) AND locked_by = %s AND status = 'running'
+            RETURNING id
+        """, (task_ids, worker_id)).fetchall()
+    
+    return [row[0] for row in rows]
+
+
+def _retry_params() -> Dict[str, int]:
+    return {
+        "retry_base": int(settings.rpa_queue_retry_base_seconds),
+        "retry_max": int(settings.rpa_queue_retry_max_seconds),
+    }
+
+
+def fail_task(task_id: str, error: str) -> None:
+    """Registra un fallo: reintenta con back-off si quedan intentos, si no la marca como fallida."""
+    with _running_lock:
+        if task_id in _interrupted_tasks:
+            # La matamos al detener el worker: la libera release_interrupted_tasks
+            return
+    
+    with get_connection() as conn:
+        conn.execute(f"""
+            UPDATE rpa_tasks
+            SET retry_count = retry_count + 1,
+                status = CASE WHEN retry_count + 1 < max_retries THEN 'pending' ELSE 'failed' END,
+                available_at = LOCALTIMESTAMP + make_interval(secs => {_retry_delay_sql()}),
+                completed_at = CASE WHEN retry_count + 1 < max_retries THEN NULL ELSE %(completed_at)s END,
+                error = %(error)s,
+                locked_by = NULL,
+                lease_expires_at = NULL
+            WHERE id = %(task_id)s
+        """, {**_retry_params(), "completed_at": datetime.now(), "error": error, "task_id": task_id})
+
+
 def get_recent_tasks(limit: int = 20) -> List[Dict[str, Any]]:
     """Obtiene las tareas recientes."""
-    ensure_tasks_table()
     
     with get_connection() as conn:
         conn.row_factory = dict_row
@@ -211,27 +444,145 @@ def get_recent_tasks(limit: int = 20) -> List[Dict[str, Any]]:
         return result
 
 
+# ============================================================================
+# LOGS DE TAREAS
+# ============================================================================
+
+# Las líneas se acumulan en memoria y se insertan en lotes.
+LOG_FLUSH_LINES = 50
+LOG_FLUSH_SECONDS = 1.0
+LOG_TAIL_LINES = 500
+
+_log_buffers: Dict[str, Dict[str, Any]] = {}
+_log_lock = threading.Lock()
+
+
+def append_task_log(task_id: str, line: str, stream: str = "log") -> None:
+    """Agrega una línea al log de la tarea (se escribe al completar el lote)."""
+    with _log_lock:
+        buffer = _log_buffers.setdefault(task_id, {"lines": [], "last_flush": time.time()})
+        buffer["lines"].append((stream, str(line).replace("\x00", "")))
+        full = len(buffer["lines"]) >= LOG_FLUSH_LINES
+    if full:
+        flush_task_log(task_id)
+
+
+def flush_task_log(task_id: str, only_if_due: bool = False) -> None:
+    """Inserta las líneas pendientes de la tarea en un solo INSERT y avisa por NOTIFY."""
+    with _log_lock:
+        buffer = _log_buffers.get(task_id)
+        if not buffer or not buffer["lines"]:
+            return
+        if only_if_due and time.time() - buffer["last_flush"] < LOG_FLUSH_SECONDS:
+            return
+        pending, buffer["lines"] = buffer["lines"], []
+        buffer["last_flush"] = time.time()
+    
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO rpa_task_log_lines (task_id, stream, line)
+                SELECT %s, t.stream, t.line
+                FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS t(stream, line, n)
+                ORDER BY t.n
+            """, (task_id, [item[0] for item in pending], [item[1] for item in pending]))
+            publish(conn, "rpa_logs", {"task_id": task_id})
+    except Exception as e:
+        logging.getLogger(__name__).error(f"[RPA] Error guardando logs de {task_id}: {e}")
+
+
+def close_task_log(task_id: str) -> None:
+    """Escribe lo pendiente y libera el buffer de la tarea."""
+    flush_task_log(task_id)
+    with _log_lock:
+        buffer = _log_buffers.get(task_id)
+        if buffer is not None and not buffer["lines"]:
+            _log_buffers.pop(task_id, None)
+
+
+def get_task_log_lines(task_id: str, after: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+    """Líneas del log con offset mayor a `after`."""
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        rows = conn.execute("""
+            SELECT id AS offset, stream, line, created_at
+            FROM rpa_task_log_lines
+            WHERE task_id = %s AND id > %s
+            ORDER BY id ASC
+            LIMIT %s
+        """, (task_id, after, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_task_log_tail(task_id: str, lines: int = LOG_TAIL_LINES) -> str:
+    """Últimas líneas del log como texto (formato del antiguo campo rpa_tasks.logs)."""
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT stream, line FROM (
+                SELECT id, stream, line
+                FROM rpa_task_log_lines
+                WHERE task_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            ) tail
+            ORDER BY id ASC
+        """, (task_id, lines)).fetchall()
+    return "\n".join(f"STDERR: {line}" if stream == "stderr" else line for stream, line in rows)
+
+
 # ============================================================================
 # WORKER
 # ============================================================================
 
 _worker_thread = None
 _worker_running = False
+_wakeup = threading.Event()
+_running_tasks: set = set()
+_running_lock = threading.Lock()
+# Subproceso de RPA de cada tarea en curso, para matarlo al detener el worker
+_task_processes: Dict[str, subprocess.Popen] = {}
+_interrupted_tasks: set = set()
+_worker_stopping = threading.Event()
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _on_rpa_event(event: dict) -> None:
+    # Solo una tarea nueva o que vuelve a 'pending' le da trabajo al worker; los
+    # demás cambios (incluidos los de este mismo worker) no deben despertarlo.
+    if event.get("op") == "INSERT" or event.get("status") == TaskStatus.PENDING.value:
+        _wakeup.set()
+
+
+event_broker.add_handler("rpa", _on_rpa_event)
+
+
+def _kill_process(process: subprocess.Popen) -> None:
+    """Mata el subproceso de RPA y lo que haya lanzado (mismo grupo de procesos)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError:
+        process.kill()
 
 
 def _execute_rpa_command_realtime(cmd: list, backend_dir: Path, task_id: str, logs: list, log_func, timeout: int = 600) -> tuple:
     """
-    Ejecuta el comando RPA en tiempo real, actualizando logs en la BD periódicamente.
+    Ejecuta el comando RPA en tiempo real; cada línea de salida se agrega a
+    rpa_task_log_lines (en lotes) conforme llega.
     Retorna (returncode, stdout, stderr).
     """
     import logging
     import select
     logger = logging.getLogger(__name__)
     
+    if _worker_stopping.is_set():
+        raise RuntimeError("Worker detenido; la tarea se vuelve a encolar")
+    
     log_func(f"Ejecutando: {' '.join(cmd)}")
     logger.info(f"[RPA] Comando: {' '.join(cmd)}")
     
-    # Usar Popen para lectura en tiempo real
+    # Usar Popen para lectura en tiempo real; en su propio grupo para matar
+    # también el navegador que lanza el RPA
     process = subprocess.Popen(
         cmd,
         cwd=str(backend_dir),
@@ -241,24 +592,15 @@ def _execute_rpa_command_realtime(cmd: list, backend_dir: Path, task_id: str, lo
         encoding='utf-8',
         errors='replace',
         bufsize=1,
-        universal_newlines=True
+        universal_newlines=True,
+        start_new_session=True
     )
+    with _running_lock:
+        _task_processes[task_id] = process
     
     stdout_lines = []
     stderr_lines = []
-    last_db_update = time.time()
-    
-    def update_logs_in_db(force=False):
-        """Actualiza los logs en la base de datos si han pasado 5 segundos o si es forzado."""
-        nonlocal last_db_update
-        current_time = time.time()
-        if force or (current_time - last_db_update >= 5):
-            all_logs = "\n".join(logs + stdout_lines + [f"STDERR: {line}" for line in stderr_lines])
-            try:
-                update_task(task_id, logs=all_logs[-50000:])  # Limitar a 50KB
-                last_db_update = current_time
-            except Exception as e:
-                logger.error(f"[RPA] Error actualizando logs en DB: {e}")
+    last_output = time.time()
     
     # Leer stdout y stderr en tiempo real
     try:
@@ -269,38 +611,43 @@ def _execute_rpa_command_realtime(cmd: list, backend_dir: Path, task_id: str, lo
             for stream in ready:
                 line = stream.readline()
                 if line:
+                    last_output = time.time()
                     if stream is process.stdout:
                         stdout_lines.append(line.rstrip())
-                        # Actualizar logs cada 10 líneas de output
-                        if len(stdout_lines) % 10 == 0:
-                            update_logs_in_db()
+                        append_task_log(task_id, line.rstrip(), "stdout")
                     else:
                         stderr_lines.append(line.rstrip())
+                        append_task_log(task_id, line.rstrip(), "stderr")
             
-            # Actualizar logs periódicamente (cada 5 segundos)
-            update_logs_in_db()
+            # Escribe el lote pendiente aunque no llegue salida nueva
+            flush_task_log(task_id, only_if_due=True)
             
-            # Verificar timeout
-            if time.time() - last_db_update > timeout:
-                process.kill()
+            # Verificar timeout (sin salida durante `timeout` segundos)
+            if time.time() - last_output > timeout:
+                _kill_process(process)
                 raise subprocess.TimeoutExpired(cmd, timeout)
         
         # Leer cualquier output restante
         remaining_stdout, remaining_stderr = process.communicate(timeout=5)
         if remaining_stdout:
             stdout_lines.append(remaining_stdout)
+            for line in remaining_stdout.splitlines():
+                append_task_log(task_id, line, "stdout")
         if remaining_stderr:
             stderr_lines.append(remaining_stderr)
+            for line in remaining_stderr.splitlines():
+                append_task_log(task_id, line, "stderr")
             
     except subprocess.TimeoutExpired:
-        process.kill()
+        _kill_process(process)
         raise
     except Exception as e:
-        process.kill()
+        _kill_process(process)
         raise RuntimeError(f"Error ejecutando RPA: {e}")
-    
-    # Actualizar logs finales
-    update_logs_in_db(force=True)
+    finally:
+        with _running_lock:
+            _task_processes.pop(task_id, None)
+        flush_task_log(task_id)
     
     stdout = "\n".join(stdout_lines)
     stderr = "\n".join(stderr_lines)
@@ -387,7 +734,9 @@ def run_qualitas_task(task_id: str, params: Dict[str, Any]):
     logs = []
     
     def log(msg):
-        logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {msg}"
+        logs.append(line)
+        append_task_log(task_id, line)
         logger.info(f"[Task {task_id}] {msg}")
     
     try:
@@ -502,86 +851,147 @@ def run_qualitas_task(task_id: str, params: Dict[str, Any]):
             task_id,
             status=TaskStatus.COMPLETED.value,
             completed_at=datetime.now(),
-            result=result_json,
-            logs="\n".join(logs)
+            result=result_json
         )
         
     except subprocess.TimeoutExpired:
         log("✗ Timeout - El RPA tardó más de 10 minutos")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error="Timeout: El proceso tardó más de 10 minutos",
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error="Timeout: El proceso tardó más de 10 minutos")
     except Exception as e:
         log(f"✗ Error: {str(e)}")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error=str(e),
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error=str(e))
+
+
+def _execute_task(task: Dict[str, Any]):
+    """Ejecuta una tarea ya tomada por este worker."""
+    logger = logging.getLogger(__name__)
+    
+    task_id = task['id']
+    task_type = task['type']
+    
+    try:
+        # params puede ser dict (psycopg lo deserializa) o string
+        params_raw = task.get('params', '{}')
+        if isinstance(params_raw, dict):
+            params = params_raw
+        else:
+            params = json.loads(params_raw or '{}')
+        
+        logger.info(f"[Worker] Procesando tarea: {task_id}")
+        
+        if task_type == TaskType.QUALITAS_LOGIN.value or task_type == TaskType.QUALITAS_EXTRACT.value:
+            run_qualitas_task(task_id, params)
+        elif task_type == TaskType.QUALITAS_PIEZAS.value:
+            run_qualitas_piezas_task(task_id, params)
+        elif task_type == TaskType.CHUBB_LOGIN.value or task_type == TaskType.CHUBB_EXTRACT.value:
+            run_chubb_task(task_id, params)
+        elif task_type == TaskType.CHUBB_PIEZAS.value:
+            run_chubb_piezas_task(task_id, params)
+        else:
+            logger.warning(f"[Worker] Tipo de tarea desconocido: {task_type}")
+            update_task(
+                task_id,
+                status=TaskStatus.FAILED.value,
+                error=f"Tipo de tarea desconocido: {task_type}",
+                completed_at=datetime.now()
+            )
+    except Exception as e:
+        logger.exception(f"[Worker] Error ejecutando tarea {task_id}")
+        try:
+            fail_task(task_id, error=str(e))
+        except Exception:
+            logger.exception(f"[Worker] No se pudo registrar el fallo de {task_id}")
+    finally:
+        close_task_log(task_id)
+        with _running_lock:
+            _running_tasks.discard(task_id)
+        _wakeup.set()
 
 
 def worker_loop():
-    """Loop del worker que procesa tareas."""
+    """Loop del worker: toma tareas mientras haya cupo y renueva los leases de las que corren."""
     global _worker_running
     
-    import logging
     logger = logging.getLogger(__name__)
-    logger.info("[Worker] Iniciado")
+    max_workers = max(1, int(settings.rpa_queue_max_workers))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rpa-task")
+    heartbeat_seconds = max(5.0, int(settings.rpa_queue_lease_seconds) / 3)
+    wait_seconds = min(float(settings.rpa_queue_poll_seconds), heartbeat_seconds)
+    logger.info(f"[Worker] Iniciado ({WORKER_ID}, {max_workers} slots)")
+    next_heartbeat = 0.0
     
-    while _worker_running:
-        try:
-            # Obtener tareas pendientes
-            pending = get_pending_tasks()
-            
-            for task in pending:
-                if not _worker_running:
-                    break
-                
-                task_id = task['id']
-                task_type = task['type']
+    try:
+        while _worker_running:
+            _wakeup.clear()
+            try:
+                with _running_lock:
+                    running_ids = list(_running_tasks)
+                if time.monotonic() >= next_heartbeat:
+                    heartbeat_tasks(WORKER_ID, running_ids)
+                    next_heartbeat = time.monotonic() + heartbeat_seconds
                 
-                # params puede ser dict (psycopg lo deserializa) o string
-                params_raw = task.get('params', '{}')
-                if isinstance(params_raw, dict):
-                    params = params_raw
-                else:
-                    params = json.loads(params_raw or '{}')
+                requeued = requeue_expired_tasks()
+                if requeued:
+                    logger.warning(f"[Worker] Tareas con lease vencido re-encoladas: {requeued}")
                 
-                logger.info(f"[Worker] Procesando tarea: {task_id}")
+                while _worker_running and len(running_ids) < max_workers:
+                    task = claim_next_task(WORKER_ID)
+                    if not task:
+                        break
+                    with _running_lock:
+                        _running_tasks.add(task['id'])
+                        running_ids = list(_running_tasks)
+                    executor.submit(_execute_task, task)
                 
-                if task_type == TaskType.QUALITAS_LOGIN.value or task_type == TaskType.QUALITAS_EXTRACT.value:
-                    run_qualitas_task(task_id, params)
-                elif task_type == TaskType.QUALITAS_PIEZAS.value:
-                    run_qualitas_piezas_task(task_id, params)
-                elif task_type == TaskType.CHUBB_LOGIN.value or task_type == TaskType.CHUBB_EXTRACT.value:
-                    run_chubb_task(task_id, params)
-                elif task_type == TaskType.CHUBB_PIEZAS.value:
-                    run_chubb_piezas_task(task_id, params)
-                else:
-                    logger.warning(f"[Worker] Tipo de tarea desconocido: {task_type}")
-                    update_task(
-                        task_id,
-                        status=TaskStatus.FAILED.value,
-                        error=f"Tipo de tarea desconocido: {task_type}",
-                        completed_at=datetime.now()
-                    )
-            
-            # Esperar antes de revisar nuevamente
-            time.sleep(5)
+            except Exception as e:
+                logger.exception("[Worker] Error en loop")
+                time.sleep(10)
             
-        except Exception as e:
-            logger.exception("[Worker] Error en loop")
-            time.sleep(10)
+            # Despierta con NOTIFY, al terminar una tarea o al tocar el heartbeat
+            _wakeup.wait(max(0.0, min(wait_seconds, next_heartbeat - time.monotonic())))
+    finally:
+        try:
+            _drain_running_tasks(heartbeat_seconds)
+        except Exception:
+            logger.exception("[Worker] Error liberando las tareas en curso")
+        executor.shutdown(wait=False)
+        logger.info("[Worker] Detenido")
+
+
+def _drain_running_tasks(heartbeat_seconds: float) -> None:
+    """
+    Mata los subprocesos de las tareas en curso y renueva sus leases hasta que
+    sus threads terminan; después las regresa a 'pending'. Sin esto seguirían
+    corriendo sin heartbeat y el nuevo líder las volvería a ejecutar.
+    """
+    logger = logging.getLogger(__name__)
+    with _running_lock:
+        interrupted = list(_running_tasks)
+        _interrupted_tasks.update(interrupted)
+        processes = [_task_processes[task_id] for task_id in interrupted if task_id in _task_processes]
+    if not interrupted:
+        return
+    
+    logger.warning(f"[Worker] Interrumpiendo tareas en curso: {interrupted}")
+    for process in processes:
+        _kill_process(process)
     
-    logger.info("[Worker] Detenido")
+    deadline = time.monotonic() + int(settings.rpa_queue_lease_seconds)
+    while True:
+        with _running_lock:
+            running_ids = list(_running_tasks)
+        if not running_ids:
+            break
+        if time.monotonic() >= deadline:
+            logger.warning(f"[Worker] Tareas que no terminaron a tiempo: {running_ids}")
+            break
+        heartbeat_tasks(WORKER_ID, running_ids)
+        _wakeup.wait(min(heartbeat_seconds, max(0.0, deadline - time.monotonic())))
+        _wakeup.clear()
+    
+    released = release_interrupted_tasks(WORKER_ID, interrupted)
+    if released:
+        logger.info(f"[Worker] Tareas re-encoladas al detenerse: {released}")
 
 
 def start_worker():
@@ -591,19 +1001,26 @@ def start_worker():
     if _worker_thread and _worker_thread.is_alive():
         return  # Ya está corriendo
     
+    _worker_stopping.clear()
+    with _running_lock:
+        _interrupted_tasks.clear()
     _worker_running = True
     _worker_thread = threading.Thread(target=worker_loop, daemon=True)
     _worker_thread.start()
 
 
 def stop_worker():
-    """Detiene el worker."""
+    """Detiene el worker y espera a que libere las tareas en curso (ver _drain_running_tasks)."""
     global _worker_running
     _worker_running = False
+    _worker_stopping.set()
+    _wakeup.set()
+    if _worker_thread and _worker_thread.is_alive():
+        _worker_thread.join(timeout=int(settings.rpa_queue_lease_seconds) + 30)
 
 
-# Iniciar worker al importar
-start_worker()
+# Lo arranca el lifespan de la API en el proceso líder (app.core.services)
+service_registry.register("rpa_worker", start_worker, stop_worker)
 
 
 # ============================================================================
@@ -653,17 +1070,20 @@ def serialize_task(task: Dict[str, Any]) -> Dict[str, Any]:
         "result": result,
         "error": task.get('error'),
         "logs": task.get('logs') or "",
-        "retry_count": task.get('retry_count', 0)
+        "retry_count": task.get('retry_count', 0),
+        "max_retries": task.get('max_retries', 3),
+        "priority": task.get('priority', 100),
+        "available_at": format_date(task.get('available_at'))
     }
 
 
 @router.post("/tasks", response_model=TaskResponse)
-async def create_task_endpoint(request: CreateTaskRequest):
+def create_task_endpoint(request: CreateTaskRequest):
     """
     Crea una nueva tarea en la cola.
     El worker la procesará automáticamente.
     """
-    task_id = create_task(request.type, request.params)
+    task_id = create_task(request.type, request.params, request.priority)
     
     # Retornar estado inicial
     task = get_task(task_id)
@@ -671,24 +1091,98 @@ async def create_task_endpoint(request: CreateTaskRequest):
 
 
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
-async def get_task_endpoint(task_id: str):
+def get_task_endpoint(task_id: str):
     """Obtiene el estado de una tarea."""
     task = get_task(task_id)
     
     if not task:
         raise HTTPException(status_code=404, detail="Tarea no encontrada")
     
+    if not task.get('logs'):
+        task['logs'] = get_task_log_tail(task_id)
     return serialize_task(task)
 
 
+@router.get("/tasks/{task_id}/logs")
+def get_task_logs(task_id: str, after: int = Query(default=0, ge=0), limit: int = Query(default=1000, ge=1, le=5000)):
+    """
+    Líneas del log posteriores a `after`.
+    El cliente vuelve a llamar con `next_offset` para recibir solo lo nuevo.
+    """
+    task = get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    
+    lines = get_task_log_lines(task_id, after, limit)
+    return {
+        "task_id": task_id,
+        "status": task['status'],
+        "lines": serialize_datetime_recursive(lines),
+        "next_offset": lines[-1]['offset'] if lines else after
+    }
+
+
+@router.get("/tasks/{task_id}/logs/stream")
+async def stream_task_logs(task_id: str, request: Request, after: int = Query(default=0, ge=0)):
+    """SSE con las líneas nuevas del log; termina cuando la tarea llega a un estado final."""
+    if not await asyncio.to_thread(get_task, task_id):
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    
+    heartbeat = max(1.0, float(settings.events_heartbeat_seconds))
+    
+    async def fetch(offset: int):
+        # Conexión async: las lecturas del log no bloquean el event loop
+        async with get_async_connection() as conn:
+            conn.row_factory = dict_row
+            cursor = await conn.execute("""
+                SELECT id AS offset, stream, line, created_at
+                FROM rpa_task_log_lines
+                WHERE task_id = %s AND id > %s
+                ORDER BY id ASC
+                LIMIT 1000
+            """, (task_id, offset))
+            lines = await cursor.fetchall()
+            cursor = await conn.execute("SELECT status FROM rpa_tasks WHERE id = %s", (task_id,))
+            row = await cursor.fetchone()
+        return lines, (row or {}).get("status")
+    
+    async def log_generator():
+        offset = after
+        async with event_broker.subscribe({"rpa_logs", "rpa"}) as queue:
+            while not await request.is_disconnected():
+                lines, task_status = await fetch(offset)
+                for item in lines:
+                    offset = item["offset"]
+                    yield format_sse({"type": "log", **serialize_datetime_recursive(dict(item))})
+                if len(lines) == 1000:
+                    continue
+                if task_status in _FINAL_STATUSES:
+                    yield format_sse({"type": "status", "status": task_status})
+                    break
+                # Espera el NOTIFY de esta tarea (o el heartbeat)
+                try:
+                    while True:
+                        event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                        if event.get("task_id") == task_id or event.get("id") == task_id:
+                            break
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+    
+    return StreamingResponse(
+        log_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/tasks")
-async def list_tasks(limit: int = 20):
+def list_tasks(limit: int = 20):
     """Lista las tareas recientes."""
     return get_recent_tasks(limit)
 
 
 @router.post("/qualitas/actualizar")
-async def queue_qualitas_update(force_extract: bool = False):
+def queue_qualitas_update(force_extract: bool = False):
     """
     Encola una actualización de indicadores de Qualitas.
     Retorna inmediatamente con el ID de la tarea.
@@ -719,27 +1213,47 @@ async def queue_qualitas_update(force_extract: bool = False):
 # ============================================================================
 # SCHEDULER ENDPOINTS
 # ============================================================================
+# Los schedulers corren solo en el proceso líder (app.core.services): estos
+# endpoints guardan lo pedido con service_registry.request y leen el estado que
+# publica el líder, sin arrancar hilos en el worker que atiende la petición.
+
+def _scheduler_status(scheduler_name: str) -> Optional[Dict[str, Any]]:
+    from app.modules.administracion.rpa_scheduler import control_name
+    return service_registry.control_status(control_name(scheduler_name))
+
+
+def _request_scheduler(scheduler_name: str, desired: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    from app.modules.administracion.rpa_scheduler import control_name
+    return service_registry.request(control_name(scheduler_name), desired)
+
 
 @router.get("/scheduler/status")
-async def scheduler_status():
+def scheduler_status():
     """
     Obtiene el estado del scheduler automático.
     """
-    from app.modules.administracion.rpa_scheduler import get_scheduler_status
-    return get_scheduler_status()
+    from app.modules.administracion.rpa_scheduler import SCHEDULER_TASK_TYPES
+    
+    statuses = {name: _scheduler_status(name) for name in SCHEDULER_TASK_TYPES}
+    return {
+        name: scheduler
+        for name, scheduler in statuses.items()
+        if scheduler and (scheduler.get("running") or "message" not in scheduler)
+    }
 
 
 @router.post("/scheduler/start")
-async def scheduler_start(interval_hours: int = 2):
+def scheduler_start(interval_hours: int = 2):
     """
     Inicia el scheduler automático.
     
     Args:
         interval_hours: Intervalo en horas entre ejecuciones (default: 2)
     """
-    from app.modules.administracion.rpa_scheduler import start_scheduler
+    from app.modules.administracion.rpa_scheduler import SCHEDULER_TASK_TYPES
     
-    scheduler = start_scheduler(interval_hours)
+    for name in SCHEDULER_TASK_TYPES:
+        _request_scheduler(name, {"running": True, "interval_hours": interval_hours})
     return {
         "success": True,
         "message": f"Scheduler iniciado con intervalo de {interval_hours} horas",
@@ -748,13 +1262,14 @@ async def scheduler_start(interval_hours: int = 2):
 
 
 @router.post("/scheduler/stop")
-async def scheduler_stop():
+def scheduler_stop():
     """
     Detiene el scheduler automático.
     """
-    from app.modules.administracion.rpa_scheduler import stop_scheduler
+    from app.modules.administracion.rpa_scheduler import SCHEDULER_TASK_TYPES
     
-    stop_scheduler()
+    for name in SCHEDULER_TASK_TYPES:
+        _request_scheduler(name, {"running": False})
     return {
         "success": True,
         "message": "Scheduler detenido"
@@ -762,7 +1277,7 @@ async def scheduler_stop():
 
 
 @router.post("/scheduler/force-run")
-async def scheduler_force_run():
+def scheduler_force_run():
     """
     Fuerza una ejecución inmediata del RPA.
     """
@@ -778,17 +1293,18 @@ async def scheduler_force_run():
 
 
 @router.post("/scheduler/restart")
-async def scheduler_restart(interval_hours: int = 2):
+def scheduler_restart(interval_hours: int = 2):
     """
     Reinicia el scheduler con un nuevo intervalo.
     
     Args:
         interval_hours: Intervalo en horas entre ejecuciones (default: 2)
     """
-    from app.modules.administracion.rpa_scheduler import stop_scheduler, start_scheduler
+    from app.modules.administracion.rpa_scheduler import SCHEDULER_TASK_TYPES
     
-    stop_scheduler()
-    scheduler = start_scheduler(interval_hours)
+    restart = uuid.uuid4().hex
+    for name in SCHEDULER_TASK_TYPES:
+        _request_scheduler(name, {"running": True, "interval_hours": interval_hours, "restart": restart})
     
     return {
         "success": True,
@@ -802,13 +1318,14 @@ async def scheduler_restart(interval_hours: int = 2):
 # ============================================================================
 
 @router.get("/scheduler/{scheduler_name}/status")
-async def scheduler_specific_status(scheduler_name: str):
+def scheduler_specific_status(scheduler_name: str):
     """
     Obtiene el estado de un scheduler específico (qualitas o chubb).
     """
-    from app.modules.administracion.rpa_scheduler import get_scheduler_status
+    if scheduler_name not in ["qualitas", "chubb"]:
+        raise HTTPException(status_code=404, detail=f"Scheduler {scheduler_name} no encontrado")
     
-    status = get_scheduler_status(scheduler_name)
+    status = _scheduler_status(scheduler_name)
     
     if not status or (not status.get("running") and "message" in status):
         raise HTTPException(status_code=404, detail=f"Scheduler {scheduler_name} no encontrado")
@@ -817,7 +1334,7 @@ async def scheduler_specific_status(scheduler_name: str):
 
 
 @router.post("/scheduler/{scheduler_name}/start")
-async def scheduler_specific_start(scheduler_name: str, interval_hours: int = 2):
+def scheduler_specific_start(scheduler_name: str, interval_hours: int = 2):
     """
     Inicia un scheduler específico (qualitas o chubb).
     
@@ -825,12 +1342,10 @@ async def scheduler_specific_start(scheduler_name: str, interval_hours: int = 2)
         scheduler_name: Nombre del scheduler (qualitas o chubb)
         interval_hours: Intervalo en horas entre ejecuciones (default: 2)
     """
-    from app.modules.administracion.rpa_scheduler import start_scheduler
-    
     if scheduler_name not in ["qualitas", "chubb"]:
         raise HTTPException(status_code=400, detail="Scheduler debe ser 'qualitas' o 'chubb'")
     
-    scheduler = start_scheduler(scheduler_name, interval_hours)
+    _request_scheduler(scheduler_name, {"running": True, "interval_hours": interval_hours})
     
     return {
         "success": True,
@@ -841,27 +1356,26 @@ async def scheduler_specific_start(scheduler_name: str, interval_hours: int = 2)
 
 
 @router.post("/scheduler/{scheduler_name}/stop")
-async def scheduler_specific_stop(scheduler_name: str):
+def scheduler_specific_stop(scheduler_name: str):
     """
     Detiene un scheduler específico (qualitas o chubb).
     
     Args:
         scheduler_name: Nombre del scheduler (qualitas o chubb)
     """
-    from app.modules.administracion.rpa_scheduler import _schedulers
-    
     if scheduler_name not in ["qualitas", "chubb"]:
         raise HTTPException(status_code=400, detail="Scheduler debe ser 'qualitas' o 'chubb'")
     
-    if scheduler_name in _schedulers:
-        _schedulers[scheduler_name].stop()
-        return {
-            "success": True,
-            "message": f"Scheduler {scheduler_name} detenido",
-            "scheduler_name": scheduler_name
-        }
-    else:
+    status = _scheduler_status(scheduler_name)
+    if not status or not status.get("running"):
         raise HTTPException(status_code=404, detail=f"Scheduler {scheduler_name} no está corriendo")
+    
+    _request_scheduler(scheduler_name, {"running": False})
+    return {
+        "success": True,
+        "message": f"Scheduler {scheduler_name} detenido",
+        "scheduler_name": scheduler_name
+    }
 
 
 # ============================================================================
@@ -877,7 +1391,9 @@ def run_chubb_task(task_id: str, params: Dict[str, Any]):
     logs = []
     
     def log(msg):
-        logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {msg}"
+        logs.append(line)
+        append_task_log(task_id, line)
         logger.info(f"[Task {task_id}] {msg}")
     
     try:
@@ -986,30 +1502,15 @@ def run_chubb_task(task_id: str, params: Dict[str, Any]):
             task_id,
             status=TaskStatus.COMPLETED.value,
             completed_at=datetime.now(),
-            result=result_json,
-            logs="\n".join(logs)
+            result=result_json
         )
         
     except subprocess.TimeoutExpired:
         log("✗ Timeout - El RPA tardó más de 10 minutos")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error="Timeout: El proceso tardó más de 10 minutos",
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error="Timeout: El proceso tardó más de 10 minutos")
     except Exception as e:
         log(f"✗ Error: {str(e)}")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error=str(e),
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error=str(e))
 
 
 def run_qualitas_piezas_task(task_id: str, params: Dict[str, Any]):
@@ -1021,7 +1522,9 @@ def run_qualitas_piezas_task(task_id: str, params: Dict[str, Any]):
     logs = []
     
     def log(msg):
-        logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {msg}"
+        logs.append(line)
+        append_task_log(task_id, line)
         logger.info(f"[Task {task_id}] {msg}")
     
     try:
@@ -1070,30 +1573,15 @@ def run_qualitas_piezas_task(task_id: str, params: Dict[str, Any]):
             task_id,
             status=TaskStatus.COMPLETED.value,
             completed_at=datetime.now(),
-            result=json.dumps({"piezas_extraidas": piezas_count, "success": True}),
-            logs="\n".join(logs)
+            result=json.dumps({"piezas_extraidas": piezas_count, "success": True})
         )
         
     except subprocess.TimeoutExpired:
         log("✗ Timeout - El RPA tardó más de 1 hora")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error="Timeout: El proceso tardó más de 1 hora",
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error="Timeout: El proceso tardó más de 1 hora")
     except Exception as e:
         log(f"✗ Error: {str(e)}")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error=str(e),
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error=str(e))
 
 
 def run_chubb_piezas_task(task_id: str, params: Dict[str, Any]):
@@ -1105,7 +1593,9 @@ def run_chubb_piezas_task(task_id: str, params: Dict[str, Any]):
     logs = []
     
     def log(msg):
-        logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+        line = f"[{datetime.now().strftime('%H:%M:%S')}] {msg}"
+        logs.append(line)
+        append_task_log(task_id, line)
         logger.info(f"[Task {task_id}] {msg}")
     
     try:
@@ -1153,34 +1643,19 @@ def run_chubb_piezas_task(task_id: str, params: Dict[str, Any]):
             task_id,
             status=TaskStatus.COMPLETED.value,
             completed_at=datetime.now(),
-            result=json.dumps({"piezas_extraidas": piezas_count, "success": True}),
-            logs="\n".join(logs)
+            result=json.dumps({"piezas_extraidas": piezas_count, "success": True})
         )
         
     except subprocess.TimeoutExpired:
         log("✗ Timeout - El RPA tardó más de 1 hora")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error="Timeout: El proceso tardó más de 1 hora",
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error="Timeout: El proceso tardó más de 1 hora")
     except Exception as e:
         log(f"✗ Error: {str(e)}")
-        update_task(
-            task_id,
-            status=TaskStatus.FAILED.value,
-            completed_at=datetime.now(),
-            error=str(e),
-            logs="\n".join(logs),
-            retry_count=get_task(task_id)['retry_count'] + 1
-        )
+        fail_task(task_id, error=str(e))
 
 
 @router.post("/chubb/actualizar")
-async def queue_chubb_update():
+def queue_chubb_update():
     """
     Encola una actualización de indicadores de CHUBB.
     Retorna inmediatamente con el ID de la tarea.
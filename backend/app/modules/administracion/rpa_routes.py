@@ -2,24 +2,39 @@
 Endpoints para ejecutar RPA de aseguradoras desde el frontend.
 """
 
+import asyncio
+import logging
 import subprocess
 import os
 from pathlib import Path
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from psycopg.rows import dict_row
 from pydantic import BaseModel, Field
 from typing import Optional, Literal, List, Any
 
-from app.core.db import get_connection
-from app.modules.recepcion.routes import ensure_inventario_recepcion_table
+from app.core.config import settings
+from app.core.db import get_async_connection, get_connection
+from app.core.events import event_broker, format_sse
+from app.modules.administracion.rpa_job_store import (
+    FINAL_STATUSES,
+    append_job_log,
+    close_job_log,
+    create_job,
+    delete_job,
+    get_job,
+    get_job_log_tail,
+    list_jobs,
+    update_job,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/rpa", tags=["rpa"])
 
-# Almacenar estado de las ejecuciones (en memoria - reinicia con el servidor)
-rpa_jobs = {}
-
-# Track log IDs for piezas executions (para actualizar al completar)
-piezas_execution_logs = {}
+# El estado de las ejecuciones vive en la tabla rpa_jobs (ver rpa_job_store) para
+# que cualquier worker de uvicorn pueda responder /status/{job_id}.
 
 
 class RPARequest(BaseModel):
@@ -30,12 +45,14 @@ class RPARequest(BaseModel):
 
 class RPAResponse(BaseModel):
     job_id: str
-    status: Literal["queued", "running", "completed", "failed"]
+    status: Literal["queued", "running", "completed", "completed_with_errors", "failed"]
     message: str
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     output: Optional[str] = None
     error: Optional[str] = None
+    progress_current: Optional[int] = None
+    progress_total: Optional[int] = None
 
 
 class AdjudicacionDatosRequest(BaseModel):
@@ -133,7 +150,6 @@ def _build_inventory_payload(row: dict[str, Any] | None) -> dict[str, Any] | Non
 
 def _load_inventory_for_qualitas(num_reporte: str, placa: str) -> dict[str, Any] | None:
     with get_connection() as conn:
-        ensure_inventario_recepcion_table(conn)
 
         row = None
         reporte = str(num_reporte or "").strip()
@@ -193,17 +209,23 @@ def run_rpa_script(seguro: str, job_id: str, action: str, headless: bool, save_s
         script_name = "chubb_full_workflow.py"
         env_prefix = "CHUBB"
     else:
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = f"Seguro no soportado: {seguro}"
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        update_job(
+            job_id,
+            status="failed",
+            error=f"Seguro no soportado: {seguro}",
+            completed_at=datetime.now().isoformat(),
+        )
         return
     
     script_path = backend_dir / "app" / "rpa" / script_name
     
     if not script_path.exists():
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = f"Script no encontrado: {script_path}"
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        update_job(
+            job_id,
+            status="failed",
+            error=f"Script no encontrado: {script_path}",
+            completed_at=datetime.now().isoformat(),
+        )
         return
     
     # Construir comando (usar python3 para compatibilidad con Docker)
@@ -222,8 +244,7 @@ def run_rpa_script(seguro: str, job_id: str, action: str, headless: bool, save_s
     
     # Ejecutar script
     try:
-        rpa_jobs[job_id]["status"] = "running"
-        rpa_jobs[job_id]["started_at"] = datetime.now().isoformat()
+        update_job(job_id, status="running", started_at=datetime.now().isoformat())
         
         # Ejecutar con timeout de 5 minutos
         result = subprocess.run(
@@ -236,23 +257,19 @@ def run_rpa_script(seguro: str, job_id: str, action: str, headless: bool, save_s
             errors='replace'
         )
         
-        rpa_jobs[job_id]["output"] = result.stdout
+        update_job(job_id, output=result.stdout)
         
         if result.returncode == 0:
-            rpa_jobs[job_id]["status"] = "completed"
-            rpa_jobs[job_id]["message"] = f"RPA {seguro} completado exitosamente"
+            update_job(job_id, status="completed", message=f"RPA {seguro} completado exitosamente")
         else:
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = result.stderr or "Error desconocido"
+            update_job(job_id, status="failed", error=result.stderr or "Error desconocido")
             
     except subprocess.TimeoutExpired:
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = "Timeout: El RPA tardó más de 5 minutos"
+        update_job(job_id, status="failed", error="Timeout: El RPA tardó más de 5 minutos")
     except Exception as e:
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="failed", error=str(e))
     
-    rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+    update_job(job_id, completed_at=datetime.now().isoformat())
 
 
 def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
@@ -275,16 +292,18 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
         log_line = f"[{timestamp}] {msg}\n"
         with open(log_file, "a", encoding="utf-8") as f:
             f.write(log_line)
-        # También guardar en memoria para consulta rápida
-        if "logs" not in rpa_jobs[job_id]:
-            rpa_jobs[job_id]["logs"] = []
-        rpa_jobs[job_id]["logs"].append(log_line)
+        # También guardar en la base de datos (visible desde cualquier worker)
+        append_job_log(job_id, log_line.rstrip("\n"))
     
     if not script_path.exists():
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = f"Script no encontrado: {script_path}"
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        update_job(
+            job_id,
+            status="failed",
+            error=f"Script no encontrado: {script_path}",
+            completed_at=datetime.now().isoformat(),
+        )
         log_message(f"ERROR: Script no encontrado: {script_path}")
+        close_job_log(job_id)
         return
     
     # Guardar datos en archivo temporal
@@ -313,9 +332,7 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
             log_message("Modo: VISUAL (con navegador visible)")
         
         # Ejecutar script con streaming de output
-        rpa_jobs[job_id]["status"] = "running"
-        rpa_jobs[job_id]["started_at"] = datetime.now().isoformat()
-        rpa_jobs[job_id]["log_file"] = str(log_file)
+        update_job(job_id, status="running", started_at=datetime.now().isoformat(), log_file=str(log_file))
         log_message(f"Job iniciado: {job_id}")
         log_message(f"Comando: {' '.join(cmd)}")
         
@@ -340,9 +357,6 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
                 if line:
                     full_output.append(line)
                     log_message(f"RPA: {line}")
-                    # Mantener solo últimas 100 líneas en memoria
-                    if len(rpa_jobs[job_id]["logs"]) > 100:
-                        rpa_jobs[job_id]["logs"] = rpa_jobs[job_id]["logs"][-100:]
         except Exception as e:
             log_message(f"Error leyendo output: {e}")
         
@@ -353,11 +367,10 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
             process.kill()
             process.wait()
             log_message("ERROR: Timeout después de 2 minutos")
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = "Timeout: La adjudicación tardó más de 2 minutos"
+            update_job(job_id, status="failed", error="Timeout: La adjudicación tardó más de 2 minutos")
             return
         
-        rpa_jobs[job_id]["output"] = "\n".join(full_output)
+        update_job(job_id, output="\n".join(full_output))
         log_message(f"Proceso terminado con código: {process.returncode}")
         
         # Leer resultado del archivo de salida
@@ -366,23 +379,20 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
             import json
             with open(result_file, "r", encoding="utf-8") as f:
                 resultado = json.load(f)
-            rpa_jobs[job_id]["resultado"] = resultado
+            update_job(job_id, resultado=resultado)
             exitosos = resultado.get("exitosos", 0)
             fallidos = resultado.get("fallidos", 0)
             log_message(f"Resultado: {exitosos} exitosos, {fallidos} fallidos")
             result_file.unlink()
         
         if process.returncode == 0:
-            rpa_jobs[job_id]["status"] = "completed"
-            rpa_jobs[job_id]["message"] = "Adjudicación completada exitosamente"
+            update_job(job_id, status="completed", message="Adjudicación completada exitosamente")
             log_message("Job completado exitosamente")
         elif process.returncode == 1:
-            rpa_jobs[job_id]["status"] = "completed_with_errors"
-            rpa_jobs[job_id]["message"] = "Algunas adjudicaciones fallaron"
+            update_job(job_id, status="completed_with_errors", message="Algunas adjudicaciones fallaron")
             log_message("Job completado con errores parciales")
         else:
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = f"Error en ejecución (código {process.returncode})"
+            update_job(job_id, status="failed", error=f"Error en ejecución (código {process.returncode})")
             log_message(f"Job fallido con código {process.returncode}")
             
     except Exception as e:
@@ -390,19 +400,20 @@ def run_adjudicacion_script(job_id: str, datos_json: str, headless: bool):
         log_message(f"ERROR: {error_msg}")
         import traceback
         log_message(f"Traceback: {traceback.format_exc()}")
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = error_msg
+        update_job(job_id, status="failed", error=error_msg)
     finally:
         # Limpiar archivo temporal
         if temp_file.exists():
             temp_file.unlink()
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
-        log_message(f"Job finalizado a las {rpa_jobs[job_id]['completed_at']}")
+        completed_at = datetime.now().isoformat()
+        update_job(job_id, completed_at=completed_at)
+        log_message(f"Job finalizado a las {completed_at}")
         log_message(f"Log completo disponible en: {log_file}")
+        close_job_log(job_id)
 
 
 @router.post("/qualitas", response_model=RPAResponse)
-async def run_qualitas_rpa(
+def run_qualitas_rpa(
     background_tasks: BackgroundTasks,
     request: RPARequest
 ):
@@ -411,13 +422,13 @@ async def run_qualitas_rpa(
     """
     job_id = f"qualitas_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{id(request)}"
     
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": "RPA de Qualitas en cola",
         "seguro": "QUALITAS",
         "tipo": "extraccion"
-    }
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
@@ -437,7 +448,7 @@ async def run_qualitas_rpa(
 
 
 @router.post("/qualitas/adjudicar", response_model=RPAResponse)
-async def adjudicar_orden_qualitas(
+def adjudicar_orden_qualitas(
     background_tasks: BackgroundTasks,
     request: AdjudicacionDatosRequest
 ):
@@ -487,14 +498,14 @@ async def adjudicar_orden_qualitas(
                 datos_dict["kilometraje"] = inventory_data.get("kilometraje", "")
     datos_json = json.dumps(datos_dict, ensure_ascii=False)
     
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": "Adjudicación de Qualitas en cola",
         "seguro": "QUALITAS",
         "tipo": "adjudicacion",
         "id_expediente": request.id_expediente
-    }
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
@@ -512,7 +523,7 @@ async def adjudicar_orden_qualitas(
 
 
 @router.post("/qualitas/adjudicar/batch", response_model=RPAResponse)
-async def adjudicar_ordenes_batch_qualitas(
+def adjudicar_ordenes_batch_qualitas(
     background_tasks: BackgroundTasks,
     request: AdjudicacionBatchRequest
 ):
@@ -536,14 +547,14 @@ async def adjudicar_ordenes_batch_qualitas(
     }
     datos_json = json.dumps(datos_dict, ensure_ascii=False)
     
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": f"Adjudicación batch de {len(request.ordenes)} órdenes en cola",
         "seguro": "QUALITAS",
         "tipo": "adjudicacion_batch",
         "total_ordenes": len(request.ordenes)
-    }
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
@@ -561,7 +572,7 @@ async def adjudicar_ordenes_batch_qualitas(
 
 
 @router.post("/chubb", response_model=RPAResponse)
-async def run_chubb_rpa(
+def run_chubb_rpa(
     background_tasks: BackgroundTasks,
     request: RPARequest
 ):
@@ -570,13 +581,13 @@ async def run_chubb_rpa(
     """
     job_id = f"chubb_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{id(request)}"
     
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": "RPA de CHUBB en cola",
         "seguro": "CHUBB",
         "tipo": "extraccion"
-    }
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
@@ -596,64 +607,60 @@ async def run_chubb_rpa(
 
 
 @router.get("/status/{job_id}", response_model=RPAResponse)
-async def get_rpa_status(job_id: str):
+def get_rpa_status(job_id: str):
     """
     Obtiene el estado de una ejecución de RPA.
     """
-    if job_id not in rpa_jobs:
+    job = get_job(job_id)
+    if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job no encontrado"
         )
     
-    job = rpa_jobs[job_id]
-    
     return RPAResponse(
         job_id=job_id,
         status=job.get("status", "unknown"),
-        message=job.get("message", ""),
+        message=job.get("message") or "",
         started_at=job.get("started_at"),
         completed_at=job.get("completed_at"),
         output=job.get("output"),
-        error=job.get("error")
+        error=job.get("error"),
+        progress_current=job.get("progress_current"),
+        progress_total=job.get("progress_total")
     )
 
 
 @router.get("/jobs")
-async def list_rpa_jobs(limit: int = 20):
+def list_rpa_jobs(limit: int = 20):
     """
     Lista las ejecuciones recientes de RPA.
     """
-    # Ordenar por fecha de inicio (más recientes primero)
-    sorted_jobs = sorted(
-        rpa_jobs.items(),
-        key=lambda x: x[1].get("started_at", "") or x[1].get("queued_at", ""),
-        reverse=True
-    )[:limit]
-    
+    # Ordenadas por fecha de inicio (más recientes primero)
     return [
         {
-            "job_id": job_id,
+            "job_id": job["job_id"],
             "seguro": job.get("seguro"),
-            "tipo": job.get("tipo", "extraccion"),
+            "tipo": job.get("tipo") or "extraccion",
             "status": job.get("status"),
             "started_at": job.get("started_at"),
             "completed_at": job.get("completed_at"),
             "has_error": bool(job.get("error")),
             "id_expediente": job.get("id_expediente"),
-            "total_ordenes": job.get("total_ordenes")
+            "total_ordenes": job.get("total_ordenes"),
+            "progress_current": job.get("progress_current"),
+            "progress_total": job.get("progress_total")
         }
-        for job_id, job in sorted_jobs
+        for job in list_jobs(limit)
     ]
 
 
 @router.delete("/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_rpa_job(job_id: str):
+def delete_rpa_job(job_id: str):
     """
-    Elimina un job de la memoria.
+    Elimina un job y su log.
     """
-    if job_id in rpa_jobs:
-        del rpa_jobs[job_id]
+    delete_job(job_id)
     return None
 
 
@@ -674,7 +681,7 @@ async def get_marcas_qualitas():
 
 
 @router.get("/status/{job_id}/logs")
-async def get_rpa_logs(job_id: str, lines: int = 50):
+def get_rpa_logs(job_id: str, lines: int = 50):
     """
     Obtiene los logs de un job de RPA.
     
@@ -682,72 +689,95 @@ async def get_rpa_logs(job_id: str, lines: int = 50):
         job_id: ID del job
         lines: Número de líneas a retornar (últimas N líneas)
     """
-    if job_id not in rpa_jobs:
+    job = get_job(job_id)
+    if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job no encontrado"
         )
     
-    job = rpa_jobs[job_id]
+    # Leer desde la base de datos primero
+    total_lines, logs = get_job_log_tail(job_id, lines)
     
-    # Intentar leer desde memoria primero
-    logs = job.get("logs", [])
-    
-    # Si no hay logs en memoria, intentar leer del archivo
-    if not logs and "log_file" in job:
+    # Si no hay logs guardados, intentar leer del archivo
+    if not logs and job.get("log_file"):
         log_file = Path(job["log_file"])
         if log_file.exists():
             try:
                 with open(log_file, "r", encoding="utf-8") as f:
-                    logs = f.readlines()
+                    file_lines = f.readlines()
+                total_lines, logs = len(file_lines), file_lines[-lines:]
             except Exception:
                 logs = []
     
-    # Retornar últimas N líneas
     return {
         "job_id": job_id,
         "status": job.get("status"),
-        "total_lines": len(logs),
-        "logs": logs[-lines:] if logs else []
+        "total_lines": total_lines,
+        "logs": logs
     }
 
 
 @router.get("/status/{job_id}/stream")
-async def stream_rpa_logs(job_id: str):
+async def stream_rpa_logs(job_id: str, request: Request):
     """
     Endpoint SSE para streaming de logs en tiempo real.
     """
-    from fastapi.responses import StreamingResponse
-    import asyncio
-    
-    if job_id not in rpa_jobs:
+    if not await asyncio.to_thread(get_job, job_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job no encontrado"
         )
     
+    heartbeat = max(1.0, float(settings.events_heartbeat_seconds))
+    
+    async def fetch(offset: int):
+        async with get_async_connection() as conn:
+            conn.row_factory = dict_row
+            cursor = await conn.execute("SELECT status FROM rpa_jobs WHERE job_id = %s", (job_id,))
+            job = await cursor.fetchone()
+            cursor = await conn.execute(
+                """
+                SELECT id AS offset, line
+                FROM rpa_job_log_lines
+                WHERE job_id = %s AND id > %s
+                ORDER BY id ASC
+                LIMIT 1000
+                """,
+                (job_id, offset),
+            )
+            lines = await cursor.fetchall()
+        return job, lines
+    
     async def log_generator():
-        last_line = 0
-        while True:
-            if job_id not in rpa_jobs:
-                yield f"data: {{\"type\": \"error\", \"message\": \"Job no encontrado\"}}\n\n"
-                break
-            
-            job = rpa_jobs[job_id]
-            logs = job.get("logs", [])
-            
-            # Enviar nuevas líneas
-            if len(logs) > last_line:
-                for line in logs[last_line:]:
-                    yield f"data: {json.dumps({'type': 'log', 'message': line.strip()})}\n\n"
-                last_line = len(logs)
-            
-            # Verificar si el job terminó
-            if job.get("status") in ["completed", "failed", "completed_with_errors"]:
-                yield f"data: {json.dumps({'type': 'status', 'status': job.get('status')})}\n\n"
-                break
-            
-            await asyncio.sleep(1)
+        offset = 0
+        async with event_broker.subscribe({"rpa_jobs"}) as queue:
+            while not await request.is_disconnected():
+                job, lines = await fetch(offset)
+                if not job:
+                    yield format_sse({"type": "error", "message": "Job no encontrado"})
+                    break
+                
+                # Enviar nuevas líneas
+                for item in lines:
+                    offset = item["offset"]
+                    yield format_sse({"type": "log", "message": item["line"].strip()})
+                if len(lines) == 1000:
+                    continue
+                
+                # Verificar si el job terminó
+                if job.get("status") in FINAL_STATUSES:
+                    yield format_sse({"type": "status", "status": job.get("status")})
+                    break
+                
+                # Espera el NOTIFY de este job (o el heartbeat)
+                try:
+                    while True:
+                        event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                        if event.get("job_id") == job_id:
+                            break
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
     
     return StreamingResponse(
         log_generator(),
@@ -755,6 +785,7 @@ async def stream_rpa_logs(job_id: str):
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
         }
     )
 
@@ -791,16 +822,15 @@ def extract_piezas_qualitas(
     job_id = str(uuid.uuid4())
     
     # Crear entrada inicial
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": "Extracción de piezas de Qualitas encolada",
         "started_at": None,
         "completed_at": None,
         "output": None,
-        "error": None,
-        "logs": []
-    }
+        "error": None
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
@@ -842,16 +872,18 @@ def run_piezas_extraction(job_id: str, max_ordenes: Optional[int], headless: boo
         log_line = f"[{timestamp}] {msg}\n"
         with open(log_file, "a", encoding="utf-8") as f:
             f.write(log_line)
-        # También guardar en memoria
-        if "logs" not in rpa_jobs[job_id]:
-            rpa_jobs[job_id]["logs"] = []
-        rpa_jobs[job_id]["logs"].append(log_line)
+        # También guardar en la base de datos (visible desde cualquier worker)
+        append_job_log(job_id, log_line.rstrip("\n"))
     
     if not script_path.exists():
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = f"Script no encontrado: {script_path}"
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        update_job(
+            job_id,
+            status="failed",
+            error=f"Script no encontrado: {script_path}",
+            completed_at=datetime.now().isoformat(),
+        )
         log_message(f"ERROR: Script no encontrado: {script_path}")
+        close_job_log(job_id)
         return
     
     try:
@@ -877,9 +909,7 @@ def run_piezas_extraction(job_id: str, max_ordenes: Optional[int], headless: boo
             log_message("Modo: VISUAL")
         
         # Ejecutar
-        rpa_jobs[job_id]["status"] = "running"
-        rpa_jobs[job_id]["started_at"] = datetime.now().isoformat()
-        rpa_jobs[job_id]["log_file"] = str(log_file)
+        update_job(job_id, status="running", started_at=datetime.now().isoformat(), log_file=str(log_file))
         log_message(f"Job iniciado: {job_id}")
         log_message(f"Comando: {' '.join(cmd)}")
         
@@ -903,9 +933,6 @@ def run_piezas_extraction(job_id: str, max_ordenes: Optional[int], headless: boo
                 if line:
                     full_output.append(line)
                     log_message(f"RPA: {line}")
-                    # Mantener solo últimas 100 líneas en memoria
-                    if len(rpa_jobs[job_id]["logs"]) > 100:
-                        rpa_jobs[job_id]["logs"] = rpa_jobs[job_id]["logs"][-100:]
         except Exception as e:
             log_message(f"Error leyendo output: {e}")
         
@@ -914,30 +941,28 @@ def run_piezas_extraction(job_id: str, max_ordenes: Optional[int], headless: boo
             process.wait(timeout=3600)  # 60 minutos timeout (1 hora) - muchas órdenes
         except subprocess.TimeoutExpired:
             process.kill()
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = "Timeout: El proceso tardó más de 30 minutos"
+            update_job(job_id, status="failed", error="Timeout: El proceso tardó más de 30 minutos")
             log_message("ERROR: Timeout de 30 minutos")
-            rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+            update_job(job_id, completed_at=datetime.now().isoformat())
+            close_job_log(job_id)
             return
         
         # Verificar resultado
         if process.returncode == 0:
-            rpa_jobs[job_id]["status"] = "completed"
-            rpa_jobs[job_id]["message"] = "Extracción de piezas completada"
+            update_job(job_id, status="completed", message="Extracción de piezas completada")
             log_message("✓ Proceso completado exitosamente")
         else:
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = f"Error en ejecución (código {process.returncode})"
+            update_job(job_id, status="failed", error=f"Error en ejecución (código {process.returncode})")
             log_message(f"✗ Error en ejecución (código {process.returncode})")
         
-        rpa_jobs[job_id]["output"] = "\n".join(full_output)
+        update_job(job_id, output="\n".join(full_output))
         
     except Exception as e:
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="failed", error=str(e))
         log_message(f"ERROR: {e}")
     
-    rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+    update_job(job_id, completed_at=datetime.now().isoformat())
+    close_job_log(job_id)
 
 
 # =====================================================
@@ -1034,16 +1059,18 @@ def run_chubb_piezas_extraction(job_id: str, headless: bool, max_expedientes: Op
         log_line = f"[{timestamp}] {msg}\n"
         with open(log_file, "a", encoding="utf-8") as f:
             f.write(log_line)
-        # También guardar en memoria
-        if "logs" not in rpa_jobs[job_id]:
-            rpa_jobs[job_id]["logs"] = []
-        rpa_jobs[job_id]["logs"].append(log_line)
+        # También guardar en la base de datos (visible desde cualquier worker)
+        append_job_log(job_id, log_line.rstrip("\n"))
     
     if not script_path.exists():
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = f"Script no encontrado: {script_path}"
-        rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        update_job(
+            job_id,
+            status="failed",
+            error=f"Script no encontrado: {script_path}",
+            completed_at=datetime.now().isoformat(),
+        )
         log_message(f"ERROR: Script no encontrado: {script_path}")
+        close_job_log(job_id)
         return
     
     try:
@@ -1068,11 +1095,14 @@ def run_chubb_piezas_extraction(job_id: str, headless: bool, max_expedientes: Op
         log_message(f"Fecha desde: {fecha_desde}")
         
         # Ejecutar
-        rpa_jobs[job_id]["status"] = "running"
-        rpa_jobs[job_id]["started_at"] = datetime.now().isoformat()
-        rpa_jobs[job_id]["log_file"] = str(log_file)
-        rpa_jobs[job_id]["seguro"] = "CHUBB"
-        rpa_jobs[job_id]["tipo"] = "piezas"
+        update_job(
+            job_id,
+            status="running",
+            started_at=datetime.now().isoformat(),
+            log_file=str(log_file),
+            seguro="CHUBB",
+            tipo="piezas",
+        )
         log_message(f"Job iniciado: {job_id}")
         log_message(f"Comando: {' '.join(cmd)}")
         
@@ -1096,9 +1126,6 @@ def run_chubb_piezas_extraction(job_id: str, headless: bool, max_expedientes: Op
                 if line:
                     full_output.append(line)
                     log_message(f"RPA: {line}")
-                    # Mantener solo últimas 100 líneas en memoria
-                    if len(rpa_jobs[job_id]["logs"]) > 100:
-                        rpa_jobs[job_id]["logs"] = rpa_jobs[job_id]["logs"][-100:]
         except Exception as e:
             log_message(f"Error leyendo output: {e}")
         
@@ -1107,17 +1134,16 @@ def run_chubb_piezas_extraction(job_id: str, headless: bool, max_expedientes: Op
             process.wait(timeout=3600)  # 1 hora timeout (muchos expedientes)
         except subprocess.TimeoutExpired:
             process.kill()
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = "Timeout: El proceso tardó más de 1 hora"
+            update_job(job_id, status="failed", error="Timeout: El proceso tardó más de 1 hora")
             log_message("ERROR: Timeout de 1 hora")
-            rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+            update_job(job_id, completed_at=datetime.now().isoformat())
+            close_job_log(job_id)
             return
         
         # Verificar resultado
         piezas_count = 0
         if process.returncode == 0:
-            rpa_jobs[job_id]["status"] = "completed"
-            rpa_jobs[job_id]["message"] = "Extracción de piezas CHUBB completada"
+            update_job(job_id, status="completed", message="Extracción de piezas CHUBB completada")
             log_message("✓ Proceso completado exitosamente")
             
             # Intentar extraer cantidad de piezas del output
@@ -1132,45 +1158,39 @@ def run_chubb_piezas_extraction(job_id: str, headless: bool, max_expedientes: Op
             except:
                 pass
         else:
-            rpa_jobs[job_id]["status"] = "failed"
-            rpa_jobs[job_id]["error"] = f"Error en ejecución (código {process.returncode})"
+            update_job(job_id, status="failed", error=f"Error en ejecución (código {process.returncode})")
             log_message(f"✗ Error en ejecución (código {process.returncode})")
         
-        rpa_jobs[job_id]["output"] = "\n".join(full_output)
+        update_job(job_id, output="\n".join(full_output))
         
         # Actualizar log de ejecución en BD
         try:
-            if job_id in piezas_execution_logs:
-                log_id = piezas_execution_logs[job_id]
+            log_id = (get_job(job_id) or {}).get("piezas_log_id")
+            if log_id:
                 from app.modules.administracion.routes import log_piezas_execution_complete, log_piezas_execution_failed
                 
-                if rpa_jobs[job_id]["status"] == "completed":
+                if process.returncode == 0:
                     log_piezas_execution_complete(log_id, piezas_count, {"job_id": job_id})
                 else:
-                    error_msg = rpa_jobs[job_id].get("error", "Error desconocido")
-                    log_piezas_execution_failed(log_id, error_msg)
-                
-                # Limpiar del diccionario
-                del piezas_execution_logs[job_id]
+                    log_piezas_execution_failed(log_id, f"Error en ejecución (código {process.returncode})")
         except Exception as e:
             logger.warning(f"[CHUBB Piezas] No se pudo actualizar log de ejecución: {e}")
         
     except Exception as e:
-        rpa_jobs[job_id]["status"] = "failed"
-        rpa_jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="failed", error=str(e))
         log_message(f"ERROR: {e}")
         
         # Actualizar log de ejecución en BD (fallo)
         try:
-            if job_id in piezas_execution_logs:
-                log_id = piezas_execution_logs[job_id]
+            log_id = (get_job(job_id) or {}).get("piezas_log_id")
+            if log_id:
                 from app.modules.administracion.routes import log_piezas_execution_failed
                 log_piezas_execution_failed(log_id, str(e))
-                del piezas_execution_logs[job_id]
         except:
             pass
     
-    rpa_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+    update_job(job_id, completed_at=datetime.now().isoformat())
+    close_job_log(job_id)
 
 
 @router.post("/chubb/piezas", response_model=RPAResponse)
@@ -1194,16 +1214,15 @@ def extract_piezas_chubb(
     job_id = str(uuid.uuid4())
     
     # Registrar inicio de ejecución manual
+    log_id = None
     try:
         from app.modules.administracion.routes import log_piezas_execution_start
         log_id = log_piezas_execution_start('CHUBB', 'manual', job_id)
-        # Guardar el log_id en el job para actualizarlo después
-        piezas_execution_logs[job_id] = log_id
     except Exception as e:
         logger.warning(f"[CHUBB Piezas] No se pudo registrar log de ejecución: {e}")
     
     # Crear entrada inicial
-    rpa_jobs[job_id] = {
+    create_job({
         "job_id": job_id,
         "status": "queued",
         "message": "Extracción de piezas de CHUBB encolada",
@@ -1211,10 +1230,11 @@ def extract_piezas_chubb(
         "completed_at": None,
         "output": None,
         "error": None,
-        "logs": [],
         "seguro": "CHUBB",
-        "tipo": "piezas"
-    }
+        "tipo": "piezas",
+        # log_id de rpa_piezas_execution_log para actualizarlo al terminar
+        "piezas_log_id": log_id
+    })
     
     # Ejecutar en background
     background_tasks.add_task(
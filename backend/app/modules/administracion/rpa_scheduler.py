@@ -16,6 +16,7 @@ import logging
 import threading
 import time
 from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 from typing import Optional, Dict, Any, Tuple
 
@@ -23,6 +24,7 @@ import pytz
 from app.modules.administracion.rpa_queue import (
     create_task, get_task, update_task, TaskType, TaskStatus
 )
+from app.core.services import service_registry
 
 # Intentar importar helper de credenciales
 try:
@@ -50,6 +52,11 @@ SCHEDULER_TO_SEGURO_MAP = {
     "chubb": "CHUBB"
 }
 
+SCHEDULER_TASK_TYPES = {
+    "qualitas": TaskType.QUALITAS_EXTRACT,
+    "chubb": TaskType.CHUBB_EXTRACT
+}
+
 # Estado del scheduler
 _schedulers = {}  # Diccionario para múltiples schedulers
 
@@ -83,6 +90,7 @@ class RPAScheduler:
         self._next_run_time: Optional[datetime] = None
         self._running = False
         self._autosync_enabled = False  # Se actualiza desde BD
+        self._restart_token: Optional[str] = None  # Último reinicio pedido (ver apply_scheduler_control)
         
     def start(self):
         """Inicia el scheduler en un thread separado."""
@@ -303,15 +311,10 @@ def start_scheduler(name: str = "qualitas", interval_hours: int = DEFAULT_INTERV
     """Inicia un scheduler específico."""
     global _schedulers
     
-    task_type_map = {
-        "qualitas": TaskType.QUALITAS_EXTRACT,
-        "chubb": TaskType.CHUBB_EXTRACT
-    }
-    
-    if name not in task_type_map:
-        raise ValueError(f"Scheduler desconocido: {name}. Opciones: {list(task_type_map.keys())}")
+    if name not in SCHEDULER_TASK_TYPES:
+        raise ValueError(f"Scheduler desconocido: {name}. Opciones: {list(SCHEDULER_TASK_TYPES.keys())}")
     
-    scheduler = get_or_create_scheduler(name, task_type_map[name], interval_hours)
+    scheduler = get_or_create_scheduler(name, SCHEDULER_TASK_TYPES[name], interval_hours)
     scheduler.start()
     
     return scheduler
@@ -330,13 +333,19 @@ def stop_scheduler(name: str = None):
 
 
 def force_run_scheduler(name: str = "qualitas") -> str:
-    """Fuerza una ejecución inmediata."""
-    global _schedulers
-    
-    if name not in _schedulers:
-        start_scheduler(name)
+    """Fuerza una ejecución inmediata. Solo encola la tarea: no arranca el scheduler en este proceso."""
+    if name not in SCHEDULER_TASK_TYPES:
+        raise ValueError(f"Scheduler desconocido: {name}. Opciones: {list(SCHEDULER_TASK_TYPES.keys())}")
     
-    return _schedulers[name].force_run()
+    logger.info(f"[Scheduler {name}] Ejecución forzada solicitada")
+    return create_task(
+        SCHEDULER_TASK_TYPES[name],
+        {
+            "auto_retry": True,
+            "forced": True,
+            "scheduled_at": _now_mazatlan().isoformat()
+        }
+    )
 
 
 def get_scheduler_status(name: str = None) -> Dict[str, Any]:
@@ -359,7 +368,42 @@ def get_scheduler_status(name: str = None) -> Dict[str, Any]:
     }
 
 
-# Iniciar schedulers automáticamente al importar el módulo
+def control_name(name: str) -> str:
+    """Nombre del control en service_registry para el scheduler `name`."""
+    return f"rpa_scheduler:{name}"
+
+
+def apply_scheduler_control(name: str, desired: Dict[str, Any]) -> None:
+    """
+    Aplica en el proceso líder lo pedido desde /admin/rpa-queue/scheduler.
+    
+    desired: {"running": bool, "interval_hours": int, "restart": token}
+    """
+    scheduler = _schedulers.get(name)
+    if not desired.get("running", True):
+        if scheduler:
+            scheduler.stop()
+        return
+    
+    interval_hours = int(desired.get("interval_hours") or DEFAULT_INTERVAL_HOURS)
+    restart = desired.get("restart")
+    if (
+        scheduler
+        and scheduler._running
+        and scheduler._configured_interval == interval_hours
+        and scheduler._restart_token == restart
+    ):
+        return
+    
+    if scheduler:
+        scheduler.stop()
+    # Instancia nueva: el hilo anterior puede seguir en su espera y saldrá solo
+    scheduler = RPAScheduler(name, SCHEDULER_TASK_TYPES[name], interval_hours)
+    scheduler._restart_token = restart
+    _schedulers[name] = scheduler
+    scheduler.start()
+
+
 def init_schedulers():
     """Inicializa los schedulers según la configuración de la BD."""
     try:
@@ -395,5 +439,13 @@ def init_schedulers():
     except Exception as e:
         logger.error(f"[Scheduler] Error al iniciar schedulers: {e}")
 
-# Inicializar al importar el módulo
-init_schedulers()
+
+# Los arranca el lifespan de la API en el proceso líder (app.core.services)
+service_registry.register("rpa_schedulers", init_schedulers, stop_scheduler)
+for _name in SCHEDULER_TASK_TYPES:
+    service_registry.register_control(
+        control_name(_name),
+        partial(apply_scheduler_control, _name),
+        partial(get_scheduler_status, _name),
+    )
+
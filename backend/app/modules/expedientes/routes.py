@@ -1,15 +1,16 @@
 import re
 import json
-from io import BytesIO
+from functools import partial
 from pathlib import Path
 from uuid import uuid4
-from zipfile import ZIP_DEFLATED, ZipFile
 
-from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, Query, UploadFile, status
 from psycopg.rows import dict_row
 
+from app.core import blob_store, media_derivatives, storage
 from app.core.db import get_connection
+from app.core.uploads import save_upload
+from app.core.zipstream import ZipSource, zip_response
 
 
 router = APIRouter(prefix="/expedientes", tags=["expedientes"])
@@ -134,14 +135,13 @@ def copy_paquete_media_to_expediente(conn, reporte_siniestro: str, paquete_id: i
     """
     from pathlib import Path
     from uuid import uuid4
-    import shutil
     
     conn.row_factory = dict_row
     
     # Obtener las fotos del paquete
     media_rows = conn.execute(
         """
-        SELECT id, media_type, file_path, original_name, mime_type, file_size
+        SELECT id, media_type, file_path, original_name, mime_type, file_size, derivatives, blob_sha256
         FROM paquetes_piezas_media
         WHERE paquete_id = %s AND media_type = 'photo'
         """,
@@ -167,10 +167,10 @@ def copy_paquete_media_to_expediente(conn, reporte_siniestro: str, paquete_id: i
         source_path = paquetes_root / Path(media["file_path"]).name
         
         if not source_path.exists():
-            # Intentar con la ruta completa
-            source_path = Path(__file__).resolve().parent.parent.parent / str(media["file_path"]).lstrip("/")
+            # Intentar con la ruta completa (o bajarla del bucket)
+            source_path = storage.local_file(media["file_path"])
         
-        if not source_path.exists():
+        if source_path is None:
             continue
         
         # Generar nombre único para el archivo
@@ -178,14 +178,17 @@ def copy_paquete_media_to_expediente(conn, reporte_siniestro: str, paquete_id: i
         filename = f"recepcion_piezas_{uuid4().hex}{extension}"
         dest_path = media_root / filename
         
-        # Copiar archivo
+        # Hard link al mismo contenido (copia si el volumen no lo permite)
         try:
-            shutil.copy2(source_path, dest_path)
+            blob_store.link_or_copy(source_path, dest_path)
         except Exception:
             continue
+        storage.publish(dest_path)
         
         file_size = dest_path.stat().st_size
         relative_path = f"/media/expedientes/{reporte_siniestro}/Recepción Piezas/{filename}"
+        # Si la foto del paquete aún no tiene derivados, el backfill los genera después
+        derivatives = media_derivatives.copy_derivatives(media.get("derivatives"), dest_path, relative_path)
         
         # Crear registro en expediente_archivos
         conn.execute(
@@ -198,9 +201,11 @@ def copy_paquete_media_to_expediente(conn, reporte_siniestro: str, paquete_id: i
                 archivo_nombre,
                 archivo_size,
                 mime_type,
-                anotaciones
+                anotaciones,
+                derivatives,
+                blob_sha256
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb, %s::jsonb, %s)
             """,
             (
                 expediente_id,
@@ -210,6 +215,8 @@ def copy_paquete_media_to_expediente(conn, reporte_siniestro: str, paquete_id: i
                 media["original_name"] or f"foto_paquete_{media['id']}",
                 file_size,
                 media["mime_type"] or "image/jpeg",
+                json.dumps(derivatives),
+                media.get("blob_sha256"),
             ),
         )
         
@@ -261,7 +268,7 @@ def update_expediente(expediente_id: int, payload: dict):
         if current_report != reporte_siniestro:
             archivo_rows = conn.execute(
                 """
-                SELECT id, archivo_path
+                SELECT id, archivo_path, derivatives
                 FROM expediente_archivos
                 WHERE expediente_id = %s
                 """,
@@ -280,19 +287,25 @@ def update_expediente(expediente_id: int, payload: dict):
                     )
                 source_dir.rename(target_dir)
 
+            old_prefix = f"/media/expedientes/{current_report}/"
+            new_prefix = f"/media/expedientes/{reporte_siniestro}/"
             for row in archivo_rows:
                 current_path = str(row.get("archivo_path") or "").strip()
                 if not current_path:
                     continue
-                next_path = current_path.replace(
-                    f"/media/expedientes/{current_report}/",
-                    f"/media/expedientes/{reporte_siniestro}/",
-                    1,
-                )
+                next_path = current_path.replace(old_prefix, new_prefix, 1)
+                derivatives = {
+                    name: value.replace(old_prefix, new_prefix, 1) if isinstance(value, str) else value
+                    for name, value in (row.get("derivatives") or {}).items()
+                }
                 conn.execute(
-                    "UPDATE expediente_archivos SET archivo_path = %s WHERE id = %s",
-                    (next_path, row["id"]),
+                    "UPDATE expediente_archivos SET archivo_path = %s, derivatives = %s::jsonb WHERE id = %s",
+                    (next_path, json.dumps(derivatives), row["id"]),
                 )
+                storage.move(current_path, next_path)
+                for name, value in (row.get("derivatives") or {}).items():
+                    if isinstance(value, str):
+                        storage.move(value, derivatives[name])
 
         updated = conn.execute(
             """
@@ -347,7 +360,7 @@ def delete_expediente(expediente_id: int):
 
         archivos = conn.execute(
             """
-            SELECT id, archivo_path
+            SELECT id, archivo_path, blob_sha256
             FROM expediente_archivos
             WHERE expediente_id = %s
             """,
@@ -362,14 +375,10 @@ def delete_expediente(expediente_id: int):
         relative_path = str(row.get("archivo_path") or "").strip()
         if not relative_path:
             continue
-        disk_path = app_root / relative_path.lstrip("/")
-        if disk_path.exists() and disk_path.is_file():
-            try:
-                disk_path.unlink()
-            except Exception:
-                pass
+        blob_store.release(app_root / relative_path.lstrip("/"), row.get("blob_sha256"))
 
     media_folder = _expedientes_media_root() / str(expediente["reporte_siniestro"] or "").strip()
+    storage.unpublish_dir(media_folder)
     if media_folder.exists() and media_folder.is_dir():
         for child in sorted(media_folder.rglob("*"), reverse=True):
             try:
@@ -394,8 +403,6 @@ def get_expediente(reporte_siniestro: str):
         raise HTTPException(status_code=400, detail="reporte_siniestro requerido")
 
     with get_connection() as conn:
-        _ensure_categoria_column(conn)
-        _ensure_anotaciones_column(conn)
         conn.row_factory = dict_row
         expediente = conn.execute(
             "SELECT id, reporte_siniestro, created_at FROM expedientes WHERE reporte_siniestro = %s",
@@ -415,7 +422,8 @@ def get_expediente(reporte_siniestro: str):
                 archivo_size,
                 mime_type,
                 created_at,
-                COALESCE(anotaciones, '[]'::jsonb) AS anotaciones
+                COALESCE(anotaciones, '[]'::jsonb) AS anotaciones,
+                derivatives
             FROM expediente_archivos
             WHERE expediente_id = %s
             ORDER BY created_at DESC
@@ -429,6 +437,7 @@ def get_expediente(reporte_siniestro: str):
 @router.post("/{reporte_siniestro}/archivos", status_code=status.HTTP_201_CREATED)
 def upload_expediente_archivo(
     reporte_siniestro: str,
+    background_tasks: BackgroundTasks,
     tipo: str = Form(...),
     categoria: str = Form(default="otros"),
     file: UploadFile = File(...),
@@ -452,15 +461,11 @@ def upload_expediente_archivo(
     filename = f"{tipo}_{uuid4().hex}{extension}"
     file_path = media_root / filename
 
-    with file_path.open("wb") as buffer:
-        buffer.write(file.file.read())
-
-    file_size = file_path.stat().st_size
+    stored = save_upload(file, file_path)
+    file_size = stored.size
     relative_path = f"/media/expedientes/{reporte_siniestro}/{tipo}/{filename}"
 
     with get_connection() as conn:
-        _ensure_categoria_column(conn)
-        _ensure_anotaciones_column(conn)
         expediente_id = _ensure_expediente(conn, reporte_siniestro)
         conn.execute(
             """
@@ -472,9 +477,10 @@ def upload_expediente_archivo(
                 archivo_nombre,
                 archivo_size,
                 mime_type,
-                anotaciones
+                anotaciones,
+                blob_sha256
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb, %s)
             """,
             (
                 expediente_id,
@@ -484,9 +490,13 @@ def upload_expediente_archivo(
                 file.filename,
                 file_size,
                 file.content_type,
+                stored.sha256,
             ),
         )
 
+    if media_derivatives.is_image_path(relative_path):
+        background_tasks.add_task(media_derivatives.generate_derivatives, "expediente_archivos", relative_path)
+
     return {
         "reporte_siniestro": reporte_siniestro,
         "tipo": tipo,
@@ -503,7 +513,6 @@ def update_expediente_archivo_anotaciones(archivo_id: int, payload: dict):
     anotaciones = _sanitize_annotations(payload.get("anotaciones"))
 
     with get_connection() as conn:
-        _ensure_anotaciones_column(conn)
         row = conn.execute(
             "SELECT id FROM expediente_archivos WHERE id = %s LIMIT 1",
             (archivo_id,),
@@ -525,7 +534,7 @@ def delete_expediente_archivo(archivo_id: int):
         conn.row_factory = dict_row
         row = conn.execute(
             """
-            SELECT id, archivo_path
+            SELECT id, archivo_path, derivatives, blob_sha256
             FROM expediente_archivos
             WHERE id = %s
             LIMIT 1
@@ -540,9 +549,8 @@ def delete_expediente_archivo(archivo_id: int):
     relative_path = (row.get("archivo_path") or "").strip()
     if relative_path:
         app_root = Path(__file__).resolve().parent.parent.parent
-        disk_path = app_root / relative_path.lstrip("/")
-        if disk_path.exists() and disk_path.is_file():
-            disk_path.unlink()
+        blob_store.release(app_root / relative_path.lstrip("/"), row.get("blob_sha256"))
+    media_derivatives.remove_derivative_files(row.get("derivatives"))
 
     return None
 
@@ -575,34 +583,22 @@ def download_expediente_zip(reporte_siniestro: str):
     if not rows:
         raise HTTPException(status_code=404, detail="No hay archivos para descargar")
 
-    app_root = Path(__file__).resolve().parent.parent.parent
-    buffer = BytesIO()
-    added = 0
-
-    with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as zip_file:
-        for index, row in enumerate(rows, start=1):
-            relative_path = (row.get("archivo_path") or "").strip()
-            if not relative_path:
-                continue
-
-            disk_path = app_root / relative_path.lstrip("/")
-            if not disk_path.exists() or not disk_path.is_file():
-                continue
-
-            original_name = row.get("archivo_nombre") or disk_path.name
-            safe_original = _safe_token(original_name, fallback=f"archivo_{index}")
-            safe_tipo = _safe_token(row.get("tipo") or "archivo", fallback="archivo")
-            arcname = f"{index:03d}_{safe_tipo}_{safe_original}"
-            zip_file.write(disk_path, arcname=arcname)
-            added += 1
-
-    if added == 0:
+    entries: list[tuple[ZipSource, str]] = []
+
+    for index, row in enumerate(rows, start=1):
+        relative_path = (row.get("archivo_path") or "").strip()
+        if not storage.has_media(relative_path):
+            continue
+
+        original_name = row.get("archivo_nombre") or Path(relative_path).name
+        safe_original = _safe_token(original_name, fallback=f"archivo_{index}")
+        safe_tipo = _safe_token(row.get("tipo") or "archivo", fallback="archivo")
+        arcname = f"{index:03d}_{safe_tipo}_{safe_original}"
+        # Se abre al escribir la entrada: con S3 se lee del bucket sin bajarlo a la caché
+        entries.append((partial(storage.open_media, relative_path), arcname))
+
+    if not entries:
         raise HTTPException(status_code=404, detail="No se encontraron archivos físicos para comprimir")
 
-    buffer.seek(0)
     zip_name = f"Expediente_{_safe_token(expediente['reporte_siniestro'], fallback='sin_folio')}.zip"
-    return StreamingResponse(
-        buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{zip_name}"'},
-    )
+    return zip_response(entries, zip_name)
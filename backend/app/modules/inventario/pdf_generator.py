@@ -30,19 +30,26 @@ from reportlab.platypus import (
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 
 
+_FONTS = None
+
+
 def _register_fonts():
-    """Registra las fuentes necesarias."""
+    """Registra las fuentes necesarias (una vez por proceso)."""
+    global _FONTS
+    if _FONTS is not None:
+        return _FONTS
     try:
         pdfmetrics.registerFont(TTFont('CenturyGothic', 'GOTHIC.TTF'))
         pdfmetrics.registerFont(TTFont('CenturyGothic-Bold', 'GOTHICB.TTF'))
-        return 'CenturyGothic', 'CenturyGothic-Bold'
+        _FONTS = ('CenturyGothic', 'CenturyGothic-Bold')
     except:
         try:
             pdfmetrics.registerFont(TTFont('CenturyGothic', '/usr/share/fonts/truetype/msttcorefonts/Century_Gothic.ttf'))
             pdfmetrics.registerFont(TTFont('CenturyGothic-Bold', '/usr/share/fonts/truetype/msttcorefonts/Century_Gothic_Bold.ttf'))
-            return 'CenturyGothic', 'CenturyGothic-Bold'
+            _FONTS = ('CenturyGothic', 'CenturyGothic-Bold')
         except:
-            return 'Helvetica', 'Helvetica-Bold'
+            _FONTS = ('Helvetica', 'Helvetica-Bold')
+    return _FONTS
 
 
 def _draw_header(canvas, doc, logo_path=None):
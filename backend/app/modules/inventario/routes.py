@@ -1,5 +1,6 @@
 import asyncio
 import io
+import json
 import os
 from datetime import datetime
 from pathlib import Path
@@ -11,7 +12,9 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from psycopg.rows import dict_row
 
+from app.core import blob_store, media_derivatives, rendering, storage
 from app.core.db import get_connection
+from app.core.uploads import save_upload
 from app.modules.expedientes.routes import copy_paquete_media_to_expediente
 from app.modules.inventario.pdf_generator import generar_pdf_inventario_paquete
 
@@ -186,6 +189,7 @@ class PaquetePiezaMedia(BaseModel):
     file_size: Optional[int] = None
     pieza_asignada_id: Optional[int] = None
     es_global: bool = False
+    derivatives: dict[str, Any] = Field(default_factory=dict)
     created_at: datetime
 
 
@@ -949,6 +953,7 @@ def _list_paquete_media(conn, paquete_id: int) -> List[dict[str, Any]]:
             file_size,
             pieza_asignada_id,
             es_global,
+            derivatives,
             created_at
         FROM paquetes_piezas_media
         WHERE paquete_id = %s
@@ -1045,7 +1050,6 @@ def get_proveedores(
     """Obtiene el listado de proveedores"""
     try:
         with get_connection() as conn:
-            ensure_proveedores_schema(conn)
             query = "SELECT * FROM proveedores WHERE 1=1"
             params = []
             
@@ -1077,7 +1081,6 @@ def get_proveedor(proveedor_id: int):
     """Obtiene un proveedor por su ID"""
     try:
         with get_connection() as conn:
-            ensure_proveedores_schema(conn)
             with conn.cursor() as cur:
                 cur.execute("SELECT * FROM proveedores WHERE id = %s", (proveedor_id,))
                 row = cur.fetchone()
@@ -1096,7 +1099,6 @@ def create_proveedor(proveedor: ProveedorBase):
     """Crea un nuevo proveedor"""
     try:
         with get_connection() as conn:
-            ensure_proveedores_schema(conn)
             fuente = _normalize_proveedor_fuente(proveedor.fuente)
             nombre = str(proveedor.nombre or "").strip()
             if not nombre:
@@ -1135,7 +1137,6 @@ def update_proveedor(proveedor_id: int, proveedor: ProveedorBase):
     """Actualiza un proveedor existente"""
     try:
         with get_connection() as conn:
-            ensure_proveedores_schema(conn)
             fuente = _normalize_proveedor_fuente(proveedor.fuente)
             nombre = str(proveedor.nombre or "").strip()
             if not nombre:
@@ -1191,7 +1192,6 @@ def delete_proveedor(proveedor_id: int):
     """Elimina un proveedor existente"""
     try:
         with get_connection() as conn:
-            ensure_proveedores_schema(conn)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM proveedores WHERE id = %s RETURNING id", (proveedor_id,))
                 row = cur.fetchone()
@@ -1475,7 +1475,6 @@ def get_paquetes(
 ):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         query = """
             SELECT
                 p.id,
@@ -1558,7 +1557,6 @@ def validate_paquete_report(
 ):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
 
         reporte = str(numero_reporte_siniestro or "").strip()
         
@@ -1613,7 +1611,6 @@ def suggest_paquete_relaciones(
 ):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
 
         reporte = str(numero_reporte_siniestro or "").strip()
         orden = _find_orden_admision_by_reporte(conn, reporte)
@@ -1630,7 +1627,6 @@ def suggest_paquete_relaciones(
 @router.get("/paquetes/{paquete_id}", response_model=PaquetePiezasDetail)
 def get_paquete(paquete_id: int):
     with get_connection() as conn:
-        ensure_paquetes_piezas_tables(conn)
         return _build_paquete_detail(conn, paquete_id)
 
 
@@ -1640,7 +1636,6 @@ def create_paquete(payload: PaquetePiezasCreate):
 
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _sync_paquetes_piezas_folio_sequence(conn)
 
         reporte_input = str(payload.numero_reporte_siniestro or "").strip()
@@ -1715,7 +1710,6 @@ def create_paquete(payload: PaquetePiezasCreate):
 def update_paquete(paquete_id: int, payload: PaquetePiezasUpdate):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
 
         updates = payload.model_dump(exclude_unset=True)
@@ -1832,7 +1826,6 @@ def completar_paquete(paquete_id: int):
     """
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         
         # Obtener información del paquete
@@ -1898,11 +1891,10 @@ def completar_paquete(paquete_id: int):
 def delete_paquete(paquete_id: int):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         media_rows = conn.execute(
             """
-            SELECT file_path
+            SELECT DISTINCT file_path, blob_sha256
             FROM paquetes_piezas_media
             WHERE paquete_id = %s
             """,
@@ -1912,14 +1904,11 @@ def delete_paquete(paquete_id: int):
 
     app_root = Path(__file__).resolve().parent.parent.parent
     for row in media_rows:
-        disk_path = app_root / str(row.get("file_path") or "").lstrip("/")
-        if disk_path.exists() and disk_path.is_file():
-            try:
-                disk_path.unlink()
-            except Exception:
-                pass
+        if row.get("file_path"):
+            blob_store.release(app_root / str(row["file_path"]).lstrip("/"), row.get("blob_sha256"))
 
     package_dir = _paquetes_media_root() / str(paquete_id)
+    storage.unpublish_dir(package_dir)
     if package_dir.exists() and package_dir.is_dir():
         for file_path in package_dir.iterdir():
             if file_path.is_file():
@@ -1938,7 +1927,6 @@ def delete_paquete(paquete_id: int):
 @router.get("/paquetes/{paquete_id}/relaciones", response_model=List[PaquetePiezaRelacion])
 def list_paquete_relaciones(paquete_id: int):
     with get_connection() as conn:
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         return _list_paquete_relaciones(conn, paquete_id)
 
@@ -1954,7 +1942,6 @@ def create_paquete_relacion(paquete_id: int, payload: PaquetePiezaRelacionCreate
 
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         relacion = conn.execute(
             """
@@ -2027,7 +2014,6 @@ def update_paquete_relacion(relacion_id: int, payload: PaquetePiezaRelacionUpdat
 
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         
         # Obtener bitacora_pieza_id antes de actualizar (para sincronización)
         recibida_nueva = updates.get("recibida")
@@ -2094,7 +2080,6 @@ def update_paquete_relacion(relacion_id: int, payload: PaquetePiezaRelacionUpdat
 @router.delete("/paquetes/relaciones/{relacion_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_paquete_relacion(relacion_id: int):
     with get_connection() as conn:
-        ensure_paquetes_piezas_tables(conn)
         deleted = conn.execute(
             """
             DELETE FROM paquetes_piezas_relaciones
@@ -2111,6 +2096,7 @@ def delete_paquete_relacion(relacion_id: int):
 @router.post("/paquetes/{paquete_id}/media", response_model=PaquetePiezaMedia, status_code=status.HTTP_201_CREATED)
 def upload_paquete_media(
     paquete_id: int,
+    background_tasks: BackgroundTasks,
     media_type: str = Query("photo", description="Tipo de archivo: photo o document"),
     file: UploadFile = File(...),
 ):
@@ -2118,21 +2104,20 @@ def upload_paquete_media(
         raise HTTPException(status_code=400, detail="media_type inválido")
 
     with get_connection() as conn:
-        conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
 
-        media_root = _paquetes_media_root() / str(paquete_id)
-        media_root.mkdir(parents=True, exist_ok=True)
+    # El archivo se guarda sin retener una conexión del pool
+    media_root = _paquetes_media_root() / str(paquete_id)
+    media_root.mkdir(parents=True, exist_ok=True)
 
-        extension = Path(file.filename or "").suffix.lower()
-        filename = f"{media_type}_{uuid4().hex}{extension}"
-        file_path = media_root / filename
-        file_bytes = file.file.read()
-        with file_path.open("wb") as buffer:
-            buffer.write(file_bytes)
+    extension = Path(file.filename or "").suffix.lower()
+    filename = f"{media_type}_{uuid4().hex}{extension}"
+    file_path = media_root / filename
+    stored = save_upload(file, file_path)
 
-        relative_path = f"/media/paquetes_piezas/{paquete_id}/{filename}"
+    relative_path = f"/media/paquetes_piezas/{paquete_id}/{filename}"
+    with get_connection() as conn:
+        conn.row_factory = dict_row
         media = conn.execute(
             """
             INSERT INTO paquetes_piezas_media (
@@ -2141,9 +2126,10 @@ def upload_paquete_media(
                 file_path,
                 original_name,
                 mime_type,
-                file_size
+                file_size,
+                blob_sha256
             )
-            VALUES (%s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING
                 id,
                 paquete_id,
@@ -2152,6 +2138,7 @@ def upload_paquete_media(
                 original_name,
                 mime_type,
                 file_size,
+                derivatives,
                 created_at
             """,
             (
@@ -2160,16 +2147,19 @@ def upload_paquete_media(
                 relative_path,
                 file.filename,
                 file.content_type,
-                len(file_bytes),
+                stored.size,
+                stored.sha256,
             ),
         ).fetchone()
-        return media
+
+    if media_type == "photo" and media_derivatives.is_image_path(relative_path):
+        background_tasks.add_task(media_derivatives.generate_derivatives, "paquetes_piezas_media", relative_path)
+    return media
 
 
 @router.get("/paquetes/{paquete_id}/media", response_model=List[PaquetePiezaMedia])
 def list_paquete_media(paquete_id: int):
     with get_connection() as conn:
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         return _list_paquete_media(conn, paquete_id)
 
@@ -2178,25 +2168,28 @@ def list_paquete_media(paquete_id: int):
 def delete_paquete_media(media_id: int):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         media = conn.execute(
             """
             DELETE FROM paquetes_piezas_media
             WHERE id = %s
-            RETURNING id, file_path
+            RETURNING id, file_path, derivatives, blob_sha256
             """,
             (media_id,),
         ).fetchone()
         if not media:
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
+        # Asignar una foto a piezas duplica la fila con el mismo archivo
+        shared = conn.execute(
+            "SELECT 1 FROM paquetes_piezas_media WHERE file_path = %s LIMIT 1",
+            (media.get("file_path"),),
+        ).fetchone()
 
+    if shared:
+        return None
     app_root = Path(__file__).resolve().parent.parent.parent
-    disk_path = app_root / str(media.get("file_path") or "").lstrip("/")
-    if disk_path.exists() and disk_path.is_file():
-        try:
-            disk_path.unlink()
-        except Exception:
-            pass
+    if media.get("file_path"):
+        blob_store.release(app_root / str(media["file_path"]).lstrip("/"), media.get("blob_sha256"))
+    media_derivatives.remove_derivative_files(media.get("derivatives"))
     return None
 
 
@@ -2212,7 +2205,6 @@ def asignar_foto_a_pieza(
     """
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         
         # Verificar que el media existe
         media = conn.execute(
@@ -2260,7 +2252,7 @@ def asignar_foto_a_pieza(
             # Obtener datos completos del media original
             media_original = conn.execute(
                 """
-                SELECT paquete_id, file_path, original_name, mime_type, file_size 
+                SELECT paquete_id, file_path, original_name, mime_type, file_size, derivatives, blob_sha256
                 FROM paquetes_piezas_media WHERE id = %s
                 """,
                 (media_id,)
@@ -2271,11 +2263,11 @@ def asignar_foto_a_pieza(
                 """
                 INSERT INTO paquetes_piezas_media (
                     paquete_id, media_type, file_path, original_name, 
-                    mime_type, file_size, pieza_asignada_id, es_global
+                    mime_type, file_size, pieza_asignada_id, es_global, derivatives, blob_sha256
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s)
                 RETURNING id, paquete_id, media_type, file_path, original_name, mime_type, file_size,
-                          pieza_asignada_id, es_global, created_at
+                          pieza_asignada_id, es_global, derivatives, created_at
                 """,
                 (
                     media_original["paquete_id"],
@@ -2285,7 +2277,9 @@ def asignar_foto_a_pieza(
                     media_original["mime_type"],
                     media_original["file_size"],
                     pieza_id,
-                    es_global if es_global is not None else False
+                    es_global if es_global is not None else False,
+                    json.dumps(media_original["derivatives"] or {}),
+                    media_original["blob_sha256"],
                 )
             ).fetchone()
             
@@ -2313,7 +2307,7 @@ def asignar_foto_a_pieza(
             SET {', '.join(updates)}
             WHERE id = %s
             RETURNING id, paquete_id, media_type, file_path, original_name, mime_type, file_size, 
-                      pieza_asignada_id, es_global, created_at
+                      pieza_asignada_id, es_global, derivatives, created_at
             """,
             tuple(params)
         ).fetchone()
@@ -2328,7 +2322,6 @@ def get_piezas_con_fotos(paquete_id: int):
     """
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         
         piezas = conn.execute(
@@ -2342,6 +2335,7 @@ def get_piezas_con_fotos(paquete_id: int):
                 r.almacen,
                 pm.id as foto_id,
                 pm.file_path as foto_path,
+                pm.derivatives as foto_derivatives,
                 pm.es_global
             FROM paquetes_piezas_relaciones r
             LEFT JOIN paquetes_piezas_media pm ON pm.pieza_asignada_id = r.bitacora_pieza_id
@@ -2543,7 +2537,6 @@ def generar_pdf_inventario(paquete_id: int):
     """
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_paquetes_piezas_tables(conn)
         _ensure_paquete_exists(conn, paquete_id)
         
         # Obtener datos del paquete
@@ -2606,6 +2599,7 @@ def generar_pdf_inventario(paquete_id: int):
                 file_size,
                 pieza_asignada_id,
                 es_global,
+                derivatives,
                 created_at
             FROM paquetes_piezas_media
             WHERE paquete_id = %s AND media_type = 'photo'
@@ -2613,29 +2607,36 @@ def generar_pdf_inventario(paquete_id: int):
             """,
             (paquete_id,),
         ).fetchall()
-        
-        # Generar PDF
-        try:
-            pdf_bytes = generar_pdf_inventario_paquete(
-                paquete_data=dict(paquete) if paquete else {},
-                piezas=[dict(p) for p in piezas],
-                fotos=[dict(f) for f in fotos]
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error al generar PDF: {str(e)}"
-            )
-        
-        # Preparar nombre del archivo
-        folio = paquete["folio"] if paquete else f"PKG-{paquete_id}"
-        reporte = paquete.get("numero_reporte_siniestro") or "sin_reporte"
-        filename = f"Inventario_{folio}_{reporte}.pdf"
-        
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
+
+    # Generar PDF fuera de la conexión: el render corre en el pool de app.core.rendering
+    try:
+        pdf_bytes = rendering.render(
+            generar_pdf_inventario_paquete,
+            paquete_data=dict(paquete) if paquete else {},
+            piezas=[dict(p) for p in piezas],
+            # El PDF usa el derivado "print" (1600 px) en lugar de la foto de cámara.
+            fotos=[
+                {**dict(f), "file_path": media_derivatives.print_path(f["file_path"], f["derivatives"])}
+                for f in fotos
+            ]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error al generar PDF: {str(e)}"
         )
+    
+    # Preparar nombre del archivo
+    folio = paquete["folio"] if paquete else f"PKG-{paquete_id}"
+    reporte = paquete.get("numero_reporte_siniestro") or "sin_reporte"
+    filename = f"Inventario_{folio}_{reporte}.pdf"
+    
+    return StreamingResponse(
+        io.BytesIO(pdf_bytes),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}"
+        }
+    )
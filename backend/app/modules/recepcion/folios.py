@@ -0,0 +1,113 @@
+"""
+Folios de recepción (`recepciones.folio_recep`) a partir de `recepcion_folio_seq`.
+
+Antes cada alta tomaba `LOCK TABLE recepciones IN EXCLUSIVE MODE` y volvía a
+sincronizar la secuencia con `MAX(folio_recep::bigint)` de recepciones e
+historical_entries (filtro por regex, sin índice), y /registros/next-folio
+repetía el escaneo cada vez que se abría el formulario. Ahora:
+
+- la secuencia se reconcilia con los folios existentes en la migración y al
+  arrancar el proceso líder: un solo `setval` hacia adelante, nunca regresa;
+- `allocate_folio` es `nextval` con un candado compartido que solo espera a
+  una reconciliación en curso: no bloquea a otras altas. Un folio de una
+  alta que se revierte (p. ej. duplicada) queda como hueco;
+- `peek_folio` lee el estado de la secuencia sin escanear tablas; es
+  informativo, el folio real se asigna al guardar.
+"""
+
+from app.core.db import get_connection
+from app.core.services import service_registry
+
+FOLIO_SEQUENCE = "recepcion_folio_seq"
+FIRST_FOLIO = 5000
+
+# Llave de pg_advisory_xact_lock (junto con fecha y placas) para la validación de
+# recepción duplicada (ver MIGRATIONS_LOCK_ID, RPA_CLAIM_LOCK_ID).
+DUPLICATE_CHECK_LOCK_ID = 872_341_011
+# Reconciliar la toma exclusiva y `allocate_folio` compartida: el setval no
+# corre mientras una alta tiene un nextval sin confirmar, ni al revés.
+FOLIO_SEQUENCE_LOCK_ID = 872_341_013
+# Un salto mayor casi siempre es un folio atípico (capturado con otro formato).
+FOLIO_JUMP_WARNING = 1_000_000
+
+
+def ensure_folio_sequence(conn) -> None:
+    conn.execute(
+        f"""
+        CREATE SEQUENCE IF NOT EXISTS {FOLIO_SEQUENCE}
+        START WITH {FIRST_FOLIO}
+        INCREMENT BY 1
+        MINVALUE {FIRST_FOLIO}
+        """
+    )
+    reconcile_folio_sequence(conn)
+
+
+def reconcile_folio_sequence(conn) -> str:
+    """
+    Adelanta la secuencia hasta el folio numérico más alto registrado y regresa el siguiente.
+
+    Es un solo `setval` hacia adelante bajo candado exclusivo: las altas que
+    ya tomaron folio terminan antes de leer la secuencia y las nuevas esperan
+    al setval, así que nunca se repite un folio.
+    """
+    with conn.transaction():
+        conn.execute("SELECT pg_advisory_xact_lock(%s)", (FOLIO_SEQUENCE_LOCK_ID,))
+        row = conn.execute(
+            f"""
+            SELECT
+                (SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {FOLIO_SEQUENCE}),
+                GREATEST(
+                    (SELECT COALESCE(MAX(folio_recep::bigint), 0) FROM recepciones WHERE folio_recep ~ '^[0-9]{{1,18}}$'),
+                    (SELECT COALESCE(MAX(folio_recep::bigint), 0) FROM historical_entries WHERE folio_recep ~ '^[0-9]{{1,18}}$')
+                )
+            """
+        ).fetchone()
+        current_value, max_folio = row[0], row[1]
+        if max_folio > current_value:
+            if max_folio - current_value > FOLIO_JUMP_WARNING:
+                print(
+                    f"[Recepcion] La secuencia de folios salta de {current_value} a {max_folio}; "
+                    "revisar folios atípicos en recepciones/historical_entries"
+                )
+            conn.execute(f"SELECT setval('{FOLIO_SEQUENCE}', %s, true)", (max_folio,))
+        return peek_folio(conn)
+
+
+def allocate_folio(conn) -> str:
+    with conn.transaction():
+        # Compartido entre altas; solo espera a una reconciliación en curso
+        conn.execute("SELECT pg_advisory_xact_lock_shared(%s)", (FOLIO_SEQUENCE_LOCK_ID,))
+        return str(conn.execute(f"SELECT nextval('{FOLIO_SEQUENCE}')").fetchone()[0])
+
+
+def peek_folio(conn) -> str:
+    row = conn.execute(
+        f"SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {FOLIO_SEQUENCE}"
+    ).fetchone()
+    return str(row[0] if row else FIRST_FOLIO)
+
+
+def lock_duplicate_check(conn, fecha_recep, placas) -> None:
+    """Serializa solo las altas con la misma fecha y placas hasta el fin de la transacción."""
+    conn.execute(
+        "SELECT pg_advisory_xact_lock(%s::int, hashtext(DATE(%s)::text || '|' || COALESCE(%s::text, '')))",
+        (DUPLICATE_CHECK_LOCK_ID, fecha_recep, placas),
+    )
+
+
+def start_reconcile() -> None:
+    # Folios cargados por fuera de la API (importaciones de históricos) desde el último arranque
+    try:
+        with get_connection() as conn:
+            next_folio = reconcile_folio_sequence(conn)
+        print(f"[Recepcion] Secuencia de folios reconciliada, siguiente folio {next_folio}")
+    except Exception as exc:
+        print(f"[Recepcion] No se pudo reconciliar la secuencia de folios: {exc}")
+
+
+def stop_reconcile() -> None:
+    return None
+
+
+service_registry.register("recepcion_folio_reconcile", start_reconcile, stop_reconcile)
@@ -0,0 +1,284 @@
+"""
+Caché de OCR (Textract) y jobs de extracción para /recepcion/ordenes/extract-fields.
+
+Cada documento se identifica por el SHA-256 de sus bytes. Se guardan los
+bloques crudos de Textract y la respuesta ya parseada junto con la versión
+del parser:
+
+- volver a subir la misma orden no vuelve a llamar a Textract;
+- si cambia el parser (subir OCR_PARSER_VERSION) la respuesta se recalcula
+  a partir de los bloques guardados, también sin Textract.
+
+Los jobs (`recepcion_ocr_jobs`) corren en un pool de hilos del proceso; el
+estado queda en la base de datos para consultarlo desde cualquier worker y
+cada cambio se publica en el tópico `ocr_jobs` de app.core.events. Todo job
+llega a un estado final: al apagar, el proceso marca 'failed' (503) los que
+no alcanzó a terminar, y el servicio `ocr_job_prune` hace lo mismo con los
+que se quedaron en 'queued'/'running' porque su proceso murió, y borra los
+jobs viejos.
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+from psycopg.rows import dict_row
+
+from app.core.config import settings
+from app.core.db import get_connection
+from app.core.events import publish
+from app.core.services import service_registry
+
+# Subir al cambiar orden_parser.parse_orden_fields para recalcular las respuestas guardadas.
+OCR_PARSER_VERSION = "1"
+
+FINAL_STATUSES = ("completed", "failed")
+
+# Respuesta de los jobs que no terminaron (apagado o proceso caído): reintentar.
+UNFINISHED_STATUS_CODE = 503
+UNFINISHED_ERROR = "La extracción se interrumpió al reiniciar el servidor; vuelve a intentarlo"
+
+PRUNE_INTERVAL_SECONDS = 300
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Jobs enviados al pool de este proceso que aún no llegan a un estado final
+_active_jobs: set[str] = set()
+_prune_stop = threading.Event()
+_prune_thread: Optional[threading.Thread] = None
+
+
+def ensure_ocr_tables(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recepcion_ocr_cache (
+            sha256 VARCHAR(64) PRIMARY KEY,
+            extension VARCHAR(10),
+            blocks JSONB NOT NULL,
+            parser_version VARCHAR(20),
+            result JSONB,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+            last_used_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS recepcion_ocr_jobs (
+            job_id VARCHAR(40) PRIMARY KEY,
+            sha256 VARCHAR(64),
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            result JSONB,
+            error TEXT,
+            status_code INTEGER,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recepcion_ocr_jobs_created ON recepcion_ocr_jobs (created_at DESC)")
+
+
+def get_cached(sha256: str) -> Optional[dict[str, Any]]:
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        return conn.execute(
+            """
+            UPDATE recepcion_ocr_cache
+            SET hits = hits + 1, last_used_at = LOCALTIMESTAMP
+            WHERE sha256 = %s
+            RETURNING sha256, extension, blocks, parser_version, result
+            """,
+            (sha256,),
+        ).fetchone()
+
+
+def store(sha256: str, extension: str, blocks: list[dict[str, Any]], result: dict[str, Any]) -> None:
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO recepcion_ocr_cache (sha256, extension, blocks, parser_version, result)
+            VALUES (%s, %s, %s::jsonb, %s, %s::jsonb)
+            ON CONFLICT (sha256) DO UPDATE
+            SET parser_version = EXCLUDED.parser_version,
+                result = EXCLUDED.result,
+                last_used_at = LOCALTIMESTAMP
+            """,
+            (
+                sha256,
+                extension,
+                json.dumps(blocks, ensure_ascii=False),
+                OCR_PARSER_VERSION,
+                json.dumps(result, ensure_ascii=False, default=str),
+            ),
+        )
+
+
+def create_job(sha256: str) -> str:
+    job_id = uuid4().hex
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO recepcion_ocr_jobs (job_id, sha256) VALUES (%s, %s)",
+            (job_id, sha256),
+        )
+    return job_id
+
+
+def update_job(job_id: str, status: str, **fields) -> None:
+    assignments = ["status = %s", "updated_at = LOCALTIMESTAMP"]
+    values: list[Any] = [status]
+    if "result" in fields:
+        assignments.append("result = %s::jsonb")
+        values.append(json.dumps(fields["result"], ensure_ascii=False, default=str))
+    for column in ("error", "status_code"):
+        if column in fields:
+            assignments.append(f"{column} = %s")
+            values.append(fields[column])
+    with get_connection() as conn:
+        # Un job que ya llegó a un estado final (p. ej. marcado 'failed' al apagar) no cambia
+        updated = conn.execute(
+            f"""
+            UPDATE recepcion_ocr_jobs SET {', '.join(assignments)}
+            WHERE job_id = %s AND status <> ALL(%s)
+            """,
+            [*values, job_id, list(FINAL_STATUSES)],
+        ).rowcount
+        if updated:
+            publish(conn, "ocr_jobs", {"job_id": job_id, "status": status})
+
+
+def _fail_unfinished(conn, condition: str, params: list[Any]) -> list[str]:
+    rows = conn.execute(
+        f"""
+        UPDATE recepcion_ocr_jobs
+        SET status = 'failed', error = %s, status_code = %s, updated_at = LOCALTIMESTAMP
+        WHERE status <> ALL(%s) AND {condition}
+        RETURNING job_id
+        """,
+        [UNFINISHED_ERROR, UNFINISHED_STATUS_CODE, list(FINAL_STATUSES), *params],
+    ).fetchall()
+    job_ids = [row[0] for row in rows]
+    for job_id in job_ids:
+        publish(conn, "ocr_jobs", {"job_id": job_id, "status": "failed"})
+    return job_ids
+
+
+def get_job(job_id: str) -> Optional[dict[str, Any]]:
+    with get_connection() as conn:
+        conn.row_factory = dict_row
+        return conn.execute(
+            """
+            SELECT job_id, status, result, error, status_code, created_at, updated_at
+            FROM recepcion_ocr_jobs
+            WHERE job_id = %s
+            """,
+            (job_id,),
+        ).fetchone()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, int(settings.ocr_job_workers)),
+                    thread_name_prefix="ocr-job",
+                )
+    return _executor
+
+
+def submit(job_id: str, task: Callable[[], dict[str, Any]], describe_error: Callable[[Exception], tuple[int, str]]) -> None:
+    """Corre `task` en el pool y guarda su resultado (o el error) en el job."""
+
+    def _run() -> None:
+        try:
+            update_job(job_id, "running")
+            result = task()
+        except Exception as exc:
+            status_code, detail = describe_error(exc)
+            print(f"[OCR] Job {job_id} falló: {detail}")
+            update_job(job_id, "failed", error=detail, status_code=status_code)
+        else:
+            update_job(job_id, "completed", result=result)
+        finally:
+            with _executor_lock:
+                _active_jobs.discard(job_id)
+
+    with _executor_lock:
+        _active_jobs.add(job_id)
+    _get_executor().submit(_run)
+
+
+def shutdown() -> None:
+    """Cancela los jobs en cola y marca 'failed' los de este proceso que no terminaron."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+        unfinished = list(_active_jobs)
+        _active_jobs.clear()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if not unfinished:
+        return
+    try:
+        with get_connection() as conn:
+            failed = _fail_unfinished(conn, "job_id = ANY(%s)", [unfinished])
+        if failed:
+            print(f"[OCR] {len(failed)} jobs sin terminar marcados como fallidos al apagar")
+    except Exception as exc:
+        print(f"[OCR] No se pudieron cerrar los jobs pendientes: {exc}")
+
+
+def prune_jobs() -> tuple[int, int]:
+    """
+    Da por fallidos los jobs sin cambios en OCR_JOB_STALE_MINUTES (su proceso
+    murió) y borra los creados hace más de OCR_JOB_RETENTION_DAYS.
+    """
+    stale_seconds = max(60, int(settings.ocr_job_stale_minutes) * 60)
+    retention_seconds = max(0.0, float(settings.ocr_job_retention_days)) * 86400
+    with get_connection() as conn:
+        stale = _fail_unfinished(
+            conn,
+            "updated_at < LOCALTIMESTAMP - make_interval(secs => %s)",
+            [stale_seconds],
+        )
+        deleted = 0
+        if retention_seconds:
+            deleted = conn.execute(
+                "DELETE FROM recepcion_ocr_jobs WHERE created_at < LOCALTIMESTAMP - make_interval(secs => %s)",
+                (retention_seconds,),
+            ).rowcount
+    return len(stale), deleted
+
+
+def _prune_loop() -> None:
+    while not _prune_stop.is_set():
+        try:
+            stale, deleted = prune_jobs()
+            if stale or deleted:
+                print(f"[OCR] Jobs: {stale} sin terminar marcados como fallidos, {deleted} viejos eliminados")
+        except Exception as exc:
+            print(f"[OCR] Error limpiando jobs: {exc}")
+        _prune_stop.wait(PRUNE_INTERVAL_SECONDS)
+
+
+def start_prune() -> None:
+    global _prune_thread
+    if _prune_thread and _prune_thread.is_alive():
+        return
+    _prune_stop.clear()
+    _prune_thread = threading.Thread(target=_prune_loop, name="ocr-job-prune", daemon=True)
+    _prune_thread.start()
+
+
+def stop_prune() -> None:
+    _prune_stop.set()
+    if _prune_thread and _prune_thread.is_alive():
+        _prune_thread.join(timeout=10)
+
+
+service_registry.register("ocr_job_prune", start_prune, stop_prune)
@@ -0,0 +1,1971 @@
+"""
+Parser de campos de órdenes de admisión (Qualitas, CHUBB y genéricas) sobre
+la salida de Textract.
+
+Antes cada estrategia volvía a recorrer las líneas del OCR y los pares
+clave-valor: normalizaba y pasaba a mayúsculas todas las líneas en cada
+búsqueda por proximidad, recalculaba la etiqueta sin acentos de cada línea
+para la transmisión y usaba `re.search` con el patrón en texto. Ahora:
+
+- `OcrDocument` tokeniza el documento una sola vez: líneas normalizadas, en
+  mayúsculas y como etiqueta (sin acentos), y los pares clave-valor con su
+  valor limpio y sus palabras;
+- `OcrDocument.find` responde "qué líneas contienen X" desde un índice que
+  se llena la primera vez que se pide cada etiqueta;
+- los patrones están compilados al importar el módulo, en tablas por campo
+  (PATTERNS) y por aseguradora (INSURER_PATTERNS).
+
+Las estrategias y su prioridad por campo son las mismas de siempre. Un
+cambio que altere resultados debe subir ocr_cache.OCR_PARSER_VERSION y
+revisarse contra el corpus de ocr_corpus/ con
+`python -m app.modules.recepcion.orden_parser_bench`.
+"""
+
+from datetime import datetime
+import re
+from typing import Any, NamedTuple, Optional
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_NON_LABEL_RE = re.compile(r"[^A-Z0-9 ]+")
+
+# Los patrones de texto completo se buscan sobre el OCR con estas banderas
+_TEXT_FLAGS = re.IGNORECASE | re.MULTILINE
+
+
+def normalize_ocr_text(value: str) -> str:
+    return _WHITESPACE_RE.sub(" ", (value or "").strip())
+
+
+def normalize_key_label(value: str) -> str:
+    normalized = value or ""
+    # La mayoría de las líneas del OCR son ASCII: sin acentos que quitar
+    if not normalized.isascii():
+        normalized = unicodedata.normalize("NFD", normalized)
+        normalized = "".join(char for char in normalized if unicodedata.category(char) != "Mn")
+    normalized = normalized.upper()
+    normalized = _NON_LABEL_RE.sub(" ", normalized)
+    return normalize_ocr_text(normalized)
+
+
+def _compile_all(*patterns: str, flags: int = _TEXT_FLAGS) -> tuple[re.Pattern, ...]:
+    return tuple(re.compile(pattern, flags) for pattern in patterns)
+
+
+def _labels(*labels: str) -> tuple[tuple[str, frozenset[str]], ...]:
+    """Etiquetas para la búsqueda flexible en KV, ya en mayúsculas y partidas en palabras."""
+    return tuple((label.upper(), frozenset(label.upper().split())) for label in labels)
+
+
+# ========== TEXTRACT ==========
+
+def _get_block_text(block: dict[str, Any], block_map: dict[str, dict[str, Any]]) -> str:
+    parts: list[str] = []
+    for rel in block.get("Relationships", []):
+        if rel.get("Type") != "CHILD":
+            continue
+        for child_id in rel.get("Ids", []):
+            child = block_map.get(child_id, {})
+            if child.get("BlockType") == "WORD":
+                word = child.get("Text", "")
+                if word:
+                    parts.append(word)
+            elif child.get("BlockType") == "SELECTION_ELEMENT" and child.get("SelectionStatus") == "SELECTED":
+                parts.append("X")
+    return normalize_ocr_text(" ".join(parts))
+
+
+def textract_data_from_blocks(blocks: list[dict[str, Any]]) -> dict[str, Any]:
+    block_map = {block.get("Id"): block for block in blocks if block.get("Id")}
+
+    lines = [
+        normalize_ocr_text(block.get("Text", ""))
+        for block in blocks
+        if block.get("BlockType") == "LINE" and block.get("Text")
+    ]
+
+    word_boxes: list[dict[str, Any]] = []
+    selected_boxes: list[dict[str, float]] = []
+    for block in blocks:
+        block_type = block.get("BlockType")
+        geometry = block.get("Geometry", {}).get("BoundingBox", {}) or {}
+        left = float(geometry.get("Left", 0.0) or 0.0)
+        top = float(geometry.get("Top", 0.0) or 0.0)
+        width = float(geometry.get("Width", 0.0) or 0.0)
+        height = float(geometry.get("Height", 0.0) or 0.0)
+        if block_type == "WORD":
+            text = normalize_ocr_text(block.get("Text", ""))
+            if text:
+                word_boxes.append(
+                    {
+                        "text": text,
+                        "norm": normalize_key_label(text),
+                        "left": left,
+                        "top": top,
+                        "width": width,
+                        "height": height,
+                    }
+                )
+        elif (
+            block_type == "SELECTION_ELEMENT"
+            and block.get("SelectionStatus") == "SELECTED"
+        ):
+            selected_boxes.append(
+                {"left": left, "top": top, "width": width, "height": height}
+            )
+
+    kv_pairs: dict[str, dict[str, str]] = {}
+    for block in blocks:
+        if block.get("BlockType") != "KEY_VALUE_SET":
+            continue
+        if "KEY" not in block.get("EntityTypes", []):
+            continue
+
+        key_text = _get_block_text(block, block_map)
+        if not key_text:
+            continue
+
+        value_text = ""
+        for rel in block.get("Relationships", []):
+            if rel.get("Type") != "VALUE":
+                continue
+            for value_id in rel.get("Ids", []):
+                value_block = block_map.get(value_id)
+                if not value_block:
+                    continue
+                value_text = _get_block_text(value_block, block_map)
+                if value_text:
+                    break
+            if value_text:
+                break
+
+        normalized_key = normalize_key_label(key_text)
+        if normalized_key:
+            kv_pairs[normalized_key] = {"key": key_text, "value": value_text}
+
+    return {
+        "text": "\n".join(lines),
+        "lines": lines,
+        "kv": kv_pairs,
+        "word_boxes": word_boxes,
+        "selected_boxes": selected_boxes,
+    }
+
+
+def detect_aseguradora(ocr_text: str) -> str:
+    """Detecta la aseguradora con variaciones comunes de OCR."""
+    upper = (ocr_text or "").upper()
+
+    # Qualitas con variaciones comunes de OCR
+    for variant in QUALITAS_VARIANTS:
+        if variant in upper:
+            return "Qualitas"
+
+    # CHUBB con variaciones
+    for variant in CHUBB_VARIANTS:
+        if variant in upper:
+            return "CHUBB"
+    return ""
+
+
+# ========== DOCUMENTO TOKENIZADO ==========
+
+class KvEntry(NamedTuple):
+    key: str  # llave normalizada (normalize_key_label)
+    key_upper: str
+    key_words: frozenset[str]
+    source: str  # llave tal como la leyó Textract (para field_debug)
+    value: str
+
+
+class OcrDocument:
+    """Salida de Textract preparada una sola vez para todas las estrategias del parser."""
+
+    def __init__(
+        self,
+        text: str,
+        kv_pairs: Optional[dict[str, dict[str, str]]] = None,
+        lines: Optional[list[str]] = None,
+        meta: Optional[dict[str, Any]] = None,
+    ) -> None:
+        self.text = text or ""
+        self.upper_text = self.text.upper()
+        self.lines = [line for line in (normalize_ocr_text(item) for item in (lines or [])) if line]
+        self.upper = [line.upper() for line in self.lines]
+        self.meta = meta or {}
+        self.kv_entries = [
+            KvEntry(
+                key=normalized_key,
+                key_upper=normalized_key.upper(),
+                key_words=frozenset(normalized_key.upper().split()),
+                source=entry.get("key", normalized_key),
+                value=normalize_ocr_text(entry.get("value", "")),
+            )
+            for normalized_key, entry in (kv_pairs or {}).items()
+        ]
+        self._label_lines: Optional[list[str]] = None
+        self._index: dict[str, tuple[int, ...]] = {}
+        self._label_index: dict[str, tuple[int, ...]] = {}
+
+    @classmethod
+    def from_textract(cls, textract_data: dict[str, Any]) -> "OcrDocument":
+        return cls(
+            textract_data.get("text", ""),
+            textract_data.get("kv", {}),
+            textract_data.get("lines", []),
+            textract_data,
+        )
+
+    @property
+    def label_lines(self) -> list[str]:
+        """Líneas como etiqueta (sin acentos ni signos); solo se calculan si se usan."""
+        if self._label_lines is None:
+            self._label_lines = [normalize_key_label(line) for line in self.lines]
+        return self._label_lines
+
+    def _lookup(self, needle: str) -> tuple[int, ...]:
+        key = needle.upper()
+        hits = self._index.get(key)
+        if hits is None:
+            hits = tuple(idx for idx, line in enumerate(self.upper) if key in line)
+            self._index[key] = hits
+        return hits
+
+    def find(self, *needles: str) -> tuple[int, ...]:
+        """Índices (en orden) de las líneas que contienen alguna de las etiquetas."""
+        if len(needles) == 1:
+            return self._lookup(needles[0])
+        merged: set[int] = set()
+        for needle in needles:
+            merged.update(self._lookup(needle))
+        return tuple(sorted(merged))
+
+    def first(self, *needles: str) -> int:
+        hits = self.find(*needles)
+        return hits[0] if hits else -1
+
+    def find_label(self, *needles: str) -> tuple[int, ...]:
+        """Como find, pero sobre las líneas sin acentos (TRANSMISIÓN -> TRANSMISION)."""
+        merged: set[int] = set()
+        for needle in needles:
+            hits = self._label_index.get(needle)
+            if hits is None:
+                hits = tuple(idx for idx, line in enumerate(self.label_lines) if needle in line)
+                self._label_index[needle] = hits
+            merged.update(hits)
+        return tuple(sorted(merged))
+
+    def pick_kv(self, contains_all: tuple[tuple[str, ...], ...]) -> tuple[str, str]:
+        """Primer par cuya llave contiene todos los tokens de algún grupo."""
+        for entry in self.kv_entries:
+            for token_group in contains_all:
+                if all(token in entry.key for token in token_group):
+                    if entry.value:
+                        return entry.value, entry.source
+                    break
+        return "", ""
+
+    def flexible_kv(
+        self,
+        labels: tuple[tuple[str, frozenset[str]], ...],
+        min_match_score: float = 0.6,
+    ) -> tuple[str, str]:
+        """
+        Búsqueda flexible en KV pairs que tolera variaciones en las etiquetas.
+        Usa coincidencia parcial y scoring.
+        """
+        best_match = ""
+        best_key = ""
+        best_score = 0.0
+
+        for entry in self.kv_entries:
+            key_upper = entry.key_upper
+            for label_upper, label_words in labels:
+                # Exacta, contiene la etiqueta, la etiqueta contiene la llave o palabras en común
+                if label_upper == key_upper:
+                    score = 1.0
+                elif label_upper in key_upper:
+                    score = 0.9
+                elif key_upper in label_upper:
+                    score = 0.8
+                else:
+                    score = 0.0
+                    if label_words and entry.key_words:
+                        common = len(label_words & entry.key_words)
+                        if common:
+                            score = common / max(len(label_words), len(entry.key_words))
+
+                if score > best_score and score >= min_match_score:
+                    best_score = score
+                    best_match = entry.value
+                    best_key = entry.source
+
+        return best_match, best_key
+
+    def search_text(self, patterns: tuple[re.Pattern, ...]) -> str:
+        for pattern in patterns:
+            match = pattern.search(self.text)
+            if match:
+                candidate = normalize_ocr_text(match.group(1))
+                if candidate:
+                    return candidate
+        return ""
+
+    def near_label(
+        self,
+        label_patterns: tuple[str, ...],
+        max_lines_after: int = 3,
+        value_pattern: Optional[re.Pattern] = None,
+        exclude_patterns: tuple[str, ...] = (),
+    ) -> str:
+        """
+        Busca un valor en las líneas siguientes a una etiqueta.
+        Útil cuando KV pairs no funcionan correctamente.
+        """
+        value_pattern = value_pattern or _ANY_VALUE_RE
+        total = len(self.lines)
+        for idx in self.find(*label_patterns):
+            for next_idx in range(idx + 1, min(idx + 1 + max_lines_after, total)):
+                candidate = self.lines[next_idx]
+                # Saltar líneas muy cortas y las que son otras etiquetas
+                if len(candidate) < 2:
+                    continue
+                candidate_upper = self.upper[next_idx]
+                if any(exclude in candidate_upper for exclude in exclude_patterns):
+                    continue
+                match = value_pattern.search(candidate)
+                if match:
+                    return match.group(1).strip()
+        return ""
+
+    def in_context(self, context_keywords: tuple[str, ...], value_pattern: re.Pattern, window_size: int = 5) -> str:
+        """Busca el valor en la ventana de líneas que empieza en cada palabra clave."""
+        total = len(self.lines)
+        for idx in self.find(*context_keywords):
+            for window_idx in range(idx, min(total, idx + window_size)):
+                match = value_pattern.search(self.lines[window_idx])
+                if match:
+                    return match.group(1).strip()
+        return ""
+
+
+# ========== TABLAS DE PATRONES ==========
+
+QUALITAS_VARIANTS = ("QUALITAS", "QUALITA", "QUALIT", "QU4LITAS", "QUAL1TAS", "CUALITAS", "CUALITA", "QUALITÁS")
+CHUBB_VARIANTS = ("CHUBB", "CHUB", "CHUBBB", "CHUBBE", "CHÜBB")
+
+# Patrones sobre el texto completo (IGNORECASE | MULTILINE), en orden de prioridad
+PATTERNS: dict[str, tuple[re.Pattern, ...]] = {
+    "fecha_adm": _compile_all(
+        r"FECHA\s*/?\s*DATE[^\n\r]*?(\d{2}/\d{2}/\d{4})",
+        r"FECHA[^\n\r]*?(\d{2}/\d{2}/\d{4})",
+        r"FECHA\s*[:\-]?\s*(\d{2}[\/\-]\d{2}[\/\-]\d{4})",
+        r"(\d{2}[\/\-]\d{2}[\/\-]\d{4})\s*FECHA",
+        r"FECHA\s+DE\s+\w+[^\n\r]*?(\d{2}[\/\-]\d{2}[\/\-]\d{2,4})",
+        r"FECHA[\s:]+(\d{1,2}[\/\s]+[A-Z]{3,9}[\/\s]+\d{4})",
+        r"FECHA\s*[:\-]?\s*(\d{4}-\d{2}-\d{2})",  # ISO format: 2026-03-26
+    ),
+    "hr_adm": _compile_all(
+        r"HORA\s*/?\s*TIME[^\n\r]*?(\d{1,2}[:.]\d{2})",
+        r"\b(\d{1,2}[:.]\d{2})\s*HRS?\b",
+        r"HORA\s*[:\-]?\s*(\d{1,2}[:.]\d{2})",
+        r"(\d{1,2}[:.]\d{2})\s*HORA",
+        r"HORA\s+DE\s+\w+[^\n\r]*?(\d{1,2}[:.]\d{2})",
+        r"T\s*(\d{2}:\d{2}):\d{2}",  # ISO format: 2026-03-26T10:30:00
+        r"(\d{2}:\d{2}):\d{2}",  # Time with seconds
+    ),
+    "reporte": _compile_all(
+        r"N[°º#]?\s*(?:DE\s+)?REPORTE[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
+        r"REPORT\s*N[°º#]?[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
+        r"REPORTE\s*[:\-]?\s*([A-Z0-9-]{5,20})",
+        r"REPORTE\s*NUMERO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
+        r"^\s*N[°º#]?\.?\s*REPORTE\s*[:\-]?\s*([A-Z0-9-]{5,20})",
+    ),
+    "siniestro": _compile_all(
+        r"N[°º#]?\s*(?:DE\s+)?SINIESTRO[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
+        r"SINIESTRO[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
+        r"SINIESTRO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
+        r"FOLIO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
+        r"\b(\d{3,}-\d{3,})\b",  # Formato común: 123-456789
+    ),
+    "nb_cliente": _compile_all(
+        r"NOMBRE O RAZ[ÓO]N SOCIAL DEL CLIENTE[^\n\r]*[\r\n]+([^\r\n]+)",
+        r"CUSTOMER NAME[^\n\r]*[\r\n]+([^\r\n]+)",
+        r"NOMBRE\s*(?:DEL?)?\s*CLIENTE[^\n\r:]*[:\s]+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})",
+        r"CLIENTE[\s:]+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})",
+        r"^\s*Asegurado:\s*([A-Z][A-Z\s]{3,40})$",
+    ),
+    "tel_cliente": _compile_all(
+        r"TEL[ÉE]FONO\s*/?\s*PHONE\s*N[°º#]?[^\n\r]*[:\s]+([0-9][0-9 \-\(\)]{7,})",
+        r"TEL[ÉE]FONO\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
+        r"TEL\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
+        r"CELULAR\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
+        r"\b(\d{3}[-\s]\d{3}[-\s]\d{4})\b",  # Formato: 669-164-5258
+        r"\b(\d{10})\b",  # Formato: 6691645258
+        r"(\(\d{3}\)\s*\d{3}[-\s]?\d{4})",  # Formato: (669) 164-5258
+    ),
+    "marca_vehiculo": _compile_all(
+        r"MARCA\s*/?\s*BRAND[^\n\r]*[\r\n]+([^\r\n]+)",
+        r"MARCA[^\n\r:]*[:\s]+([A-Z0-9][A-Z0-9\s]{1,20})",
+        r"MARCA\s*[:\-]?\s*([A-Z][A-Z\s]{1,15})",
+        r"^\s*Marca:\s*([A-Z][A-Z\s]{1,15})$",
+    ),
+    "tipo_vehiculo": _compile_all(
+        r"TIPO\s*/?\s*TYPE[^\n\r]*[\r\n]+([^\r\n]+)",
+        r"TIPO[^\n\r:]*[:\s]+([A-Z0-9][A-Z0-9\s]{1,25})",
+        r"TIPO\s*[:\-]?\s*([A-Z][A-Z0-9\s]{1,20})",
+        r"LINEA\s*[:\-]?\s*([A-Z][A-Z0-9\s]{1,20})",
+        r"^\s*Tipo:\s*([A-Z][A-Z0-9\s\.]{5,50})$",
+    ),
+    "modelo_anio": _compile_all(
+        r"MODELO\s*/?\s*AÑO?\s*[:\-]?\s*(20\d{2})",
+        r"AÑO\s*[:\-]?\s*(20\d{2})",
+        r"\b(20\d{2})\b",  # Cualquier año 20XX
+    ),
+    "color_vehiculo": _compile_all(
+        r"COLOR\s*/?\s*COLOUR?[^\n\r]*[\r\n]+([A-Z][A-Z\s]{2,15})",
+        r"COLOR[^\n\r:]*[:\s]+([A-Z][A-Z\s]{2,15})",
+        r"COLOR\s*[:\-]?\s*([A-Z][A-Z\s]{2,15})",
+        r"^\s*Color:\s*([A-Z][A-Z\s]{2,15})$",
+    ),
+    "serie_auto": _compile_all(
+        r"N[°º#]?\s*DE SERIE\s*/?\s*SERIES?\s*N[°º#]?[^\n\r]*[\r\n]+([A-HJ-NPR-Z0-9]{8,17})",
+        r"VIN[^\n\r:]*[:\s]+([A-HJ-NPR-Z0-9]{8,17})",
+        r"SERIE\s*[:\-]?\s*([A-HJ-NPR-Z0-9]{8,17})",
+        r"^\s*Serie:\s*([A-HJ-NPR-Z0-9]{8,17})$",
+        r"\b([A-HJ-NPR-Z0-9]{17})\b",  # VIN estándar de 17 caracteres
+    ),
+    "placas": _compile_all(
+        r"PLACAS\s*/?\s*LICENSE PLATE[^\n\r]*[\r\n]+([A-Z0-9\-]{5,10})",
+        r"PLACAS[^\n\r:]*[:\s]+([A-Z0-9\-]{5,10})",
+        r"PLACA\s*[:\-]?\s*([A-Z0-9\-]{5,10})",
+        r"^\s*Placas:\s*([A-Z0-9\-]{5,10})$",
+        r"\b([A-Z]{1,3}-?\d{1,4}-?[A-Z]?\d?)\b",  # Formatos comunes de placas mexicanas
+    ),
+    "kilometraje": _compile_all(
+        r"KILOMETRAJE\s*/?\s*MILEAGE[^\n\r]*[\r\n]+([0-9,.]{1,8})",
+        r"KILOMETRAJE[^\n\r:]*[:\s]+([0-9,.]{1,8})",
+        r"KM\s*[:\-]?\s*([0-9,.]{1,8})",
+        r"KILOMETRAJE\s*[:\-]?\s*(\d+)",
+        r"\b(\d{1,3}(?:,\d{3})+)\b",  # Formato con comas: 45,000
+    ),
+    "descripcion_siniestro": _compile_all(
+        r"DESCRIPCI[ÓO]N DE DA[ÑN]OS A REPARAR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
+        r"DESCRIPTION OF DAMAGES TO REPAIR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
+        r"DESCRIPCI[ÓO]N DE DA[ÑN]OS A REPARAR[^\r\n]*\s+([A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{8,})",
+        r"DA[ÑN]OS\s*A\s*REPARAR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
+        r"DESCRIPCI[ÓO]N\s*DE\s*DA[ÑN]OS[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
+        r"OBSERVACIONES\s*DE\s*DA[ÑN]OS[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
+        # Qualitas Ajuste Express format
+        r"DESCRIPCI[ÓO]N\s+DE\s+DA[ÑN]OS[\s:]+([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s*]{10,200})",
+        # CHUBB ticket: Daños Mecanicos
+        r"DA[ÑN]OS\s+MECANICOS[^\r\n]*(?:\r?\n)+([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{10,300})",
+    ),
+}
+
+# Patrones propios de cada aseguradora; se prueban antes que los genéricos del mismo campo
+INSURER_PATTERNS: dict[str, dict[str, tuple[re.Pattern, ...]]] = {
+    "CHUBB": {
+        # CHUBB uses "Ocurrencia" with datetime in the same cell
+        "fecha_adm": _compile_all(
+            r"OCURRENCIA[^\n\r]*?(\d{1,2}[\/\-][A-Z]{3}[\/\-]\d{4})",
+            r"OCURRENCIA[^\n\r]*?(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{4})",
+            r"OCURRENCIA[\s:]+(\d{4}-\d{2}-\d{2})",  # ISO: 2026-03-20
+        ),
+        "hr_adm": _compile_all(
+            r"OCURRENCIA[^\n\r]*?(\d{1,2}[:.]\d{2})(?::\d{2})?",
+            r"\b(\d{1,2}[:.]\d{2})(?::\d{2})\b",
+            r"OCURRENCIA[\s:]+\d{4}-\d{2}-\d{2}[\sT]+(\d{2}:\d{2})",  # ISO datetime
+        ),
+    },
+}
+
+# Valores buscados línea por línea (proximidad, sin IGNORECASE)
+_ANY_VALUE_RE = re.compile(r"([^\n\r]{2,50})")
+_FECHA_VALUE_RE = re.compile(r"(\d{2}[\/\-]\d{2}[\/\-]\d{4}|\d{1,2}[\/\s]+[A-Z]{3,9}[\/\s]+\d{4}|\d{4}-\d{2}-\d{2})")
+_HORA_VALUE_RE = re.compile(r"(\d{1,2}[:.]\d{2})")
+_CODE_VALUE_RE = re.compile(r"([A-Z0-9-]{5,20})")
+_NAME_VALUE_RE = re.compile(r"([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})")
+_PHONE_VALUE_RE = re.compile(r"([0-9\s\-\(\)]{8,15})")
+_MARCA_VALUE_RE = re.compile(r"([A-Z][A-Z\s]{1,15})")
+_TIPO_VALUE_RE = re.compile(r"([A-Z][A-Z0-9\s]{1,25})")
+_YEAR_VALUE_RE = re.compile(r"(20\d{2})")
+_COLOR_VALUE_RE = re.compile(r"([A-Z][A-Z\s]{2,15})")
+_SERIE_VALUE_RE = re.compile(r"([A-HJ-NPR-Z0-9]{8,17})")
+_KM_VALUE_RE = re.compile(r"([0-9,.]{1,8})")
+_DESCRIPCION_VALUE_RE = re.compile(r"([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{10,200})")
+
+# Valores buscados en la ventana de contexto (con IGNORECASE)
+_CODE_CONTEXT_RE = re.compile(r"\b([A-Z0-9-]{5,20})\b", re.IGNORECASE)
+_PHONE_CONTEXT_RE = re.compile(r"\b(\d{10}|\d{3}[-\s]\d{3}[-\s]\d{4})\b", re.IGNORECASE)
+
+# Fecha y hora
+_DATE_SEPARATOR_RE = re.compile(r"\s*([\/\-])\s*")
+_MONTH_DATE_RE = re.compile(r"\b(\d{1,2})(?:[\/\-]|\s+)([A-Z]{3})(?:[\/\-]|\s+)(\d{4})\b")
+_SEPARATED_DATE_RE = re.compile(r"\b(\d{2})\s*[|\s]\s*(\d{2})\s*[|\s]\s*(\d{4})\b")
+_NUMERIC_DATE_RE = re.compile(r"\b(\d{2}/\d{2}/\d{4})\b")
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_ISO_TIME_RE = re.compile(r"T(\d{2}:\d{2})")
+_HHMM_RE = re.compile(r"\b(\d{2}:\d{2})\b")
+_TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})")
+_TIME_WITH_SECONDS_RE = re.compile(r"\b(\d{1,2}[:.]\d{2})(?::\d{2})\b", re.IGNORECASE)
+_TIME_OPTIONAL_SECONDS_RE = re.compile(r"\b(\d{1,2}[:.]\d{2})(?::\d{2})?\b")
+_TICKET_DATE_RE = re.compile(r"\b(\d{1,2}/[a-z]{3,9}/\d{4})\b", re.IGNORECASE)
+_TICKET_TIME_RE = re.compile(r"\b(\d{2}:\d{2}:\d{2}|\d{2}:\d{2})\b")
+
+# Correcciones OCR comunes para meses
+MONTH_OCR_FIXES = {
+    "NAR": "MAR",  # OCR confunde M con N
+    "NAY": "MAY",  # OCR confunde M con N
+    "IAR": "MAR",  # OCR confunde M con I
+    "IAY": "MAY",  # OCR confunde M con I
+    "JUN": "JUN",
+    "JUL": "JUL",
+    "AGD": "AGO",  # OCR confunde O con D
+    "AGQ": "AGO",  # OCR confunde O con Q
+    "SEB": "SEP",  # OCR confunde P con B
+    "SET": "SEP",  # OCR confunde P con T
+    "OCT": "OCT",
+    "NOB": "NOV",  # OCR confunde V con B
+    "DIC": "DIC",
+}
+MONTHS = {
+    "ENE": "01",
+    "FEB": "02",
+    "MAR": "03",
+    "ABR": "04",
+    "MAY": "05",
+    "JUN": "06",
+    "JUL": "07",
+    "AGO": "08",
+    "SEP": "09",
+    "OCT": "10",
+    "NOV": "11",
+    "DIC": "12",
+    "JAN": "01",
+    "APR": "04",
+    "AUG": "08",
+    "DEC": "12",
+}
+
+# Reporte
+_REPORTE_PREFIX_RE = re.compile(r"^(REPORTE|REPORT|SINIESTRO|FOLIO)\s*[:\-]?\s*", re.IGNORECASE)
+
+# Nombre del cliente: textos que definitivamente NO son nombres de cliente
+INVALID_NAME_PATTERNS = (
+    "DETALLADO", "AUTOMOTRIZ", "TALLER", "MARINA", "COLLISION", "CENTER",
+    "ASEGURADORA", "SEGUROS", "COMPAÑIA", "DIRECCION", "CIRCUNVALACION",
+    "CALLE", "AVENIDA", "COLONIA", "CIUDAD", "ESTADO", "CP:", "TELEFONO:",
+    "ESTIMADO", "FAVOR", "PRESENTARSE", "CON", "DE", "AJUSTADOR", "AJUSTADOR EXPRESS",
+    "CAMACHO", "LEYVA", "JOB EDUARDO",
+    # Textos de encabezados CHUBB
+    "VALIDO POR", "VALIDO", "CLAVE ACCESO", "FECHA ENTREGA", "IDENTIFICADOR",
+    "VOLANTE DE ADMISION", "VOLANTE DE ADMISIÓN", "Y VALUACION", "Y VALUACIÓN",
+    # Textos del disclaimer CHUBB
+    "OPERACIONES REALIZADAS", "FUERA DE ESTOS", "CANALES", "EVITA CAER",
+    "FRAUDES", "VICTIMA", "DENUNCIA", "GUARDIA NACIONAL", "CHUBB NO SE",
+    "RESPONSABLE POR", "CORREOS DESDE", "DOMINIOS", "DISTINTOS", "OFICIALES",
+    "CHUBB.COM", "CHUBBSERVICIOS.COM", "ALERTA DE FRAUDE", "NUNCA TE PEDIREMOS",
+    "DEPOSITOS", "CUENTAS", "NUESTRO NOMBRE",
+)
+_HAS_DIGIT_RE = re.compile(r"\d")
+_NAME_START_RE = re.compile(r"^[A-ZÁÉÍÓÚÑ]")
+_TWO_WORD_NAME_RE = re.compile(r"^[A-ZÁÉÍÓÚÑ]+\s+[A-ZÁÉÍÓÚÑ]+$")
+_FULL_NAME_RE = re.compile(r"^[A-ZÁÉÍÓÚÑ]+(\s+[A-ZÁÉÍÓÚÑ]+){2,4}$")
+_SIGNATURE_NAME_RE = re.compile(r"[A-ZÁÉÍÓÚÑ ]{6,}")
+_UPPER_LETTER_RE = re.compile(r"[A-ZÁÉÍÓÚÑ]")
+VALID_SHORT_NAME_WORDS = frozenset({"DE", "DEL", "LA", "LOS", "LAS", "Y", "MC", "VON", "VAN"})
+
+# Teléfono y email que son del taller o de la aseguradora, no del cliente
+TALLER_PHONE_PATTERNS = (
+    "6699868513",  # Teléfono del taller La Marina
+    "800800",  # Líneas 800 de Qualitas
+    "8700288",  # Otros números de Qualitas
+    "555481",  # Teléfonos CDMX
+    "555002",
+)
+INSURER_EMAIL_DOMAINS = (
+    "qualitas.com.mx",
+    "qualitas.com",
+    "chubb.com",
+    "chubb.com.mx",
+    "chubbservicios.com",
+    "chubbservicios.com.mx",
+    "gnp.com.mx",
+    "axa.com.mx",
+    "mapfre.com.mx",
+)
+_NON_DIGIT_RE = re.compile(r"\D")
+_EMAIL_RE = re.compile(r"([A-Z0-9._%+\-]+@[A-Z0-9.\-]+\.[A-Z]{2,})", re.IGNORECASE)
+_LOWER_EMAIL_RE = re.compile(r"([a-z0-9._%+\-]+@[a-z0-9.\-]+\.[a-z]{2,})")
+
+# Vehículo
+KNOWN_BRANDS = ("TOYOTA", "NISSAN", "CHEVROLET", "CHEUROLET", "HONDA", "FORD", "KIA", "HYUNDAI", "MAZDA", "JEEP", "VW", "VOLKSWAGEN")
+VEHICLE_LABELS = (
+    "MARCA", "BRAND", "TIPO", "TYPE", "MODELO", "MODEL", "AÑO", "ANO", "YEAR",
+    "KILOMETRAJE", "MILEAGE", "COLOR", "COLOUR", "PLACAS", "PLATES", "TRANSMISION", "TRANSMISSION",
+)
+TICKET_LABELS = ("MARCA", "TIPO", "MODELO", "COLOR", "PLACAS", "SERIE", "ASEGURADO", "CHUBB")
+INVALID_MARCAS = ("TIPO", "TYPE", "MARCA", "BRAND", "MODELO", "MODEL", "AÑO", "ANO", "YEAR", "KILOMETRAJE", "MILEAGE", "PLACAS", "PLATES")
+SYSTEM_MARCAS = ("REGULARIZADO", "OTROS", "OTRO", "VARIOS", "DIFERENTES")
+_CLASSIC_BRAND_RE = re.compile(r"^(CHEVROLET|CHEUROLET|NISSAN|TOYOTA|HONDA|VW|VOLKSWAGEN|FORD|CHRYSLER|KIA|HYUNDAI|MAZDA|JEEP|GMC|CADILLAC|BUICK)$")
+_TABLE_BRAND_RE = re.compile(r"^(NISSAN|TOYOTA|HONDA|VW|VOLKSWAGEN|CHEVROLET|CHEUROLET|FORD|CHRYSLER|KIA|HYUNDAI|MAZDA|JEEP)$", re.IGNORECASE)
+_ANY_BRAND_RE = re.compile(r"^(TOYOTA|NISSAN|CHEVROLET|CHEUROLET|HONDA|FORD|KIA|HYUNDAI|MAZDA|JEEP|VW|VOLKSWAGEN|GMC|CHRYSLER|BUICK|CADILLAC)$")
+_YEAR_LINE_RE = re.compile(r"^(20\d{2})$")
+_YEAR_OR_NUMBER_RE = re.compile(r"^(20\d{2}|\d+)$")
+_KM_OR_LABEL_RE = re.compile(r"^(\d+|KILOMETRAJE|PLACAS)$", re.IGNORECASE)
+_CHUBB_MODELO_RE = re.compile(r"MODELO:\s*(20\d{2})", re.IGNORECASE)
+_YEAR_RE = re.compile(r"(20\d{2})")
+YEAR_CONTEXT_MARKERS = ("NISSAN", "TOYOTA", "HONDA", "MARCA", "TIPO", "MODELO", "CHEVROLET", "CHEUROLET")
+
+# Color
+COLORES_VALIDOS = (
+    "NEGRO", "BLANCO", "GRIS", "PLATA", "ROJO", "AZUL", "VERDE", "AMARILLO",
+    "NARANJA", "CAFE", "MARRON", "BEIGE", "DORADO", "VINO", "TINTO", "GRAFITO",
+    "ACERO", "ARENA", "BLANCO PERLA", "AZUL MARINO", "GRIS OSCURO", "PLATA METALICO",
+)
+# Basado en errores típicos de OCR: K↔R, O↔0, I↔1, etc.
+COLOR_OCR_FIXES = {
+    # Rojo y variantes
+    "KAO": "ROJO",
+    "KAJO": "ROJO",
+    "ROJ": "ROJO",
+    "ROJ0": "ROJO",
+    "R0J0": "ROJO",
+    # Azul y variantes
+    "AZUI": "AZUL",
+    "AZULI": "AZUL",
+    "AZU1": "AZUL",
+    "4ZUL": "AZUL",
+    # Negro y variantes
+    "NEGR": "NEGRO",
+    "NEGR0": "NEGRO",
+    "N3GR0": "NEGRO",
+    # Blanco y variantes
+    "BLANC": "BLANCO",
+    "BLANC0": "BLANCO",
+    "BL4NC0": "BLANCO",
+    # Gris y variantes
+    "GRS": "GRIS",
+    "GRI": "GRIS",
+    "GR1S": "GRIS",
+    # Plata y variantes
+    "PLAT": "PLATA",
+    "PLAT4": "PLATA",
+    "PL4TA": "PLATA",
+    # Verde y variantes
+    "VERD": "VERDE",
+    "VERD3": "VERDE",
+    # Otros
+    "AMARILL": "AMARILLO",
+    "AMAR1LL0": "AMARILLO",
+}
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+_RED_OCR_RE = re.compile(r"^[KR][A-Z0-9]*O$")
+
+# Placas y kilometraje
+INVALID_PLACAS = (
+    # Transmisión
+    "AUTOM", "AUTOMATICA", "AUTOMÁTICA", "MANUAL", "TRANSMISION", "TRANSMISIÓN",
+    # Estados/Municipios
+    "NUEVO", "USADO", "ESTADO", "CIUDAD", "MUNICIPIO",
+    # Coberturas
+    "AMPLIA", "LIMITADA", "DAÑOS", "MATERIALES", "ROBO",
+    # Otros campos del formulario
+    "ORIGINAL", "COPIA", "FOLIO", "REPORTE", "SINIESTRO",
+    # Marcas comunes (si se confunden)
+    "CHEVROLET", "NISSAN", "TOYOTA", "FORD", "HONDA", "VW", "VOLKSWAGEN",
+    # Valores booleanos o estados
+    "SI", "NO", "SÍ", "YES", "TRUE", "FALSE",
+)
+_MONEY_RE = re.compile(r"\$\s*[\d,]+\.?\d*")
+_CENTS_RE = re.compile(r"\.\d{2}$")
+
+# Descripción de daños
+INVALID_DESCRIPCION = (
+    "EN CASO DE INUND", "IN CASE OF FLOOD", "DESCRIBIR", "ANOTAR",
+    "INDICAR", "ESPECIFICAR", "COMPLETAR", "LLENAR",
+)
+SECTION_SKIP_MARKERS = (
+    "EN CASO DE INUND", "IN CASE OF FLOOD", "DESCRIPCION DE DANOS", "DESCRIPTION OF DAMAGES",
+    "LADO DERECHO", "RIGHT SIDE", "LADO IZQUIERDO", "LEFT SIDE", "FRENTE", "POSTERIOR",
+    "NIVEL ", "POSIBLE AGRAVAMIENTO", "SOLO PERDIDA", "ESTRIBO",
+)
+CHUBB_DAMAGE_KEYWORDS = (
+    "FACIA", "FARO", "PUERTA", "DEFENSA", "COFRE", "SALPICADERA",
+    "ESPEJO", "PARRILLA", "TAPA", "COSTADO", "PARACHOQUE",
+    "GUARDAFANGO", "GUARDAFANGOS", "BUMPER", "LAMPARA",
+    "CALAVERA", "MICA", "CRISTAL", "VIDRIO", "REJILLA",
+    "ALERON", "FASCIA", "ESTRIBO", "ROCE", "ABOLLADURA",
+    "GOLPE", "IMPACTO", "RAYON", "RASGUÑO", "QUEBRADO",
+    "ROTO", "DAÑADO", "DAÑO", "COLISION", "CHOQUE",
+)
+QUALITAS_DAMAGE_KEYWORDS = (
+    "SALPICADERA", "ESPEJO", "FARO", "FACIA", "DEFENSA", "PUERTA",
+    "COSTADO", "COFRE", "TOLDO", "CANTONERA", "PARRILLA", "STOP",
+    "ESTRIBO", "PARACHOQUE", "GUARDAFANGO", "GUARDAFANGOS", "BUMPER",
+    "LAMPARA", "CALAVERA", "MICA", "CRISTAL", "VIDRIO", "REJILLA",
+    "ALERON", "FASCIA", "ROCE", "ABOLLADURA", "GOLPE", "IMPACTO",
+    "RAYON", "RASGUÑO", "QUEBRADO", "ROTO", "DAÑADO", "DAÑO",
+    "COLISION", "CHOQUE", "TRASERO", "FRONTAL", "LATERAL", "DERECHO",
+    "IZQUIERDO", "DELANTERO", "POSTERIOR", "CAPOT", "TAPA", "BAUL",
+)
+# Ajuste Express también acepta "PARTE", "TRASERA", ... como indicio de daño
+AJUSTE_EXPRESS_DAMAGE_KEYWORDS = QUALITAS_DAMAGE_KEYWORDS + ("PARTE", "TRASERA", "DELANTERA", "IZQUIERDA", "DERECHA")
+
+# Limpieza de tipo para el catálogo
+_BRAND_PREFIX_RES = tuple(
+    re.compile(rf"^({prefix}\s+)+", re.IGNORECASE)
+    for prefix in ("TY", "TOYOTA", "NISSAN", "CHEVROLET", "CHEV", "FORD", "HONDA", "VW", "VOLKSWAGEN", "KIA", "HYUNDAI", "MAZDA", "JEEP", "GMC", "CHRYSLER")
+)
+_TRAILING_YEAR_RE = re.compile(r"\s+20\d{2}$")
+_TRAILING_4DIGITS_RE = re.compile(r"\s+\d{4}$")
+_TRAILING_DOORS_ENGINE_RE = re.compile(r"\s+\d+P\s+L\d+$", re.IGNORECASE)
+_TRAILING_ENGINE_RE = re.compile(r"\s+L\d+$", re.IGNORECASE)
+_BRAND_MODEL_YEAR_RE = re.compile(r"^([A-Z][A-Z0-9]{1,15})(?:\s+([A-Z][A-Z0-9\s]{2,30}))?\s*(\d{4})?$", re.IGNORECASE)
+_BRAND_THEN_TYPE_RE = re.compile(r"^([A-Z0-9]{2,})(?:\s*\([A-Z0-9]{1,4}\))?\s+(.+)$")
+_CHUBB_CLASS_RE = re.compile(r"\bCLASE\s*([A-Z0-9]+)\b", re.IGNORECASE)
+# Especificaciones de motor, transmisión y equipamiento que CHUBB agrega al tipo
+CHUBB_TECH_SPECS = frozenset({
+    "L3", "L4", "L5", "L6", "V6", "V8", "V12",
+    "IMO", "IMQ", "AUT", "MAN", "MEC", "CVT",
+    "ABS", "CA", "CE", "CC", "TELA", "TEL", "ELA",
+    "SM", "SQ", "CB", "EBD", "ESP", "TCS", "HSA",
+    "4X2", "4X4", "4WD", "2WD", "AWD", "FWD", "RWD",
+    "T", "AT", "MT", "DCT", "DSG",
+    "1", "2", "3", "4", "5", "6", "7", "8", "9", "0",
+})
+
+# Transmisión: casilla marcada junto a la opción
+_CHECK_KV = r"(X|XX|CHECK|SELECT|SI|YES|TRUE|1|■|█|☒|☑)"
+_CHECK_MARK = r"(X|■|█|☒|☑)"
+TRANSMISION_KV_PATTERNS = (
+    (re.compile(rf"AUTOMAT(?:ICA|IC)\s*{_CHECK_KV}"), "Automatica"),
+    (re.compile(rf"MANUAL\s*{_CHECK_KV}"), "Manual"),
+    (re.compile(rf"{_CHECK_MARK}\s*AUTOMAT(?:ICA|IC)"), "Automatica"),
+    (re.compile(rf"{_CHECK_MARK}\s*MANUAL"), "Manual"),
+)
+TRANSMISION_LINE_PATTERNS = (
+    (re.compile(rf"AUTOMAT(?:ICA|IC)\s*{_CHECK_MARK}|{_CHECK_MARK}\s*AUTOMAT(?:ICA|IC)"), "Automatica"),
+    (re.compile(rf"MANUAL\s*{_CHECK_MARK}|{_CHECK_MARK}\s*MANUAL"), "Manual"),
+)
+
+# Etiquetas para from_kv (todos los tokens del grupo en la llave) y from_flexible_kv
+KV_FECHA = (("FECHA", "DATE"), ("FECHA",), ("FECHA", "ADMISION"), ("FECHA", "INGRESO"))
+FLEX_FECHA = _labels("FECHA", "DATE", "FECHA ADMISION", "FECHA INGRESO", "Fecha")
+KV_HORA = (("HORA", "TIME"), ("HORA",), ("HORA", "ADMISION"), ("HORA", "INGRESO"))
+FLEX_HORA = _labels("HORA", "TIME", "HORA ADMISION", "HORA INGRESO")
+KV_OCURRENCIA = (("OCURRENCIA",),)
+KV_REPORTE = (
+    ("REPORTE",), ("REPORT",),
+    ("NUMERO", "REPORTE"), ("NO", "REPORTE"), ("N", "REPORTE"),
+    ("NUMERO", "DE", "REPORTE"), ("NO", "DE", "REPORTE"),
+    ("N", "DE", "REPORTE"), ("N", "REPORTE"),
+)
+FLEX_REPORTE = _labels(
+    "REPORTE", "REPORT",
+    "NUMERO REPORTE", "NO REPORTE", "N REPORTE",
+    "NUMERO DE REPORTE", "NO DE REPORTE", "N DE REPORTE", "Nº REPORTE",
+)
+KV_SINIESTRO = (("SINIESTRO",), ("NUMERO", "SINIESTRO"), ("NO", "SINIESTRO"))
+FLEX_SINIESTRO = _labels("SINIESTRO", "NUMERO SINIESTRO", "NO SINIESTRO", "NUMERO DE SINIESTRO", "FOLIO")
+KV_CLIENTE = (("NOMBRE", "RAZON", "CLIENTE"), ("CUSTOMER", "NAME"), ("NOMBRE", "CLIENTE"), ("CLIENTE",))
+FLEX_CLIENTE = _labels(
+    "NOMBRE", "NOMBRE CLIENTE", "CLIENTE", "CUSTOMER NAME", "NOMBRE O RAZON SOCIAL",
+    "RAZON SOCIAL", "NOMBRE DEL CLIENTE", "Asegurado", "CONTRATANTE", "TITULAR",
+)
+KV_TELEFONO = (("TELEFONO", "PHONE"), ("TELEFONO",), ("TEL", "CLIENTE"), ("CELULAR",))
+FLEX_TELEFONO = _labels(
+    "TELEFONO", "PHONE", "TEL", "CELULAR", "TELEFONO CLIENTE", "TELEFONO DEL CLIENTE",
+    "TEL CLIENTE", "CELULAR CLIENTE",
+)
+KV_EMAIL = (("E", "MAIL"), ("EMAIL",), ("CORREO",), ("E-MAIL",))
+FLEX_EMAIL = _labels("EMAIL", "E-MAIL", "E MAIL", "CORREO", "CORREO ELECTRONICO", "EMAIL CLIENTE")
+KV_MARCA = (("MARCA", "BRAND"), ("MARCA",), ("MARCA", "VEHICULO"))
+FLEX_MARCA = _labels("MARCA", "BRAND", "MARCA VEHICULO", "MARCA DEL VEHICULO", "MARCA AUTO")
+KV_TIPO = (("TIPO", "TYPE"), ("TIPO",), ("TIPO", "VEHICULO"), ("MODELO", "TIPO"))
+FLEX_TIPO = _labels("TIPO", "TYPE", "TIPO VEHICULO", "TIPO DE VEHICULO", "MODELO", "SUBMARCA", "LINEA", "VERSION")
+KV_MODELO = (("MODELO",), ("AÑO",), ("ANIO",), ("YEAR",))
+FLEX_MODELO = _labels("MODELO", "MODELO/AÑO", "MODELO/ANIO", "AÑO MODELO", "ANIO MODELO", "YEAR", "MODEL YEAR")
+KV_COLOR = (("COLOR", "COLOUR"), ("COLOR",))
+FLEX_COLOR = _labels("COLOR", "COLOUR", "COLOR VEHICULO", "COLOR DEL VEHICULO")
+KV_SERIE = (("SERIE",), ("VIN",), ("NO", "SERIE"), ("NUMERO", "SERIE"))
+FLEX_SERIE = _labels("SERIE", "VIN", "NUMERO DE SERIE", "NO SERIE", "N SERIE", "SERIE VEHICULO")
+KV_PLACAS = (("PLACAS", "LICENSE"), ("PLACAS",), ("PLACA", "LICENSE"), ("PLACA",))
+FLEX_PLACAS = _labels("PLACAS", "PLACA", "LICENSE PLATE", "NO PLACAS", "NUMERO PLACAS")
+KV_KILOMETRAJE = (("KILOMETRAJE", "MILEAGE"), ("KILOMETRAJE",), ("KM",))
+FLEX_KILOMETRAJE = _labels("KILOMETRAJE", "MILEAGE", "KM", "KMS", "KILOMETROS", "ODOMETRO")
+
+
+# ========== VALIDACIONES Y NORMALIZACIONES ==========
+
+def normalize_time(raw_value: str) -> str:
+    if not raw_value:
+        return ""
+    match = _TIME_RE.search(raw_value)
+    if not match:
+        return ""
+    hour = int(match.group(1))
+    minute = int(match.group(2))
+    if hour > 23 or minute > 59:
+        return ""
+    return f"{hour:02d}:{minute:02d}"
+
+
+def normalize_date(raw_value: str) -> str:
+    raw = normalize_ocr_text(raw_value or "")
+    if not raw:
+        return ""
+    raw = _DATE_SEPARATOR_RE.sub(r"\1", raw)
+
+    # Direct numeric formats.
+    candidate = raw.replace("-", "/")
+    for fmt in ("%d/%m/%Y", "%d/%m/%y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(candidate, fmt).date().isoformat()
+        except ValueError:
+            continue
+
+    # ISO format: 2026-03-26
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        pass
+
+    # Formats with month names, e.g. 12/dic/2025.
+    raw_fixed = raw.upper()
+    for wrong, correct in MONTH_OCR_FIXES.items():
+        raw_fixed = raw_fixed.replace(wrong, correct)
+
+    month_match = _MONTH_DATE_RE.search(normalize_key_label(raw_fixed))
+    if month_match:
+        day = int(month_match.group(1))
+        month = MONTHS.get(month_match.group(2))
+        year = int(month_match.group(3))
+        if month:
+            try:
+                return datetime(year=year, month=int(month), day=day).date().isoformat()
+            except ValueError:
+                return ""
+
+    # Qualitas format with date fields separated: 21 | 03 | 2026 or 21 03 2026
+    separated_match = _SEPARATED_DATE_RE.search(raw)
+    if separated_match:
+        day, month, year = separated_match.groups()
+        try:
+            return datetime(year=int(year), month=int(month), day=int(day)).date().isoformat()
+        except ValueError:
+            return ""
+
+    return ""
+
+
+def is_valid_name(candidate: str) -> bool:
+    """Valida que el candidato parezca un nombre de persona real."""
+    if not candidate or len(candidate) < 3:
+        return False
+    candidate_upper = candidate.upper()
+    if any(invalid in candidate_upper for invalid in INVALID_NAME_PATTERNS):
+        return False
+    # Debe tener al menos dos palabras (nombre y apellido), sin números y empezar con mayúscula
+    words = candidate.split()
+    if len(words) < 2:
+        return False
+    if _HAS_DIGIT_RE.search(candidate):
+        return False
+    if not _NAME_START_RE.match(candidate):
+        return False
+    # RECHAZAR ACRÓNIMOS: nombres reales típicamente tienen al menos algunas palabras de 4+ letras
+    short_words = [w for w in words if len(w) <= 3]
+    long_words = [w for w in words if len(w) >= 4]
+    if len(short_words) > len(words) / 2 and len(long_words) < 2:
+        return False
+    return True
+
+
+def is_valid_client_phone(phone: str) -> bool:
+    """Valida que el teléfono sea del cliente, no del taller o aseguradora."""
+    if not phone:
+        return False
+    digits = _NON_DIGIT_RE.sub("", phone)
+    if any(pattern in digits for pattern in TALLER_PHONE_PATTERNS):
+        return False
+    return len(digits) >= 10
+
+
+def is_valid_client_email(email: str) -> bool:
+    """Valida que el email sea del cliente, no de la aseguradora."""
+    if not email:
+        return False
+    email_lower = email.lower()
+    return not any(domain in email_lower for domain in INSURER_EMAIL_DOMAINS)
+
+
+def is_invalid_marca(marca: str) -> bool:
+    """Determina si la marca es inválida (etiqueta u otro campo)."""
+    if not marca:
+        return True
+    marca_upper = marca.upper()
+    if marca_upper in INVALID_MARCAS:
+        return True
+    # Si más de la mitad de las palabras son etiquetas (ej: "TIPO TYPE", "MARCA BRAND"), es inválida
+    marca_words = marca_upper.split()
+    invalid_words = [w for w in marca_words if w in INVALID_MARCAS]
+    return len(invalid_words) > 0 and len(invalid_words) >= len(marca_words) / 2
+
+
+def clean_tipo_for_catalog(tipo: str, anio: str) -> str:
+    """
+    Limpia el campo tipo para facilitar fuzzy matching con catálogo.
+    Quita la marca del inicio y el año del final si están presentes.
+    Ej: "TY TOYOTA COROLLA BASE 4P L4 2017" → "COROLLA BASE"
+    """
+    if not tipo:
+        return tipo
+
+    tipo_clean = tipo.strip()
+    for prefix_re in _BRAND_PREFIX_RES:
+        tipo_clean = prefix_re.sub("", tipo_clean).strip()
+
+    if anio and tipo_clean.endswith(anio):
+        tipo_clean = tipo_clean[: -len(anio)].strip()
+    tipo_clean = _TRAILING_YEAR_RE.sub("", tipo_clean).strip()
+
+    # Sufijos de especificación técnica como "4P L4" o "L4"
+    tipo_clean = _TRAILING_DOORS_ENGINE_RE.sub("", tipo_clean).strip()
+    tipo_clean = _TRAILING_ENGINE_RE.sub("", tipo_clean).strip()
+
+    return tipo_clean if tipo_clean else tipo
+
+
+# ========== PARSER ==========
+
+def parse_orden_fields(doc: OcrDocument) -> tuple[dict, dict]:
+    aseguradora = detect_aseguradora(doc.upper_text)
+    insurer_patterns = INSURER_PATTERNS.get(aseguradora, {})
+    lines = doc.lines
+    upper = doc.upper
+    total = len(lines)
+    field_debug: dict[str, str] = {}
+
+    def from_kv(field_name: str, candidates: tuple[tuple[str, ...], ...]) -> str:
+        value, source = doc.pick_kv(candidates)
+        if value:
+            field_debug[field_name] = f"kv:{source}"
+        return value
+
+    def from_regex(field_name: str, patterns: tuple[re.Pattern, ...]) -> str:
+        value = doc.search_text(patterns)
+        if value:
+            field_debug[field_name] = "regex"
+        return value
+
+    def from_flexible_kv(field_name: str, possible_labels: tuple[tuple[str, frozenset[str]], ...]) -> str:
+        value, source = doc.flexible_kv(possible_labels)
+        if value:
+            field_debug[field_name] = f"flexible_kv:{source}"
+        return value
+
+    def from_proximity(field_name: str, label_patterns: tuple[str, ...], **kwargs) -> str:
+        value = doc.near_label(label_patterns, **kwargs)
+        if value:
+            field_debug[field_name] = "proximity"
+        return value
+
+    def from_context(field_name: str, context_keywords: tuple[str, ...], value_pattern: re.Pattern, **kwargs) -> str:
+        value = doc.in_context(context_keywords, value_pattern, **kwargs)
+        if value:
+            field_debug[field_name] = "context"
+        return value
+
+    def detect_transmision() -> str:
+        # Try KV first for documents where checkbox state is included in form extraction.
+        for entry in doc.kv_entries:
+            if "TRANSMISION" not in entry.key and "TRANSMISSION" not in entry.key:
+                continue
+            combined = normalize_key_label(f"{entry.source} {entry.value}")
+            for pattern, value in TRANSMISION_KV_PATTERNS:
+                if pattern.search(combined):
+                    return value
+
+        # Fallback using OCR lines around "Transmision".
+        label_lines = doc.label_lines if lines else []
+        for idx in doc.find_label("TRANSMISION", "TRANSMISSION") if lines else ():
+            window = " ".join(label_lines[idx : idx + 4])
+            for pattern, value in TRANSMISION_LINE_PATTERNS:
+                if pattern.search(window):
+                    return value
+
+        # Geometry fallback: link selected checkbox to nearest transmission label.
+        labels = [
+            item
+            for item in (doc.meta.get("word_boxes") or [])
+            if "AUTOMAT" in str(item.get("norm") or "") or "MANUAL" in str(item.get("norm") or "")
+        ]
+        checks = doc.meta.get("selected_boxes") or []
+        if labels and checks:
+            best_label = ""
+            best_score = None
+            for check in checks:
+                cx = check["left"] + (check["width"] / 2)
+                cy = check["top"] + (check["height"] / 2)
+                for label in labels:
+                    lx = float(label.get("left", 0.0)) + (float(label.get("width", 0.0)) / 2)
+                    ly = float(label.get("top", 0.0)) + (float(label.get("height", 0.0)) / 2)
+                    # Favor same-row matches and near-horizontal checkboxes.
+                    score = ((cx - lx) ** 2) + (((cy - ly) * 1.8) ** 2)
+                    if best_score is None or score < best_score:
+                        best_score = score
+                        best_label = str(label.get("norm") or "")
+            if best_label:
+                if "AUTOMAT" in best_label:
+                    field_debug["transmision"] = "geometry_checkbox"
+                    return "Automatica"
+                if "MANUAL" in best_label:
+                    field_debug["transmision"] = "geometry_checkbox"
+                    return "Manual"
+        return ""
+
+    # ========== FECHA ==========
+    raw_fecha = (
+        from_kv("fecha_adm", KV_FECHA)
+        or from_flexible_kv("fecha_adm", FLEX_FECHA)
+        or from_regex("fecha_adm", PATTERNS["fecha_adm"])
+        or from_proximity(
+            "fecha_adm",
+            ("FECHA", "DATE", "FECHA ADMISION"),
+            max_lines_after=2,
+            value_pattern=_FECHA_VALUE_RE,
+            exclude_patterns=("HORA", "TIME", "REPORTE", "SINIESTRO"),
+        )
+    )
+
+    # Fallback para Qualitas con campos separados: 21 | 03 | 2026
+    if not raw_fecha:
+        for idx in doc.find("FECHA"):
+            for next_line in lines[idx : idx + 3]:
+                separated_match = _SEPARATED_DATE_RE.search(next_line)
+                if separated_match:
+                    raw_fecha = "/".join(separated_match.groups())
+                    field_debug["fecha_adm"] = "qualitas_separated_fields"
+                    break
+            if raw_fecha:
+                break
+
+    # Formato bilingüe: "FECHA DATE" y la fecha en alguna de las siguientes líneas
+    if not raw_fecha:
+        for idx in doc.find("FECHA"):
+            line_upper = upper[idx]
+            if not ("DATE" in line_upper or "HORA" in line_upper or "TIME" in line_upper):
+                continue
+            for next_idx in range(idx + 1, min(idx + 5, total)):
+                # Saltar líneas que son otras etiquetas
+                if any(label in upper[next_idx] for label in ("HORA", "TIME", "PÓLIZA", "POLICY", "ENDOSO", "ENDORSEMENT")):
+                    continue
+                fecha_match = _NUMERIC_DATE_RE.search(lines[next_idx])
+                if fecha_match:
+                    raw_fecha = fecha_match.group(1)
+                    field_debug["fecha_adm"] = "qualitas_bilingual_date"
+                    break
+            if raw_fecha:
+                break
+
+    fecha_iso = normalize_date(raw_fecha)
+
+    # ========== HORA ==========
+    raw_hora = (
+        from_kv("hr_adm", KV_HORA)
+        or from_flexible_kv("hr_adm", FLEX_HORA)
+        or from_regex("hr_adm", PATTERNS["hr_adm"])
+        or from_proximity(
+            "hr_adm",
+            ("HORA", "TIME", "HORA ADMISION"),
+            max_lines_after=2,
+            value_pattern=_HORA_VALUE_RE,
+            exclude_patterns=("FECHA", "DATE", "REPORTE", "SINIESTRO"),
+        )
+    )
+
+    # Fallback para Qualitas Ajuste Express: hora en la línea de la fecha ISO o la siguiente
+    if not raw_hora:
+        for idx, line in enumerate(lines):
+            if not _ISO_DATE_RE.search(line):
+                continue
+            time_match = _ISO_TIME_RE.search(line)
+            if time_match:
+                raw_hora = time_match.group(1)
+                field_debug["hr_adm"] = "iso_datetime"
+                break
+            for next_line in lines[idx : idx + 2]:
+                time_match = _HHMM_RE.search(next_line)
+                if time_match:
+                    raw_hora = time_match.group(1)
+                    field_debug["hr_adm"] = "near_date"
+                    break
+            if raw_hora:
+                break
+    hora = normalize_time(raw_hora)
+
+    if aseguradora == "CHUBB":
+        # CHUBB uses "Ocurrencia" with datetime in the same cell; prefer it over generic FECHA.
+        raw_ocurrencia_fecha = from_kv("fecha_adm", KV_OCURRENCIA) or from_regex("fecha_adm", insurer_patterns["fecha_adm"])
+        ocurrencia_iso = normalize_date(raw_ocurrencia_fecha)
+        if ocurrencia_iso:
+            fecha_iso = ocurrencia_iso
+            field_debug["fecha_adm"] = "ocurrencia_datetime"
+
+        raw_ocurrencia_hora = from_regex("hr_adm", insurer_patterns["hr_adm"])
+        if not raw_ocurrencia_hora:
+            match = _TIME_WITH_SECONDS_RE.search(doc.text)
+            if match:
+                raw_ocurrencia_hora = match.group(1)
+        if not raw_ocurrencia_hora:
+            for idx in doc.find("OCURRENCIA"):
+                for candidate in lines[idx : idx + 4]:
+                    match = _TIME_OPTIONAL_SECONDS_RE.search(candidate)
+                    if match:
+                        raw_ocurrencia_hora = match.group(1)
+                        break
+                if raw_ocurrencia_hora:
+                    break
+        if not raw_ocurrencia_hora and raw_ocurrencia_fecha:
+            raw_ocurrencia_hora = raw_ocurrencia_fecha
+        ocurrencia_hora = normalize_time(raw_ocurrencia_hora)
+        if ocurrencia_hora:
+            hora = ocurrencia_hora
+            field_debug["hr_adm"] = "ocurrencia_datetime"
+
+        # Ticket vertical: línea que empieza con fecha tipo "20/mar/2026"
+        if not fecha_iso:
+            for line in lines:
+                match = _TICKET_DATE_RE.search(line)
+                if match:
+                    fecha_iso = normalize_date(match.group(1))
+                    if fecha_iso:
+                        field_debug["fecha_adm"] = "chubb_ticket_date_line"
+                        break
+
+        # Hora HH:MM:SS o HH:MM en la línea de Ocurrencia o la siguiente
+        if not hora:
+            for idx in doc.find("OCURRENCIA"):
+                for j in range(idx, min(idx + 2, total)):
+                    time_match = _TICKET_TIME_RE.search(lines[j])
+                    if time_match:
+                        hora = normalize_time(time_match.group(1))
+                        if hora:
+                            field_debug["hr_adm"] = "chubb_ticket_time"
+                            break
+                if hora:
+                    break
+
+    if not hora:
+        # Last-resort for documents where HORA/Ocurrencia keys are split by OCR.
+        for line in lines:
+            match = _TIME_OPTIONAL_SECONDS_RE.search(line)
+            if match:
+                hora = normalize_time(match.group(1))
+                if hora:
+                    field_debug["hr_adm"] = "line_time_fallback"
+                    break
+
+    # ========== REPORTE/SINIESTRO ==========
+    # Qualitas Ajuste Express tiene N° REPORTE y N° SINIESTRO separados: se prefiere REPORTE
+    reporte = from_kv("reporte_siniestro", KV_REPORTE) or from_flexible_kv("reporte_siniestro", FLEX_REPORTE)
+    if not reporte:
+        reporte = from_regex("reporte_siniestro", PATTERNS["reporte"])
+
+    # SINIESTRO como fallback
+    if not reporte:
+        reporte = (
+            from_kv("reporte_siniestro", KV_SINIESTRO)
+            or from_flexible_kv("reporte_siniestro", FLEX_SINIESTRO)
+            or from_regex("reporte_siniestro", PATTERNS["siniestro"])
+        )
+        if reporte:
+            field_debug["reporte_siniestro"] = "extracted_from_siniestro_fallback"
+
+    # Búsqueda en líneas por proximidad y contexto
+    if not reporte:
+        reporte = (
+            from_proximity(
+                "reporte_siniestro",
+                ("REPORTE", "REPORT"),
+                max_lines_after=2,
+                value_pattern=_CODE_VALUE_RE,
+                exclude_patterns=("FECHA", "HORA", "TELEFONO", "EMAIL", "FOLIO ELECTRONICO", "SINIESTRO"),
+            )
+            or from_context(
+                "reporte_siniestro",
+                ("REPORTE", "SINIESTRO", "FOLIO"),
+                value_pattern=_CODE_CONTEXT_RE,
+                window_size=3,
+            )
+        )
+
+    # Limpiar el reporte - quitar prefijos comunes
+    if reporte:
+        reporte = _REPORTE_PREFIX_RE.sub("", reporte).strip()
+
+    # ========== NOMBRE DEL CLIENTE ==========
+    # Qualitas Ajuste Express: el asegurado va arriba del bloque de firmas
+    #   EVELIN DOMINGUEZ              <- Línea N (asegurado)
+    #   CAMACHO LEYVA JOB EDUARDO     <- Línea N+1 (ajustador)
+    #   FIRMA DEL CONDUCTOR ASEGURADO <- Línea N+2 (etiqueta)
+    #   FIRMA DEL AJUSTADOR EXPRESS   <- Línea N+3 (etiqueta)
+    nb_cliente = ""
+    if aseguradora == "Qualitas" and lines:
+        for label_idx in doc.find("FIRMA DEL CONDUCTOR"):
+            idx = label_idx - 2
+            if idx < 0 or label_idx + 1 >= total or "FIRMA DEL AJUSTADOR" not in upper[label_idx + 1]:
+                continue
+            if len(lines[idx]) > 3 and len(lines[idx + 1]) > 3 and is_valid_name(lines[idx]):
+                nb_cliente = lines[idx]
+                field_debug["nb_cliente"] = "qualitas_firma_pattern_exact"
+                break
+
+        # "FIRMA DEL CONDUCTOR ASEGURADO" y subir 2 líneas (en medio va el ajustador)
+        if not nb_cliente:
+            for idx in doc.find("FIRMA DEL CONDUCTOR ASEGURADO"):
+                if idx >= 2 and is_valid_name(lines[idx - 2]):
+                    nb_cliente = lines[idx - 2]
+                    field_debug["nb_cliente"] = "qualitas_firma_2lines_up"
+                    break
+
+        # Último recurso: nombre de dos palabras en las últimas 10 líneas
+        if not nb_cliente:
+            for candidate in lines[-10:]:
+                candidate_upper = candidate.upper()
+                if (
+                    len(candidate) > 5
+                    and _TWO_WORD_NAME_RE.match(candidate)
+                    and not _HAS_DIGIT_RE.search(candidate)
+                    and "CAMACHO" not in candidate_upper
+                    and "JOB" not in candidate_upper
+                    and "LEYVA" not in candidate_upper
+                    and is_valid_name(candidate)
+                ):
+                    nb_cliente = candidate
+                    field_debug["nb_cliente"] = "qualitas_last_lines"
+                    break
+
+    # CHUBB ticket vertical: "Asegurado:" y el nombre en la línea siguiente, solo
+    # después de "Datos Vehículo" para evitar el encabezado
+    if not nb_cliente and aseguradora == "CHUBB" and lines:
+        datos_vehiculo_idx = doc.first("DATOS VEHICULO", "DATOS VEHÍCULO")
+        if datos_vehiculo_idx >= 0:
+            for i in range(datos_vehiculo_idx, min(datos_vehiculo_idx + 15, total)):
+                if "ASEGURADO" in upper[i] and ":" in lines[i] and i + 1 < total:
+                    # Validación simplificada para CHUBB: nombre en mayúsculas con 3-6 palabras
+                    candidate = lines[i + 1]
+                    words = candidate.split()
+                    if 3 <= len(words) <= 6 and candidate == candidate.upper() and all(w.isalpha() for w in words):
+                        nb_cliente = candidate
+                        field_debug["nb_cliente"] = "chubb_ticket_asegurado_line"
+                        break
+
+        # Fallback: nombre completo típico (3-5 palabras en mayúsculas)
+        if not nb_cliente:
+            for candidate in lines:
+                if _FULL_NAME_RE.match(candidate) and is_valid_name(candidate):
+                    nb_cliente = candidate
+                    field_debug["nb_cliente"] = "chubb_ticket_name_pattern"
+                    break
+
+    # ========== ESTRATEGIAS GENÉRICAS (solo si no se encontró en específicas) ==========
+    if not nb_cliente:
+        nb_cliente = from_kv("nb_cliente", KV_CLIENTE) or from_flexible_kv("nb_cliente", FLEX_CLIENTE)
+        if nb_cliente and not is_valid_name(nb_cliente):
+            nb_cliente = ""
+
+    if not nb_cliente:
+        nb_cliente = from_regex("nb_cliente", PATTERNS["nb_cliente"])
+        if nb_cliente and not is_valid_name(nb_cliente):
+            nb_cliente = ""
+
+    if not nb_cliente:
+        candidate = from_proximity(
+            "nb_cliente",
+            ("NOMBRE", "CLIENTE", "ASEGURADO", "CONTRATANTE", "ASEGURADO:"),
+            max_lines_after=2,
+            value_pattern=_NAME_VALUE_RE,
+            exclude_patterns=("TELEFONO", "EMAIL", "DIRECCION", "POLIZA", "CHUBB", "TALLER"),
+        )
+        if candidate and is_valid_name(candidate):
+            nb_cliente = candidate
+
+    # ========== TELÉFONO ==========
+    tel_cliente = (
+        from_kv("tel_cliente", KV_TELEFONO)
+        or from_flexible_kv("tel_cliente", FLEX_TELEFONO)
+        or from_regex("tel_cliente", PATTERNS["tel_cliente"])
+        or from_proximity(
+            "tel_cliente",
+            ("TELEFONO", "PHONE", "TEL", "CELULAR"),
+            max_lines_after=2,
+            value_pattern=_PHONE_VALUE_RE,
+            exclude_patterns=("FECHA", "HORA", "REPORTE", "EMAIL"),
+        )
+        or from_context(
+            "tel_cliente",
+            ("TELEFONO", "PHONE", "TEL", "CONTACTO"),
+            value_pattern=_PHONE_CONTEXT_RE,
+            window_size=3,
+        )
+    )
+
+    if tel_cliente and not is_valid_client_phone(tel_cliente):
+        tel_cliente = ""
+        field_debug["tel_cliente"] = "rejected_taller_phone"
+
+    # Qualitas OCR often has multiple phone labels; prioritize the phone tied to the customer block.
+    customer_idx = doc.first("NOMBRE O RAZON SOCIAL DEL CLIENTE", "CUSTOMER NAME OR CORPORATE NAME")
+    if customer_idx >= 0:
+        email_label_idx = next((idx for idx in doc.find("E MAIL", "EMAIL") if idx >= customer_idx), -1)
+        start = customer_idx + 1
+        stop = email_label_idx if email_label_idx > start else min(start + 8, total)
+        contextual_phone = ""
+        for idx in range(start, max(start, stop)):
+            digits = _NON_DIGIT_RE.sub("", lines[idx])
+            if len(digits) >= 10 and "POLIZA" not in upper[idx] and "TEL" not in upper[idx]:
+                contextual_phone = digits
+                break
+        if contextual_phone:
+            tel_cliente = contextual_phone
+            field_debug["tel_cliente"] = "lines_after_customer_header"
+
+    tel_cliente = _NON_DIGIT_RE.sub("", tel_cliente or "")
+    if len(tel_cliente) > 10:
+        tel_cliente = tel_cliente[-10:]
+
+    # ========== EMAIL ==========
+    email_cliente = from_kv("email_cliente", KV_EMAIL) or from_flexible_kv("email_cliente", FLEX_EMAIL)
+    if email_cliente and not is_valid_client_email(email_cliente):
+        email_cliente = ""
+
+    # Cualquier email en el texto si no se encontró por KV
+    if not email_cliente:
+        email_match = _EMAIL_RE.search(doc.upper_text)
+        if email_match:
+            candidate = email_match.group(1).lower()
+            if is_valid_client_email(candidate):
+                email_cliente = candidate
+                field_debug["email_cliente"] = "regex_global"
+
+    # Email en las líneas después de la etiqueta
+    if not email_cliente:
+        email_idx = doc.first("E MAIL", "EMAIL", "CORREO", "E-MAIL")
+        if email_idx >= 0:
+            for line in lines[email_idx + 1 : email_idx + 6]:
+                if "@" in line:
+                    possible = line.lower()
+                    if _LOWER_EMAIL_RE.search(possible) and is_valid_client_email(possible):
+                        email_cliente = possible
+                        field_debug["email_cliente"] = "line_after_email_label"
+                        break
+
+    # Email en el contexto del nombre del cliente
+    if not email_cliente and nb_cliente:
+        for idx in doc.find(nb_cliente):
+            for next_line in lines[idx : idx + 5]:
+                email_match = _LOWER_EMAIL_RE.search(next_line.lower())
+                if email_match:
+                    candidate = email_match.group(1)
+                    if is_valid_client_email(candidate):
+                        email_cliente = candidate
+                        field_debug["email_cliente"] = "context_after_name"
+                        break
+            if email_cliente:
+                break
+
+    email_cliente = email_cliente.lower()
+
+    # ========== INFORMACIÓN DEL VEHÍCULO ==========
+
+    def extract_ticket_field(label_patterns: tuple[str, ...], max_lines: int = 2) -> str:
+        """Formato ticket vertical (CHUBB): "Marca:" al final de una línea y el valor en la siguiente."""
+        patterns = tuple(pattern.upper() for pattern in label_patterns)
+        for idx, line_upper in enumerate(upper):
+            stripped = line_upper.rstrip(":")
+            for pattern_upper in patterns:
+                if not (stripped.endswith(pattern_upper) or line_upper == pattern_upper):
+                    continue
+                for j in range(1, min(max_lines + 1, total - idx)):
+                    # Evitar líneas que sean otras etiquetas
+                    if not upper[idx + j].startswith(TICKET_LABELS):
+                        return lines[idx + j]
+        return ""
+
+    modelo_anio = ""
+    marca_vehiculo = ""
+    tipo_vehiculo = ""
+    color_vehiculo = ""
+    placas = ""
+    kilometraje = ""
+
+    if aseguradora == "Qualitas" and lines:
+        # ========== FORMATO QUALITAS AUTOMÓVILES (CLÁSICO) ==========
+        # Encabezados MARCA -> TIRO/TIPO -> MODELO (AÑO) -> KILOMETRAJE seguidos de los valores
+        marca_idx = next((idx for idx in doc.find("MARCA") if upper[idx] == "MARCA"), -1)
+
+        if marca_idx >= 0:
+            header_window = range(marca_idx, min(marca_idx + 5, total))
+            is_bilingual = any("BRAND" in upper[j] or "TYPE" in upper[j] for j in header_window)
+            has_tipo = any("TIPO" in upper[i] or "TIRO" in upper[i] or "TYPE" in upper[i] for i in header_window)
+            has_modelo = any(
+                "MODELO" in upper[i] and ("AÑO" in upper[i] or "ANO" in upper[i] or "YEAR" in upper[i])
+                for i in header_window
+            )
+
+            if has_tipo and has_modelo:
+                # Valores debajo de los encabezados: CHEVROLET, SILVERADO, 2014, (vacío)
+                # o bilingüe: TOYOTA, TY TOYOTA COROLLA..., 2017
+                candidates_start = marca_idx + 4
+                for i in range(candidates_start, min(candidates_start + 10, total)):
+                    line = lines[i]
+                    line_upper = upper[i]
+
+                    # Saltar etiquetas ("MARCA BRAND", "TIPO TYPE"...) salvo que traigan una marca conocida
+                    is_label = any(
+                        line_upper == pattern or line_upper.startswith(pattern + " ") or (" " + pattern) in line_upper
+                        for pattern in VEHICLE_LABELS
+                    ) and not any(brand in line_upper for brand in KNOWN_BRANDS)
+                    if is_label:
+                        continue
+
+                    if not marca_vehiculo and _CLASSIC_BRAND_RE.search(line_upper):
+                        marca_vehiculo = line.replace("CHEUROLET", "CHEVROLET")  # Corrección OCR común
+                        field_debug["marca_vehiculo"] = "qualitas_bilingual_marca" if is_bilingual else "qualitas_classic_marca"
+                        continue
+
+                    if is_bilingual and not marca_vehiculo and line_upper in KNOWN_BRANDS:
+                        marca_vehiculo = line.replace("CHEUROLET", "CHEVROLET")
+                        field_debug["marca_vehiculo"] = "qualitas_bilingual_marca"
+                        continue
+
+                    # Tipo: línea después de marca, no es año ni número ni etiqueta
+                    if marca_vehiculo and not tipo_vehiculo:
+                        if any(label in line_upper for label in VEHICLE_LABELS):
+                            continue
+                        if not _YEAR_OR_NUMBER_RE.match(line) and len(line) > 2:
+                            tipo_vehiculo = line
+                            field_debug["tipo_vehiculo"] = "qualitas_bilingual_tipo" if is_bilingual else "qualitas_classic_tipo"
+                            continue
+
+                    if not modelo_anio and _YEAR_LINE_RE.match(line):
+                        if 1990 <= int(line) <= 2030:
+                            modelo_anio = line
+                            field_debug["modelo_anio"] = "qualitas_bilingual_year" if is_bilingual else "qualitas_classic_year"
+                            continue
+
+        # ========== FORMATO QUALITAS AJUSTE EXPRESS ==========
+        # NISSAN / NISSAN X-TRAIL ADVANCE / 2017 / 0
+        if not modelo_anio:
+            for idx in range(total - 3):
+                if (
+                    _TABLE_BRAND_RE.search(lines[idx])
+                    and len(lines[idx + 1]) > 5
+                    and _YEAR_LINE_RE.match(lines[idx + 2])
+                    and _KM_OR_LABEL_RE.match(lines[idx + 3])
+                ):
+                    modelo_anio = lines[idx + 2]
+                    field_debug["modelo_anio"] = "qualitas_table_pattern"
+                    break
+
+            # Línea que es solo un año con datos del vehículo en las líneas anteriores
+            if not modelo_anio:
+                for idx, line in enumerate(lines):
+                    if _YEAR_LINE_RE.match(line) and 2010 <= int(line) <= 2030:
+                        context = " ".join(upper[max(0, idx - 3) : idx])
+                        if any(marker in context for marker in YEAR_CONTEXT_MARKERS):
+                            modelo_anio = line
+                            field_debug["modelo_anio"] = "qualitas_year_in_context"
+                            break
+
+    # ========== ESTRATEGIA ESPECÍFICA PARA CHUBB (AÑO DEL MODELO) ==========
+    # CHUBB tiene "Modelo:2024" en los datos del vehículo, separado de la fecha de ocurrencia
+    if not modelo_anio and aseguradora == "CHUBB":
+        for idx in doc.find("MODELO:"):
+            year_match = _CHUBB_MODELO_RE.search(lines[idx])
+            if year_match:
+                modelo_anio = year_match.group(1)
+                field_debug["modelo_anio"] = "chubb_modelo_year"
+                break
+            if idx + 1 < total:
+                year_match = _YEAR_LINE_RE.match(lines[idx + 1])
+                if year_match:
+                    modelo_anio = year_match.group(1)
+                    field_debug["modelo_anio"] = "chubb_modelo_next_line"
+                    break
+
+    # ========== MARCA ==========
+    if not marca_vehiculo:
+        marca_vehiculo = (
+            from_kv("marca_vehiculo", KV_MARCA)
+            or from_flexible_kv("marca_vehiculo", FLEX_MARCA)
+            or from_regex("marca_vehiculo", PATTERNS["marca_vehiculo"])
+            or from_proximity(
+                "marca_vehiculo",
+                ("MARCA", "BRAND"),
+                max_lines_after=1,
+                value_pattern=_MARCA_VALUE_RE,
+                exclude_patterns=("TIPO", "MODELO", "COLOR", "SERIE"),
+            )
+            or (aseguradora == "CHUBB" and extract_ticket_field(("Marca", "MARCA")))
+        )
+
+    # ========== TIPO ==========
+    if not tipo_vehiculo:
+        tipo_vehiculo = (
+            from_kv("tipo_vehiculo", KV_TIPO)
+            or from_flexible_kv("tipo_vehiculo", FLEX_TIPO)
+            or from_regex("tipo_vehiculo", PATTERNS["tipo_vehiculo"])
+            or from_proximity(
+                "tipo_vehiculo",
+                ("TIPO", "TYPE", "LINEA", "SUBMARCA"),
+                max_lines_after=1,
+                value_pattern=_TIPO_VALUE_RE,
+                exclude_patterns=("MARCA", "MODELO", "COLOR", "SERIE", "PLACAS"),
+            )
+            or (aseguradora == "CHUBB" and extract_ticket_field(("Tipo", "TIPO")))
+        )
+
+    # ========== AÑO ==========
+    if not modelo_anio:
+        modelo_anio = (
+            from_kv("modelo_anio", KV_MODELO)
+            or from_flexible_kv("modelo_anio", FLEX_MODELO)
+            or from_regex("modelo_anio", PATTERNS["modelo_anio"])
+            or from_proximity(
+                "modelo_anio",
+                ("MODELO", "AÑO", "ANIO"),
+                max_lines_after=1,
+                value_pattern=_YEAR_VALUE_RE,
+                exclude_patterns=("REPORTE", "SINIESTRO", "FECHA"),
+            )
+        )
+
+        # Validar que sea un año razonable (1990-2030)
+        if modelo_anio:
+            year_match = _YEAR_RE.search(str(modelo_anio))
+            year = int(year_match.group(1)) if year_match else 0
+            modelo_anio = str(year) if 1990 <= year <= 2030 else ""
+
+    # ========== COLOR ==========
+    color_vehiculo = (
+        from_kv("color_vehiculo", KV_COLOR)
+        or from_flexible_kv("color_vehiculo", FLEX_COLOR)
+        or from_regex("color_vehiculo", PATTERNS["color_vehiculo"])
+        or from_proximity(
+            "color_vehiculo",
+            ("COLOR",),
+            max_lines_after=1,
+            value_pattern=_COLOR_VALUE_RE,
+            exclude_patterns=("MARCA", "TIPO", "MODELO", "SERIE", "PLACAS"),
+        )
+        or (aseguradora == "CHUBB" and extract_ticket_field(("Color", "COLOR")))
+    )
+
+    if color_vehiculo:
+        color_upper = color_vehiculo.upper().strip()
+        color_upper_clean = _NON_ALNUM_RE.sub("", color_upper)
+
+        # Correcciones OCR exactas; si no, KAO/KA/KO/RAO... suelen ser ROJO mal leído
+        if color_upper_clean in COLOR_OCR_FIXES:
+            color_vehiculo = COLOR_OCR_FIXES[color_upper_clean]
+            color_upper = color_vehiculo
+        elif (color_upper_clean in ("K", "KA", "KO", "KAO", "KA0")) or (
+            _RED_OCR_RE.match(color_upper_clean) and len(color_upper_clean) <= 5
+        ):
+            color_vehiculo = "ROJO"
+            color_upper = "ROJO"
+
+        es_valido = any(valido in color_upper or color_upper in valido for valido in COLORES_VALIDOS)
+        if not es_valido and len(color_vehiculo) < 3:
+            color_vehiculo = ""  # Descartar si parece inválido
+
+    # ========== SERIE/VIN ==========
+    serie_auto = (
+        from_kv("serie_auto", KV_SERIE)
+        or from_flexible_kv("serie_auto", FLEX_SERIE)
+        or from_regex("serie_auto", PATTERNS["serie_auto"])
+        or from_proximity(
+            "serie_auto",
+            ("SERIE", "VIN", "NUMERO DE SERIE"),
+            max_lines_after=1,
+            value_pattern=_SERIE_VALUE_RE,
+            exclude_patterns=("MARCA", "TIPO", "MODELO", "PLACAS"),
+        )
+        or (aseguradora == "CHUBB" and extract_ticket_field(("Serie", "SERIE", "No. serie", "NO. SERIE")))
+    )
+
+    # VIN válido: hasta 17 caracteres alfanuméricos
+    if serie_auto:
+        serie_limpia = _NON_ALNUM_RE.sub("", serie_auto.upper())
+        if len(serie_limpia) >= 8:
+            serie_auto = serie_limpia[:17]
+
+    # ========== PLACAS ==========
+    placas = (
+        from_kv("placas", KV_PLACAS)
+        or from_flexible_kv("placas", FLEX_PLACAS)
+        or from_regex("placas", PATTERNS["placas"])
+        or from_proximity(
+            "placas",
+            ("PLACAS", "PLACA", "LICENSE"),
+            max_lines_after=1,
+            value_pattern=_CODE_VALUE_RE,
+            exclude_patterns=("MARCA", "TIPO", "MODELO", "SERIE"),
+        )
+        or (aseguradora == "CHUBB" and extract_ticket_field(("Placas", "PLACAS", "Placa", "PLACA")))
+    )
+
+    if placas:
+        placas_upper = placas.upper().strip()
+        # Rechazar transmisión, estado, cobertura... o una palabra larga sin números
+        parece_palabra = len(placas_upper) > 6 and not _HAS_DIGIT_RE.search(placas_upper)
+        if parece_palabra or any(inv in placas_upper for inv in INVALID_PLACAS):
+            placas = ""
+        else:
+            placas = _WHITESPACE_RE.sub("", placas_upper)
+            placas_limpia = _NON_ALNUM_RE.sub("", placas)
+            if len(placas_limpia) < 5:
+                placas = ""
+            # Placas sin números son sospechosas
+            elif not _HAS_DIGIT_RE.search(placas_limpia) and len(placas_limpia) < 6:
+                placas = ""
+
+    # ========== KILOMETRAJE ==========
+    kilometraje = (
+        from_kv("kilometraje", KV_KILOMETRAJE)
+        or from_flexible_kv("kilometraje", FLEX_KILOMETRAJE)
+        or from_regex("kilometraje", PATTERNS["kilometraje"])
+        or from_proximity(
+            "kilometraje",
+            ("KILOMETRAJE", "KM", "KMS", "ODOMETRO"),
+            max_lines_after=1,
+            value_pattern=_KM_VALUE_RE,
+            exclude_patterns=("MARCA", "TIPO", "MODELO", "PLACAS"),
+        )
+    )
+
+    if kilometraje:
+        # Rechazar si parece un monto de dinero ($258,234.63 o similar)
+        if _MONEY_RE.search(kilometraje):
+            kilometraje = ""
+        else:
+            kilometraje_clean = _NON_DIGIT_RE.sub("", kilometraje)
+            if kilometraje_clean:
+                km_num = int(kilometraje_clean)
+                # Sumas aseguradas: números muy grandes o con centavos
+                parece_monto = (km_num > 200000 and len(kilometraje_clean) >= 6) or _CENTS_RE.search(kilometraje)
+                kilometraje = str(km_num) if 0 <= km_num <= 999999 and not parece_monto else ""
+            else:
+                kilometraje = ""
+
+    # ========== DESCRIPCIÓN DE DAÑOS ==========
+    descripcion_siniestro = from_regex("descripcion_siniestro", PATTERNS["descripcion_siniestro"]) or from_proximity(
+        "descripcion_siniestro",
+        ("DAÑOS", "DANOS", "DAMAGES", "REPARAR", "DESCRIPCION DAÑOS", "DESCRIPCION DE DAÑOS"),
+        max_lines_after=5,
+        value_pattern=_DESCRIPCION_VALUE_RE,
+        exclude_patterns=("PREEXISTENTES", "PREEXISTING", "INUNDACION", "FLOOD", "AREAS DAÑADAS"),
+    )
+
+    # CHUBB ticket vertical: "Piezas Dañadas" y "Daños Mecanicos"
+    if not descripcion_siniestro and aseguradora == "CHUBB" and lines:
+        piezas_danadas = []
+        danos_mecanicos = []
+
+        piezas_idx = doc.first("PIEZAS DAÑADAS", "PIEZAS DANADAS")
+        if piezas_idx >= 0:
+            for idx in range(piezas_idx + 1, min(piezas_idx + 20, total)):
+                line_upper = upper[idx]
+                # Detenerse en secciones siguientes
+                if any(marker in line_upper for marker in (
+                    "DAÑOS MECANICOS", "DANOS MECANICOS", "NOTAS GENERALES",
+                    "ALERTA DE FRAUDE", "FIRMA DEL CONDUCTOR",
+                )):
+                    break
+                if "SECCION" in line_upper or line_upper in ("OTROS", "OTRO"):
+                    continue
+                if len(lines[idx]) > 2:
+                    piezas_danadas.append(lines[idx])
+
+        mecanicos_idx = doc.first("DAÑOS MECANICOS", "DANOS MECANICOS")
+        if mecanicos_idx >= 0:
+            for idx in range(mecanicos_idx + 1, min(mecanicos_idx + 10, total)):
+                if any(marker in upper[idx] for marker in (
+                    "NOTAS GENERALES", "ALERTA DE FRAUDE", "FIRMA DEL CONDUCTOR", "CONDUCTOR",
+                )):
+                    break
+                if len(lines[idx]) > 5:
+                    danos_mecanicos.append(lines[idx])
+
+        descripcion_parts = []
+        if piezas_danadas:
+            descripcion_parts.append("Piezas: " + ", ".join(piezas_danadas[:5]))
+        if danos_mecanicos:
+            descripcion_parts.append("Daños: " + " ".join(danos_mecanicos[:3]))
+        if descripcion_parts:
+            descripcion_siniestro = "; ".join(descripcion_parts)
+            field_debug["descripcion_siniestro"] = "chubb_ticket_piezas_mecanicos"
+
+    # Validar que la descripción no sea texto de ayuda/instrucción
+    if descripcion_siniestro:
+        upper_desc = descripcion_siniestro.upper()
+        if any(inv in upper_desc for inv in INVALID_DESCRIPCION):
+            descripcion_siniestro = ""
+            field_debug.pop("descripcion_siniestro", None)
+
+    # Fallback: líneas después del encabezado de daños
+    if not descripcion_siniestro:
+        header_idx = doc.first("DESCRIPCION DE DANOS A REPARAR", "DESCRIPTION OF DAMAGES TO REPAIR")
+        if header_idx >= 0:
+            candidates: list[str] = []
+            for idx in range(header_idx + 1, min(header_idx + 30, total)):
+                line = lines[idx]
+                up = upper[idx]
+                if "DANOS PREEXISTENTES" in up or "PREEXISTING DAMAGE" in up:
+                    break
+                if any(marker in up for marker in SECTION_SKIP_MARKERS) or up.startswith("LEVEL") or line.startswith("("):
+                    continue
+                if len(line) >= 8 and _UPPER_LETTER_RE.search(up):
+                    candidates.append(line)
+                if len(candidates) >= 2:
+                    break
+            if candidates:
+                descripcion_siniestro = candidates[0]
+                field_debug["descripcion_siniestro"] = "lines_after_section_header"
+
+    # CHUBB: la descripción suele venir en "Piezas dañadas"
+    if aseguradora == "CHUBB" and not descripcion_siniestro:
+        piezas_idx = doc.first("PIEZAS DANADAS", "PIEZAS DAÑADAS")
+        if piezas_idx >= 0:
+            candidates = []
+            for idx in range(piezas_idx + 1, min(piezas_idx + 10, total)):
+                line = lines[idx]
+                up = upper[idx]
+                if "DANOS MECANICOS" in up or "DAÑOS MECANICOS" in up or "NOTAS GENERALES" in up:
+                    break
+                if (
+                    "PREEXIST" in up
+                    or "NOTAS" in up
+                    or "SECCION FRONTAL" in up
+                    or "SECEION FRONTAL" in up
+                    or up in ("SECCION", "SECEION")
+                ):
+                    continue
+                if len(line) >= 5:
+                    candidates.append(line)
+            if candidates:
+                non_generic = [
+                    c
+                    for c in candidates
+                    if not (
+                        "SECCION" in c.upper()
+                        or "SECEION" in c.upper()
+                        or "SECTION" in c.upper()
+                        or c.upper() in ("FRONTAL", "SECCION FRONTAL", "SECEION FRONTAL")
+                    )
+                ]
+                if non_generic:
+                    candidates = non_generic
+                descripcion_siniestro = ", ".join(candidates[:2])
+                field_debug["descripcion_siniestro"] = "chubb_piezas_danadas"
+
+    # Qualitas Ajuste Express: líneas con palabras de daño desde la sección de descripción
+    if not descripcion_siniestro and aseguradora == "Qualitas":
+        desc_idx = doc.first(
+            "DESCRIPCION DE DANOS", "DESCRIPTION OF DAMAGES",
+            "DAÑOS A REPARAR", "DAMAGES TO REPAIR", "OBSERVACIONES",
+            "DESCRIPCION DE DAÑOS", "DESCRIPCION DAÑOS",
+        )
+        if desc_idx >= 0:
+            candidates = []
+            for idx in range(desc_idx, min(desc_idx + 10, total)):
+                up = upper[idx]
+                if any(skip in up for skip in ("AREAS DAÑADAS", "PARTE FRONTAL", "PARTE TRASERA", "LADO DERECHO", "LADO IZQUIERDO")):
+                    continue
+                if any(kw in up for kw in AJUSTE_EXPRESS_DAMAGE_KEYWORDS) and len(lines[idx]) > 10:
+                    candidates.append(lines[idx])
+            if candidates:
+                descripcion_siniestro = "; ".join(candidates[:3])
+                field_debug["descripcion_siniestro"] = "qualitas_ajuste_express"
+
+    # Fallback general para Qualitas
+    if not descripcion_siniestro and aseguradora == "Qualitas":
+        desc_idx = doc.first(
+            "DESCRIPCION DE DANOS", "DESCRIPTION OF DAMAGES",
+            "DAÑOS A REPARAR", "DAMAGES TO REPAIR", "OBSERVACIONES",
+        )
+        if desc_idx >= 0:
+            for idx in range(desc_idx + 1, min(desc_idx + 25, total)):
+                up = upper[idx]
+                if "DANOS PREEXISTENTES" in up or "PREEXISTING DAMAGE" in up:
+                    break
+                if "EN CASO DE INUND" in up or "IN CASE OF FLOOD" in up:
+                    continue
+                if any(token in up for token in QUALITAS_DAMAGE_KEYWORDS):
+                    descripcion_siniestro = lines[idx]
+                    field_debug["descripcion_siniestro"] = "qualitas_damage_keywords"
+                    break
+
+    # ========== CORRECCIÓN DE MARCA SI ES INVÁLIDA ==========
+    if is_invalid_marca(marca_vehiculo):
+        for idx, line_upper in enumerate(upper):
+            if _ANY_BRAND_RE.search(line_upper):
+                marca_vehiculo = lines[idx].replace("CHEUROLET", "CHEVROLET")
+                field_debug["marca_vehiculo"] = "corrected_from_invalid"
+                break
+
+    # ========== LIMPIEZA DE TIPO PARA MATCH CON CATÁLOGO ==========
+    if tipo_vehiculo:
+        tipo_original = tipo_vehiculo
+        tipo_vehiculo = clean_tipo_for_catalog(tipo_vehiculo, modelo_anio)
+        if tipo_vehiculo != tipo_original:
+            field_debug["tipo_vehiculo"] = field_debug.get("tipo_vehiculo", "") + "_catalog_cleaned"
+
+    # Algunas plantillas traen "MARCA ... MODELO" en TIPO y un valor de sistema en MARCA
+    # (Qualitas Ajuste Express: Marca "REGULARIZADO", Tipo "Nissan Sedan 4D S 1.8L I4 2018")
+    if tipo_vehiculo:
+        tipo_clean = normalize_ocr_text(tipo_vehiculo)
+        brand_model_match = _BRAND_MODEL_YEAR_RE.match(tipo_clean)
+        if brand_model_match and marca_vehiculo:
+            candidate_brand = brand_model_match.group(1)
+            if marca_vehiculo.upper() in SYSTEM_MARCAS:
+                marca_vehiculo = candidate_brand.title()
+                field_debug["marca_vehiculo"] = "extracted_from_tipo_ajuste_express"
+                remaining = tipo_clean[len(candidate_brand):].strip()
+                if remaining:
+                    tipo_vehiculo = _TRAILING_4DIGITS_RE.sub("", remaining).strip()
+                    field_debug["tipo_vehiculo"] = "cleaned_from_ajuste_express"
+        elif aseguradora != "CHUBB":
+            brand_model_match = _BRAND_THEN_TYPE_RE.match(tipo_clean)
+            if brand_model_match:
+                candidate_brand = brand_model_match.group(1)
+                candidate_type = normalize_ocr_text(brand_model_match.group(2))
+                if candidate_type:
+                    tipo_vehiculo = candidate_type
+                    if candidate_brand:
+                        marca_vehiculo = candidate_brand
+                        field_debug["marca_vehiculo"] = "heuristic_from_tipo"
+                    field_debug["tipo_vehiculo"] = "heuristic_from_tipo"
+
+    if aseguradora == "CHUBB":
+        # CHUBB "Marca" is usually reliable; "Tipo" can be long, keep a concise class when possible.
+        marca_clean = normalize_ocr_text(marca_vehiculo)
+        if marca_clean:
+            marca_vehiculo = marca_clean
+        tipo_clean = normalize_ocr_text(tipo_vehiculo)
+        if tipo_clean:
+            class_match = _CHUBB_CLASS_RE.search(tipo_clean)
+            if class_match:
+                tipo_vehiculo = f"CLASE {class_match.group(1).upper()}"
+                field_debug["tipo_vehiculo"] = "chubb_class_from_tipo"
+            else:
+                tipo_vehiculo = tipo_clean
+
+        # Quitar especificaciones técnicas del tipo
+        # Ej: "ATTITUDE SEDAN L4 IMO AUT 4 ABS CA CE T ELA SM SQ CB" -> "ATTITUDE SEDAN"
+        if tipo_vehiculo:
+            cleaned_words = [
+                word for word in tipo_vehiculo.split() if word.upper() not in CHUBB_TECH_SPECS and not word.isdigit()
+            ]
+            if cleaned_words:
+                tipo_vehiculo = " ".join(cleaned_words)
+                field_debug["tipo_vehiculo"] = "chubb_tipo_cleaned"
+
+        # Nombre del asegurado desde la sección "Datos Vehículo"
+        if not nb_cliente and lines:
+            datos_vehiculo_idx = doc.first("DATOS VEHICULO", "DATOS VEHÍCULO")
+            if datos_vehiculo_idx >= 0:
+                for i in range(datos_vehiculo_idx + 1, min(datos_vehiculo_idx + 10, total)):
+                    line = lines[i]
+                    if "ASEGURADO" not in upper[i] or ":" not in line:
+                        continue
+                    # Nombre en la línea siguiente o en la misma después del ":"
+                    if i + 1 < total and is_valid_name(lines[i + 1]):
+                        nb_cliente = lines[i + 1]
+                        field_debug["nb_cliente"] = "chubb_datos_vehiculo_asegurado"
+                        break
+                    candidate = line.split(":", 1)[1].strip()
+                    if is_valid_name(candidate):
+                        nb_cliente = candidate
+                        field_debug["nb_cliente"] = "chubb_asegurado_inline"
+                        break
+
+                # Sin "Asegurado:", buscar un nombre de persona en la sección:
+                # 3-6 palabras en mayúsculas, sin números, al menos 2 de 4+ letras
+                if not nb_cliente:
+                    for i in range(datos_vehiculo_idx + 1, min(datos_vehiculo_idx + 20, total)):
+                        candidate = lines[i]
+                        words = candidate.split()
+                        long_words = [w for w in words if len(w) >= 4]
+                        if (
+                            3 <= len(words) <= 6
+                            and candidate == candidate.upper()
+                            and not any(c.isdigit() for c in candidate)
+                            and len(long_words) >= 2
+                            and all(w.isalpha() and (len(w) >= 3 or w in VALID_SHORT_NAME_WORDS) for w in words)
+                            and is_valid_name(candidate)
+                        ):
+                            nb_cliente = candidate
+                            field_debug["nb_cliente"] = "chubb_name_search"
+                            break
+
+            # Fallback: sección de firmas (arriba de "Conductor")
+            if not nb_cliente:
+                for idx in doc.find("CONDUCTOR"):
+                    if idx == 0:
+                        continue
+                    signature_name = ""
+                    for candidate in lines[max(0, idx - 8) : idx]:
+                        candidate_up = candidate.upper()
+                        words = candidate_up.split()
+                        if (
+                            "AJUSTADOR" not in candidate_up
+                            and "NOMBRE" not in candidate_up
+                            and "FIRMA" not in candidate_up
+                            and "CONDUCTOR" not in candidate_up
+                            and "NOTAS GENERALES" not in candidate_up
+                            and "NOTAS" != candidate_up
+                            and "@" not in candidate
+                            and ":" not in candidate
+                            and "." not in candidate
+                            and not _HAS_DIGIT_RE.search(candidate)
+                            and "CHUBB" not in candidate_up
+                            and "FRAUDE" not in candidate_up
+                            and "GUARDIA" not in candidate_up
+                            and "RESPONSABLE" not in candidate_up
+                            and _SIGNATURE_NAME_RE.fullmatch(normalize_key_label(candidate))
+                            and 2 <= len(words) <= 6
+                            and _UPPER_LETTER_RE.search(candidate_up)
+                        ):
+                            signature_name = candidate
+                            break
+                    if signature_name:
+                        nb_cliente = signature_name
+                        field_debug["nb_cliente"] = "line_before_conductor"
+                        break
+
+    fields = {
+        "seguro_comp": aseguradora,
+        "reporte_siniestro": reporte,
+        "fecha_adm": fecha_iso,
+        "hr_adm": hora,
+        "nb_cliente": nb_cliente,
+        "tel_cliente": tel_cliente,
+        "email_cliente": email_cliente,
+        "marca_vehiculo": marca_vehiculo,
+        "tipo_vehiculo": tipo_vehiculo,
+        "modelo_anio": modelo_anio,
+        "color_vehiculo": color_vehiculo,
+        "serie_auto": serie_auto,
+        "placas": placas,
+        "kilometraje": kilometraje,
+        "transmision": detect_transmision(),
+        "descripcion_siniestro": descripcion_siniestro,
+    }
+
+    cleaned = {key: normalize_ocr_text(value or "") for key, value in fields.items()}
+    return cleaned, field_debug
@@ -0,0 +1,100 @@
+"""
+Benchmark de regresión del parser de órdenes sobre el corpus de ocr_corpus/.
+
+Cada archivo del corpus es una respuesta de Textract anonimizada
+(`blocks`) con los valores correctos de cada campo (`expected`). Para cada
+documento se reporta la mediana del tiempo de parseo y cuántos campos
+coinciden con lo esperado.
+
+Uso (desde backend/):
+    python -m app.modules.recepcion.orden_parser_bench
+    python -m app.modules.recepcion.orden_parser_bench --runs 200 --verbose
+    python -m app.modules.recepcion.orden_parser_bench --min-accuracy 0.75
+"""
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import sys
+import time
+
+from app.modules.recepcion.orden_parser import OcrDocument, parse_orden_fields, textract_data_from_blocks
+
+CORPUS_DIR = Path(__file__).resolve().parent / "ocr_corpus"
+
+
+def load_corpus(corpus_dir: Path) -> list[dict]:
+    return [json.loads(path.read_text(encoding="utf-8")) for path in sorted(corpus_dir.glob("*.json"))]
+
+
+def bench_document(document: dict, runs: int) -> dict:
+    textract_data = textract_data_from_blocks(document["blocks"])
+    timings: list[float] = []
+    fields: dict = {}
+    field_debug: dict = {}
+    for _ in range(max(1, runs)):
+        started = time.perf_counter()
+        fields, field_debug = parse_orden_fields(OcrDocument.from_textract(textract_data))
+        timings.append((time.perf_counter() - started) * 1000)
+
+    expected = document.get("expected") or {}
+    mismatches = {
+        field: {"got": fields.get(field, ""), "expected": value, "source": field_debug.get(field, "")}
+        for field, value in expected.items()
+        if fields.get(field, "") != value
+    }
+    return {
+        "name": document.get("name", ""),
+        "ms": statistics.median(timings),
+        "correct": len(expected) - len(mismatches),
+        "total": len(expected),
+        "mismatches": mismatches,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark del parser de órdenes de admisión.")
+    parser.add_argument("--corpus", default=str(CORPUS_DIR), help="Directorio con el corpus de Textract.")
+    parser.add_argument("--runs", type=int, default=50, help="Repeticiones por documento (se reporta la mediana).")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los campos que no coinciden.")
+    parser.add_argument(
+        "--min-accuracy",
+        type=float,
+        default=0.0,
+        help="Salir con error si la exactitud total queda por debajo (0-1).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    corpus = load_corpus(Path(args.corpus))
+    if not corpus:
+        print(f"[OCR bench] Corpus vacío: {args.corpus}")
+        sys.exit(1)
+
+    results = [bench_document(document, args.runs) for document in corpus]
+    width = max(len(result["name"]) for result in results)
+    for result in results:
+        print(f"{result['name']:<{width}}  {result['ms']:8.3f} ms  {result['correct']:>2}/{result['total']}")
+        if args.verbose:
+            for field, detail in result["mismatches"].items():
+                print(
+                    f"    {field}: {detail['got']!r} (esperado {detail['expected']!r}, fuente {detail['source'] or '-'})"
+                )
+
+    correct = sum(result["correct"] for result in results)
+    total = sum(result["total"] for result in results)
+    accuracy = correct / total if total else 0.0
+    total_ms = sum(result["ms"] for result in results)
+    print(
+        f"{'TOTAL':<{width}}  {total_ms:8.3f} ms  {correct}/{total} campos ({accuracy:.1%}), "
+        f"{total_ms / len(results):.3f} ms/documento"
+    )
+    if accuracy < args.min_accuracy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Caché en disco del PDF de recepción (/recepcion/registros/{id}/pdf).
+
+Cada PDF se guarda con el nombre `recepcion_{id}_{huella}.pdf`, donde la
+huella resume la fila de la recepción, la firma y los archivos de plantilla
+(SVG de daños, logo, fuentes). Si cambia cualquiera de ellos cambia la
+huella y el PDF se vuelve a generar; las versiones viejas se borran al
+guardar la nueva. La carpeta se recorta por tamaño y antigüedad.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from uuid import uuid4
+
+from app.core.config import settings
+
+# Subir al cambiar el diseño del PDF para invalidar todo lo generado antes.
+PDF_RENDER_VERSION = "1"
+
+_PRUNE_INTERVAL_SECONDS = 300.0
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def cache_dir() -> Path:
+    configured = (settings.recepcion_pdf_cache_dir or "").strip()
+    if configured:
+        path = Path(configured)
+    else:
+        path = Path(__file__).resolve().parents[3] / "cache" / "recepcion_pdf"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _file_signature(path: Path) -> Optional[list[Any]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def fingerprint(row: dict[str, Any], media_rows: Iterable[dict[str, Any]], files: Iterable[Path]) -> str:
+    """Huella del contenido del PDF: datos de la recepción, media usada y archivos en disco."""
+    payload = {
+        "version": PDF_RENDER_VERSION,
+        "row": row,
+        "media": [dict(item) for item in media_rows],
+        "files": {str(path): _file_signature(path) for path in files},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+def _path_for(recepcion_id: int, digest: str) -> Path:
+    return cache_dir() / f"recepcion_{recepcion_id}_{digest}.pdf"
+
+
+def get_cached(recepcion_id: int, digest: str) -> Optional[Path]:
+    path = _path_for(recepcion_id, digest)
+    if not path.is_file():
+        return None
+    try:
+        # El mtime marca el último uso para el recorte por antigüedad.
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def store(recepcion_id: int, digest: str, content: bytes) -> Path:
+    path = _path_for(recepcion_id, digest)
+    tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+    for old in path.parent.glob(f"recepcion_{recepcion_id}_*.pdf"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    prune()
+    return path
+
+
+def invalidate(recepcion_id: int) -> None:
+    for old in cache_dir().glob(f"recepcion_{recepcion_id}_*.pdf"):
+        old.unlink(missing_ok=True)
+
+
+def prune(force: bool = False) -> int:
+    """Borra PDFs viejos o los menos usados si la carpeta supera el tamaño máximo."""
+    global _last_prune
+    now = time.time()
+    with _prune_lock:
+        if not force and now - _last_prune < _PRUNE_INTERVAL_SECONDS:
+            return 0
+        _last_prune = now
+
+    max_age_seconds = max(0.0, float(settings.recepcion_pdf_cache_max_age_days)) * 86400
+    max_bytes = max(0, int(settings.recepcion_pdf_cache_max_mb)) * 1024 * 1024
+
+    entries = []
+    for path in cache_dir().glob("*.pdf"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        expired = max_age_seconds and now - mtime > max_age_seconds
+        oversized = max_bytes and total > max_bytes
+        if not expired and not oversized:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
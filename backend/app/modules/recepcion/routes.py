@@ -1,22 +1,21 @@
 import asyncio
+import copy
+from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache, partial
+import hashlib
 from io import BytesIO
 import json
-import os
 from pathlib import Path
 import re
-import shutil
-import time
 from typing import Any, Optional
-import unicodedata
 from urllib.error import HTTPError, URLError
 from urllib.request import Request as UrlRequest, urlopen
 from uuid import uuid4
-from zipfile import ZIP_DEFLATED, ZipFile
 from xml.etree import ElementTree as ET
 
-from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from reportlab.graphics import renderPDF
 from psycopg.rows import dict_row
@@ -32,13 +31,26 @@ from svglib.svglib import svg2rlg
 
 from app.core.db import get_connection
 from app.core.config import settings
+from app.core.events import event_broker, format_sse
+from app.core import aws, blob_store, media_derivatives, rendering, storage
+from app.core.uploads import max_upload_bytes, save_upload
+from app.core.zipstream import ZipSource, zip_response
+from app.modules.recepcion import folios, ocr_cache, pdf_cache, transcripcion, vehiculos
+from app.modules.recepcion.orden_parser import (
+    OcrDocument,
+    detect_aseguradora,
+    parse_orden_fields,
+    textract_data_from_blocks,
+)
+from app.modules.taller.routes import materialize_ot_stages
 
 router = APIRouter(prefix="/recepcion", tags=["recepcion"])
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageChops
 except Exception:  # pragma: no cover - optional dependency
     Image = None
+    ImageChops = None
 
 try:
     import boto3
@@ -56,29 +68,6 @@ except Exception:  # pragma: no cover - optional dependency
     pdfium = None
 
 _EXTRACTION_ALLOWED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
-_WHITESPACE_RE = re.compile(r"\s+")
-
-
-def _normalize_ocr_text(value: str) -> str:
-    return _WHITESPACE_RE.sub(" ", (value or "").strip())
-
-
-def _normalize_key_label(value: str) -> str:
-    normalized = unicodedata.normalize("NFD", value or "")
-    normalized = "".join(char for char in normalized if unicodedata.category(char) != "Mn")
-    normalized = normalized.upper()
-    normalized = re.sub(r"[^A-Z0-9 ]+", " ", normalized)
-    return _normalize_ocr_text(normalized)
-
-
-def _extract_with_regex(text: str, patterns: list[str]) -> str:
-    for pattern in patterns:
-        match = re.search(pattern, text, flags=re.IGNORECASE | re.MULTILINE)
-        if match:
-            candidate = _normalize_ocr_text(match.group(1))
-            if candidate:
-                return candidate
-    return ""
 
 
 def _pdf_first_page_to_png(file_bytes: bytes) -> bytes:
@@ -102,33 +91,17 @@ def _pdf_first_page_to_png(file_bytes: bytes) -> bytes:
         pdf.close()
 
 
-def _get_block_text(block: dict[str, Any], block_map: dict[str, dict[str, Any]]) -> str:
-    parts: list[str] = []
-    for rel in block.get("Relationships", []):
-        if rel.get("Type") != "CHILD":
-            continue
-        for child_id in rel.get("Ids", []):
-            child = block_map.get(child_id, {})
-            if child.get("BlockType") == "WORD":
-                word = child.get("Text", "")
-                if word:
-                    parts.append(word)
-            elif child.get("BlockType") == "SELECTION_ELEMENT" and child.get("SelectionStatus") == "SELECTED":
-                parts.append("X")
-    return _normalize_ocr_text(" ".join(parts))
-
-
-def _extract_textract_data(file_bytes: bytes, extension: str) -> dict[str, Any]:
+def _textract_blocks(file_bytes: bytes, extension: str) -> list[dict[str, Any]]:
+    """Bloques crudos de Textract (lo que se guarda en la caché de OCR)."""
     if not boto3:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Falta dependencia boto3 para usar Textract.",
         )
-    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
-    client = boto3.client("textract", region_name=region)
+    client = aws.get_client("textract", endpoint_url=settings.aws_textract_endpoint_url.strip() or None)
     document_bytes = file_bytes if extension in {".jpg", ".jpeg", ".png"} else _pdf_first_page_to_png(file_bytes)
     if not document_bytes:
-        return ""
+        return []
     try:
         response = client.analyze_document(
             Document={"Bytes": document_bytes},
@@ -136,2223 +109,11 @@ def _extract_textract_data(file_bytes: bytes, extension: str) -> dict[str, Any]:
         )
     except Exception:
         response = client.detect_document_text(Document={"Bytes": document_bytes})
+    return response.get("Blocks", [])
 
-    blocks = response.get("Blocks", [])
-    block_map = {block.get("Id"): block for block in blocks if block.get("Id")}
-
-    lines = [
-        _normalize_ocr_text(block.get("Text", ""))
-        for block in blocks
-        if block.get("BlockType") == "LINE" and block.get("Text")
-    ]
-
-    word_boxes: list[dict[str, Any]] = []
-    selected_boxes: list[dict[str, float]] = []
-    for block in blocks:
-        block_type = block.get("BlockType")
-        geometry = block.get("Geometry", {}).get("BoundingBox", {}) or {}
-        left = float(geometry.get("Left", 0.0) or 0.0)
-        top = float(geometry.get("Top", 0.0) or 0.0)
-        width = float(geometry.get("Width", 0.0) or 0.0)
-        height = float(geometry.get("Height", 0.0) or 0.0)
-        if block_type == "WORD":
-            text = _normalize_ocr_text(block.get("Text", ""))
-            if text:
-                word_boxes.append(
-                    {
-                        "text": text,
-                        "norm": _normalize_key_label(text),
-                        "left": left,
-                        "top": top,
-                        "width": width,
-                        "height": height,
-                    }
-                )
-        elif (
-            block_type == "SELECTION_ELEMENT"
-            and block.get("SelectionStatus") == "SELECTED"
-        ):
-            selected_boxes.append(
-                {"left": left, "top": top, "width": width, "height": height}
-            )
-
-    kv_pairs: dict[str, dict[str, str]] = {}
-    for block in blocks:
-        if block.get("BlockType") != "KEY_VALUE_SET":
-            continue
-        if "KEY" not in block.get("EntityTypes", []):
-            continue
-
-        key_text = _get_block_text(block, block_map)
-        if not key_text:
-            continue
 
-        value_text = ""
-        for rel in block.get("Relationships", []):
-            if rel.get("Type") != "VALUE":
-                continue
-            for value_id in rel.get("Ids", []):
-                value_block = block_map.get(value_id)
-                if not value_block:
-                    continue
-                value_text = _get_block_text(value_block, block_map)
-                if value_text:
-                    break
-            if value_text:
-                break
-
-        normalized_key = _normalize_key_label(key_text)
-        if normalized_key:
-            kv_pairs[normalized_key] = {"key": key_text, "value": value_text}
-
-    return {
-        "text": "\n".join(lines),
-        "lines": lines,
-        "kv": kv_pairs,
-        "word_boxes": word_boxes,
-        "selected_boxes": selected_boxes,
-    }
-
-
-def _pick_from_kv(
-    kv_pairs: dict[str, dict[str, str]],
-    contains_all: list[list[str]],
-) -> tuple[str, str]:
-    for normalized_key, entry in kv_pairs.items():
-        for token_group in contains_all:
-            if all(token in normalized_key for token in token_group):
-                value = _normalize_ocr_text(entry.get("value", ""))
-                if value:
-                    return value, entry.get("key", normalized_key)
-    return "", ""
-
-
-def _detect_aseguradora(ocr_text: str) -> str:
-    """Detecta la aseguradora con variaciones comunes de OCR."""
-    upper = (ocr_text or "").upper()
-    
-    # Qualitas con variaciones comunes de OCR
-    qualitas_variants = ["QUALITAS", "QUALITA", "QUALIT", "QU4LITAS", "QUAL1TAS", 
-                         "CUALITAS", "CUALITA", "QUALITÁS"]
-    for variant in qualitas_variants:
-        if variant in upper:
-            return "Qualitas"
-    
-    # CHUBB con variaciones
-    chubb_variants = ["CHUBB", "CHUB", "CHUBBB", "CHUBBE", "CHÜBB"]
-    for variant in chubb_variants:
-        if variant in upper:
-            return "CHUBB"
-    return ""
-
-
-def _find_value_near_label(
-    lines: list[str],
-    label_patterns: list[str],
-    max_lines_after: int = 3,
-    value_pattern: str = r"([^\n\r]{2,50})",
-    exclude_patterns: list[str] | None = None,
-) -> str:
-    """
-    Busca un valor cerca de una etiqueta en las líneas del OCR.
-    Útil cuando KV pairs no funcionan correctamente.
-    """
-    if not lines:
-        return ""
-    
-    exclude = exclude_patterns or []
-    normalized_lines = [_normalize_ocr_text(line) for line in lines if _normalize_ocr_text(line)]
-    
-    for idx, line in enumerate(normalized_lines):
-        line_upper = line.upper()
-        
-        # Buscar si la línea contiene alguno de los patrones de etiqueta
-        label_found = False
-        for pattern in label_patterns:
-            if pattern.upper() in line_upper:
-                label_found = True
-                break
-        
-        if not label_found:
-            continue
-        
-        # Buscar en las siguientes líneas
-        for next_idx in range(idx + 1, min(idx + 1 + max_lines_after, len(normalized_lines))):
-            candidate = normalized_lines[next_idx].strip()
-            
-            # Saltar líneas vacías o muy cortas
-            if len(candidate) < 2:
-                continue
-            
-            # Verificar exclusiones
-            skip = False
-            candidate_upper = candidate.upper()
-            for exclude_pattern in exclude:
-                if exclude_pattern.upper() in candidate_upper:
-                    skip = True
-                    break
-            if skip:
-                continue
-            
-            # Verificar que coincida con el patrón de valor
-            match = re.search(value_pattern, candidate)
-            if match:
-                return match.group(1).strip()
-    
-    return ""
-
-
-def _extract_from_line_context(
-    lines: list[str],
-    context_keywords: list[str],
-    value_pattern: str,
-    window_size: int = 5,
-) -> str:
-    """
-    Extrae un valor buscando en el contexto de ciertas palabras clave.
-    Busca en una ventana de líneas alrededor de las palabras clave.
-    """
-    if not lines:
-        return ""
-    
-    normalized_lines = [_normalize_ocr_text(line) for line in lines if _normalize_ocr_text(line)]
-    
-    for idx, line in enumerate(normalized_lines):
-        line_upper = line.upper()
-        
-        # Verificar si la línea contiene alguna palabra clave
-        has_keyword = any(kw.upper() in line_upper for kw in context_keywords)
-        
-        if has_keyword:
-            # Buscar en la ventana de líneas
-            start = max(0, idx)
-            end = min(len(normalized_lines), idx + window_size)
-            
-            for window_idx in range(start, end):
-                candidate = normalized_lines[window_idx]
-                match = re.search(value_pattern, candidate, re.IGNORECASE)
-                if match:
-                    return match.group(1).strip()
-    
-    return ""
-
-
-def _flexible_kv_search(
-    kv_pairs: dict[str, dict[str, str]],
-    possible_labels: list[str],
-    min_match_score: float = 0.6,
-) -> tuple[str, str]:
-    """
-    Búsqueda flexible en KV pairs que tolera variaciones en las etiquetas.
-    Usa coincidencia parcial y scoring.
-    """
-    if not kv_pairs:
-        return "", ""
-    
-    best_match = ""
-    best_key = ""
-    best_score = 0.0
-    
-    for normalized_key, entry in kv_pairs.items():
-        key_upper = normalized_key.upper()
-        
-        for label in possible_labels:
-            label_upper = label.upper()
-            
-            # Calcular score de coincidencia
-            score = 0.0
-            
-            # Coincidencia exacta
-            if label_upper == key_upper:
-                score = 1.0
-            # Contiene la etiqueta completa
-            elif label_upper in key_upper:
-                score = 0.9
-            # La etiqueta contiene la clave
-            elif key_upper in label_upper:
-                score = 0.8
-            # Coincidencia de palabras
-            else:
-                label_words = set(label_upper.split())
-                key_words = set(key_upper.split())
-                if label_words and key_words:
-                    intersection = label_words.intersection(key_words)
-                    if intersection:
-                        score = len(intersection) / max(len(label_words), len(key_words))
-            
-            if score > best_score and score >= min_match_score:
-                best_score = score
-                best_match = _normalize_ocr_text(entry.get("value", ""))
-                best_key = entry.get("key", normalized_key)
-    
-    return best_match, best_key
-
-
-def _parse_orden_fields(
-    ocr_text: str,
-    kv_pairs: Optional[dict[str, dict[str, str]]] = None,
-    ocr_lines: Optional[list[str]] = None,
-    textract_meta: Optional[dict[str, Any]] = None,
-) -> tuple[dict, dict]:
-    upper_text = (ocr_text or "").upper()
-    aseguradora = _detect_aseguradora(upper_text)
-    kv = kv_pairs or {}
-    normalized_lines = [_normalize_ocr_text(line) for line in (ocr_lines or []) if _normalize_ocr_text(line)]
-    field_debug: dict[str, str] = {}
-
-    def from_kv(field_name: str, candidates: list[list[str]]) -> str:
-        value, source = _pick_from_kv(kv, candidates)
-        if value:
-            field_debug[field_name] = f"kv:{source}"
-        return value
-
-    def from_regex(field_name: str, patterns: list[str]) -> str:
-        value = _extract_with_regex(ocr_text, patterns)
-        if value:
-            field_debug[field_name] = "regex"
-        return value
-    
-    def from_flexible_kv(field_name: str, possible_labels: list[str]) -> str:
-        """Usa búsqueda flexible en KV pairs."""
-        value, source = _flexible_kv_search(kv, possible_labels)
-        if value:
-            field_debug[field_name] = f"flexible_kv:{source}"
-        return value
-    
-    def from_proximity(field_name: str, label_patterns: list[str], **kwargs) -> str:
-        """Busca valor cerca de una etiqueta en líneas OCR."""
-        value = _find_value_near_label(normalized_lines, label_patterns, **kwargs)
-        if value:
-            field_debug[field_name] = "proximity"
-        return value
-    
-    def from_context(field_name: str, context_keywords: list[str], value_pattern: str, **kwargs) -> str:
-        """Extrae valor del contexto de palabras clave."""
-        value = _extract_from_line_context(normalized_lines, context_keywords, value_pattern, **kwargs)
-        if value:
-            field_debug[field_name] = "context"
-        return value
-
-    def detect_transmision() -> str:
-        # Try KV first for documents where checkbox state is included in form extraction.
-        for key, entry in kv.items():
-            if "TRANSMISION" not in key and "TRANSMISSION" not in key:
-                continue
-            combined = _normalize_key_label(f"{entry.get('key', '')} {entry.get('value', '')}")
-            if re.search(r"AUTOMAT(?:ICA|IC)\s*(X|XX|CHECK|SELECT|SI|YES|TRUE|1|■|█|☒|☑)", combined):
-                return "Automatica"
-            if re.search(r"MANUAL\s*(X|XX|CHECK|SELECT|SI|YES|TRUE|1|■|█|☒|☑)", combined):
-                return "Manual"
-            if re.search(r"(X|■|█|☒|☑)\s*AUTOMAT(?:ICA|IC)", combined):
-                return "Automatica"
-            if re.search(r"(X|■|█|☒|☑)\s*MANUAL", combined):
-                return "Manual"
-
-        # Fallback using OCR lines around "Transmision".
-        if normalized_lines:
-            for idx, line in enumerate(normalized_lines):
-                up = _normalize_key_label(line)
-                if "TRANSMISION" not in up and "TRANSMISSION" not in up:
-                    continue
-                window = " ".join(_normalize_key_label(item) for item in normalized_lines[idx : idx + 4])
-                if re.search(r"AUTOMAT(?:ICA|IC)\s*(X|■|█|☒|☑)", window) or re.search(
-                    r"(X|■|█|☒|☑)\s*AUTOMAT(?:ICA|IC)", window
-                ):
-                    return "Automatica"
-                if re.search(r"MANUAL\s*(X|■|█|☒|☑)", window) or re.search(
-                    r"(X|■|█|☒|☑)\s*MANUAL", window
-                ):
-                    return "Manual"
-
-        # Geometry fallback: link selected checkbox to nearest transmission label.
-        meta = textract_meta or {}
-        labels = [
-            item
-            for item in (meta.get("word_boxes") or [])
-            if re.search(r"AUTOMAT|AUTOMATIC|MANUAL", str(item.get("norm") or ""))
-        ]
-        checks = meta.get("selected_boxes") or []
-        if labels and checks:
-            best_label = ""
-            best_score = None
-            for check in checks:
-                cx = check["left"] + (check["width"] / 2)
-                cy = check["top"] + (check["height"] / 2)
-                for label in labels:
-                    lx = float(label.get("left", 0.0)) + (float(label.get("width", 0.0)) / 2)
-                    ly = float(label.get("top", 0.0)) + (float(label.get("height", 0.0)) / 2)
-                    # Favor same-row matches and near-horizontal checkboxes.
-                    score = ((cx - lx) ** 2) + (((cy - ly) * 1.8) ** 2)
-                    if best_score is None or score < best_score:
-                        best_score = score
-                        best_label = str(label.get("norm") or "")
-            if best_label:
-                if "AUTOMAT" in best_label:
-                    field_debug["transmision"] = "geometry_checkbox"
-                    return "Automatica"
-                if "MANUAL" in best_label:
-                    field_debug["transmision"] = "geometry_checkbox"
-                    return "Manual"
-        return ""
-
-    def normalize_time(raw_value: str) -> str:
-        if not raw_value:
-            return ""
-        match = re.search(r"(\d{1,2})[:.](\d{2})", raw_value)
-        if not match:
-            return ""
-        hour = int(match.group(1))
-        minute = int(match.group(2))
-        if hour > 23 or minute > 59:
-            return ""
-        return f"{hour:02d}:{minute:02d}"
-
-    def normalize_date(raw_value: str) -> str:
-        raw = _normalize_ocr_text(raw_value or "")
-        if not raw:
-            return ""
-        raw = re.sub(r"\s*([\/\-])\s*", r"\1", raw)
-
-        # Direct numeric formats.
-        candidate = raw.replace("-", "/")
-        for fmt in ("%d/%m/%Y", "%d/%m/%y", "%Y/%m/%d"):
-            try:
-                return datetime.strptime(candidate, fmt).date().isoformat()
-            except ValueError:
-                continue
-        
-        # ISO format: 2026-03-26
-        try:
-            return datetime.strptime(raw, "%Y-%m-%d").date().isoformat()
-        except ValueError:
-            pass
-
-        # Formats with month names, e.g. 12/dic/2025.
-        # Correcciones OCR comunes para meses
-        month_ocr_fixes = {
-            "NAR": "MAR",  # OCR confunde M con N
-            "NAY": "MAY",  # OCR confunde M con N
-            "IAR": "MAR",  # OCR confunde M con I
-            "IAY": "MAY",  # OCR confunde M con I
-            "JUN": "JUN",
-            "JUL": "JUL",
-            "AGD": "AGO",  # OCR confunde O con D
-            "AGQ": "AGO",  # OCR confunde O con Q
-            "SEB": "SEP",  # OCR confunde P con B
-            "SET": "SEP",  # OCR confunde P con T
-            "OCT": "OCT",
-            "NOB": "NOV",  # OCR confunde V con B
-            "DIC": "DIC",
-        }
-        
-        # Aplicar correcciones OCR a la fecha raw
-        raw_fixed = raw.upper()
-        for wrong, correct in month_ocr_fixes.items():
-            raw_fixed = raw_fixed.replace(wrong, correct)
-        
-        month_map = {
-            "ENE": "01",
-            "FEB": "02",
-            "MAR": "03",
-            "ABR": "04",
-            "MAY": "05",
-            "JUN": "06",
-            "JUL": "07",
-            "AGO": "08",
-            "SEP": "09",
-            "OCT": "10",
-            "NOV": "11",
-            "DIC": "12",
-            "JAN": "01",
-            "APR": "04",
-            "AUG": "08",
-            "DEC": "12",
-        }
-        month_match = re.search(
-            r"\b(\d{1,2})(?:[\/\-]|\s+)([A-Z]{3})(?:[\/\-]|\s+)(\d{4})\b",
-            _normalize_key_label(raw_fixed),
-        )
-        if month_match:
-            day = int(month_match.group(1))
-            month = month_map.get(month_match.group(2))
-            year = int(month_match.group(3))
-            if month:
-                try:
-                    return datetime(year=year, month=int(month), day=day).date().isoformat()
-                except ValueError:
-                    return ""
-        
-        # Qualitas format with date fields separated: 21 | 03 | 2026 or 21 03 2026
-        separated_match = re.search(r"\b(\d{2})\s*[|\s]\s*(\d{2})\s*[|\s]\s*(\d{4})\b", raw)
-        if separated_match:
-            day = separated_match.group(1)
-            month = separated_match.group(2)
-            year = separated_match.group(3)
-            try:
-                return datetime(year=int(year), month=int(month), day=int(day)).date().isoformat()
-            except ValueError:
-                return ""
-        
-        return ""
-
-    # ========== FECHA ==========
-    # Intentar múltiples estrategias para extraer la fecha
-    raw_fecha = (
-        from_kv("fecha_adm", [["FECHA", "DATE"], ["FECHA"], ["FECHA", "ADMISION"], ["FECHA", "INGRESO"]])
-        or from_flexible_kv("fecha_adm", ["FECHA", "DATE", "FECHA ADMISION", "FECHA INGRESO", "Fecha"])
-        or from_regex(
-            "fecha_adm",
-            [
-                r"FECHA\s*/?\s*DATE[^\n\r]*?(\d{2}/\d{2}/\d{4})",
-                r"FECHA[^\n\r]*?(\d{2}/\d{2}/\d{4})",
-                r"FECHA\s*[:\-]?\s*(\d{2}[\/\-]\d{2}[\/\-]\d{4})",
-                r"(\d{2}[\/\-]\d{2}[\/\-]\d{4})\s*FECHA",
-                r"FECHA\s+DE\s+\w+[^\n\r]*?(\d{2}[\/\-]\d{2}[\/\-]\d{2,4})",
-                r"FECHA[\s:]+(\d{1,2}[\/\s]+[A-Z]{3,9}[\/\s]+\d{4})",
-                r"FECHA\s*[:\-]?\s*(\d{4}-\d{2}-\d{2})",  # ISO format: 2026-03-26
-            ],
-        )
-        or from_proximity(
-            "fecha_adm",
-            ["FECHA", "DATE", "FECHA ADMISION"],
-            max_lines_after=2,
-            value_pattern=r"(\d{2}[\/\-]\d{2}[\/\-]\d{4}|\d{1,2}[\/\s]+[A-Z]{3,9}[\/\s]+\d{4}|\d{4}-\d{2}-\d{2})",
-            exclude_patterns=["HORA", "TIME", "REPORTE", "SINIESTRO"]
-        )
-    )
-    
-    # Fallback para Qualitas con campos separados: 21 | 03 | 2026
-    if not raw_fecha and normalized_lines:
-        for idx, line in enumerate(normalized_lines):
-            if "FECHA" in line.upper():
-                # Buscar patrón de campos separados en las siguientes líneas
-                for next_line in normalized_lines[idx:idx+3]:
-                    separated_match = re.search(r"\b(\d{2})\s*[|\s]\s*(\d{2})\s*[|\s]\s*(\d{4})\b", next_line)
-                    if separated_match:
-                        raw_fecha = f"{separated_match.group(1)}/{separated_match.group(2)}/{separated_match.group(3)}"
-                        field_debug["fecha_adm"] = "qualitas_separated_fields"
-                        break
-                if raw_fecha:
-                    break
-    
-    # Estrategia para formato bilingüe: buscar "FECHA DATE" y tomar siguiente línea con formato fecha
-    if not raw_fecha and normalized_lines:
-        for idx, line in enumerate(normalized_lines):
-            line_upper = line.upper()
-            if "FECHA" in line_upper and ("DATE" in line_upper or "HORA" in line_upper or "TIME" in line_upper):
-                # Buscar en las siguientes líneas un valor que parezca fecha (DD/MM/YYYY)
-                for next_line in normalized_lines[idx+1:idx+5]:
-                    # Saltar líneas que son otras etiquetas
-                    if any(label in next_line.upper() for label in ["HORA", "TIME", "PÓLIZA", "POLICY", "ENDOSO", "ENDORSEMENT"]):
-                        continue
-                    # Buscar patrón DD/MM/YYYY
-                    fecha_match = re.search(r"\b(\d{2}/\d{2}/\d{4})\b", next_line)
-                    if fecha_match:
-                        raw_fecha = fecha_match.group(1)
-                        field_debug["fecha_adm"] = "qualitas_bilingual_date"
-                        break
-                if raw_fecha:
-                    break
-
-    fecha_iso = normalize_date(raw_fecha)
-
-    # ========== HORA ==========
-    raw_hora = (
-        from_kv("hr_adm", [["HORA", "TIME"], ["HORA"], ["HORA", "ADMISION"], ["HORA", "INGRESO"]])
-        or from_flexible_kv("hr_adm", ["HORA", "TIME", "HORA ADMISION", "HORA INGRESO"])
-        or from_regex(
-            "hr_adm",
-            [
-                r"HORA\s*/?\s*TIME[^\n\r]*?(\d{1,2}[:.]\d{2})",
-                r"\b(\d{1,2}[:.]\d{2})\s*HRS?\b",
-                r"HORA\s*[:\-]?\s*(\d{1,2}[:.]\d{2})",
-                r"(\d{1,2}[:.]\d{2})\s*HORA",
-                r"HORA\s+DE\s+\w+[^\n\r]*?(\d{1,2}[:.]\d{2})",
-                r"T\s*(\d{2}:\d{2}):\d{2}",  # ISO format: 2026-03-26T10:30:00
-                r"(\d{2}:\d{2}):\d{2}",  # Time with seconds
-            ],
-        )
-        or from_proximity(
-            "hr_adm",
-            ["HORA", "TIME", "HORA ADMISION"],
-            max_lines_after=2,
-            value_pattern=r"(\d{1,2}[:.]\d{2})",
-            exclude_patterns=["FECHA", "DATE", "REPORTE", "SINIESTRO"]
-        )
-    )
-    
-    # Fallback para Qualitas Ajuste Express: buscar patrón de hora después de fecha
-    if not raw_hora and normalized_lines:
-        for idx, line in enumerate(normalized_lines):
-            # Si la línea tiene una fecha ISO, buscar hora en la misma línea o siguiente
-            if re.search(r"\d{4}-\d{2}-\d{2}", line):
-                # Buscar hora en la misma línea
-                time_match = re.search(r"T(\d{2}:\d{2})", line)
-                if time_match:
-                    raw_hora = time_match.group(1)
-                    field_debug["hr_adm"] = "iso_datetime"
-                    break
-                # O buscar en líneas siguientes cerca de la fecha
-                for next_line in normalized_lines[idx:idx+2]:
-                    time_match = re.search(r"\b(\d{2}:\d{2})\b", next_line)
-                    if time_match:
-                        raw_hora = time_match.group(1)
-                        field_debug["hr_adm"] = "near_date"
-                        break
-                if raw_hora:
-                    break
-    hora = normalize_time(raw_hora)
-
-    if aseguradora == "CHUBB":
-        # CHUBB uses "Ocurrencia" with datetime in the same cell; prefer it over generic FECHA.
-        raw_ocurrencia_fecha = from_kv("fecha_adm", [["OCURRENCIA"]]) or from_regex(
-            "fecha_adm",
-            [
-                r"OCURRENCIA[^\n\r]*?(\d{1,2}[\/\-][A-Z]{3}[\/\-]\d{4})",
-                r"OCURRENCIA[^\n\r]*?(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{4})",
-                r"OCURRENCIA[\s:]+(\d{4}-\d{2}-\d{2})",  # ISO: 2026-03-20
-            ],
-        )
-        ocurrencia_iso = normalize_date(raw_ocurrencia_fecha)
-        if ocurrencia_iso:
-            fecha_iso = ocurrencia_iso
-            field_debug["fecha_adm"] = "ocurrencia_datetime"
-
-        raw_ocurrencia_hora = from_regex(
-            "hr_adm",
-            [
-                r"OCURRENCIA[^\n\r]*?(\d{1,2}[:.]\d{2})(?::\d{2})?",
-                r"\b(\d{1,2}[:.]\d{2})(?::\d{2})\b",
-                r"OCURRENCIA[\s:]+\d{4}-\d{2}-\d{2}[\sT]+(\d{2}:\d{2})",  # ISO datetime
-            ],
-        )
-        if not raw_ocurrencia_hora:
-            match = re.search(r"\b(\d{1,2}[:.]\d{2})(?::\d{2})\b", ocr_text or "", flags=re.IGNORECASE)
-            if match:
-                raw_ocurrencia_hora = match.group(1)
-        if not raw_ocurrencia_hora and normalized_lines:
-            for idx, line in enumerate(normalized_lines):
-                if "OCURRENCIA" not in line.upper():
-                    continue
-                window = normalized_lines[idx : idx + 4]
-                for candidate in window:
-                    match = re.search(r"\b(\d{1,2}[:.]\d{2})(?::\d{2})?\b", candidate)
-                    if match:
-                        raw_ocurrencia_hora = match.group(1)
-                        break
-                if raw_ocurrencia_hora:
-                    break
-        if not raw_ocurrencia_hora and raw_ocurrencia_fecha:
-            raw_ocurrencia_hora = raw_ocurrencia_fecha
-        ocurrencia_hora = normalize_time(raw_ocurrencia_hora)
-        if ocurrencia_hora:
-            hora = ocurrencia_hora
-            field_debug["hr_adm"] = "ocurrencia_datetime"
-        
-        # Fallback específico para CHUBB ticket vertical: buscar línea que empiece con fecha tipo "20/mar/2026"
-        if not fecha_iso and normalized_lines:
-            for line in normalized_lines:
-                # Patrón: 20/mar/2026 o 20/marzo/2026
-                match = re.search(r"\b(\d{1,2}/[a-z]{3,9}/\d{4})\b", line, re.IGNORECASE)
-                if match:
-                    fecha_iso = normalize_date(match.group(1))
-                    if fecha_iso:
-                        field_debug["fecha_adm"] = "chubb_ticket_date_line"
-                        break
-        
-        # Buscar hora en formato HH:MM:SS o HH:MM cerca de Ocurrencia
-        if not hora and normalized_lines:
-            for idx, line in enumerate(normalized_lines):
-                if "OCURRENCIA" in line.upper():
-                    # Buscar en la misma línea o siguiente
-                    for j in range(idx, min(idx + 2, len(normalized_lines))):
-                        time_match = re.search(r"\b(\d{2}:\d{2}:\d{2}|\d{2}:\d{2})\b", normalized_lines[j])
-                        if time_match:
-                            hora = normalize_time(time_match.group(1))
-                            if hora:
-                                field_debug["hr_adm"] = "chubb_ticket_time"
-                                break
-                    if hora:
-                        break
-
-    if not hora and normalized_lines:
-        # Last-resort for documents where HORA/Ocurrencia keys are split by OCR.
-        for line in normalized_lines:
-            match = re.search(r"\b(\d{1,2}[:.]\d{2})(?::\d{2})?\b", line)
-            if match:
-                hora = normalize_time(match.group(1))
-                if hora:
-                    field_debug["hr_adm"] = "line_time_fallback"
-                    break
-
-    # ========== REPORTE/SINIESTRO ==========
-    # Este campo es crítico - usar múltiples estrategias
-    # Qualitas Ajuste Express tiene: N° REPORTE y N° SINIESTRO separados
-    # Preferir REPORTE sobre SINIESTRO cuando ambos existen
-    
-    # Primero intentar extraer REPORTE específicamente
-    reporte = (
-        from_kv("reporte_siniestro", [
-            ["REPORTE"], ["REPORT"],
-            ["NUMERO", "REPORTE"], ["NO", "REPORTE"], ["N", "REPORTE"],
-            ["NUMERO", "DE", "REPORTE"], ["NO", "DE", "REPORTE"],
-            ["N", "DE", "REPORTE"], ["N", "REPORTE"]
-        ])
-        or from_flexible_kv("reporte_siniestro", [
-            "REPORTE", "REPORT",
-            "NUMERO REPORTE", "NO REPORTE", "N REPORTE",
-            "NUMERO DE REPORTE", "NO DE REPORTE", "N DE REPORTE", "Nº REPORTE"
-        ])
-    )
-    
-    # Si no se encontró REPORTE, intentar buscarlo específicamente con regex
-    if not reporte:
-        reporte = from_regex(
-            "reporte_siniestro",
-            [
-                r"N[°º#]?\s*(?:DE\s+)?REPORTE[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
-                r"REPORT\s*N[°º#]?[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
-                r"REPORTE\s*[:\-]?\s*([A-Z0-9-]{5,20})",
-                r"REPORTE\s*NUMERO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
-                r"^\s*N[°º#]?\.?\s*REPORTE\s*[:\-]?\s*([A-Z0-9-]{5,20})",
-            ],
-        )
-    
-    # Si aún no hay reporte, entonces buscar SINIESTRO como fallback
-    if not reporte:
-        reporte = (
-            from_kv("reporte_siniestro", [["SINIESTRO"], ["NUMERO", "SINIESTRO"], ["NO", "SINIESTRO"]])
-            or from_flexible_kv("reporte_siniestro", [
-                "SINIESTRO", "NUMERO SINIESTRO", "NO SINIESTRO", 
-                "NUMERO DE SINIESTRO", "FOLIO"
-            ])
-            or from_regex(
-                "reporte_siniestro",
-                [
-                    r"N[°º#]?\s*(?:DE\s+)?SINIESTRO[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
-                    r"SINIESTRO[^\n\r:]*[:\s]+([A-Z0-9-]{5,20})",
-                    r"SINIESTRO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
-                    r"FOLIO\s*[:\-]?\s*([A-Z0-9-]{5,20})",
-                    r"\b(\d{3,}-\d{3,})\b",  # Formato común: 123-456789
-                ],
-            )
-        )
-        if reporte:
-            field_debug["reporte_siniestro"] = "extracted_from_siniestro_fallback"
-    
-    # Búsqueda en líneas por proximidad y contexto
-    if not reporte:
-        reporte = (
-            from_proximity(
-                "reporte_siniestro",
-                ["REPORTE", "REPORT"],
-                max_lines_after=2,
-                value_pattern=r"([A-Z0-9-]{5,20})",
-                exclude_patterns=["FECHA", "HORA", "TELEFONO", "EMAIL", "FOLIO ELECTRONICO", "SINIESTRO"]
-            )
-            or from_context(
-                "reporte_siniestro",
-                ["REPORTE", "SINIESTRO", "FOLIO"],
-                value_pattern=r"\b([A-Z0-9-]{5,20})\b",
-                window_size=3
-            )
-        )
-    
-    # Limpiar el reporte - quitar prefijos comunes
-    if reporte:
-        reporte = re.sub(r"^(REPORTE|REPORT|SINIESTRO|FOLIO)\s*[:\-]?\s*", "", reporte, flags=re.IGNORECASE).strip()
-
-    # ========== NOMBRE DEL CLIENTE ==========
-    # Lista de textos que definitivamente NO son nombres de cliente
-    INVALID_NAME_PATTERNS = [
-        "DETALLADO", "AUTOMOTRIZ", "TALLER", "MARINA", "COLLISION", "CENTER",
-        "ASEGURADORA", "SEGUROS", "COMPAÑIA", "DIRECCION", "CIRCUNVALACION",
-        "CALLE", "AVENIDA", "COLONIA", "CIUDAD", "ESTADO", "CP:", "TELEFONO:",
-        "ESTIMADO", "FAVOR", "PRESENTARSE", "CON", "DIRECCION", "CON",
-        "FAVOR", "DE", "PRESENTARSE", "AJUSTADOR", "AJUSTADOR EXPRESS",
-        "CAMACHO", "LEYVA", "JOB EDUARDO",
-        # Textos de encabezados CHUBB
-        "VALIDO POR", "VALIDO", "CLAVE ACCESO", "FECHA ENTREGA", "IDENTIFICADOR",
-        "VOLANTE DE ADMISION", "VOLANTE DE ADMISIÓN", "Y VALUACION", "Y VALUACIÓN",
-        # Textos del disclaimer CHUBB
-        "OPERACIONES REALIZADAS", "FUERA DE ESTOS", "CANALES", "EVITA CAER",
-        "FRAUDES", "VICTIMA", "DENUNCIA", "GUARDIA NACIONAL", "CHUBB NO SE",
-        "RESPONSABLE POR", "CORREOS DESDE", "DOMINIOS", "DISTINTOS", "OFICIALES",
-        "CHUBB.COM", "CHUBBSERVICIOS.COM", "ALERTA DE FRAUDE", "NUNCA TE PEDIREMOS",
-        "DEPOSITOS", "CUENTAS", "NUESTRO NOMBRE"
-    ]
-    
-    def is_valid_name(candidate: str) -> bool:
-        """Valida que el candidato parezca un nombre de persona real."""
-        if not candidate or len(candidate) < 3:
-            return False
-        candidate_upper = candidate.upper()
-        # No debe contener patrones inválidos
-        for invalid in INVALID_NAME_PATTERNS:
-            if invalid in candidate_upper:
-                return False
-        # Debe tener al menos dos palabras (nombre y apellido)
-        words = candidate.split()
-        if len(words) < 2:
-            return False
-        # No debe tener números (excepto si es parte de un nombre raro)
-        if re.search(r"\d", candidate):
-            return False
-        # Debe empezar con letra mayúscula
-        if not re.match(r"^[A-ZÁÉÍÓÚÑ]", candidate):
-            return False
-        # RECHAZAR ACRÓNIMOS: si todas las palabras son de 2-3 letras, probablemente es un acrónimo
-        # Nombres reales típicamente tienen al menos algunas palabras de 4+ letras
-        short_words = [w for w in words if len(w) <= 3]
-        long_words = [w for w in words if len(w) >= 4]
-        # Si más de la mitad son palabras cortas Y hay pocas palabras largas, es acrónimo
-        if len(short_words) > len(words) / 2 and len(long_words) < 2:
-            return False
-        return True
-    
-    # ========== ESTRATEGIAS ESPECÍFICAS POR ASEGURADORA PRIMERO ==========
-    
-    # Qualitas Ajuste Express: buscar nombre del asegurado PRIMERO (antes de estrategias genéricas)
-    # Basado en la estructura exacta del OCR:
-    #   EVELIN DOMINGUEZ          <- Línea N (asegurado)
-    #   CAMACHO LEYVA JOB EDUARDO <- Línea N+1 (ajustador)
-    #   FIRMA DEL CONDUCTOR ASEGURADO <- Línea N+2 (etiqueta)
-    #   FIRMA DEL AJUSTADOR EXPRESS     <- Línea N+3 (etiqueta)
-    nb_cliente = ""
-    if aseguradora == "Qualitas" and normalized_lines:
-        # Buscar el patrón exacto: dos líneas con nombres seguidas de las etiquetas de firma
-        for idx in range(len(normalized_lines) - 3):
-            line1 = normalized_lines[idx].strip()      # EVELIN DOMINGUEZ
-            line2 = normalized_lines[idx + 1].strip()  # CAMACHO LEYVA JOB EDUARDO
-            line3 = normalized_lines[idx + 2].strip().upper()  # FIRMA DEL CONDUCTOR ASEGURADO
-            line4 = normalized_lines[idx + 3].strip().upper()  # FIRMA DEL AJUSTADOR EXPRESS
-            
-            # Verificar si es el patrón de firmas
-            if (
-                "FIRMA DEL CONDUCTOR" in line3
-                and "FIRMA DEL AJUSTADOR" in line4
-                and len(line1) > 3
-                and len(line2) > 3
-            ):
-                # line1 es el asegurado, line2 es el ajustador
-                # Validar que line1 parezca un nombre
-                if is_valid_name(line1):
-                    nb_cliente = line1
-                    field_debug["nb_cliente"] = "qualitas_firma_pattern_exact"
-                    break
-        
-        # Si no se encontró, buscar línea con "FIRMA DEL CONDUCTOR ASEGURADO" y subir 2 líneas
-        if not nb_cliente:
-            for idx, line in enumerate(normalized_lines):
-                if "FIRMA DEL CONDUCTOR ASEGURADO" in line.upper():
-                    # Subir 2 líneas (hay una línea con el ajustador en medio)
-                    if idx >= 2:
-                        candidate = normalized_lines[idx - 2].strip()
-                        if is_valid_name(candidate):
-                            nb_cliente = candidate
-                            field_debug["nb_cliente"] = "qualitas_firma_2lines_up"
-                            break
-        
-        # Último recurso: buscar en la sección inferior del documento (últimas 10 líneas)
-        if not nb_cliente:
-            last_lines = normalized_lines[-10:] if len(normalized_lines) >= 10 else normalized_lines
-            for idx, line in enumerate(last_lines):
-                candidate = line.strip()
-                # Buscar nombre que parezca de persona (2 palabras, mayúsculas, sin números)
-                if (
-                    len(candidate) > 5
-                    and re.match(r"^[A-ZÁÉÍÓÚÑ]+\s+[A-ZÁÉÍÓÚÑ]+$", candidate)
-                    and not re.search(r"\d", candidate)
-                    and "CAMACHO" not in candidate.upper()
-                    and "JOB" not in candidate.upper()
-                    and "LEYVA" not in candidate.upper()
-                    and is_valid_name(candidate)
-                ):
-                    nb_cliente = candidate
-                    field_debug["nb_cliente"] = "qualitas_last_lines"
-                    break
-    
-    # CHUBB ticket vertical: buscar "Asegurado:" seguido de nombre en línea siguiente
-    # Solo buscar DESPUÉS de "Datos Vehículo" para evitar el encabezado
-    if not nb_cliente and aseguradora == "CHUBB" and normalized_lines:
-        datos_vehiculo_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            if "DATOS VEHICULO" in line.upper() or "DATOS VEHÍCULO" in line.upper():
-                datos_vehiculo_idx = idx
-                break
-        
-        # Buscar "Asegurado:" solo después de "Datos Vehículo"
-        if datos_vehiculo_idx >= 0:
-            for i in range(datos_vehiculo_idx, min(datos_vehiculo_idx + 15, len(normalized_lines))):
-                line = normalized_lines[i]
-                line_upper = line.upper()
-                if "ASEGURADO" in line_upper and ":" in line:
-                    # El nombre debería estar en la siguiente línea
-                    if i + 1 < len(normalized_lines):
-                        candidate = normalized_lines[i + 1].strip()
-                        # Validación simplificada para CHUBB: nombre en mayúsculas con 3-6 palabras
-                        words = candidate.split()
-                        if (len(words) >= 3 and len(words) <= 6 and 
-                            candidate == candidate.upper() and
-                            all(w.isalpha() for w in words)):
-                            nb_cliente = candidate
-                            field_debug["nb_cliente"] = "chubb_ticket_asegurado_line"
-                            break
-        
-        # Fallback: si no se encontró, buscar línea con nombre completo típico (3+ palabras, mayúsculas)
-        if not nb_cliente:
-            for line in normalized_lines:
-                candidate = line.strip()
-                # Patrón típico de nombre: 3-5 palabras en mayúsculas (ej: MANUEL DE JESUS HERNANDEZ TOVAR)
-                if re.match(r"^[A-ZÁÉÍÓÚÑ]+(\s+[A-ZÁÉÍÓÚÑ]+){2,4}$", candidate):
-                    if is_valid_name(candidate):
-                        nb_cliente = candidate
-                        field_debug["nb_cliente"] = "chubb_ticket_name_pattern"
-                        break
-    
-    # ========== ESTRATEGIAS GENÉRICAS (solo si no se encontró en específicas) ==========
-    if not nb_cliente:
-        nb_cliente = (
-            from_kv("nb_cliente", [
-                ["NOMBRE", "RAZON", "CLIENTE"],
-                ["CUSTOMER", "NAME"],
-                ["NOMBRE", "CLIENTE"],
-                ["CLIENTE"],
-            ])
-            or from_flexible_kv("nb_cliente", [
-                "NOMBRE", "NOMBRE CLIENTE", "CLIENTE", "CUSTOMER NAME", "NOMBRE O RAZON SOCIAL",
-                "RAZON SOCIAL", "NOMBRE DEL CLIENTE", "Asegurado", "CONTRATANTE", "TITULAR"
-            ])
-        )
-        
-        # Validar el nombre extraído
-        if nb_cliente and not is_valid_name(nb_cliente):
-            nb_cliente = ""
-    
-    # Si no se encontró, intentar regex
-    if not nb_cliente:
-        nb_cliente = from_regex(
-            "nb_cliente",
-            [
-                r"NOMBRE O RAZ[ÓO]N SOCIAL DEL CLIENTE[^\n\r]*[\r\n]+([^\r\n]+)",
-                r"CUSTOMER NAME[^\n\r]*[\r\n]+([^\r\n]+)",
-                r"NOMBRE\s*(?:DEL?)?\s*CLIENTE[^\n\r:]*[:\s]+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})",
-                r"CLIENTE[\s:]+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})",
-                r"^\s*Asegurado:\s*([A-Z][A-Z\s]{3,40})$",
-            ],
-        )
-        if nb_cliente and not is_valid_name(nb_cliente):
-            nb_cliente = ""
-    
-    # Búsqueda por proximidad con validación
-    if not nb_cliente:
-        candidate = from_proximity(
-            "nb_cliente",
-            ["NOMBRE", "CLIENTE", "ASEGURADO", "CONTRATANTE", "ASEGURADO:"],
-            max_lines_after=2,
-            value_pattern=r"([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑa-záéíóúñ\s]{2,40})",
-            exclude_patterns=["TELEFONO", "EMAIL", "DIRECCION", "POLIZA", "CHUBB", "TALLER"]
-        )
-        if candidate and is_valid_name(candidate):
-            nb_cliente = candidate
-
-    # ========== TELÉFONO ==========
-    # Patrones para detectar teléfonos de taller/aseguradora (no del cliente)
-    TALLER_PHONE_PATTERNS = [
-        "6699868513",  # Teléfono del taller La Marina
-        "800800",      # Líneas 800 de Qualitas
-        "8700288",     # Otros números de Qualitas
-        "555481",      # Teléfonos CDMX
-        "555002",
-    ]
-    
-    def is_valid_client_phone(phone: str) -> bool:
-        """Valida que el teléfono sea del cliente, no del taller o aseguradora."""
-        if not phone:
-            return False
-        digits = re.sub(r"\D", "", phone)
-        # Verificar contra patrones de teléfonos de taller/aseguradora
-        for pattern in TALLER_PHONE_PATTERNS:
-            if pattern in digits:
-                return False
-        # Debe tener al menos 10 dígitos
-        if len(digits) < 10:
-            return False
-        return True
-    
-    tel_cliente = (
-        from_kv("tel_cliente", [
-            ["TELEFONO", "PHONE"],
-            ["TELEFONO"],
-            ["TEL", "CLIENTE"],
-            ["CELULAR"],
-        ])
-        or from_flexible_kv("tel_cliente", [
-            "TELEFONO", "PHONE", "TEL", "CELULAR", "TELEFONO CLIENTE", "TELEFONO DEL CLIENTE",
-            "TEL CLIENTE", "CELULAR CLIENTE"
-        ])
-        or from_regex(
-            "tel_cliente",
-            [
-                r"TEL[ÉE]FONO\s*/?\s*PHONE\s*N[°º#]?[^\n\r]*[:\s]+([0-9][0-9 \-\(\)]{7,})",
-                r"TEL[ÉE]FONO\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
-                r"TEL\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
-                r"CELULAR\s*[:\-]?\s*([0-9\s\-\(\)]{8,15})",
-                r"\b(\d{3}[-\s]\d{3}[-\s]\d{4})\b",  # Formato: 669-164-5258
-                r"\b(\d{10})\b",  # Formato: 6691645258
-                r"\(\d{3}\)\s*\d{3}[-\s]?\d{4}",  # Formato: (669) 164-5258
-            ],
-        )
-        or from_proximity(
-            "tel_cliente",
-            ["TELEFONO", "PHONE", "TEL", "CELULAR"],
-            max_lines_after=2,
-            value_pattern=r"([0-9\s\-\(\)]{8,15})",
-            exclude_patterns=["FECHA", "HORA", "REPORTE", "EMAIL"]
-        )
-        or from_context(
-            "tel_cliente",
-            ["TELEFONO", "PHONE", "TEL", "CONTACTO"],
-            value_pattern=r"\b(\d{10}|\d{3}[-\s]\d{3}[-\s]\d{4})\b",
-            window_size=3
-        )
-    )
-    
-    # Validar que el teléfono sea del cliente
-    if tel_cliente and not is_valid_client_phone(tel_cliente):
-        tel_cliente = ""
-        field_debug["tel_cliente"] = "rejected_taller_phone"
-
-    # Qualitas OCR often has multiple phone labels; prioritize the phone tied to the customer block.
-    if normalized_lines:
-        customer_idx = -1
-        email_label_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            up = line.upper()
-            if customer_idx < 0 and (
-                "NOMBRE O RAZON SOCIAL DEL CLIENTE" in up
-                or "CUSTOMER NAME OR CORPORATE NAME" in up
-            ):
-                customer_idx = idx
-            if customer_idx >= 0 and email_label_idx < 0 and ("E MAIL" in up or "EMAIL" in up):
-                email_label_idx = idx
-                break
-        if customer_idx >= 0:
-            start = customer_idx + 1
-            stop = email_label_idx if email_label_idx > start else min(start + 8, len(normalized_lines))
-            contextual_phone = ""
-            for line in normalized_lines[start:stop]:
-                digits = re.sub(r"\D", "", line or "")
-                if len(digits) >= 10 and "POLIZA" not in line.upper() and "TEL" not in line.upper():
-                    contextual_phone = digits
-                    break
-            if contextual_phone:
-                tel_cliente = contextual_phone
-                field_debug["tel_cliente"] = "lines_after_customer_header"
-
-    tel_cliente = re.sub(r"\D", "", tel_cliente or "")
-    if len(tel_cliente) > 10:
-        tel_cliente = tel_cliente[-10:]
-
-    # ========== EMAIL ==========
-    # Dominios de aseguradoras (emails que NO son del cliente)
-    INSURER_EMAIL_DOMAINS = [
-        "qualitas.com.mx",
-        "qualitas.com",
-        "chubb.com",
-        "chubb.com.mx",
-        "chubbservicios.com",
-        "chubbservicios.com.mx",
-        "gnp.com.mx",
-        "axa.com.mx",
-        "mapfre.com.mx",
-    ]
-    
-    def is_valid_client_email(email: str) -> bool:
-        """Valida que el email sea del cliente, no de la aseguradora."""
-        if not email:
-            return False
-        email_lower = email.lower()
-        for domain in INSURER_EMAIL_DOMAINS:
-            if domain in email_lower:
-                return False
-        return True
-    
-    email_cliente = (
-        from_kv("email_cliente", [["E", "MAIL"], ["EMAIL"], ["CORREO"], ["E-MAIL"]])
-        or from_flexible_kv("email_cliente", [
-            "EMAIL", "E-MAIL", "E MAIL", "CORREO", "CORREO ELECTRONICO", "EMAIL CLIENTE"
-        ])
-    )
-    
-    # Validar que no sea email de aseguradora
-    if email_cliente and not is_valid_client_email(email_cliente):
-        email_cliente = ""
-    
-    # Buscar cualquier email en el texto si no se encontró por KV
-    if not email_cliente:
-        email_match = re.search(r"([A-Z0-9._%+\-]+@[A-Z0-9.\-]+\.[A-Z]{2,})", upper_text, flags=re.IGNORECASE)
-        if email_match:
-            candidate = email_match.group(1).lower()
-            if is_valid_client_email(candidate):
-                email_cliente = candidate
-                field_debug["email_cliente"] = "regex_global"
-    
-    # Buscar email cerca de la etiqueta
-    if not email_cliente and normalized_lines:
-        email_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            up = line.upper()
-            if "E MAIL" in up or "EMAIL" in up or "CORREO" in up or "E-MAIL" in up:
-                email_idx = idx
-                break
-        if email_idx >= 0:
-            for line in normalized_lines[email_idx + 1 : email_idx + 6]:
-                if "@" in line:
-                    possible = _normalize_ocr_text(line).lower()
-                    if re.search(r"[a-z0-9._%+\-]+@[a-z0-9.\-]+\.[a-z]{2,}", possible):
-                        if is_valid_client_email(possible):
-                            email_cliente = possible
-                            field_debug["email_cliente"] = "line_after_email_label"
-                            break
-    
-    # Buscar email en el contexto del cliente
-    if not email_cliente and normalized_lines and nb_cliente:
-        for idx, line in enumerate(normalized_lines):
-            if nb_cliente.upper() in line.upper():
-                # Buscar email en las siguientes líneas
-                for next_line in normalized_lines[idx:idx+5]:
-                    email_match = re.search(r"([a-z0-9._%+\-]+@[a-z0-9.\-]+\.[a-z]{2,})", next_line.lower())
-                    if email_match:
-                        candidate = email_match.group(1)
-                        if is_valid_client_email(candidate):
-                            email_cliente = candidate
-                            field_debug["email_cliente"] = "context_after_name"
-                            break
-                if email_cliente:
-                    break
-    
-    email_cliente = email_cliente.lower()
-
-    # ========== INFORMACIÓN DEL VEHÍCULO ==========
-    
-    # Función auxiliar para extraer campo en formato ticket vertical (CHUBB)
-    def extract_ticket_field(label_patterns: list[str], max_lines: int = 2) -> str:
-        if not normalized_lines:
-            return ""
-        for idx, line in enumerate(normalized_lines):
-            line_upper = line.upper().strip()
-            # Buscar si la línea termina con alguno de los patrones de etiqueta
-            for pattern in label_patterns:
-                pattern_upper = pattern.upper()
-                # Formato: "Marca:" o "Marca" al final de la línea
-                if line_upper.rstrip(":").endswith(pattern_upper) or line_upper == pattern_upper:
-                    # El valor está en la siguiente línea
-                    for j in range(1, min(max_lines + 1, len(normalized_lines) - idx)):
-                        candidate = normalized_lines[idx + j].strip()
-                        # Evitar líneas vacías o que sean otras etiquetas
-                        if candidate and not any(
-                            candidate.upper().startswith(p) for p in 
-                            ["MARCA", "TIPO", "MODELO", "COLOR", "PLACAS", "SERIE", "ASEGURADO", "CHUBB"]
-                        ):
-                            return candidate
-        return ""
-    
-    # Inicializar variables para evitar UnboundLocalError
-    marca_vehiculo = ""
-    tipo_vehiculo = ""
-    color_vehiculo = ""
-    placas = ""
-    kilometraje = ""
-    modelo_anio = ""
-
-    # ========== AÑO/MODELO ==========
-    # Buscar específicamente un año de 4 dígitos (1990-2030) o 2 dígitos válidos
-    # Evitar confundir con descripciones de daños
-    
-    def extract_year_from_text(text: str) -> str:
-        """Extrae un año válido de vehículo (1990-2030) del texto."""
-        if not text:
-            return ""
-        # Buscar años de 4 dígitos
-        year_match = re.search(r"\b((?:19|20)\d{2})\b", text)
-        if year_match:
-            year = int(year_match.group(1))
-            if 1990 <= year <= 2030:
-                return str(year)
-        return ""
-    
-    # ========== EXTRACCIÓN ESPECÍFICA PARA QUALITAS AJUSTE EXPRESS (PRIMERO) ==========
-    # Basado en la estructura exacta de las líneas del OCR
-    # Las líneas del OCR muestran:
-    #   Línea N: NISSAN
-    #   Línea N+1: NISSAN X-TRAIL ADVANCE  
-    #   Línea N+2: 2017
-    #   Línea N+3: 0
-    
-    modelo_anio = ""
-    marca_vehiculo = ""
-    tipo_vehiculo = ""
-    color_vehiculo = ""
-    placas = ""
-    kilometraje = ""
-    
-    if aseguradora == "Qualitas" and normalized_lines:
-        # ========== FORMATO QUALITAS AUTOMÓVILES (CLÁSICO) ==========
-        # Detectar si es el formato con encabezados de tabla:
-        # MARCA -> TIRO/TIPO -> MODELO (AÑO) -> KILOMETRAJE
-        # seguido de los valores reales
-        
-        marca_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            if line.strip().upper() == "MARCA":
-                marca_idx = idx
-                break
-        
-        # Si encontramos MARCA y cerca está TIRO o TIPO, es formato clásico
-        if marca_idx >= 0:
-            # Buscar estructura: MARCA, TIRO/TIPO, MODELO (AÑO), KILOMETRAJE
-            has_tipo = False
-            has_modelo = False
-            has_kilometraje = False
-            
-            # Detectar si es formato bilingüe buscando "BRAND" o "TYPE" en las líneas siguientes
-            is_bilingual = any("BRAND" in normalized_lines[j].upper() or "TYPE" in normalized_lines[j].upper() for j in range(marca_idx, min(marca_idx + 5, len(normalized_lines))))
-            
-            # Buscar headers del formato (soporta español solo o bilingüe)
-            for i in range(marca_idx, min(marca_idx + 5, len(normalized_lines))):
-                line_upper = normalized_lines[i].strip().upper()
-                # TIPO/TIRO - puede venir como "TIPO", "TIPO TYPE", "TIRO"
-                if "TIPO" in line_upper or "TIRO" in line_upper or "TYPE" in line_upper:
-                    has_tipo = True
-                # MODELO (AÑO) - puede venir como "MODELO (AÑO)", "MODELO (ANO) MODEL (YEAR)"
-                if "MODELO" in line_upper and ("AÑO" in line_upper or "ANO" in line_upper or "YEAR" in line_upper):
-                    has_modelo = True
-                # KILOMETRAJE/MILEAGE
-                if "KILOMETRAJE" in line_upper or "MILEAGE" in line_upper:
-                    has_kilometraje = True
-            
-            # Si es formato clásico o bilingüe, buscar valores debajo
-            if has_tipo and has_modelo:
-                # Los valores deberían estar en las siguientes líneas
-                # Estructura típica: CHEVROLET, SILVERADO, 2014, (vacío)
-                # O bilingüe: TOYOTA, TY TOYOTA COROLLA..., 2017
-                candidates_start = marca_idx + 4  # Después de los headers
-                
-                # Lista de etiquetas a ignorar (tanto español como inglés)
-                # Incluye variantes como "MARCA BRAND", "TIPO TYPE", "MODELO (ANO) MODEL (YEAR)"
-                skip_patterns = [
-                    "MARCA", "BRAND", "TIPO", "TYPE", "MODELO", "MODEL", "AÑO", "ANO", "YEAR", 
-                    "KILOMETRAJE", "MILEAGE", "COLOR", "COLOUR", "PLACAS", "PLATES", "TRANSMISION", "TRANSMISSION"
-                ]
-                
-                for i in range(candidates_start, min(candidates_start + 10, len(normalized_lines))):
-                    line = normalized_lines[i].strip()
-                    line_upper = line.upper()
-                    
-                    # Saltar líneas que contienen etiquetas (para variantes bilingües como "MARCA BRAND")
-                    is_label = False
-                    for pattern in skip_patterns:
-                        if line_upper == pattern or line_upper.startswith(pattern + " ") or (" " + pattern) in line_upper:
-                            # Pero no saltar si la línea también contiene una marca conocida
-                            has_marca = any(m in line_upper for m in ["TOYOTA", "NISSAN", "CHEVROLET", "CHEUROLET", "HONDA", "FORD", "KIA", "HYUNDAI", "MAZDA", "JEEP", "VW", "VOLKSWAGEN"])
-                            if not has_marca:
-                                is_label = True
-                                break
-                    if is_label:
-                        continue
-                    
-                    # Marca: línea que es marca conocida
-                    if not marca_vehiculo and re.search(r"^(CHEVROLET|CHEUROLET|NISSAN|TOYOTA|HONDA|VW|VOLKSWAGEN|FORD|CHRYSLER|KIA|HYUNDAI|MAZDA|JEEP|GMC|CADILLAC|BUICK)$", line_upper):
-                        marca_vehiculo = line.replace("CHEUROLET", "CHEVROLET")  # Corrección OCR común
-                        field_debug["marca_vehiculo"] = "qualitas_classic_marca"
-                        if is_bilingual:
-                            field_debug["marca_vehiculo"] = "qualitas_bilingual_marca"
-                        continue
-                    
-                    # Si aún no tenemos marca pero encontramos una línea válida después de saltar etiquetas
-                    # y es el formato bilingüe, buscar más abajo
-                    if is_bilingual and not marca_vehiculo and line_upper in ["TOYOTA", "NISSAN", "HONDA", "CHEVROLET", "CHEUROLET", "FORD", "KIA", "HYUNDAI", "MAZDA", "JEEP", "VW", "VOLKSWAGEN"]:
-                        marca_vehiculo = line.replace("CHEUROLET", "CHEVROLET")
-                        field_debug["marca_vehiculo"] = "qualitas_bilingual_marca"
-                        continue
-                    
-                    # Tipo: línea después de marca, no es año ni número ni etiqueta
-                    if marca_vehiculo and not tipo_vehiculo:
-                        # Saltar si parece una etiqueta
-                        if any(label in line_upper for label in skip_patterns):
-                            continue
-                        if not re.match(r"^(20\d{2}|\d+)$", line) and len(line) > 2:
-                            tipo_vehiculo = line
-                            field_debug["tipo_vehiculo"] = "qualitas_classic_tipo"
-                            if is_bilingual:
-                                field_debug["tipo_vehiculo"] = "qualitas_bilingual_tipo"
-                            continue
-                    
-                    # Año: línea que es año 20XX
-                    if not modelo_anio and re.match(r"^(20\d{2})$", line):
-                        year = int(line)
-                        if 1990 <= year <= 2030:
-                            modelo_anio = line
-                            field_debug["modelo_anio"] = "qualitas_classic_year"
-                            if is_bilingual:
-                                field_debug["modelo_anio"] = "qualitas_bilingual_year"
-                            continue
-        
-        # ========== FORMATO QUALITAS AJUSTE EXPRESS ==========
-        # Buscar el patrón específico de la tabla:
-        # Línea N: NISSAN
-        # Línea N+1: NISSAN X-TRAIL ADVANCE  
-        # Línea N+2: 2017
-        # Línea N+3: 0
-        
-        if not modelo_anio:  # Solo si no lo encontramos en formato clásico
-            for idx in range(len(normalized_lines) - 3):
-                line1 = normalized_lines[idx].strip()      # NISSAN
-                line2 = normalized_lines[idx + 1].strip()  # NISSAN X-TRAIL ADVANCE
-                line3 = normalized_lines[idx + 2].strip()  # 2017
-                line4 = normalized_lines[idx + 3].strip()  # 0
-                
-                # Verificar si es el patrón de la tabla de vehículo
-                if (
-                    re.search(r"^(NISSAN|TOYOTA|HONDA|VW|VOLKSWAGEN|CHEVROLET|CHEUROLET|FORD|CHRYSLER|KIA|HYUNDAI|MAZDA|JEEP)$", line1, re.IGNORECASE)
-                    and len(line2) > 5  # Tipo/modelo
-                    and re.match(r"^(20\d{2})$", line3)  # Año
-                    and re.match(r"^(\d+|KILOMETRAJE|PLACAS)$", line4, re.IGNORECASE)  # Kilometraje, 0, o etiqueta
-                ):
-                    modelo_anio = line3
-                    field_debug["modelo_anio"] = "qualitas_table_pattern"
-                    break
-            
-            # Si no se encontró, buscar cualquier línea que sea solo un año y esté cerca de marca
-            if not modelo_anio:
-                for idx, line in enumerate(normalized_lines):
-                    line_stripped = line.strip()
-                    if re.match(r"^(20\d{2})$", line_stripped):
-                        year = int(line_stripped)
-                        if 2010 <= year <= 2030:
-                            # Verificar contexto: líneas anteriores deben tener datos del vehículo
-                            context = " ".join(normalized_lines[max(0, idx-3):idx]).upper()
-                            if any(marker in context for marker in ["NISSAN", "TOYOTA", "HONDA", "MARCA", "TIPO", "MODELO", "CHEVROLET", "CHEUROLET"]):
-                                modelo_anio = line_stripped
-                                field_debug["modelo_anio"] = "qualitas_year_in_context"
-                                break
-
-    # ========== ESTRATEGIA ESPECÍFICA PARA CHUBB (AÑO DEL MODELO) ==========
-    # CHUBB tiene "Modelo:2024" en los datos del vehículo, separado de la fecha de ocurrencia
-    if not modelo_anio and aseguradora == "CHUBB" and normalized_lines:
-        for idx, line in enumerate(normalized_lines):
-            line_upper = line.upper()
-            # Buscar "Modelo:" o "Modelo:" seguido de año
-            if "MODELO:" in line_upper or "MODELO:" in line:
-                # Extraer año de la misma línea (ej: "Modelo:2024")
-                year_match = re.search(r"MODELO:\s*(20\d{2})", line, re.IGNORECASE)
-                if year_match:
-                    modelo_anio = year_match.group(1)
-                    field_debug["modelo_anio"] = "chubb_modelo_year"
-                    break
-                # O buscar en la siguiente línea
-                if idx + 1 < len(normalized_lines):
-                    next_line = normalized_lines[idx + 1].strip()
-                    year_match = re.match(r"^(20\d{2})$", next_line)
-                    if year_match:
-                        modelo_anio = year_match.group(1)
-                        field_debug["modelo_anio"] = "chubb_modelo_next_line"
-                        break
-
-    # ========== ESTRATEGIAS GENÉRICAS PARA MARCA (solo si no se encontró en específicas) ==========
-    if not marca_vehiculo:
-        marca_vehiculo = (
-            from_kv("marca_vehiculo", [["MARCA", "BRAND"], ["MARCA"], ["MARCA", "VEHICULO"]])
-            or from_flexible_kv("marca_vehiculo", [
-                "MARCA", "BRAND", "MARCA VEHICULO", "MARCA DEL VEHICULO", "MARCA AUTO"
-            ])
-            or from_regex(
-                "marca_vehiculo",
-                [
-                    r"MARCA\s*/?\s*BRAND[^\n\r]*[\r\n]+([^\r\n]+)",
-                    r"MARCA[^\n\r:]*[:\s]+([A-Z0-9][A-Z0-9\s]{1,20})",
-                    r"MARCA\s*[:\-]?\s*([A-Z][A-Z\s]{1,15})",
-                    r"^\s*Marca:\s*([A-Z][A-Z\s]{1,15})$",
-                ],
-            )
-            or from_proximity(
-                "marca_vehiculo",
-                ["MARCA", "BRAND"],
-                max_lines_after=1,
-                value_pattern=r"([A-Z][A-Z\s]{1,15})",
-                exclude_patterns=["TIPO", "MODELO", "COLOR", "SERIE"]
-            )
-            or (aseguradora == "CHUBB" and extract_ticket_field(["Marca", "MARCA"]))
-        )
-
-    # ========== ESTRATEGIAS GENÉRICAS PARA TIPO (solo si no se encontró en específicas) ==========
-    if not tipo_vehiculo:
-        tipo_vehiculo = (
-            from_kv("tipo_vehiculo", [["TIPO", "TYPE"], ["TIPO"], ["TIPO", "VEHICULO"], ["MODELO", "TIPO"]])
-            or from_flexible_kv("tipo_vehiculo", [
-                "TIPO", "TYPE", "TIPO VEHICULO", "TIPO DE VEHICULO", "MODELO", "SUBMARCA",
-                "LINEA", "VERSION"
-            ])
-            or from_regex(
-                "tipo_vehiculo",
-                [
-                    r"TIPO\s*/?\s*TYPE[^\n\r]*[\r\n]+([^\r\n]+)",
-                    r"TIPO[^\n\r:]*[:\s]+([A-Z0-9][A-Z0-9\s]{1,25})",
-                    r"TIPO\s*[:\-]?\s*([A-Z][A-Z0-9\s]{1,20})",
-                    r"LINEA\s*[:\-]?\s*([A-Z][A-Z0-9\s]{1,20})",
-                    r"^\s*Tipo:\s*([A-Z][A-Z0-9\s\.]{5,50})$",
-                ],
-            )
-            or from_proximity(
-                "tipo_vehiculo",
-                ["TIPO", "TYPE", "LINEA", "SUBMARCA"],
-                max_lines_after=1,
-                value_pattern=r"([A-Z][A-Z0-9\s]{1,25})",
-                exclude_patterns=["MARCA", "MODELO", "COLOR", "SERIE", "PLACAS"]
-            )
-            or (aseguradora == "CHUBB" and extract_ticket_field(["Tipo", "TIPO"]))
-        )
-
-    # ========== ESTRATEGIAS GENÉRICAS PARA AÑO (solo si no se encontró en específicas) ==========
-    if not modelo_anio:
-        modelo_anio = (
-            from_kv("modelo_anio", [["MODELO"], ["AÑO"], ["ANIO"], ["YEAR"]])
-            or from_flexible_kv("modelo_anio", [
-                "MODELO", "MODELO/AÑO", "MODELO/ANIO", "AÑO MODELO", "ANIO MODELO", 
-                "YEAR", "MODEL YEAR"
-            ])
-            or from_regex(
-                "modelo_anio",
-                [
-                    r"MODELO\s*/?\s*AÑO?\s*[:\-]?\s*(20\d{2})",
-                    r"AÑO\s*[:\-]?\s*(20\d{2})",
-                    r"\b(20\d{2})\b",  # Cualquier año 20XX
-                ],
-            )
-            or from_proximity(
-                "modelo_anio",
-                ["MODELO", "AÑO", "ANIO"],
-                max_lines_after=1,
-                value_pattern=r"(20\d{2})",
-                exclude_patterns=["REPORTE", "SINIESTRO", "FECHA"]
-            )
-        )
-        
-        # Validar que sea un año razonable (1990-2030)
-        if modelo_anio:
-            year_match = re.search(r"(20\d{2})", str(modelo_anio))
-            if year_match:
-                year = int(year_match.group(1))
-                if 1990 <= year <= 2030:
-                    modelo_anio = str(year)
-                else:
-                    modelo_anio = ""
-            else:
-                modelo_anio = ""
-
-    # ========== COLOR ==========
-    if not color_vehiculo:
-        color_vehiculo = (
-            from_kv("color_vehiculo", [["COLOR", "COLOUR"], ["COLOR"]])
-            or from_flexible_kv("color_vehiculo", [
-                "COLOR", "COLOUR", "COLOR VEHICULO", "COLOR DEL VEHICULO"
-            ])
-            or from_regex(
-                "color_vehiculo",
-                [
-                    r"COLOR\s*/?\s*COLOUR?[^\n\r]*[\r\n]+([A-Z][A-Z\s]{2,15})",
-                    r"COLOR[^\n\r:]*[:\s]+([A-Z][A-Z\s]{2,15})",
-                    r"COLOR\s*[:\-]?\s*([A-Z][A-Z\s]{2,15})",
-                    r"^\s*Color:\s*([A-Z][A-Z\s]{2,15})$",
-                ],
-            )
-            or from_proximity(
-                "color_vehiculo",
-                ["COLOR"],
-                max_lines_after=1,
-            value_pattern=r"([A-Z][A-Z\s]{2,15})",
-            exclude_patterns=["MARCA", "TIPO", "MODELO", "SERIE", "PLACAS"]
-        )
-        or (aseguradora == "CHUBB" and extract_ticket_field(["Color", "COLOR"]))
-    )
-    
-    # Validar que el color sea un color válido común
-    colores_validos = [
-        "NEGRO", "BLANCO", "GRIS", "PLATA", "ROJO", "AZUL", "VERDE", "AMARILLO",
-        "NARANJA", "CAFE", "MARRON", "BEIGE", "DORADO", "VINO", "TINTO", "GRAFITO",
-        "ACERO", "ARENA", "BLANCO PERLA", "AZUL MARINO", "GRIS OSCURO", "PLATA METALICO"
-    ]
-    
-    # Correcciones OCR comunes para colores
-    # Basado en errores típicos de OCR: K↔R, O↔0, I↔1, etc.
-    color_ocr_fixes = {
-        # Rojo y variantes
-        "KAO": "ROJO",
-        "KAJO": "ROJO",
-        "ROJ": "ROJO",
-        "ROJ0": "ROJO",
-        "R0J0": "ROJO",
-        # Azul y variantes
-        "AZUI": "AZUL",
-        "AZULI": "AZUL",
-        "AZU1": "AZUL",
-        "4ZUL": "AZUL",
-        # Negro y variantes
-        "NEGR": "NEGRO",
-        "NEGR0": "NEGRO",
-        "N3GR0": "NEGRO",
-        # Blanco y variantes
-        "BLANC": "BLANCO",
-        "BLANC0": "BLANCO",
-        "BL4NC0": "BLANCO",
-        # Gris y variantes
-        "GRS": "GRIS",
-        "GRI": "GRIS",
-        "GR1S": "GRIS",
-        # Plata y variantes
-        "PLAT": "PLATA",
-        "PLAT4": "PLATA",
-        "PL4TA": "PLATA",
-        # Verde y variantes
-        "VERD": "VERDE",
-        "VERD3": "VERDE",
-        # Otros
-        "AMARILL": "AMARILLO",
-        "AMAR1LL0": "AMARILLO",
-    }
-    
-    if color_vehiculo:
-        color_upper = color_vehiculo.upper().strip()
-        # Limpiar caracteres especiales
-        color_upper_clean = re.sub(r"[^A-Z0-9]", "", color_upper)
-        
-        # Aplicar correcciones OCR exactas
-        if color_upper_clean in color_ocr_fixes:
-            color_vehiculo = color_ocr_fixes[color_upper_clean]
-            color_upper = color_vehiculo
-        else:
-            # Corrección fonética/similitud: si empieza con K y suena como color
-            if color_upper_clean.startswith("K") and len(color_upper_clean) <= 5:
-                # KAO, KA, KO suelen ser ROJO mal leído
-                if color_upper_clean in ["K", "KA", "KO", "KAO", "KA0"]:
-                    color_vehiculo = "ROJO"
-                    color_upper = "ROJO"
-            # Si termina en vocal + O, podría ser ROJO (KAO→ROJO, RAO→ROJO)
-            if re.match(r"^[KR][A-Z0-9]*O$", color_upper_clean) and len(color_upper_clean) <= 5:
-                color_vehiculo = "ROJO"
-                color_upper = "ROJO"
-        
-        # Verificar si es un color válido o contiene uno
-        es_valido = any(valido in color_upper or color_upper in valido for valido in colores_validos)
-        if not es_valido and len(color_vehiculo) < 3:
-            color_vehiculo = ""  # Descartar si parece inválido
-
-    # ========== SERIE/VIN ==========
-    serie_auto = (
-        from_kv("serie_auto", [["SERIE"], ["VIN"], ["NO", "SERIE"], ["NUMERO", "SERIE"]])
-        or from_flexible_kv("serie_auto", [
-            "SERIE", "VIN", "NUMERO DE SERIE", "NO SERIE", "N SERIE", "SERIE VEHICULO"
-        ])
-        or from_regex(
-            "serie_auto",
-            [
-                r"N[°º#]?\s*DE SERIE\s*/?\s*SERIES?\s*N[°º#]?[^\n\r]*[\r\n]+([A-HJ-NPR-Z0-9]{8,17})",
-                r"VIN[^\n\r:]*[:\s]+([A-HJ-NPR-Z0-9]{8,17})",
-                r"SERIE\s*[:\-]?\s*([A-HJ-NPR-Z0-9]{8,17})",
-                r"^\s*Serie:\s*([A-HJ-NPR-Z0-9]{8,17})$",
-                r"\b([A-HJ-NPR-Z0-9]{17})\b",  # VIN estándar de 17 caracteres
-            ],
-        )
-        or from_proximity(
-            "serie_auto",
-            ["SERIE", "VIN", "NUMERO DE SERIE"],
-            max_lines_after=1,
-            value_pattern=r"([A-HJ-NPR-Z0-9]{8,17})",
-            exclude_patterns=["MARCA", "TIPO", "MODELO", "PLACAS"]
-        )
-        or (aseguradora == "CHUBB" and extract_ticket_field(["Serie", "SERIE", "No. serie", "NO. SERIE"]))
-    )
-    
-    # Validar formato de VIN básico
-    if serie_auto:
-        serie_limpia = re.sub(r"[^A-Z0-9]", "", serie_auto.upper())
-        # VIN válido: 17 caracteres alfanuméricos (sin I, O, Q)
-        if len(serie_limpia) >= 8:
-            serie_auto = serie_limpia[:17]  # Tomar máximo 17 caracteres
-
-    # ========== PLACAS ==========
-    if not placas:
-        placas = (
-            from_kv("placas", [["PLACAS", "LICENSE"], ["PLACAS"], ["PLACA", "LICENSE"], ["PLACA"]])
-            or from_flexible_kv("placas", [
-                "PLACAS", "PLACA", "LICENSE PLATE", "NO PLACAS", "NUMERO PLACAS"
-            ])
-        or from_regex(
-            "placas",
-            [
-                r"PLACAS\s*/?\s*LICENSE PLATE[^\n\r]*[\r\n]+([A-Z0-9\-]{5,10})",
-                r"PLACAS[^\n\r:]*[:\s]+([A-Z0-9\-]{5,10})",
-                r"PLACA\s*[:\-]?\s*([A-Z0-9\-]{5,10})",
-                r"^\s*Placas:\s*([A-Z0-9\-]{5,10})$",
-                r"\b([A-Z]{1,3}-?\d{1,4}-?[A-Z]?\d?)\b",  # Formatos comunes de placas mexicanas
-            ],
-        )
-        or from_proximity(
-            "placas",
-            ["PLACAS", "PLACA", "LICENSE"],
-            max_lines_after=1,
-            value_pattern=r"([A-Z0-9\-]{5,10})",
-            exclude_patterns=["MARCA", "TIPO", "MODELO", "SERIE"]
-        )
-        or (aseguradora == "CHUBB" and extract_ticket_field(["Placas", "PLACAS", "Placa", "PLACA"]))
-    )
-    
-    # Limpiar y validar placas
-    if placas:
-        placas_upper = placas.upper().strip()
-        # Rechazar si es claramente transmisión, estado o cualquier otro campo que no sea placa
-        # Patrones típicos de campos que NO son placas
-        invalid_placas = [
-            # Transmisión
-            "AUTOM", "AUTOMATICA", "AUTOMÁTICA", "MANUAL", "TRANSMISION", "TRANSMISIÓN",
-            # Estados/Municipios
-            "NUEVO", "USADO", "ESTADO", "CIUDAD", "MUNICIPIO",
-            # Coberturas
-            "AMPLIA", "LIMITADA", "DAÑOS", "MATERIALES", "ROBO",
-            # Otros campos del formulario
-            "ORIGINAL", "COPIA", "FOLIO", "REPORTE", "SINIESTRO",
-            # Marcas comunes (si se confunden)
-            "CHEVROLET", "NISSAN", "TOYOTA", "FORD", "HONDA", "VW", "VOLKSWAGEN",
-            # Valores booleanos o estados
-            "SI", "NO", "SÍ", "YES", "TRUE", "FALSE",
-        ]
-        # También rechazar si parece una palabra común muy larga sin números
-        parece_palabra = len(placas_upper) > 6 and not re.search(r"\d", placas_upper)
-        
-        if any(inv in placas_upper for inv in invalid_placas) or parece_palabra:
-            placas = ""  # No es una placa válida
-        else:
-            placas = re.sub(r"\s+", "", placas_upper)  # Quitar espacios
-            # Validar longitud mínima
-            placas_limpia = re.sub(r"[^A-Z0-9]", "", placas)
-            if len(placas_limpia) < 5:
-                placas = ""  # Descartar si es muy corta
-            # Validar que tenga al menos un número (placas mexicanas típicas)
-            elif not re.search(r"\d", placas_limpia) and len(placas_limpia) < 6:
-                placas = ""  # Placas sin números son sospechosas
-
-    # ========== KILOMETRAJE ==========
-    if not kilometraje:
-        kilometraje = (
-            from_kv("kilometraje", [["KILOMETRAJE", "MILEAGE"], ["KILOMETRAJE"], ["KM"]])
-            or from_flexible_kv("kilometraje", [
-                "KILOMETRAJE", "MILEAGE", "KM", "KMS", "KILOMETROS", "ODOMETRO"
-            ])
-            or from_regex(
-                "kilometraje",
-                [
-                    r"KILOMETRAJE\s*/?\s*MILEAGE[^\n\r]*[\r\n]+([0-9,.]{1,8})",
-                    r"KILOMETRAJE[^\n\r:]*[:\s]+([0-9,.]{1,8})",
-                    r"KM\s*[:\-]?\s*([0-9,.]{1,8})",
-                    r"KILOMETRAJE\s*[:\-]?\s*(\d+)",
-                    r"\b(\d{1,3}(?:,\d{3})+)\b",  # Formato con comas: 45,000
-                ],
-            )
-            or from_proximity(
-                "kilometraje",
-                ["KILOMETRAJE", "KM", "KMS", "ODOMETRO"],
-                max_lines_after=1,
-                value_pattern=r"([0-9,.]{1,8})",
-                exclude_patterns=["MARCA", "TIPO", "MODELO", "PLACAS"]
-        )
-    )
-    
-    # Limpiar y validar kilometraje
-    if kilometraje:
-        # Rechazar si parece un monto de dinero ($258,234.63 o similar)
-        if re.search(r"\$\s*[\d,]+\.?\d*", str(kilometraje)):
-            kilometraje = ""  # Es una suma asegurada, no kilometraje
-        else:
-            kilometraje_clean = re.sub(r"[^\d]", "", str(kilometraje))
-            if kilometraje_clean:
-                km_num = int(kilometraje_clean)
-                # Validar rango razonable (0 - 999999)
-                # 0 es válido (vehículo nuevo)
-                # Rechazar si parece una suma asegurada (números muy grandes tipo 258234, 150000, etc.)
-                # Patrón típico de sumas aseguradas: números > 100000 sin contexto de kilometraje
-                # o númerres con formato de moneda implícito (terminan en .00 o .63)
-                km_str = str(kilometraje).replace(",", "")
-                parece_monto = (
-                    km_num > 200000 and len(kilometraje_clean) >= 6  # Números muy grandes
-                    or re.search(r"\.\d{2}$", str(kilometraje))  # Termina en centavos
-                )
-                if 0 <= km_num <= 999999 and not parece_monto:
-                    kilometraje = str(km_num)
-                else:
-                    kilometraje = ""  # Descartar si está fuera de rango o parece monto
-            else:
-                kilometraje = ""
-
-    # ========== DESCRIPCIÓN DE DAÑOS ==========
-    descripcion_siniestro = (
-        from_regex(
-            "descripcion_siniestro",
-            [
-                r"DESCRIPCI[ÓO]N DE DA[ÑN]OS A REPARAR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                r"DESCRIPTION OF DAMAGES TO REPAIR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                r"DESCRIPCI[ÓO]N DE DA[ÑN]OS A REPARAR[^\r\n]*\s+([A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{8,})",
-                r"DA[ÑN]OS\s*A\s*REPARAR[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                r"DESCRIPCI[ÓO]N\s*DE\s*DA[ÑN]OS[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                r"OBSERVACIONES\s*DE\s*DA[ÑN]OS[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                r"DESCRIPCI[ÓO]N\s*DE\s*DA[ÑN]OS[^\r\n]*(?:\r?\n)+([^\r\n]{6,})",
-                # Qualitas Ajuste Express format
-                r"DESCRIPCI[ÓO]N\s+DE\s+DA[ÑN]OS[\s:]+([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s*]{10,200})",
-                # CHUBB ticket: Daños Mecanicos
-                r"DA[ÑN]OS\s+MECANICOS[^\r\n]*(?:\r?\n)+([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{10,300})",
-            ],
-        )
-        or from_proximity(
-            "descripcion_siniestro",
-            ["DAÑOS", "DANOS", "DAMAGES", "REPARAR", "DESCRIPCION DAÑOS", "DESCRIPCION DE DAÑOS"],
-            max_lines_after=5,
-            value_pattern=r"([A-ZÁÉÍÓÚÑ][A-Z0-9ÁÉÍÓÚÑ,\.\-\s]{10,200})",
-            exclude_patterns=["PREEXISTENTES", "PREEXISTING", "INUNDACION", "FLOOD", "AREAS DAÑADAS"]
-        )
-    )
-    
-    # CHUBB ticket vertical: Extraer de "Piezas Dañadas" y "Daños Mecanicos"
-    if not descripcion_siniestro and aseguradora == "CHUBB" and normalized_lines:
-        piezas_danadas = []
-        danos_mecanicos = []
-        
-        # Buscar sección "Piezas Dañadas"
-        piezas_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            if "PIEZAS DAÑADAS" in line.upper() or "PIEZAS DANADAS" in line.upper():
-                piezas_idx = idx
-                break
-        
-        if piezas_idx >= 0:
-            # Recolectar líneas hasta la siguiente sección
-            for line in normalized_lines[piezas_idx + 1 : piezas_idx + 20]:
-                line_upper = line.upper()
-                # Detenerse en secciones siguientes
-                if any(marker in line_upper for marker in [
-                    "DAÑOS MECANICOS", "DANOS MECANICOS", "NOTAS GENERALES", 
-                    "ALERTA DE FRAUDE", "FIRMA DEL CONDUCTOR"
-                ]):
-                    break
-                # Ignorar líneas vacías o que son encabezados de sección
-                if not line.strip() or "SECCION" in line_upper or line_upper in ["OTROS", "OTRO"]:
-                    continue
-                # Limpiar y agregar
-                cleaned = line.strip()
-                if len(cleaned) > 2:
-                    piezas_danadas.append(cleaned)
-        
-        # Buscar sección "Daños Mecanicos"
-        mecanicos_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            if "DAÑOS MECANICOS" in line.upper() or "DANOS MECANICOS" in line.upper():
-                mecanicos_idx = idx
-                break
-        
-        if mecanicos_idx >= 0:
-            for line in normalized_lines[mecanicos_idx + 1 : mecanicos_idx + 10]:
-                line_upper = line.upper()
-                if any(marker in line_upper for marker in [
-                    "NOTAS GENERALES", "ALERTA DE FRAUDE", "FIRMA DEL CONDUCTOR", "CONDUCTOR"
-                ]):
-                    break
-                cleaned = line.strip()
-                if len(cleaned) > 5:
-                    danos_mecanicos.append(cleaned)
-        
-        # Combinar ambas fuentes
-        descripcion_parts = []
-        if piezas_danadas:
-            descripcion_parts.append("Piezas: " + ", ".join(piezas_danadas[:5]))
-        if danos_mecanicos:
-            descripcion_parts.append("Daños: " + " ".join(danos_mecanicos[:3]))
-        
-        if descripcion_parts:
-            descripcion_siniestro = "; ".join(descripcion_parts)
-            field_debug["descripcion_siniestro"] = "chubb_ticket_piezas_mecanicos"
-    
-    # Validar que la descripción no sea texto de ayuda/instrucción
-    if descripcion_siniestro:
-        upper_desc = descripcion_siniestro.upper()
-        textos_invalidos = [
-            "EN CASO DE INUND", "IN CASE OF FLOOD", "DESCRIBIR", "ANOTAR",
-            "INDICAR", "ESPECIFICAR", "COMPLETAR", "LLENAR"
-        ]
-        if any(inv in upper_desc for inv in textos_invalidos):
-            descripcion_siniestro = ""
-            field_debug.pop("descripcion_siniestro", None)
-    
-    # Fallback: buscar líneas después del encabezado de daños
-    if not descripcion_siniestro and normalized_lines:
-        header_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            up = line.upper()
-            if "DESCRIPCION DE DANOS A REPARAR" in up or "DESCRIPTION OF DAMAGES TO REPAIR" in up:
-                header_idx = idx
-                break
-        if header_idx >= 0:
-            candidates: list[str] = []
-            for line in normalized_lines[header_idx + 1 : header_idx + 30]:
-                up = line.upper()
-                if "DANOS PREEXISTENTES" in up or "PREEXISTING DAMAGE" in up:
-                    break
-                if (
-                    "EN CASO DE INUND" in up
-                    or "IN CASE OF FLOOD" in up
-                    or "DESCRIPCION DE DANOS" in up
-                    or "DESCRIPTION OF DAMAGES" in up
-                    or "LADO DERECHO" in up
-                    or "RIGHT SIDE" in up
-                    or "LADO IZQUIERDO" in up
-                    or "LEFT SIDE" in up
-                    or "FRENTE" in up
-                    or "POSTERIOR" in up
-                    or "NIVEL " in up
-                    or up.startswith("LEVEL")
-                    or "POSIBLE AGRAVAMIENTO" in up
-                    or "SOLO PERDIDA" in up
-                    or "ESTRIBO" in up
-                    or line.startswith("(")
-                ):
-                    continue
-                if len(line) >= 8 and re.search(r"[A-ZÁÉÍÓÚÑ]", up):
-                    candidates.append(line)
-                if len(candidates) >= 2:
-                    break
-            if candidates:
-                descripcion_siniestro = candidates[0].strip()
-                field_debug["descripcion_siniestro"] = "lines_after_section_header"
-
-    if aseguradora == "CHUBB":
-        # CHUBB damage description is commonly in "Piezas dañadas".
-        if not descripcion_siniestro and normalized_lines:
-            piezas_idx = -1
-            for idx, line in enumerate(normalized_lines):
-                up = line.upper()
-                if "PIEZAS DANADAS" in up or "PIEZAS DAÑADAS" in up:
-                    piezas_idx = idx
-                    break
-            if piezas_idx >= 0:
-                candidates: list[str] = []
-                for line in normalized_lines[piezas_idx + 1 : piezas_idx + 10]:
-                    up = line.upper()
-                    if "DANOS MECANICOS" in up or "DAÑOS MECANICOS" in up or "NOTAS GENERALES" in up:
-                        break
-                    if (
-                        not line
-                        or "PREEXIST" in up
-                        or "NOTAS" in up
-                        or "SECCION FRONTAL" in up
-                        or "SECCION" == up.strip()
-                        or "SECEION FRONTAL" in up
-                        or "SECEION" == up.strip()
-                    ):
-                        continue
-                    if len(line) >= 5:
-                        candidates.append(line)
-                if candidates:
-                    non_generic = []
-                    for c in candidates:
-                        cu = c.upper()
-                        if (
-                            "SECCION" in cu
-                            or "SECEION" in cu
-                            or "SECTION" in cu
-                            or cu.strip() in {"FRONTAL", "SECCION FRONTAL", "SECEION FRONTAL"}
-                        ):
-                            continue
-                        non_generic.append(c)
-                    if non_generic:
-                        candidates = non_generic
-                    if not candidates:
-                        # Palabras clave extendidas para detectar daños
-                        damage_keywords = (
-                            "FACIA", "FARO", "PUERTA", "DEFENSA", "COFRE", "SALPICADERA",
-                            "ESPEJO", "PARRILLA", "TAPA", "COSTADO", "PARACHOQUE",
-                            "GUARDAFANGO", "GUARDAFANGOS", "BUMPER", "LAMPARA",
-                            "CALAVERA", "MICA", "CRISTAL", "VIDRIO", "REJILLA",
-                            "ALERON", "FASCIA", "ESTRIBO", "ROCE", "ABOLLADURA",
-                            "GOLPE", "IMPACTO", "RAYON", "RASGUÑO", "QUEBRADO",
-                            "ROTO", "DAÑADO", "DAÑO", "COLISION", "CHOQUE"
-                        )
-                        for c in normalized_lines[piezas_idx + 1 : piezas_idx + 12]:
-                            cu = c.upper()
-                            if any(token in cu for token in damage_keywords):
-                                candidates.append(c)
-                                break
-                    descripcion_siniestro = ", ".join(candidates[:2])
-                    field_debug["descripcion_siniestro"] = "chubb_piezas_danadas"
-
-    # Fallback específico para Qualitas Ajuste Express
-    if not descripcion_siniestro and aseguradora == "Qualitas" and normalized_lines:
-        # Buscar sección "Descripción de daños" o "Descripción de daños a reparar"
-        desc_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            up = line.upper()
-            if any(marker in up for marker in [
-                "DESCRIPCION DE DANOS", "DESCRIPTION OF DAMAGES", 
-                "DAÑOS A REPARAR", "DAMAGES TO REPAIR", "OBSERVACIONES",
-                "DESCRIPCION DE DAÑOS", "DESCRIPCION DAÑOS"
-            ]):
-                desc_idx = idx
-                break
-        
-        if desc_idx >= 0:
-            # Palabras clave extendidas para detectar daños
-            damage_keywords = (
-                "SALPICADERA", "ESPEJO", "FARO", "FACIA", "DEFENSA", "PUERTA",
-                "COSTADO", "COFRE", "TOLDO", "CANTONERA", "PARRILLA", "STOP",
-                "ESTRIBO", "PARACHOQUE", "GUARDAFANGO", "GUARDAFANGOS", "BUMPER",
-                "LAMPARA", "CALAVERA", "MICA", "CRISTAL", "VIDRIO", "REJILLA",
-                "ALERON", "FASCIA", "ROCE", "ABOLLADURA", "GOLPE", "IMPACTO",
-                "RAYON", "RASGUÑO", "QUEBRADO", "ROTO", "DAÑADO", "DAÑO",
-                "COLISION", "CHOQUE", "TRASERO", "FRONTAL", "LATERAL", "DERECHO",
-                "IZQUIERDO", "DELANTERO", "POSTERIOR", "CAPOT", "TAPA", "BAUL",
-                "PARTE", "TRASERA", "DELANTERA", "IZQUIERDA", "DERECHA"
-            )
-            
-            # Para Ajuste Express, la descripción puede estar en la misma línea o siguientes
-            candidates = []
-            for line in normalized_lines[desc_idx : desc_idx + 10]:
-                up = line.upper()
-                # Saltar líneas de encabezado o separadores
-                if any(skip in up for skip in ["AREAS DAÑADAS", "PARTE FRONTAL", "PARTE TRASERA", "LADO DERECHO", "LADO IZQUIERDO"]):
-                    continue
-                # Buscar líneas con palabras clave de daño
-                if any(kw in up for kw in damage_keywords):
-                    # Limpiar la línea
-                    cleaned = line.strip()
-                    if len(cleaned) > 10:
-                        candidates.append(cleaned)
-            
-            if candidates:
-                descripcion_siniestro = "; ".join(candidates[:3])  # Tomar hasta 3 líneas
-                field_debug["descripcion_siniestro"] = "qualitas_ajuste_express"
-    
-    # Fallback general para Qualitas
-    if not descripcion_siniestro and aseguradora == "Qualitas" and normalized_lines:
-        desc_idx = -1
-        for idx, line in enumerate(normalized_lines):
-            up = line.upper()
-            if any(marker in up for marker in [
-                "DESCRIPCION DE DANOS", "DESCRIPTION OF DAMAGES", 
-                "DAÑOS A REPARAR", "DAMAGES TO REPAIR", "OBSERVACIONES"
-            ]):
-                desc_idx = idx
-                break
-        if desc_idx >= 0:
-            damage_keywords = (
-                "SALPICADERA", "ESPEJO", "FARO", "FACIA", "DEFENSA", "PUERTA",
-                "COSTADO", "COFRE", "TOLDO", "CANTONERA", "PARRILLA", "STOP",
-                "ESTRIBO", "PARACHOQUE", "GUARDAFANGO", "GUARDAFANGOS", "BUMPER",
-                "LAMPARA", "CALAVERA", "MICA", "CRISTAL", "VIDRIO", "REJILLA",
-                "ALERON", "FASCIA", "ROCE", "ABOLLADURA", "GOLPE", "IMPACTO",
-                "RAYON", "RASGUÑO", "QUEBRADO", "ROTO", "DAÑADO", "DAÑO",
-                "COLISION", "CHOQUE", "TRASERO", "FRONTAL", "LATERAL", "DERECHO",
-                "IZQUIERDO", "DELANTERO", "POSTERIOR", "CAPOT", "TAPA", "BAUL"
-            )
-            for line in normalized_lines[desc_idx + 1 : desc_idx + 25]:
-                up = line.upper()
-                if "DANOS PREEXISTENTES" in up or "PREEXISTING DAMAGE" in up:
-                    break
-                if "EN CASO DE INUND" in up or "IN CASE OF FLOOD" in up:
-                    continue
-                if any(token in up for token in damage_keywords):
-                    descripcion_siniestro = line
-                    field_debug["descripcion_siniestro"] = "qualitas_damage_keywords"
-                    break
-
-    # ========== CORRECCIÓN DE MARCA SI ES INVÁLIDA ==========
-    # Validación de seguridad: si la marca es una etiqueta u otro campo, corregir
-    invalid_marcas = ["TIPO", "TYPE", "MARCA", "BRAND", "MODELO", "MODEL", "AÑO", "ANO", "YEAR", "KILOMETRAJE", "MILEAGE", "PLACAS", "PLATES"]
-    
-    def is_invalid_marca(marca: str) -> bool:
-        """Determina si la marca es inválida (etiqueta u otro campo)."""
-        if not marca:
-            return True
-        marca_upper = marca.upper()
-        # Si es exactamente una etiqueta inválida
-        if marca_upper in invalid_marcas:
-            return True
-        # Si contiene palabras de etiquetas (ej: "TIPO TYPE", "MARCA BRAND")
-        marca_words = marca_upper.split()
-        invalid_words = [w for w in marca_words if w in invalid_marcas]
-        # Si más de la mitad de las palabras son etiquetas, es inválida
-        if len(invalid_words) > 0 and len(invalid_words) >= len(marca_words) / 2:
-            return True
-        return False
-    
-    if is_invalid_marca(marca_vehiculo):
-        # Buscar marca en las líneas del OCR
-        for line in normalized_lines:
-            line_upper = line.strip().upper()
-            # Buscar una marca válida conocida
-            marca_match = re.search(r"^(TOYOTA|NISSAN|CHEVROLET|CHEUROLET|HONDA|FORD|KIA|HYUNDAI|MAZDA|JEEP|VW|VOLKSWAGEN|GMC|CHRYSLER|BUICK|CADILLAC)$", line_upper)
-            if marca_match:
-                marca_vehiculo = line.strip().replace("CHEUROLET", "CHEVROLET")
-                field_debug["marca_vehiculo"] = "corrected_from_invalid"
-                break
-    
-    # Si aún no tenemos marca válida, buscar la primera línea que sea marca conocida
-    if is_invalid_marca(marca_vehiculo):
-        for line in normalized_lines:
-            line_upper = line.strip().upper()
-            marca_match = re.search(r"^(TOYOTA|NISSAN|CHEVROLET|CHEUROLET|HONDA|FORD|KIA|HYUNDAI|MAZDA|JEEP|VW|VOLKSWAGEN|GMC|CHRYSLER|BUICK|CADILLAC)$", line_upper)
-            if marca_match:
-                marca_vehiculo = line.strip().replace("CHEUROLET", "CHEVROLET")
-                field_debug["marca_vehiculo"] = "fallback_marca_search"
-                break
-
-    # ========== LIMPIEZA DE TIPO PARA MATCH CON CATÁLOGO ==========
-    def clean_tipo_for_catalog(tipo: str, marca: str, anio: str) -> str:
-        """
-        Limpia el campo tipo para facilitar fuzzy matching con catálogo.
-        Quita la marca del inicio y el año del final si están presentes.
-        Ej: "TY TOYOTA COROLLA BASE 4P L4 2017" → "COROLLA BASE 4P L4"
-        """
-        if not tipo:
-            return tipo
-        
-        tipo_clean = tipo.strip()
-        tipo_upper = tipo_clean.upper()
-        
-        # Quitar prefijos comunes de marca (TY, TOYOTA, etc.)
-        brand_prefixes = ["TY", "TOYOTA", "NISSAN", "CHEVROLET", "CHEV", "FORD", "HONDA", "VW", "VOLKSWAGEN", "KIA", "HYUNDAI", "MAZDA", "JEEP", "GMC", "CHRYSLER"]
-        for prefix in brand_prefixes:
-            # Buscar al inicio o después de espacio
-            pattern = rf"^({prefix}\s+)+"
-            tipo_clean = re.sub(pattern, "", tipo_clean, flags=re.IGNORECASE).strip()
-        
-        # Quitar año del final si está presente
-        if anio and tipo_clean.endswith(anio):
-            tipo_clean = tipo_clean[:-len(anio)].strip()
-        # También quitar cualquier año de 4 dígitos del final
-        tipo_clean = re.sub(r"\s+20\d{2}$", "", tipo_clean).strip()
-        
-        # Quitar sufijos comunes de especificación técnica (opcional, para catálogo)
-        # Patrones como "4P L4", "4P", "5P", etc.
-        tipo_clean = re.sub(r"\s+\d+P\s+L\d+$", "", tipo_clean, flags=re.IGNORECASE).strip()
-        tipo_clean = re.sub(r"\s+L\d+$", "", tipo_clean, flags=re.IGNORECASE).strip()
-        
-        return tipo_clean if tipo_clean else tipo
-    
-    # Aplicar limpieza al tipo
-    if tipo_vehiculo:
-        tipo_original = tipo_vehiculo
-        tipo_vehiculo = clean_tipo_for_catalog(tipo_vehiculo, marca_vehiculo, modelo_anio)
-        if tipo_vehiculo != tipo_original:
-            field_debug["tipo_vehiculo"] = field_debug.get("tipo_vehiculo", "") + "_catalog_cleaned"
-
-    # For some insurer templates, TIPO contains "MARCA ... MODELO", while MARCA may contain dealer name.
-    # Qualitas Ajuste Express: Marca puede ser "REGULARIZADO" y Tipo contiene "Nissan Sedan..."
-    # Detectar si marca parece un valor de sistema y tipo contiene marca real
-    if tipo_vehiculo:
-        tipo_clean = _normalize_ocr_text(tipo_vehiculo)
-        
-        # Patrón: "Marca Tipo Modelo" en el campo tipo (ej: "Nissan Sedan 4D S 1.8L I4 2018")
-        brand_model_match = re.match(r"^([A-Z][A-Z0-9]{1,15})(?:\s+([A-Z][A-Z0-9\s]{2,30}))?\s*(\d{4})?$", tipo_clean, re.IGNORECASE)
-        if brand_model_match and marca_vehiculo:
-            candidate_brand = brand_model_match.group(1)
-            # Si marca actual parece un valor de sistema (REGULARIZADO, OTROS, etc.)
-            marca_upper = marca_vehiculo.upper()
-            if marca_upper in ["REGULARIZADO", "OTROS", "OTRO", "VARIOS", "DIFERENTES"]:
-                # Extraer marca del tipo
-                marca_vehiculo = candidate_brand.title()
-                field_debug["marca_vehiculo"] = "extracted_from_tipo_ajuste_express"
-                # El resto del tipo es el tipo real
-                remaining = tipo_clean[len(candidate_brand):].strip()
-                if remaining:
-                    # Quitar el año si está al final
-                    remaining = re.sub(r"\s+\d{4}$", "", remaining).strip()
-                    tipo_vehiculo = remaining
-                    field_debug["tipo_vehiculo"] = "cleaned_from_ajuste_express"
-        elif tipo_vehiculo and aseguradora != "CHUBB":
-            # Heurística original para otros casos
-            brand_model_match = re.match(r"^([A-Z0-9]{2,})(?:\s*\([A-Z0-9]{1,4}\))?\s+(.+)$", tipo_clean)
-            if brand_model_match:
-                candidate_brand = brand_model_match.group(1)
-                candidate_type = _normalize_ocr_text(brand_model_match.group(2))
-                if candidate_type:
-                    tipo_vehiculo = candidate_type
-                    if candidate_brand:
-                        marca_vehiculo = candidate_brand
-                        field_debug["marca_vehiculo"] = "heuristic_from_tipo"
-                    field_debug["tipo_vehiculo"] = "heuristic_from_tipo"
-
-    if aseguradora == "CHUBB":
-        # CHUBB "Marca" is usually reliable; "Tipo" can be long, keep a concise class when possible.
-        marca_clean = _normalize_ocr_text(marca_vehiculo)
-        if marca_clean:
-            marca_vehiculo = marca_clean
-        tipo_clean = _normalize_ocr_text(tipo_vehiculo)
-        if tipo_clean:
-            class_match = re.search(r"\bCLASE\s*([A-Z0-9]+)\b", tipo_clean, flags=re.IGNORECASE)
-            if class_match:
-                tipo_vehiculo = f"CLASE {class_match.group(1).upper()}"
-                field_debug["tipo_vehiculo"] = "chubb_class_from_tipo"
-            else:
-                tipo_vehiculo = tipo_clean
-        
-        # CHUBB: Limpiar tipo de especificaciones técnicas
-        # Ej: "ATTITUDE SEDAN L4 IMO AUT 4 ABS CA CE T ELA SM SQ CB" -> "ATTITUDE SEDAN"
-        if tipo_vehiculo:
-            # Palabras técnicas a remover (especificaciones de motor, transmisión, equipamiento)
-            tech_specs = [
-                "L3", "L4", "L5", "L6", "V6", "V8", "V12",
-                "IMO", "IMQ", "AUT", "MAN", "MEC", "CVT",
-                "ABS", "CA", "CE", "CC", "TELA", "TEL", "ELA",
-                "SM", "SQ", "CB", "EBD", "ESP", "TCS", "HSA",
-                "4X2", "4X4", "4WD", "2WD", "AWD", "FWD", "RWD",
-                "T", "AT", "MT", "CVT", "DCT", "DSG",
-                "1", "2", "3", "4", "5", "6", "7", "8", "9", "0"
-            ]
-            
-            words = tipo_vehiculo.split()
-            cleaned_words = []
-            for word in words:
-                word_upper = word.upper()
-                # Si la palabra no es una especificación técnica, mantenerla
-                if word_upper not in tech_specs and not word.isdigit():
-                    cleaned_words.append(word)
-            
-            if cleaned_words:
-                tipo_vehiculo = " ".join(cleaned_words)
-                field_debug["tipo_vehiculo"] = "chubb_tipo_cleaned"
-
-        # CHUBB: Buscar nombre del asegurado desde sección "Asegurado:" o "Datos Vehículo"
-        if not nb_cliente and normalized_lines:
-            # ESTRATEGIA 1: Buscar en sección "Datos Vehículo" -> "Asegurado:" -> Nombre
-            # Esta es la estructura típica del ticket CHUBB vertical
-            datos_vehiculo_idx = -1
-            for idx, line in enumerate(normalized_lines):
-                if "DATOS VEHICULO" in line.upper() or "DATOS VEHÍCULO" in line.upper():
-                    datos_vehiculo_idx = idx
-                    break
-            
-            if datos_vehiculo_idx >= 0:
-                # Buscar "Asegurado:" dentro de las siguientes 10 líneas después de "Datos Vehículo"
-                for i in range(datos_vehiculo_idx + 1, min(datos_vehiculo_idx + 10, len(normalized_lines))):
-                    line = normalized_lines[i]
-                    if "ASEGURADO" in line.upper() and ":" in line:
-                        # Nombre debería estar en la siguiente línea
-                        if i + 1 < len(normalized_lines):
-                            candidate = normalized_lines[i + 1].strip()
-                            if is_valid_name(candidate):
-                                nb_cliente = candidate
-                                field_debug["nb_cliente"] = "chubb_datos_vehiculo_asegurado"
-                                break
-                        # O en la misma línea después del ":"
-                        parts = line.split(":", 1)
-                        if len(parts) > 1:
-                            candidate = parts[1].strip()
-                            if is_valid_name(candidate):
-                                nb_cliente = candidate
-                                field_debug["nb_cliente"] = "chubb_asegurado_inline"
-                                break
-                
-                # Si no se encontró con "Asegurado:", buscar nombre válido en la sección
-                if not nb_cliente:
-                    start_idx = datos_vehiculo_idx
-                
-                if start_idx >= 0:
-                    # Buscar en las siguientes líneas un nombre válido
-                    # Patrón mejorado: nombre de persona
-                    for i in range(start_idx + 1, min(start_idx + 20, len(normalized_lines))):
-                        candidate = normalized_lines[i].strip()
-                        words = candidate.split()
-                        
-                        # Palabras cortas válidas en nombres (artículos, preposiciones)
-                        valid_short_words = {"DE", "DEL", "LA", "LOS", "LAS", "Y", "MC", "VON", "VAN"}
-                        
-                        # Validar que sea un nombre de persona:
-                        # - 3-6 palabras
-                        # - Todas en mayúsculas
-                        # - Palabras de 3+ letras O palabras cortas válidas
-                        # - Al menos 2 palabras de 4+ letras (para evitar acrónimos)
-                        # - Sin números
-                        long_words = [w for w in words if len(w) >= 4]
-                        
-                        if (len(words) >= 3 and len(words) <= 6 and
-                            candidate == candidate.upper() and
-                            not any(c.isdigit() for c in candidate) and
-                            len(long_words) >= 2 and  # Al menos 2 palabras largas
-                            all(w.isalpha() and (len(w) >= 3 or w in valid_short_words) for w in words)):
-                            
-                            if is_valid_name(candidate):
-                                nb_cliente = candidate
-                                field_debug["nb_cliente"] = "chubb_name_search"
-                                break
-            
-            # Fallback: buscar en sección de firmas (arriba de "Conductor")
-            if not nb_cliente:
-                signature_name = ""
-                for idx, line in enumerate(normalized_lines):
-                    if "CONDUCTOR" in line.upper() and idx > 0:
-                        start = max(0, idx - 8)
-                        window = normalized_lines[start:idx]
-                        candidates: list[str] = []
-                        for candidate in window:
-                            candidate_up = candidate.upper()
-                            compact = _normalize_key_label(candidate)
-                            if (
-                                candidate
-                                and "AJUSTADOR" not in candidate_up
-                                and "NOMBRE" not in candidate_up
-                                and "FIRMA" not in candidate_up
-                                and "CONDUCTOR" not in candidate_up
-                                and "NOTAS GENERALES" not in candidate_up
-                                and "NOTAS" != candidate_up.strip()
-                                and "@" not in candidate
-                                and ":" not in candidate
-                                and "." not in candidate
-                                and not re.search(r"\d", candidate)
-                                and "CHUBB" not in candidate_up
-                                and "FRAUDE" not in candidate_up
-                                and "GUARDIA" not in candidate_up
-                                and "RESPONSABLE" not in candidate_up
-                                and re.fullmatch(r"[A-ZÁÉÍÓÚÑ ]{6,}", compact or "")
-                                and len(candidate_up.split()) >= 2
-                                and len(candidate_up.split()) <= 6
-                                and re.search(r"[A-ZÁÉÍÓÚÑ]", candidate_up)
-                            ):
-                                candidates.append(candidate)
-                        if candidates:
-                            signature_name = candidates[0]
-                            break
-                if signature_name:
-                    nb_cliente = signature_name
-                    field_debug["nb_cliente"] = "line_before_conductor"
-
-    fields = {
-        "seguro_comp": aseguradora,
-        "reporte_siniestro": reporte,
-        "fecha_adm": fecha_iso,
-        "hr_adm": hora,
-        "nb_cliente": nb_cliente,
-        "tel_cliente": tel_cliente,
-        "email_cliente": email_cliente,
-        "marca_vehiculo": marca_vehiculo,
-        "tipo_vehiculo": tipo_vehiculo,
-        "modelo_anio": modelo_anio,
-        "color_vehiculo": color_vehiculo,
-        "serie_auto": serie_auto,
-        "placas": placas,
-        "kilometraje": kilometraje,
-        "transmision": detect_transmision(),
-        "descripcion_siniestro": descripcion_siniestro,
-    }
-
-    cleaned = {key: _normalize_ocr_text(value or "") for key, value in fields.items()}
-    return cleaned, field_debug
+def _extract_textract_data(file_bytes: bytes, extension: str) -> dict[str, Any]:
+    return textract_data_from_blocks(_textract_blocks(file_bytes, extension))
 
 
 def ensure_recepcion_media_table(conn):
@@ -2388,6 +149,16 @@ def ensure_recepcion_media_table(conn):
     )
 
 
+def ensure_recepcion_media_derivatives_column(conn):
+    # Archivos derivados del original (p. ej. {"ink": ruta} para la firma lista para imprimir)
+    conn.execute(
+        """
+        ALTER TABLE recepcion_media
+        ADD COLUMN IF NOT EXISTS derivatives JSONB NOT NULL DEFAULT '{}'::jsonb
+        """
+    )
+
+
 def ensure_inventario_recepcion_table(conn):
     conn.execute(
         """
@@ -2486,7 +257,6 @@ def _upsert_inventario_recepcion(
     folio_seguro: Optional[str],
     inventario: Optional[dict[str, Any]],
 ):
-    ensure_inventario_recepcion_table(conn)
     if not inventario:
         return
 
@@ -2688,22 +458,14 @@ def _ensure_expediente_for_report(conn, reporte_siniestro: str) -> int:
     return created["id"] if isinstance(created, dict) else created[0]
 
 
-def _ensure_expediente_archivos_columns(conn):
-    conn.execute(
-        """
-        ALTER TABLE expediente_archivos
-        ADD COLUMN IF NOT EXISTS categoria VARCHAR(40)
-        """
-    )
-    conn.execute(
-        """
-        ALTER TABLE expediente_archivos
-        ADD COLUMN IF NOT EXISTS anotaciones JSONB NOT NULL DEFAULT '[]'::jsonb
-        """
-    )
-
-
-def _mirror_photo_to_expediente(conn, recepcion_id: int, source_file_path: Path, original_name: str, mime_type: str):
+def _mirror_photo_to_expediente(
+    conn,
+    recepcion_id: int,
+    source_file_path: Path,
+    original_name: str,
+    mime_type: str,
+    blob_sha256: Optional[str] = None,
+) -> Optional[str]:
     conn.row_factory = dict_row
     recepcion_row = conn.execute(
         """
@@ -2717,13 +479,12 @@ def _mirror_photo_to_expediente(conn, recepcion_id: int, source_file_path: Path,
         (recepcion_id,),
     ).fetchone()
     if not recepcion_row:
-        return
+        return None
 
     reporte_siniestro = str(recepcion_row.get("folio_seguro") or "").strip()
     if not reporte_siniestro:
-        return
+        return None
 
-    _ensure_expediente_archivos_columns(conn)
     expediente_id = _ensure_expediente_for_report(conn, reporte_siniestro)
 
     media_root = Path(__file__).resolve().parent.parent.parent / "media" / "expedientes" / reporte_siniestro / "recepcion_foto"
@@ -2731,7 +492,9 @@ def _mirror_photo_to_expediente(conn, recepcion_id: int, source_file_path: Path,
     extension = source_file_path.suffix.lower()
     filename = f"recepcion_foto_{uuid4().hex}{extension}"
     target_file_path = media_root / filename
-    shutil.copy2(source_file_path, target_file_path)
+    # Hard link al mismo contenido; no duplica la foto en disco
+    blob_store.link_or_copy(source_file_path, target_file_path)
+    storage.publish(target_file_path)
 
     relative_path = f"/media/expedientes/{reporte_siniestro}/recepcion_foto/{filename}"
     conn.execute(
@@ -2744,9 +507,10 @@ def _mirror_photo_to_expediente(conn, recepcion_id: int, source_file_path: Path,
             archivo_nombre,
             archivo_size,
             mime_type,
-            anotaciones
+            anotaciones,
+            blob_sha256
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, '[]'::jsonb, %s)
         """,
         (
             expediente_id,
@@ -2756,8 +520,10 @@ def _mirror_photo_to_expediente(conn, recepcion_id: int, source_file_path: Path,
             original_name,
             target_file_path.stat().st_size,
             mime_type,
+            blob_sha256,
         ),
     )
+    return relative_path
 
 
 def ensure_orden_admision_transmision_column(conn):
@@ -2995,16 +761,25 @@ def _pretty_part_name(value: str) -> str:
     return token.title()
 
 
-def _build_colored_damage_svg(svg_path: Path, selected_parts: list[str], fill_color: str) -> bytes:
-    if not svg_path.exists():
-        return b""
-    try:
-        tree = ET.parse(svg_path)
-    except ET.ParseError:
-        return b""
+@dataclass(frozen=True)
+class _DamageTemplate:
+    """SVG de daños ya normalizado, partido alrededor del contenido de ZONAS."""
+
+    prefix: bytes
+    suffix: bytes
+    zones: tuple[tuple[str, ET.Element], ...]
+
+
+_ZONES_PLACEHOLDER = "__LAMARINA_ZONAS__"
 
-    root = tree.getroot()
-    selected = {str(item or "").strip().upper() for item in (selected_parts or []) if str(item or "").strip()}
+
+@lru_cache(maxsize=4)
+def _load_damage_template(svg_path: str, mtime_ns: int) -> Optional[_DamageTemplate]:
+    # mtime_ns forma parte de la llave para releer la plantilla si se reemplaza el archivo.
+    try:
+        root = ET.parse(svg_path).getroot()
+    except (OSError, ET.ParseError):
+        return None
 
     # svglib can ignore embedded CSS classes in some SVG exports, so we normalize
     # key style attributes inline to prevent black-filled shapes.
@@ -3023,40 +798,85 @@ def _build_colored_damage_svg(svg_path: Path, selected_parts: list[str], fill_co
             elem.set("fill", "none")
             elem.set("stroke", "none")
 
-    zones = None
+    zones_elem = None
     for elem in root.iter():
         elem_id = (elem.attrib.get("id") or "").upper()
         if elem_id == "ZONAS":
-            zones = elem
+            zones_elem = elem
             break
 
-    if zones is None:
+    if zones_elem is None:
+        return None
+
+    zones = []
+    for elem in list(zones_elem):
+        elem_id = (elem.attrib.get("id") or "").upper()
+        if elem_id:
+            zones.append((elem_id, elem))
+        zones_elem.remove(elem)
+    zones_elem.text = _ZONES_PLACEHOLDER
+
+    prefix, _, suffix = ET.tostring(root, encoding="utf-8").partition(_ZONES_PLACEHOLDER.encode("utf-8"))
+    return _DamageTemplate(prefix=prefix, suffix=suffix, zones=tuple(zones))
+
+
+def _get_damage_template(svg_path: Path) -> Optional[_DamageTemplate]:
+    try:
+        mtime_ns = svg_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _load_damage_template(str(svg_path), mtime_ns)
+
+
+def _build_colored_damage_svg(svg_path: Path, selected_parts: list[str], fill_color: str) -> bytes:
+    template = _get_damage_template(svg_path)
+    if template is None:
         return b""
 
+    selected = {str(item or "").strip().upper() for item in (selected_parts or []) if str(item or "").strip()}
+
     # Keep only selected shapes in ZONAS to avoid renderer issues with transparent fills.
-    for elem in list(zones):
-        elem_id = (elem.attrib.get("id") or "").upper()
-        if not elem_id or elem_id not in selected:
-            zones.remove(elem)
+    # Solo se clonan las zonas elegidas; el resto de la plantilla se comparte.
+    chunks = [template.prefix]
+    for elem_id, elem in template.zones:
+        if elem_id not in selected:
             continue
-        elem.set("fill", fill_color)
-        elem.set("fill-opacity", "0.82")
-        elem.set("stroke", "none")
+        zone = copy.deepcopy(elem)
+        zone.set("fill", fill_color)
+        zone.set("fill-opacity", "0.82")
+        zone.set("stroke", "none")
+        zone.tail = None
+        chunks.append(ET.tostring(zone, encoding="utf-8", xml_declaration=False))
+    chunks.append(template.suffix)
+    return b"".join(chunks)
+
+
+@lru_cache(maxsize=128)
+def _cached_damage_drawing(svg_path: str, mtime_ns: int, parts: frozenset[str], fill_color: str):
+    svg_bytes = _build_colored_damage_svg(Path(svg_path), sorted(parts), fill_color)
+    if not svg_bytes:
+        return None
+    return svg2rlg(BytesIO(svg_bytes))
+
 
-    return ET.tostring(root, encoding="utf-8")
+def _colored_damage_drawing(svg_path: Path, selected_parts: list[str], fill_color: str):
+    """Drawing de reportlab por (partes, color); combinaciones repetidas salen de la caché."""
+    try:
+        mtime_ns = svg_path.stat().st_mtime_ns
+    except OSError:
+        return None
+    parts = frozenset(str(item or "").strip().upper() for item in (selected_parts or []) if str(item or "").strip())
+    return _cached_damage_drawing(str(svg_path), mtime_ns, parts, fill_color)
 
 
 def _draw_svg_block(
     pdf: canvas.Canvas,
-    svg_bytes: bytes,
+    drawing,
     x: float,
     y: float,
     width: float,
     height: float,
 ):
-    if not svg_bytes:
-        return
-    drawing = svg2rlg(BytesIO(svg_bytes))
     if drawing is None or not drawing.width or not drawing.height:
         return
     # Clip strictly to the target block and normalize using drawing bounds.
@@ -3094,27 +914,48 @@ def _draw_svg_block(
         pdf.restoreState()
 
 
+def _signature_to_black_ink(img):
+    """
+    Trazo negro conservando el alfa: alpha = max(a, promedio(r, g, b)) y 0 donde
+    el pixel ya era transparente. Se hace por canales completos, no pixel por pixel.
+    """
+    rgba = img.convert("RGBA")
+    alpha = rgba.getchannel("A")
+    mean = rgba.convert("RGB").convert("L", (1 / 3, 1 / 3, 1 / 3, 0))
+    ink_alpha = ImageChops.lighter(alpha, mean)
+    # keep anti-aliasing alpha and force solid black ink
+    visible = alpha.point(lambda value: 255 if value else 0)
+    ink_alpha = ImageChops.multiply(ink_alpha, visible)
+    black = Image.new("L", rgba.size, 0)
+    return Image.merge("RGBA", (black, black, black, ink_alpha))
+
+
+def _create_signature_ink(signature_path: Path) -> Optional[Path]:
+    """Guarda junto a la firma original su versión en tinta negra para el PDF."""
+    if Image is None:
+        return None
+    ink_path = signature_path.with_name(f"{signature_path.stem}_ink.png")
+    try:
+        with Image.open(signature_path) as img:
+            _signature_to_black_ink(img).save(ink_path, format="PNG")
+    except Exception:
+        return None
+    return ink_path
+
+
 def _prepare_signature_black(signature_path: Path) -> ImageReader | str:
     """
     Convert signature image to black strokes (preserving alpha) for clearer print.
     Falls back to raw file path if PIL is unavailable.
+    Solo se usa para firmas subidas antes de que existiera el derivado "ink".
     """
     if Image is None:
         return str(signature_path)
     try:
-        img = Image.open(signature_path).convert("RGBA")
-        pixels = img.getdata()
-        processed = []
-        for r, g, b, a in pixels:
-            if a == 0:
-                processed.append((0, 0, 0, 0))
-            else:
-                # keep anti-aliasing alpha and force solid black ink
-                alpha = max(a, int((r + g + b) / 3))
-                processed.append((0, 0, 0, alpha))
-        img.putdata(processed)
+        with Image.open(signature_path) as img:
+            processed = _signature_to_black_ink(img)
         out = BytesIO()
-        img.save(out, format="PNG")
+        processed.save(out, format="PNG")
         out.seek(0)
         return ImageReader(out)
     except Exception:
@@ -3127,7 +968,7 @@ def health_check():
 
 
 @router.post("/transcripciones")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(request: Request, file: UploadFile = File(...)):
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archivo de audio requerido")
     if not boto3:
@@ -3135,42 +976,10 @@ async def transcribe_audio(file: UploadFile = File(...)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Falta dependencia boto3 en el backend.",
         )
-    if not settings.aws_transcribe_bucket:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="AWS_TRANSCRIBE_BUCKET no configurado en el backend.",
-        )
 
     extension = Path(file.filename).suffix.lower()
-    extension_map = {
-        ".wav": "wav",
-        ".mp3": "mp3",
-        ".mp4": "mp4",
-        ".m4a": "mp4",
-        ".flac": "flac",
-        ".ogg": "ogg",
-        ".webm": "webm",
-        ".amr": "amr",
-    }
-    media_format = extension_map.get(extension)
-    content_type = (file.content_type or "").lower()
-    valid_audio = bool(media_format) or content_type.startswith("audio/")
-    if not media_format and content_type.startswith("audio/"):
-        guessed_ext = content_type.replace("audio/", "").split(";")[0].strip()
-        media_format = {
-            "x-wav": "wav",
-            "wav": "wav",
-            "mpeg": "mp3",
-            "mp3": "mp3",
-            "mp4": "mp4",
-            "x-m4a": "mp4",
-            "flac": "flac",
-            "ogg": "ogg",
-            "webm": "webm",
-            "amr": "amr",
-        }.get(guessed_ext)
-
-    if not valid_audio or not media_format:
+    media_format = transcripcion.media_format_for(extension, file.content_type)
+    if not media_format:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Formato de audio no soportado. Usa wav, mp3, mp4/m4a, flac, ogg o webm.",
@@ -3180,122 +989,30 @@ async def transcribe_audio(file: UploadFile = File(...)):
     if not file_bytes:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo está vacío.")
 
-    region = settings.aws_region or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
-    bucket = settings.aws_transcribe_bucket
-    object_key = f"transcribe/recepcion/{uuid4().hex}{extension or '.webm'}"
-    job_name = f"recepcion-transcribe-{uuid4().hex}"
-
-    s3_client = boto3.client("s3", region_name=region)
-    transcribe_client = boto3.client("transcribe", region_name=region)
-
     try:
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=object_key,
-            Body=file_bytes,
-            ContentType=file.content_type or "application/octet-stream",
+        cleaned_text = await transcripcion.run_until_disconnect(
+            request,
+            transcripcion.transcribe(
+                file_bytes,
+                media_format,
+                extension,
+                file.content_type or "application/octet-stream",
+            ),
         )
-
-        media_uri = f"s3://{bucket}/{object_key}"
-        start_job_payload = {
-            "TranscriptionJobName": job_name,
-            "Media": {"MediaFileUri": media_uri},
-            "MediaFormat": media_format,
-        }
-        if settings.aws_transcribe_identify_language:
-            language_options = [
-                item.strip()
-                for item in (settings.aws_transcribe_language_options or "").split(",")
-                if item.strip()
-            ]
-            start_job_payload["IdentifyLanguage"] = True
-            if language_options:
-                start_job_payload["LanguageOptions"] = language_options
-        else:
-            start_job_payload["LanguageCode"] = settings.aws_transcribe_language_code
-
-        # Iniciar trabajo de transcripción con settings optimizados
-        # Nota: No incluir MaxSpeakerLabels si ShowSpeakerLabels es False
-        start_job_payload["Settings"] = {
-            "ShowSpeakerLabels": False,
-            "ChannelIdentification": False,
-            "ShowAlternatives": False,
-        }
-        
-        transcribe_client.start_transcription_job(**start_job_payload)
-
-        # Polling más agresivo para respuesta rápida
-        # Audio corto (<10s) debería procesarse en 2-5 segundos
-        deadline = time.time() + min(45, max(15, settings.aws_transcribe_timeout_seconds))
-        transcript_file_uri = ""
-        poll_count = 0
-        
-        while time.time() < deadline:
-            job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name).get(
-                "TranscriptionJob", {}
-            )
-            status_name = job.get("TranscriptionJobStatus")
-            
-            if status_name == "COMPLETED":
-                transcript_file_uri = (
-                    job.get("Transcript", {}).get("TranscriptFileUri", "") if job else ""
-                )
-                break
-            if status_name == "FAILED":
-                reason = job.get("FailureReason") or "Error desconocido en AWS Transcribe."
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"Transcribe falló: {reason}",
-                )
-            
-            # Polling adaptativo: más frecuente al inicio, luego más espaciado
-            poll_count += 1
-            if poll_count <= 5:
-                await asyncio.sleep(0.5)  # Primeros 5 polls: cada 500ms
-            elif poll_count <= 15:
-                await asyncio.sleep(0.8)  # Siguientes 10 polls: cada 800ms
-            else:
-                await asyncio.sleep(max(1, settings.aws_transcribe_poll_seconds))
-
-        if not transcript_file_uri:
-            raise HTTPException(
-                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                detail="Transcripción excedió el tiempo de espera.",
-            )
-
-        try:
-            with urlopen(transcript_file_uri) as response:
-                payload = json.loads(response.read().decode("utf-8"))
-        except (URLError, ValueError) as exc:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"No se pudo leer resultado de Transcribe: {exc}",
-            ) from exc
-
-        transcripts = payload.get("results", {}).get("transcripts", [])
-        cleaned_text = (transcripts[0].get("transcript", "") if transcripts else "").strip()
-        if not cleaned_text:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="No se obtuvo texto del audio enviado.",
-            )
-        return {"text": cleaned_text}
-    except HTTPException:
-        raise
+    except transcripcion.TranscriptionError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"No se pudo transcribir el audio con AWS Transcribe: {exc}",
         ) from exc
-    finally:
-        try:
-            transcribe_client.delete_transcription_job(TranscriptionJobName=job_name)
-        except Exception:
-            pass
-        try:
-            s3_client.delete_object(Bucket=bucket, Key=object_key)
-        except Exception:
-            pass
+
+    if not cleaned_text:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="No se obtuvo texto del audio enviado.",
+        )
+    return {"text": cleaned_text}
 
 
 @router.get("/registros")
@@ -3363,92 +1080,62 @@ def list_registros():
 
 
 @router.get("/lookup-placas")
-def lookup_por_placas(placas: str):
-    placas_normalized = (placas or "").strip().upper()
-    if not placas_normalized:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="placas requerido")
+def lookup_por_placas(placas: str = "", serie: str = ""):
+    if not vehiculos.normalize_placa(placas) and not vehiculos.normalize_placa(serie):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="placas o serie requerido")
 
     with get_connection() as conn:
-        ensure_orden_admision_transmision_column(conn)
-        conn.row_factory = dict_row
-        orden = conn.execute(
-            """
-            SELECT
-                reporte_siniestro,
-                nb_cliente,
-                tel_cliente,
-                email_cliente,
-                marca_vehiculo,
-                tipo_vehiculo,
-                modelo_anio,
-                color_vehiculo,
-                serie_auto,
-                placas,
-                kilometraje,
-                transmision,
-                seguro_comp
-            FROM orden_admision
-            WHERE UPPER(placas) = %s
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (placas_normalized,),
-        ).fetchone()
-        if orden:
-            return {
-                "source": "orden_admision",
-                "reporte_siniestro": orden.get("reporte_siniestro"),
-                "nb_cliente": orden.get("nb_cliente"),
-                "tel_cliente": orden.get("tel_cliente"),
-                "email_cliente": orden.get("email_cliente"),
-                "vehiculo_marca": orden.get("marca_vehiculo"),
-                "vehiculo_modelo": orden.get("tipo_vehiculo"),
-                "vehiculo_anio": orden.get("modelo_anio"),
-                "vehiculo_tipo": orden.get("tipo_vehiculo"),
-                "vehiculo_color": orden.get("color_vehiculo"),
-                "placas": orden.get("placas"),
-                "kilometraje": orden.get("kilometraje"),
-                "transmision": orden.get("transmision"),
-                "seguro": orden.get("seguro_comp"),
-            }
+        vehiculo = vehiculos.lookup_vehiculo(conn, placas, serie)
 
-        recepcion = conn.execute(
-            """
-            SELECT
-                nb_cliente,
-                tel_cliente,
-                email_cliente,
-                vehiculo_marca,
-                vehiculo_modelo,
-                vehiculo_anio,
-                vehiculo_tipo,
-                vehiculo_color,
-                placas,
-                kilometraje,
-                seguro
-            FROM recepciones
-            WHERE UPPER(placas) = %s
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (placas_normalized,),
-        ).fetchone()
+    if vehiculo and vehiculo.get("orden_id"):
+        return {
+            "source": "orden_admision",
+            "reporte_siniestro": vehiculo.get("orden_reporte_siniestro"),
+            "nb_cliente": vehiculo.get("orden_nb_cliente"),
+            "tel_cliente": vehiculo.get("orden_tel_cliente"),
+            "email_cliente": vehiculo.get("orden_email_cliente"),
+            "vehiculo_marca": vehiculo.get("orden_marca_vehiculo"),
+            "vehiculo_modelo": vehiculo.get("orden_tipo_vehiculo"),
+            "vehiculo_anio": vehiculo.get("orden_modelo_anio"),
+            "vehiculo_tipo": vehiculo.get("orden_tipo_vehiculo"),
+            "vehiculo_color": vehiculo.get("orden_color_vehiculo"),
+            "serie_auto": vehiculo.get("orden_serie_auto"),
+            "placas": vehiculo.get("orden_placas"),
+            "kilometraje": vehiculo.get("orden_kilometraje"),
+            "transmision": vehiculo.get("orden_transmision"),
+            "seguro": vehiculo.get("orden_seguro_comp"),
+        }
 
-        if recepcion:
-            return {
-                "source": "recepcion",
-                "nb_cliente": recepcion.get("nb_cliente"),
-                "tel_cliente": recepcion.get("tel_cliente"),
-                "email_cliente": recepcion.get("email_cliente"),
-                "vehiculo_marca": recepcion.get("vehiculo_marca"),
-                "vehiculo_modelo": recepcion.get("vehiculo_modelo"),
-                "vehiculo_anio": recepcion.get("vehiculo_anio"),
-                "vehiculo_tipo": recepcion.get("vehiculo_tipo"),
-                "vehiculo_color": recepcion.get("vehiculo_color"),
-                "placas": recepcion.get("placas"),
-                "kilometraje": recepcion.get("kilometraje"),
-                "seguro": recepcion.get("seguro"),
-            }
+    if vehiculo and vehiculo.get("recepcion_id"):
+        return {
+            "source": "recepcion",
+            "nb_cliente": vehiculo.get("recepcion_nb_cliente"),
+            "tel_cliente": vehiculo.get("recepcion_tel_cliente"),
+            "email_cliente": vehiculo.get("recepcion_email_cliente"),
+            "vehiculo_marca": vehiculo.get("recepcion_vehiculo_marca"),
+            "vehiculo_modelo": vehiculo.get("recepcion_vehiculo_modelo"),
+            "vehiculo_anio": vehiculo.get("recepcion_vehiculo_anio"),
+            "vehiculo_tipo": vehiculo.get("recepcion_vehiculo_tipo"),
+            "vehiculo_color": vehiculo.get("recepcion_vehiculo_color"),
+            "placas": vehiculo.get("recepcion_placas"),
+            "kilometraje": vehiculo.get("recepcion_kilometraje"),
+            "seguro": vehiculo.get("recepcion_seguro"),
+        }
+
+    if vehiculo and vehiculo.get("historico_id"):
+        return {
+            "source": "historico",
+            "folio_recep": vehiculo.get("historico_folio_recep"),
+            "nb_cliente": vehiculo.get("historico_nb_cliente"),
+            "tel_cliente": vehiculo.get("historico_tel_cliente"),
+            "vehiculo_marca": vehiculo.get("historico_marca_vehiculo"),
+            "vehiculo_modelo": vehiculo.get("historico_modelo_vehiculo"),
+            "vehiculo_tipo": vehiculo.get("historico_tipo_carroceria"),
+            "vehiculo_color": vehiculo.get("historico_color"),
+            "placas": vehiculo.get("historico_placas"),
+            "kilometraje": vehiculo.get("historico_kilometraje"),
+            "seguro": vehiculo.get("historico_seguro"),
+        }
 
     return {"source": None}
 
@@ -3456,7 +1143,6 @@ def lookup_por_placas(placas: str):
 @router.get("/ordenes")
 def list_ordenes_admision():
     with get_connection() as conn:
-        ensure_orden_admision_transmision_column(conn)
         conn.row_factory = dict_row
         rows = conn.execute(
             """
@@ -3531,7 +1217,6 @@ def list_citas(
     to_date: date | None = Query(default=None, alias="to"),
 ):
     with get_connection() as conn:
-        ensure_recepcion_citas_table(conn)
         conn.row_factory = dict_row
         filters = []
         params: list[object] = []
@@ -3578,7 +1263,6 @@ def resumen_citas(
     to_date: date | None = Query(default=None, alias="to"),
 ):
     with get_connection() as conn:
-        ensure_recepcion_citas_table(conn)
         conn.row_factory = dict_row
         filters = []
         params: list[object] = []
@@ -3611,7 +1295,6 @@ def resumen_citas(
 def create_cita(payload: CitaCreate):
     estado = _normalize_cita_estado(payload.estado)
     with get_connection() as conn:
-        ensure_recepcion_citas_table(conn)
         conn.row_factory = dict_row
         orden = conn.execute(
             "SELECT id FROM orden_admision WHERE id = %s",
@@ -3653,7 +1336,6 @@ def update_cita(cita_id: int, payload: CitaUpdate):
         updates["estado"] = _normalize_cita_estado(updates["estado"])
 
     with get_connection() as conn:
-        ensure_recepcion_citas_table(conn)
         if "orden_admision_id" in updates:
             exists = conn.execute(
                 "SELECT id FROM orden_admision WHERE id = %s",
@@ -3682,7 +1364,6 @@ def update_cita(cita_id: int, payload: CitaUpdate):
 @router.delete("/citas/{cita_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_cita(cita_id: int):
     with get_connection() as conn:
-        ensure_recepcion_citas_table(conn)
         result = conn.execute("DELETE FROM recepcion_citas WHERE id = %s", (cita_id,))
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Cita no encontrada")
@@ -3741,7 +1422,6 @@ def create_orden_admision(payload: OrdenAdmisionCreate):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="nb_cliente requerido")
 
     with get_connection() as conn:
-        ensure_orden_admision_transmision_column(conn)
         _sync_cliente(conn, payload.nb_cliente, payload.tel_cliente, payload.email_cliente)
 
         conn.row_factory = dict_row
@@ -3793,6 +1473,7 @@ def create_orden_admision(payload: OrdenAdmisionCreate):
                 payload.descripcion_danospreex,
             ),
         ).fetchone()
+        vehiculos.refresh_vehiculo(conn, payload.placas)
 
     return row
 
@@ -3807,16 +1488,22 @@ def update_orden_admision(orden_id: int, payload: OrdenAdmisionUpdate):
     values = list(updates.values()) + [orden_id]
 
     with get_connection() as conn:
-        ensure_orden_admision_transmision_column(conn)
-        row = conn.execute(
-            f"""
-            UPDATE orden_admision
-            SET {fields}
-            WHERE id = %s
-            RETURNING id
-            """,
-            values,
-        ).fetchone()
+        with conn.transaction():
+            previous = conn.execute(
+                "SELECT placas FROM orden_admision WHERE id = %s FOR UPDATE",
+                (orden_id,),
+            ).fetchone()
+            row = conn.execute(
+                f"""
+                UPDATE orden_admision
+                SET {fields}
+                WHERE id = %s
+                RETURNING id, placas
+                """,
+                values,
+            ).fetchone()
+            if row and ("placas" in updates or "serie_auto" in updates):
+                vehiculos.refresh_vehiculo(conn, previous[0], row[1])
 
     if not row:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
@@ -3826,6 +1513,7 @@ def update_orden_admision(orden_id: int, payload: OrdenAdmisionUpdate):
 @router.delete("/ordenes/{orden_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_orden_admision(orden_id: int):
     media_root = Path(__file__).resolve().parent.parent.parent / "media" / "orden_admision" / str(orden_id)
+    storage.unpublish_dir(media_root)
     if media_root.exists():
         for item in media_root.iterdir():
             if item.is_file():
@@ -3833,8 +1521,10 @@ def delete_orden_admision(orden_id: int):
         media_root.rmdir()
 
     with get_connection() as conn:
-        result = conn.execute("DELETE FROM orden_admision WHERE id = %s", (orden_id,))
-    if result.rowcount == 0:
+        deleted = conn.execute("DELETE FROM orden_admision WHERE id = %s RETURNING placas", (orden_id,)).fetchone()
+        if deleted:
+            vehiculos.refresh_vehiculo(conn, deleted[0])
+    if not deleted:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     return None
 
@@ -3850,10 +1540,7 @@ def upload_orden_archivo(orden_id: int, file: UploadFile = File(...)):
     filename = f"orden_{uuid4().hex}{extension}"
     file_path = media_root / filename
 
-    with file_path.open("wb") as buffer:
-        buffer.write(file.file.read())
-
-    file_size = file_path.stat().st_size
+    file_size = save_upload(file, file_path).size
 
     relative_path = f"/media/orden_admision/{orden_id}/{filename}"
 
@@ -3870,8 +1557,7 @@ def upload_orden_archivo(orden_id: int, file: UploadFile = File(...)):
     return {"path": relative_path, "name": file.filename, "size": file_size}
 
 
-@router.post("/ordenes/extract-fields")
-def extract_orden_fields(file: UploadFile = File(...)):
+def _read_extraction_upload(file: UploadFile) -> tuple[bytes, str]:
     extension = Path(file.filename or "").suffix.lower()
     if extension not in _EXTRACTION_ALLOWED_EXTENSIONS:
         raise HTTPException(
@@ -3879,30 +1565,130 @@ def extract_orden_fields(file: UploadFile = File(...)):
             detail="Formato inválido. Usa PDF, JPG, JPEG o PNG.",
         )
 
-    file_bytes = file.file.read()
+    limit = max_upload_bytes(extension)
+    file_bytes = file.file.read(limit + 1)
     if not file_bytes:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Archivo vacío.")
+    if len(file_bytes) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El archivo supera el límite de {limit // (1024 * 1024)} MB",
+        )
+    return file_bytes, extension
+
+
+def _textract_error(exc: Exception) -> tuple[int, str]:
+    """(status, detalle) para un error al extraer; los HTTPException se respetan."""
+    if isinstance(exc, HTTPException):
+        return exc.status_code, str(exc.detail)
+    credentials_error = (
+        (NoCredentialsError and isinstance(exc, NoCredentialsError))
+        or (PartialCredentialsError and isinstance(exc, PartialCredentialsError))
+        or "Unable to locate credentials" in str(exc)
+    )
+    detail = (
+        "Textract no tiene credenciales AWS. Configura AWS_ACCESS_KEY_ID, "
+        "AWS_SECRET_ACCESS_KEY y opcionalmente AWS_SESSION_TOKEN en el backend, "
+        "o asigna un IAM Role valido a la instancia EC2."
+        if credentials_error
+        else f"No se pudo extraer texto con Textract: {exc}"
+    )
+    return status.HTTP_502_BAD_GATEWAY, detail
+
+
+def _extract_orden_fields_cached(file_bytes: bytes, extension: str, sha256: Optional[str] = None) -> dict[str, Any]:
+    """
+    Respuesta de extract-fields usando la caché de OCR: Textract solo se llama
+    para documentos nuevos y el parser solo corre si cambió OCR_PARSER_VERSION.
+    """
+    sha256 = sha256 or hashlib.sha256(file_bytes).hexdigest()
+    cached = None
+    if settings.ocr_cache_enabled:
+        try:
+            cached = ocr_cache.get_cached(sha256)
+        except Exception as exc:
+            print(f"[OCR] No se pudo leer la caché: {exc}")
+    if cached and cached.get("parser_version") == ocr_cache.OCR_PARSER_VERSION and cached.get("result"):
+        return cached["result"]
+
+    blocks = cached["blocks"] if cached else _textract_blocks(file_bytes, extension)
+    result = _orden_fields_response(textract_data_from_blocks(blocks))
+    if settings.ocr_cache_enabled and blocks:
+        try:
+            ocr_cache.store(sha256, extension, blocks, result)
+        except Exception as exc:
+            print(f"[OCR] No se pudo guardar en la caché: {exc}")
+    return result
 
+
+@router.post("/ordenes/extract-fields")
+def extract_orden_fields(file: UploadFile = File(...)):
+    file_bytes, extension = _read_extraction_upload(file)
     try:
-        textract_data = _extract_textract_data(file_bytes, extension)
+        return _extract_orden_fields_cached(file_bytes, extension)
     except Exception as exc:
-        credentials_error = (
-            (NoCredentialsError and isinstance(exc, NoCredentialsError))
-            or (PartialCredentialsError and isinstance(exc, PartialCredentialsError))
-            or "Unable to locate credentials" in str(exc)
-        )
-        detail = (
-            "Textract no tiene credenciales AWS. Configura AWS_ACCESS_KEY_ID, "
-            "AWS_SECRET_ACCESS_KEY y opcionalmente AWS_SESSION_TOKEN en el backend, "
-            "o asigna un IAM Role valido a la instancia EC2."
-            if credentials_error
-            else f"No se pudo extraer texto con Textract: {exc}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=detail,
-        ) from exc
+        status_code, detail = _textract_error(exc)
+        raise HTTPException(status_code=status_code, detail=detail) from exc
 
+
+@router.post("/ordenes/extract-fields/jobs", status_code=status.HTTP_202_ACCEPTED)
+def submit_orden_extraction(file: UploadFile = File(...)):
+    """
+    Extracción asíncrona: responde de inmediato con el job y el OCR corre en
+    segundo plano. Si el documento ya está en la caché el job sale completado.
+    """
+    file_bytes, extension = _read_extraction_upload(file)
+    sha256 = hashlib.sha256(file_bytes).hexdigest()
+    job_id = ocr_cache.create_job(sha256)
+    ocr_cache.submit(
+        job_id,
+        lambda: _extract_orden_fields_cached(file_bytes, extension, sha256),
+        _textract_error,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/ordenes/extract-fields/jobs/{job_id}")
+def get_orden_extraction(job_id: str):
+    job = ocr_cache.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job no encontrado")
+    return job
+
+
+@router.get("/ordenes/extract-fields/jobs/{job_id}/stream")
+async def stream_orden_extraction(job_id: str, request: Request):
+    """SSE que termina con el estado final del job (resultado o error)."""
+    job = await asyncio.to_thread(ocr_cache.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job no encontrado")
+    heartbeat = max(1.0, float(settings.events_heartbeat_seconds))
+
+    async def event_generator():
+        async with event_broker.subscribe({"ocr_jobs"}) as queue:
+            current = job
+            while not await request.is_disconnected():
+                if current and current.get("status") in ocr_cache.FINAL_STATUSES:
+                    yield format_sse(current)
+                    break
+                yield format_sse({"job_id": job_id, "status": (current or {}).get("status")})
+                try:
+                    while True:
+                        event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                        if event.get("job_id") == job_id:
+                            break
+                except asyncio.TimeoutError:
+                    pass
+                current = await asyncio.to_thread(ocr_cache.get_job, job_id)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _orden_fields_response(textract_data: dict[str, Any]) -> dict[str, Any]:
     ocr_text = textract_data.get("text", "")
     if not ocr_text.strip():
         return {
@@ -3913,13 +1699,8 @@ def extract_orden_fields(file: UploadFile = File(...)):
             "field_debug": {},
         }
 
-    parsed, field_debug = _parse_orden_fields(
-        ocr_text,
-        textract_data.get("kv", {}),
-        textract_data.get("lines", []),
-        textract_data,
-    )
-    aseguradora = parsed.get("seguro_comp") or _detect_aseguradora(ocr_text)
+    parsed, field_debug = parse_orden_fields(OcrDocument.from_textract(textract_data))
+    aseguradora = parsed.get("seguro_comp") or detect_aseguradora(ocr_text)
     template = (aseguradora or "desconocido").lower()
     return {
         "aseguradora_detectada": aseguradora,
@@ -3999,70 +1780,10 @@ class WhatsAppRecepcionSendRequest(BaseModel):
     phones: list[str]
 
 
-def _sync_recepcion_folio_sequence(conn) -> None:
-    conn.execute(
-        """
-        CREATE SEQUENCE IF NOT EXISTS recepcion_folio_seq
-        START WITH 5000
-        INCREMENT BY 1
-        MINVALUE 5000
-        """
-    )
-    conn.execute(
-        """
-        WITH max_recepciones AS (
-            SELECT COALESCE(MAX(folio_recep::bigint), 4999) AS max_value
-            FROM recepciones
-            WHERE folio_recep ~ '^[0-9]+$'
-        ),
-        max_historico AS (
-            SELECT COALESCE(MAX(folio_recep::bigint), 4999) AS max_value
-            FROM historical_entries
-            WHERE folio_recep ~ '^[0-9]+$'
-        ),
-        synced AS (
-            SELECT setval(
-                'recepcion_folio_seq',
-                GREATEST(
-                    (SELECT max_value FROM max_recepciones),
-                    (SELECT max_value FROM max_historico)
-                ),
-                true
-            ) AS current_value
-        )
-        SELECT current_value
-        FROM synced
-        """
-    ).fetchone()
-
-
-def _peek_recepcion_folio(conn) -> str:
-    _sync_recepcion_folio_sequence(conn)
-    row = conn.execute(
-        """
-        SELECT COALESCE(last_value, 4999) + 1 AS next_folio
-        FROM recepcion_folio_seq
-        """
-    ).fetchone()
-    next_folio = row[0] if row else 5000
-    return str(next_folio)
-
-
-def _next_recepcion_folio(conn) -> str:
-    _sync_recepcion_folio_sequence(conn)
-    row = conn.execute(
-        """
-        SELECT nextval('recepcion_folio_seq') AS next_folio
-        """
-    ).fetchone()
-    next_folio = row[0] if row else 5000
-    return str(next_folio)
-
-
 @router.get("/registros/next-folio")
 def get_next_folio():
     with get_connection() as conn:
-        folio = _peek_recepcion_folio(conn)
+        folio = folios.peek_folio(conn)
     return {"folio_recep": folio}
 
 
@@ -4070,7 +1791,6 @@ def get_next_folio():
 def get_registro(recepcion_id: int):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_inventario_recepcion_table(conn)
         row = conn.execute(
             """
             SELECT
@@ -4302,12 +2022,49 @@ def send_recepcion_whatsapp_template(
     }
 
 
-@router.get("/registros/{recepcion_id}/pdf")
-def download_registro_pdf(recepcion_id: int):
+_PDF_FONT_CANDIDATES = ("CenturyGothic.ttf", "centurygothic.ttf", "GOTHIC.TTF")
+_pdf_fonts: Optional[tuple[str, str]] = None
+
+
+def _register_registro_pdf_fonts() -> tuple[str, str]:
+    """Century Gothic if provided in assets, fallback to Helvetica. Se registra una vez por proceso."""
+    global _pdf_fonts
+    if _pdf_fonts is not None:
+        return _pdf_fonts
     app_root = Path(__file__).resolve().parent.parent.parent
-    svg_template = app_root / "assets" / "Cardialog_svgLaMarina.svg"
-    logo_path = app_root / "assets" / "LaMarinaCCLogoT.png"
+    fonts = ("Helvetica", "Helvetica-Bold")
+    for candidate in _PDF_FONT_CANDIDATES:
+        font_path = app_root / "assets" / candidate
+        if font_path.exists():
+            try:
+                pdfmetrics.registerFont(TTFont("CenturyGothic", str(font_path)))
+                # Same font for bold fallback if bold file is unavailable.
+                pdfmetrics.registerFont(TTFont("CenturyGothic-Bold", str(font_path)))
+                fonts = ("CenturyGothic", "CenturyGothic-Bold")
+                break
+            except Exception:
+                pass
+    _pdf_fonts = fonts
+    return fonts
+
+
+def warm_pdf_render_worker() -> None:
+    """Inicializador de los procesos de app.core.rendering: fuentes y plantilla de daños."""
+    app_root = Path(__file__).resolve().parent.parent.parent
+    _register_registro_pdf_fonts()
+    _colored_damage_drawing(app_root / "assets" / "Cardialog_svgLaMarina.svg", [], "#e04b4b")
+
 
+def _registro_pdf_assets(app_root: Path) -> list[Path]:
+    assets_dir = app_root / "assets"
+    return [
+        assets_dir / "Cardialog_svgLaMarina.svg",
+        assets_dir / "LaMarinaCCLogoT.png",
+        *(assets_dir / candidate for candidate in _PDF_FONT_CANDIDATES),
+    ]
+
+
+def _load_registro_pdf_source(recepcion_id: int) -> tuple[Optional[dict], Optional[dict]]:
     with get_connection() as conn:
         conn.row_factory = dict_row
         row = conn.execute(
@@ -4343,12 +2100,11 @@ def download_registro_pdf(recepcion_id: int):
             (recepcion_id,),
         ).fetchone()
         if not row:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Registro no encontrado")
+            return None, None
 
-        ensure_recepcion_media_table(conn)
         signature_row = conn.execute(
             """
-            SELECT file_path
+            SELECT id, file_path, derivatives
             FROM recepcion_media
             WHERE recepcion_id = %s AND media_type = 'signature'
             ORDER BY id DESC
@@ -4356,7 +2112,27 @@ def download_registro_pdf(recepcion_id: int):
             """,
             (recepcion_id,),
         ).fetchone()
-        signature_exists = signature_row is not None
+    return row, signature_row
+
+
+def _registro_pdf_fingerprint(row: dict, signature_row: Optional[dict]) -> str:
+    app_root = Path(__file__).resolve().parent.parent.parent
+    files = _registro_pdf_assets(app_root)
+    media_rows = []
+    if signature_row and signature_row.get("file_path"):
+        media_rows.append(signature_row)
+        files.append(app_root / str(signature_row.get("file_path")).lstrip("/"))
+        ink_path = (signature_row.get("derivatives") or {}).get("ink")
+        if ink_path:
+            files.append(app_root / str(ink_path).lstrip("/"))
+    return pdf_cache.fingerprint(row, media_rows, files)
+
+
+def _render_registro_pdf(row: dict, signature_row: Optional[dict]) -> bytes:
+    app_root = Path(__file__).resolve().parent.parent.parent
+    svg_template = app_root / "assets" / "Cardialog_svgLaMarina.svg"
+    logo_path = app_root / "assets" / "LaMarinaCCLogoT.png"
+    signature_exists = signature_row is not None
 
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=letter)
@@ -4365,20 +2141,7 @@ def download_registro_pdf(recepcion_id: int):
     y = height - 1.8 * cm
 
     # Font setup (Century Gothic if provided in assets, fallback to Helvetica).
-    base_font = "Helvetica"
-    bold_font = "Helvetica-Bold"
-    for candidate in ("CenturyGothic.ttf", "centurygothic.ttf", "GOTHIC.TTF"):
-        font_path = app_root / "assets" / candidate
-        if font_path.exists():
-            try:
-                pdfmetrics.registerFont(TTFont("CenturyGothic", str(font_path)))
-                # Same font for bold fallback if bold file is unavailable.
-                pdfmetrics.registerFont(TTFont("CenturyGothic-Bold", str(font_path)))
-                base_font = "CenturyGothic"
-                bold_font = "CenturyGothic-Bold"
-                break
-            except Exception:
-                pass
+    base_font, bold_font = _register_registro_pdf_fonts()
 
     # Header
     header_h = 2.6 * cm
@@ -4576,11 +2339,11 @@ def download_registro_pdf(recepcion_id: int):
     pdf.setStrokeColor(colors.HexColor("#d1d5db"))
     pdf.rect(left_x, y - block_height, block_width, block_height, stroke=1, fill=0)
     pdf.rect(right_x, y - block_height, block_width, block_height, stroke=1, fill=0)
-    siniestro_svg = _build_colored_damage_svg(svg_template, row.get("partes_siniestro") or [], "#e04b4b")
-    preexist_svg = _build_colored_damage_svg(svg_template, row.get("partes_preexistentes") or [], "#f2a300")
+    siniestro_drawing = _colored_damage_drawing(svg_template, row.get("partes_siniestro") or [], "#e04b4b")
+    preexist_drawing = _colored_damage_drawing(svg_template, row.get("partes_preexistentes") or [], "#f2a300")
     _draw_svg_block(
         pdf,
-        siniestro_svg,
+        siniestro_drawing,
         left_x + 0.15 * cm,
         y - block_height + 0.15 * cm,
         block_width - 0.3 * cm,
@@ -4588,7 +2351,7 @@ def download_registro_pdf(recepcion_id: int):
     )
     _draw_svg_block(
         pdf,
-        preexist_svg,
+        preexist_drawing,
         right_x + 0.15 * cm,
         y - block_height + 0.15 * cm,
         block_width - 0.3 * cm,
@@ -4628,7 +2391,12 @@ def download_registro_pdf(recepcion_id: int):
                 sign_h = 3.0 * cm
                 sign_x = sign_center_x - (sign_w / 2)
                 sign_y = line_y - (sign_h * 0.22)
-                sig_source = _prepare_signature_black(signature_path)
+                ink_path = (signature_row.get("derivatives") or {}).get("ink")
+                ink_file = app_root / str(ink_path).lstrip("/") if ink_path else None
+                if ink_file and ink_file.is_file():
+                    sig_source = str(ink_file)
+                else:
+                    sig_source = _prepare_signature_black(signature_path)
                 pdf.drawImage(
                     sig_source,
                     sign_x,
@@ -4683,39 +2451,76 @@ def download_registro_pdf(recepcion_id: int):
     )
 
     pdf.save()
-    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def _ensure_registro_pdf(recepcion_id: int) -> tuple[Optional[dict], Optional[Path], str]:
+    """Regresa (fila, ruta del PDF en caché, huella), generándolo solo si cambió algo."""
+    row, signature_row = _load_registro_pdf_source(recepcion_id)
+    if not row:
+        return None, None, ""
+    if signature_row:
+        # Con almacenamiento S3 la firma puede no estar en el disco de este nodo
+        storage.local_file(signature_row.get("file_path"))
+        storage.local_file((signature_row.get("derivatives") or {}).get("ink"))
+    digest = _registro_pdf_fingerprint(row, signature_row)
+    path = pdf_cache.get_cached(recepcion_id, digest)
+    if path is None:
+        path = pdf_cache.store(recepcion_id, digest, rendering.render(_render_registro_pdf, row, signature_row))
+    return row, path, digest
+
+
+def warm_registro_pdf(recepcion_id: int) -> None:
+    """Genera el PDF en segundo plano para que la descarga o el envío por WhatsApp no esperen."""
+    try:
+        _ensure_registro_pdf(recepcion_id)
+    except Exception as exc:
+        print(f"[PDF cache] No se pudo generar el PDF de la recepción {recepcion_id}: {exc}")
+
+
+@router.get("/registros/{recepcion_id}/pdf")
+def download_registro_pdf(recepcion_id: int, request: Request):
+    row, path, digest = _ensure_registro_pdf(recepcion_id)
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Registro no encontrado")
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     filename = f"Recepcion_{_safe_pdf_text(row.get('folio_recep')).replace(' ', '_')}.pdf"
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return FileResponse(path, media_type="application/pdf", headers=headers)
 
 
 @router.post("/registros", status_code=status.HTTP_201_CREATED)
-def create_registro(payload: RecepcionCreate):
+def create_registro(payload: RecepcionCreate, background_tasks: BackgroundTasks):
     if not payload.nb_cliente.strip():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="nb_cliente requerido")
 
     with get_connection() as conn:
         with conn.transaction():
-            conn.execute("LOCK TABLE recepciones IN EXCLUSIVE MODE")
-            generated_folio = _next_recepcion_folio(conn)
-
             _sync_cliente(conn, payload.nb_cliente, payload.tel_cliente, payload.email_cliente)
 
-            duplicate = conn.execute(
-                """
+            placa = vehiculos.normalize_placa(payload.placas)
+            folios.lock_duplicate_check(conn, payload.fecha_recep, placa)
+            duplicate = placa and conn.execute(
+                f"""
                 SELECT 1
                 FROM recepciones
-                WHERE DATE(fecha_recep) = DATE(%s) AND placas = %s
+                WHERE {vehiculos.placa_expression()} = %s
+                    AND fecha_recep >= DATE(%s)
+                    AND fecha_recep < DATE(%s) + 1
                 LIMIT 1
                 """,
-                (payload.fecha_recep, payload.placas),
+                (placa, payload.fecha_recep, payload.fecha_recep),
             ).fetchone()
             if duplicate:
                 raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Recepción duplicada")
 
+            generated_folio = folios.allocate_folio(conn)
+
             row = conn.execute(
                 """
                 INSERT INTO recepciones (
@@ -4822,6 +2627,8 @@ def create_registro(payload: RecepcionCreate):
                     payload.fecha_entrega,
                 ),
             )
+            vehiculos.refresh_vehiculo(conn, placa)
+            materialize_ot_stages(conn, row[0], payload.folio_ot or generated_folio)
 
             _upsert_inventario_recepcion(
                 conn,
@@ -4832,11 +2639,12 @@ def create_registro(payload: RecepcionCreate):
                 payload.inventario,
             )
 
+    background_tasks.add_task(warm_registro_pdf, row[0])
     return {"id": row[0], "folio_recep": generated_folio}
 
 
 @router.put("/registros/{recepcion_id}")
-def update_registro(recepcion_id: int, payload: RecepcionUpdate):
+def update_registro(recepcion_id: int, payload: RecepcionUpdate, background_tasks: BackgroundTasks):
     allowed_fields = {
         "fecha_recep",
         "nb_cliente",
@@ -4872,7 +2680,7 @@ def update_registro(recepcion_id: int, payload: RecepcionUpdate):
     with get_connection() as conn:
         conn.row_factory = dict_row
         current = conn.execute(
-            "SELECT id, folio_recep FROM recepciones WHERE id = %s",
+            "SELECT id, folio_recep, placas FROM recepciones WHERE id = %s",
             (recepcion_id,),
         ).fetchone()
         if not current:
@@ -4956,6 +2764,8 @@ def update_registro(recepcion_id: int, payload: RecepcionUpdate):
                 current.get("folio_recep"),
             ),
         )
+        if "placas" in updates:
+            vehiculos.refresh_vehiculo(conn, current.get("placas"), updated.get("placas"))
 
         _upsert_inventario_recepcion(
             conn,
@@ -4966,11 +2776,17 @@ def update_registro(recepcion_id: int, payload: RecepcionUpdate):
             payload.inventario,
         )
 
+    background_tasks.add_task(warm_registro_pdf, recepcion_id)
     return {"id": recepcion_id}
 
 
 @router.post("/registros/{recepcion_id}/media", status_code=status.HTTP_201_CREATED)
-def upload_media(recepcion_id: int, media_type: str, file: UploadFile = File(...)):
+def upload_media(
+    recepcion_id: int,
+    media_type: str,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+):
     if media_type not in {
         "photo",
         "video",
@@ -4991,13 +2807,18 @@ def upload_media(recepcion_id: int, media_type: str, file: UploadFile = File(...
     filename = f"{media_type}_{uuid4().hex}{extension}"
     file_path = media_root / filename
 
-    with file_path.open("wb") as buffer:
-        buffer.write(file.file.read())
+    stored = save_upload(file, file_path)
 
     relative_path = f"/media/recepcion/{recepcion_id}/{filename}"
 
+    derivatives = {}
+    if media_type == "signature":
+        ink_path = _create_signature_ink(file_path)
+        if ink_path:
+            storage.publish(ink_path)
+            derivatives["ink"] = f"/media/recepcion/{recepcion_id}/{ink_path.name}"
+
     with get_connection() as conn:
-        ensure_recepcion_media_table(conn)
         single_asset_types = {
             "video",
             "signature",
@@ -5008,7 +2829,7 @@ def upload_media(recepcion_id: int, media_type: str, file: UploadFile = File(...
             conn.row_factory = dict_row
             old_rows = conn.execute(
                 """
-                SELECT file_path
+                SELECT file_path, derivatives, blob_sha256
                 FROM recepcion_media
                 WHERE recepcion_id = %s AND media_type = %s
                 """,
@@ -5023,38 +2844,44 @@ def upload_media(recepcion_id: int, media_type: str, file: UploadFile = File(...
             )
             app_root = Path(__file__).resolve().parent.parent.parent
             for row in old_rows:
-                old_file = app_root / str(row.get("file_path") or "").lstrip("/")
-                if old_file.exists() and old_file.is_file():
-                    try:
-                        old_file.unlink()
-                    except Exception:
-                        pass
+                if row.get("file_path"):
+                    blob_store.release(app_root / str(row["file_path"]).lstrip("/"), row.get("blob_sha256"))
+                media_derivatives.remove_derivative_files(row.get("derivatives"))
         conn.execute(
             """
-            INSERT INTO recepcion_media (recepcion_id, media_type, file_path, original_name)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO recepcion_media (recepcion_id, media_type, file_path, original_name, derivatives, blob_sha256)
+            VALUES (%s, %s, %s, %s, %s::jsonb, %s)
             """,
-            (recepcion_id, media_type, relative_path, file.filename),
+            (recepcion_id, media_type, relative_path, file.filename, json.dumps(derivatives), stored.sha256),
         )
+        mirror_path = None
         if media_type == "photo":
             try:
-                _mirror_photo_to_expediente(conn, recepcion_id, file_path, file.filename or filename, file.content_type or "")
+                mirror_path = _mirror_photo_to_expediente(
+                    conn, recepcion_id, file_path, file.filename or filename, file.content_type or "", stored.sha256
+                )
             except Exception:
                 # Keep workshop upload working even if expediente sync fails.
                 pass
 
+    if media_type == "signature":
+        # La firma aparece en el PDF de recepción
+        background_tasks.add_task(warm_registro_pdf, recepcion_id)
+    elif media_derivatives.is_image_path(relative_path):
+        background_tasks.add_task(media_derivatives.generate_derivatives, "recepcion_media", relative_path)
+        if mirror_path:
+            background_tasks.add_task(media_derivatives.generate_derivatives, "expediente_archivos", mirror_path)
     return {"path": relative_path}
 
 
 @router.get("/registros/{recepcion_id}/media")
 def list_media(recepcion_id: int, media_type: Optional[str] = None):
     with get_connection() as conn:
-        ensure_recepcion_media_table(conn)
         conn.row_factory = dict_row
         if media_type:
             rows = conn.execute(
                 """
-                SELECT id, media_type, file_path, original_name, created_at
+                SELECT id, media_type, file_path, original_name, derivatives, created_at
                 FROM recepcion_media
                 WHERE recepcion_id = %s AND media_type = %s
                 ORDER BY id ASC
@@ -5064,7 +2891,7 @@ def list_media(recepcion_id: int, media_type: Optional[str] = None):
         else:
             rows = conn.execute(
                 """
-                SELECT id, media_type, file_path, original_name, created_at
+                SELECT id, media_type, file_path, original_name, derivatives, created_at
                 FROM recepcion_media
                 WHERE recepcion_id = %s
                 ORDER BY id ASC
@@ -5095,7 +2922,6 @@ def download_media_zip(recepcion_id: int):
     }
 
     with get_connection() as conn:
-        ensure_recepcion_media_table(conn)
         conn.row_factory = dict_row
         recepcion = conn.execute(
             """
@@ -5123,30 +2949,23 @@ def download_media_zip(recepcion_id: int):
     if not rows:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No hay imágenes para descargar")
 
-    app_root = Path(__file__).resolve().parent.parent.parent
-    buffer = BytesIO()
-    added = 0
+    entries: list[tuple[ZipSource, str]] = []
     type_counters: dict[str, int] = {}
-    with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as zip_file:
-        for row in rows:
-            relative_path = (row.get("file_path") or "").strip()
-            if not relative_path:
-                continue
-            disk_path = app_root / relative_path.lstrip("/")
-            if not disk_path.exists() or not disk_path.is_file():
-                continue
-            media_type = row.get("media_type") or "photo"
-            suffix = type_suffix.get(media_type, "foto")
-            type_counters[suffix] = type_counters.get(suffix, 0) + 1
-            extension = Path(row.get("original_name") or "").suffix.lower() or disk_path.suffix.lower() or ".jpg"
-            safe_name = f"{type_counters[suffix]}_{suffix}{extension}"
-            zip_file.write(disk_path, arcname=safe_name)
-            added += 1
-
-    if added == 0:
+    for row in rows:
+        relative_path = (row.get("file_path") or "").strip()
+        if not storage.has_media(relative_path):
+            continue
+        media_type = row.get("media_type") or "photo"
+        suffix = type_suffix.get(media_type, "foto")
+        type_counters[suffix] = type_counters.get(suffix, 0) + 1
+        extension = Path(row.get("original_name") or "").suffix.lower() or Path(relative_path).suffix.lower() or ".jpg"
+        safe_name = f"{type_counters[suffix]}_{suffix}{extension}"
+        # Se abre al escribir la entrada: con S3 se lee del bucket sin bajarlo a la caché
+        entries.append((partial(storage.open_media, relative_path), safe_name))
+
+    if not entries:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No se encontraron archivos físicos para comprimir")
 
-    buffer.seek(0)
     filename = (
         f"Galeria_"
         f"{_normalize_token(str(recepcion.get('folio_recep') or recepcion_id))}_"
@@ -5154,27 +2973,22 @@ def download_media_zip(recepcion_id: int):
         f"{_normalize_token(recepcion.get('vehiculo_tipo'))}_"
         f"{_normalize_token(str(recepcion.get('vehiculo_anio') or 'NA'))}.zip"
     )
-    return StreamingResponse(
-        buffer,
-        media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return zip_response(entries, filename)
 
 
 @router.delete("/registros/{recepcion_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_registro(recepcion_id: int):
     with get_connection() as conn:
         conn.row_factory = dict_row
-        ensure_recepcion_media_table(conn)
         registro = conn.execute(
-            "SELECT id, folio_recep FROM recepciones WHERE id = %s",
+            "SELECT id, folio_recep, placas FROM recepciones WHERE id = %s",
             (recepcion_id,),
         ).fetchone()
         if not registro:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Registro no encontrado")
 
         media_rows = conn.execute(
-            "SELECT file_path FROM recepcion_media WHERE recepcion_id = %s",
+            "SELECT file_path, blob_sha256 FROM recepcion_media WHERE recepcion_id = %s",
             (recepcion_id,),
         ).fetchall()
 
@@ -5184,21 +2998,20 @@ def delete_registro(recepcion_id: int):
             "DELETE FROM historical_entries WHERE folio_recep = %s",
             (registro.get("folio_recep"),),
         )
+        vehiculos.refresh_vehiculo(conn, registro.get("placas"))
 
     app_root = Path(__file__).resolve().parent.parent.parent
     for row in media_rows:
         file_path = (row.get("file_path") or "").strip()
         if not file_path:
             continue
-        disk_path = app_root / file_path.lstrip("/")
-        try:
-            if disk_path.exists():
-                disk_path.unlink()
-        except OSError:
-            # Si no se puede eliminar el archivo físico, no bloqueamos el borrado del registro.
-            pass
+        # Si no se puede eliminar el archivo físico, no bloqueamos el borrado del registro.
+        blob_store.release(app_root / file_path.lstrip("/"), row.get("blob_sha256"))
+
+    pdf_cache.invalidate(recepcion_id)
 
     media_folder = Path(__file__).resolve().parent.parent.parent / "media" / "recepcion" / str(recepcion_id)
+    storage.unpublish_dir(media_folder)
     try:
         if media_folder.exists():
             for child in media_folder.iterdir():
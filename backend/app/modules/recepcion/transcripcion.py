@@ -0,0 +1,330 @@
+"""
+Transcripción de dictados de recepción (/recepcion/transcripciones) con AWS Transcribe.
+
+Antes el endpoint llamaba a boto3 (put_object, start/get_transcription_job)
+y a urlopen directamente en el event loop, con clientes nuevos en cada
+petición: un dictado congelaba el resto de rutas async (webhook de WhatsApp,
+SSE). Ahora:
+
+- cada llamada bloqueante corre en un hilo (asyncio.to_thread) y la espera
+  del job es un asyncio.sleep;
+- los clientes de S3 y Transcribe salen de app.core.aws (uno por proceso);
+- `run_until_disconnect` cancela la transcripción si el cliente se va. La
+  limpieza (job y objeto en S3) es una tarea aparte que primero espera a que
+  termine la llamada a AWS que estaba en curso (put_object o
+  start_transcription_job siguen en su hilo aunque se cancele la petición) y
+  el apagado espera las limpiezas pendientes (`wait_for_cleanups`);
+- con AWS_TRANSCRIBE_STREAMING=true y el paquete amazon-transcribe, el audio
+  wav (PCM 16 bits mono), flac u ogg/opus va directo al endpoint de
+  streaming, sin S3 ni polling; los demás formatos usan el job batch.
+
+AWS_TRANSCRIBE_ENDPOINT_URL apunta S3 y Transcribe a un stand-in local
+(LocalStack, moto_server) para pruebas.
+"""
+
+import asyncio
+import io
+import json
+import time
+from typing import Any, Awaitable, Optional, TypeVar
+from urllib.error import URLError
+from urllib.request import urlopen
+from uuid import uuid4
+import wave
+
+from fastapi import Request
+
+from app.core import aws
+from app.core.config import settings
+
+try:
+    from amazon_transcribe.client import TranscribeStreamingClient
+    from amazon_transcribe.handlers import TranscriptResultStreamHandler
+except Exception:  # pragma: no cover - optional dependency
+    TranscribeStreamingClient = None
+    TranscriptResultStreamHandler = None
+
+T = TypeVar("T")
+
+EXTENSION_FORMATS = {
+    ".wav": "wav",
+    ".mp3": "mp3",
+    ".mp4": "mp4",
+    ".m4a": "mp4",
+    ".flac": "flac",
+    ".ogg": "ogg",
+    ".webm": "webm",
+    ".amr": "amr",
+}
+CONTENT_TYPE_FORMATS = {
+    "x-wav": "wav",
+    "wav": "wav",
+    "mpeg": "mp3",
+    "mp3": "mp3",
+    "mp4": "mp4",
+    "x-m4a": "mp4",
+    "flac": "flac",
+    "ogg": "ogg",
+    "webm": "webm",
+    "amr": "amr",
+}
+
+# Trozos chicos por evento de audio en streaming
+_STREAM_CHUNK_BYTES = 8 * 1024
+_DISCONNECT_POLL_SECONDS = 0.5
+
+_CLEANUP_SHUTDOWN_SECONDS = 30.0
+
+_streaming_client = None
+# Limpiezas en curso: referencia fuerte hasta que terminan y para esperarlas al apagar
+_cleanups: set[asyncio.Task] = set()
+
+
+class TranscriptionError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def media_format_for(extension: str, content_type: Optional[str]) -> Optional[str]:
+    """MediaFormat de Transcribe según la extensión o, si no la hay, el content-type audio/*."""
+    media_format = EXTENSION_FORMATS.get(extension)
+    content_type = (content_type or "").lower()
+    if not media_format and content_type.startswith("audio/"):
+        media_format = CONTENT_TYPE_FORMATS.get(content_type.replace("audio/", "").split(";")[0].strip())
+    return media_format
+
+
+def _endpoint_url() -> Optional[str]:
+    return settings.aws_transcribe_endpoint_url.strip() or None
+
+
+def _language_options() -> list[str]:
+    return [item.strip() for item in (settings.aws_transcribe_language_options or "").split(",") if item.strip()]
+
+
+def _poll_delay(poll_count: int) -> float:
+    # Polling adaptativo: audio corto (<10s) suele quedar en 2-5 segundos
+    if poll_count <= 5:
+        return 0.5
+    if poll_count <= 15:
+        return 0.8
+    return max(1, settings.aws_transcribe_poll_seconds)
+
+
+def _read_transcript(transcript_file_uri: str) -> dict[str, Any]:
+    try:
+        with urlopen(transcript_file_uri, timeout=30) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except (URLError, ValueError) as exc:
+        raise TranscriptionError(502, f"No se pudo leer resultado de Transcribe: {exc}") from exc
+
+
+def _cleanup(s3_client, transcribe_client, bucket: str, object_key: str, job_name: str, job_started: bool) -> None:
+    if job_started:
+        try:
+            transcribe_client.delete_transcription_job(TranscriptionJobName=job_name)
+        except Exception as exc:
+            print(f"[Transcribe] No se borró el job {job_name}: {exc}")
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=object_key)
+    except Exception as exc:
+        print(f"[Transcribe] No se borró s3://{bucket}/{object_key}: {exc}")
+
+
+async def _in_thread(calls: list[asyncio.Future], func, *args, **kwargs):
+    """
+    asyncio.to_thread protegido: si la petición se cancela la llamada sigue en
+    su hilo y queda en `calls` para que la limpieza la espere.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    calls.append(future)
+    return await asyncio.shield(future)
+
+
+async def _cleanup_after(calls: list[asyncio.Future], *cleanup_args) -> None:
+    if calls:
+        await asyncio.wait(calls)
+    # El job existe si start_transcription_job terminó bien (aunque la petición ya se hubiera cancelado)
+    job_started = len(calls) > 1 and not calls[1].cancelled() and calls[1].exception() is None
+    for future in calls:
+        if not future.cancelled():
+            future.exception()  # marcada como leída
+    await asyncio.to_thread(_cleanup, *cleanup_args, job_started)
+
+
+async def wait_for_cleanups(timeout: float = _CLEANUP_SHUTDOWN_SECONDS) -> None:
+    """Espera (con tope) las limpiezas pendientes antes de apagar el proceso."""
+    pending = set(_cleanups)
+    if not pending:
+        return
+    _, still_pending = await asyncio.wait(pending, timeout=timeout)
+    if still_pending:
+        print(f"[Transcribe] {len(still_pending)} limpiezas sin terminar al apagar")
+
+
+async def _wait_for_job(transcribe_client, job_name: str) -> str:
+    deadline = time.monotonic() + min(45, max(15, settings.aws_transcribe_timeout_seconds))
+    poll_count = 0
+    while time.monotonic() < deadline:
+        response = await asyncio.to_thread(transcribe_client.get_transcription_job, TranscriptionJobName=job_name)
+        job = response.get("TranscriptionJob", {})
+        status_name = job.get("TranscriptionJobStatus")
+        if status_name == "COMPLETED":
+            return job.get("Transcript", {}).get("TranscriptFileUri", "")
+        if status_name == "FAILED":
+            reason = job.get("FailureReason") or "Error desconocido en AWS Transcribe."
+            raise TranscriptionError(502, f"Transcribe falló: {reason}")
+        poll_count += 1
+        await asyncio.sleep(_poll_delay(poll_count))
+    return ""
+
+
+async def transcribe_batch(file_bytes: bytes, media_format: str, extension: str, content_type: str) -> str:
+    """Sube el audio a S3, corre un job de Transcribe y regresa el texto."""
+    bucket = settings.aws_transcribe_bucket
+    if not bucket:
+        raise TranscriptionError(503, "AWS_TRANSCRIBE_BUCKET no configurado en el backend.")
+
+    object_key = f"transcribe/recepcion/{uuid4().hex}{extension or '.webm'}"
+    job_name = f"recepcion-transcribe-{uuid4().hex}"
+    endpoint_url = _endpoint_url()
+    s3_client = await asyncio.to_thread(aws.get_client, "s3", None, endpoint_url)
+    transcribe_client = await asyncio.to_thread(aws.get_client, "transcribe", None, endpoint_url)
+
+    start_job_payload: dict[str, Any] = {
+        "TranscriptionJobName": job_name,
+        "Media": {"MediaFileUri": f"s3://{bucket}/{object_key}"},
+        "MediaFormat": media_format,
+        # Nota: No incluir MaxSpeakerLabels si ShowSpeakerLabels es False
+        "Settings": {
+            "ShowSpeakerLabels": False,
+            "ChannelIdentification": False,
+            "ShowAlternatives": False,
+        },
+    }
+    if settings.aws_transcribe_identify_language:
+        start_job_payload["IdentifyLanguage"] = True
+        language_options = _language_options()
+        if language_options:
+            start_job_payload["LanguageOptions"] = language_options
+    else:
+        start_job_payload["LanguageCode"] = settings.aws_transcribe_language_code
+
+    # put_object y start_transcription_job, en ese orden
+    calls: list[asyncio.Future] = []
+    try:
+        await _in_thread(
+            calls,
+            s3_client.put_object,
+            Bucket=bucket,
+            Key=object_key,
+            Body=file_bytes,
+            ContentType=content_type,
+        )
+        await _in_thread(calls, transcribe_client.start_transcription_job, **start_job_payload)
+
+        transcript_file_uri = await _wait_for_job(transcribe_client, job_name)
+        if not transcript_file_uri:
+            raise TranscriptionError(504, "Transcripción excedió el tiempo de espera.")
+
+        payload = await asyncio.to_thread(_read_transcript, transcript_file_uri)
+    finally:
+        # Tarea aparte, sin await: también corre si la petición se canceló a medio
+        # camino, pero hasta que termina la llamada a AWS que estaba en curso.
+        cleanup = asyncio.ensure_future(
+            _cleanup_after(calls, s3_client, transcribe_client, bucket, object_key, job_name)
+        )
+        _cleanups.add(cleanup)
+        cleanup.add_done_callback(_cleanups.discard)
+
+    transcripts = payload.get("results", {}).get("transcripts", [])
+    return (transcripts[0].get("transcript", "") if transcripts else "").strip()
+
+
+def stream_audio_for(file_bytes: bytes, media_format: str) -> Optional[tuple[bytes, str, int]]:
+    """(audio, encoding, sample rate) para Transcribe streaming, o None si el formato no aplica."""
+    if media_format == "wav":
+        try:
+            with wave.open(io.BytesIO(file_bytes)) as wav_file:
+                if wav_file.getsampwidth() != 2 or wav_file.getnchannels() != 1:
+                    return None
+                return wav_file.readframes(wav_file.getnframes()), "pcm", wav_file.getframerate()
+        except (wave.Error, EOFError):
+            return None
+    if media_format == "flac" and file_bytes[:4] == b"fLaC" and len(file_bytes) >= 21:
+        # STREAMINFO: la frecuencia son 20 bits a partir del byte 18
+        sample_rate = (file_bytes[18] << 12) | (file_bytes[19] << 4) | (file_bytes[20] >> 4)
+        return (file_bytes, "flac", sample_rate) if sample_rate else None
+    if media_format == "ogg":
+        head = file_bytes.find(b"OpusHead", 0, 256)
+        if head >= 0 and len(file_bytes) >= head + 16:
+            sample_rate = int.from_bytes(file_bytes[head + 12 : head + 16], "little") or 48000
+            return file_bytes, "ogg-opus", sample_rate
+    return None
+
+
+def _get_streaming_client():
+    global _streaming_client
+    if _streaming_client is None:
+        _streaming_client = TranscribeStreamingClient(region=aws.default_region())
+    return _streaming_client
+
+
+async def transcribe_streaming(audio: bytes, media_encoding: str, sample_rate: int) -> str:
+    """Manda el audio al endpoint de streaming de Transcribe y junta los resultados finales."""
+    options: dict[str, Any] = {"media_sample_rate_hz": sample_rate, "media_encoding": media_encoding}
+    if settings.aws_transcribe_identify_language:
+        options["identify_language"] = True
+        options["language_options"] = _language_options()
+    else:
+        options["language_code"] = settings.aws_transcribe_language_code
+    stream = await _get_streaming_client().start_stream_transcription(**options)
+
+    parts: list[str] = []
+
+    class _FinalTranscripts(TranscriptResultStreamHandler):
+        async def handle_transcript_event(self, transcript_event) -> None:
+            for result in transcript_event.transcript.results:
+                if not result.is_partial and result.alternatives:
+                    parts.append(result.alternatives[0].transcript)
+
+    async def send_audio() -> None:
+        for start in range(0, len(audio), _STREAM_CHUNK_BYTES):
+            await stream.input_stream.send_audio_event(audio_chunk=audio[start : start + _STREAM_CHUNK_BYTES])
+        await stream.input_stream.end_stream()
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(send_audio(), _FinalTranscripts(stream.output_stream).handle_events()),
+            timeout=max(15, settings.aws_transcribe_timeout_seconds),
+        )
+    except asyncio.TimeoutError as exc:
+        raise TranscriptionError(504, "Transcripción excedió el tiempo de espera.") from exc
+    return " ".join(part.strip() for part in parts if part.strip())
+
+
+async def transcribe(file_bytes: bytes, media_format: str, extension: str, content_type: str) -> str:
+    if settings.aws_transcribe_streaming and TranscribeStreamingClient is not None:
+        stream_audio = stream_audio_for(file_bytes, media_format)
+        if stream_audio:
+            return await transcribe_streaming(*stream_audio)
+    return await transcribe_batch(file_bytes, media_format, extension, content_type)
+
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Espera `awaitable` y lo cancela si el cliente cierra la conexión antes de que termine."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("[Transcribe] Cliente desconectado, se cancela la transcripción")
+                task.cancel()
+                raise TranscriptionError(499, "El cliente cerró la conexión; transcripción cancelada.")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,249 @@
+"""
+Identidad de vehículos por placa y serie (VIN) a través de orden_admision,
+recepciones e historical_entries.
+
+Antes /recepcion/lookup-placas buscaba con `UPPER(placas) = %s ORDER BY id
+DESC` primero en orden_admision y luego en recepciones (sin índice que sirva,
+escaneo completo en cada tabla), nunca consultaba historical_entries, y la
+validación de duplicados de `create_registro` comparaba `placas` tal cual
+("ABC-123" y "abc 123" eran vehículos distintos). Ahora:
+
+- la placa canónica es la placa en mayúsculas sin nada que no sea A-Z/0-9;
+  en SQL es `placa_expression(...)`, inmutable, así que cada tabla tiene un
+  índice de expresión `(placa canónica, id DESC)`;
+- vehiculo_identidades guarda por placa canónica la serie más reciente y el id
+  de la última fila en cada una de las tres tablas. Las rutas que escriben
+  placas llaman a `refresh_vehiculo` dentro de su transacción;
+- `lookup_vehiculo` resuelve placa o serie con una sola búsqueda por llave y
+  joins por id a las tres tablas.
+"""
+
+import re
+from typing import Optional
+
+from psycopg.rows import dict_row
+
+# Llave de pg_advisory_xact_lock (junto con la placa) para recalcular una
+# identidad sin carreras entre altas simultáneas (ver DUPLICATE_CHECK_LOCK_ID).
+IDENTITY_LOCK_ID = 872_341_012
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+
+
+def normalize_placa(value: Optional[str]) -> str:
+    """Placa (o serie) canónica: mayúsculas, solo A-Z y 0-9."""
+    return _NON_ALNUM.sub("", (value or "").upper())
+
+
+def placa_expression(column: str = "placas") -> str:
+    """Expresión SQL equivalente a `normalize_placa`; debe coincidir con la de los índices."""
+    return f"regexp_replace(upper({column}), '[^A-Z0-9]', '', 'g')"
+
+
+_ORDEN_PLACA = placa_expression("orden_admision.placas")
+_ORDEN_SERIE = placa_expression("orden_admision.serie_auto")
+
+# Columnas de la identidad de `p.placa`; cada subconsulta usa el índice de expresión de su tabla.
+_IDENTITY_COLUMNS = f"""
+    (
+        SELECT {_ORDEN_SERIE}
+        FROM orden_admision
+        WHERE {_ORDEN_PLACA} = p.placa AND {_ORDEN_SERIE} <> ''
+        ORDER BY orden_admision.id DESC
+        LIMIT 1
+    ) AS serie,
+    (
+        SELECT orden_admision.id
+        FROM orden_admision
+        WHERE {_ORDEN_PLACA} = p.placa
+        ORDER BY orden_admision.id DESC
+        LIMIT 1
+    ) AS orden_admision_id,
+    (
+        SELECT recepciones.id
+        FROM recepciones
+        WHERE {placa_expression("recepciones.placas")} = p.placa
+        ORDER BY recepciones.id DESC
+        LIMIT 1
+    ) AS recepcion_id,
+    (
+        SELECT historical_entries.id
+        FROM historical_entries
+        WHERE {placa_expression("historical_entries.placas")} = p.placa
+        ORDER BY historical_entries.id DESC
+        LIMIT 1
+    ) AS historical_entry_id
+"""
+
+
+def ensure_vehiculo_identidades(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vehiculo_identidades (
+            placa TEXT PRIMARY KEY,
+            serie TEXT,
+            orden_admision_id INTEGER,
+            recepcion_id INTEGER,
+            historical_entry_id INTEGER,
+            updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_vehiculo_identidades_serie
+        ON vehiculo_identidades (serie, updated_at DESC)
+        WHERE serie IS NOT NULL
+        """
+    )
+    for table in ("orden_admision", "recepciones", "historical_entries"):
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_placa_norm ON {table} (({placa_expression()}), id DESC)"
+        )
+
+    conn.execute(
+        f"""
+        INSERT INTO vehiculo_identidades (placa, serie, orden_admision_id, recepcion_id, historical_entry_id)
+        SELECT p.placa, {_IDENTITY_COLUMNS}
+        FROM (
+            SELECT {placa_expression()} AS placa FROM orden_admision
+            UNION
+            SELECT {placa_expression()} FROM recepciones
+            UNION
+            SELECT {placa_expression()} FROM historical_entries
+        ) p
+        WHERE p.placa <> ''
+        ON CONFLICT (placa) DO NOTHING
+        """
+    )
+
+
+def widen_vehiculo_identidades(conn) -> None:
+    # placas y series capturadas a mano no tienen largo máximo: con VARCHAR(20)/(80)
+    # una sola fila larga abortaba el backfill o revertía la alta que la escribía.
+    conn.execute(
+        """
+        ALTER TABLE vehiculo_identidades
+            ALTER COLUMN placa TYPE TEXT,
+            ALTER COLUMN serie TYPE TEXT
+        """
+    )
+
+
+def refresh_vehiculo(conn, *placas: Optional[str]) -> None:
+    """
+    Recalcula la identidad de cada placa con lo que hay en las tres tablas.
+
+    Se llama después de escribir, con la placa anterior y la nueva si cambió.
+    Dentro de la transacción del cambio el candado dura hasta el commit; en
+    autocommit corre en su propia transacción sobre lo ya confirmado.
+    """
+    keys = sorted({normalize_placa(value) for value in placas} - {""})
+    if not keys:
+        return
+    with conn.transaction():
+        for placa in keys:
+            _refresh_placa(conn, placa)
+
+
+def _refresh_placa(conn, placa: str) -> None:
+    conn.execute("SELECT pg_advisory_xact_lock(%s::int, hashtext(%s))", (IDENTITY_LOCK_ID, placa))
+    conn.execute(
+        f"""
+        WITH identidad AS (
+            SELECT p.placa, {_IDENTITY_COLUMNS}
+            FROM (SELECT %s::text AS placa) p
+        ),
+        sin_filas AS (
+            DELETE FROM vehiculo_identidades vi
+            USING identidad i
+            WHERE vi.placa = i.placa
+                AND i.orden_admision_id IS NULL
+                AND i.recepcion_id IS NULL
+                AND i.historical_entry_id IS NULL
+        )
+        INSERT INTO vehiculo_identidades (placa, serie, orden_admision_id, recepcion_id, historical_entry_id)
+        SELECT placa, serie, orden_admision_id, recepcion_id, historical_entry_id
+        FROM identidad
+        WHERE orden_admision_id IS NOT NULL
+            OR recepcion_id IS NOT NULL
+            OR historical_entry_id IS NOT NULL
+        ON CONFLICT (placa) DO UPDATE SET
+            serie = EXCLUDED.serie,
+            orden_admision_id = EXCLUDED.orden_admision_id,
+            recepcion_id = EXCLUDED.recepcion_id,
+            historical_entry_id = EXCLUDED.historical_entry_id,
+            updated_at = LOCALTIMESTAMP
+        """,
+        (placa,),
+    )
+
+
+def lookup_vehiculo(conn, placa: Optional[str] = None, serie: Optional[str] = None) -> Optional[dict]:
+    """
+    Última fila de cada tabla para la placa (o, si no hay placa, la serie).
+
+    Regresa un dict con prefijos `orden_`, `recepcion_` e `historico_` por
+    tabla (None donde no hay fila), o None si el vehículo no se conoce.
+    """
+    placa_key = normalize_placa(placa)
+    serie_key = normalize_placa(serie)
+    if placa_key:
+        condition, key = "vi.placa = %s", placa_key
+    elif serie_key:
+        condition, key = "vi.serie = %s", serie_key
+    else:
+        return None
+
+    return conn.cursor(row_factory=dict_row).execute(
+        f"""
+        SELECT
+            vi.placa,
+            vi.serie,
+            o.id AS orden_id,
+            o.reporte_siniestro AS orden_reporte_siniestro,
+            o.nb_cliente AS orden_nb_cliente,
+            o.tel_cliente AS orden_tel_cliente,
+            o.email_cliente AS orden_email_cliente,
+            o.marca_vehiculo AS orden_marca_vehiculo,
+            o.tipo_vehiculo AS orden_tipo_vehiculo,
+            o.modelo_anio AS orden_modelo_anio,
+            o.color_vehiculo AS orden_color_vehiculo,
+            o.serie_auto AS orden_serie_auto,
+            o.placas AS orden_placas,
+            o.kilometraje AS orden_kilometraje,
+            o.transmision AS orden_transmision,
+            o.seguro_comp AS orden_seguro_comp,
+            r.id AS recepcion_id,
+            r.nb_cliente AS recepcion_nb_cliente,
+            r.tel_cliente AS recepcion_tel_cliente,
+            r.email_cliente AS recepcion_email_cliente,
+            r.vehiculo_marca AS recepcion_vehiculo_marca,
+            r.vehiculo_modelo AS recepcion_vehiculo_modelo,
+            r.vehiculo_anio AS recepcion_vehiculo_anio,
+            r.vehiculo_tipo AS recepcion_vehiculo_tipo,
+            r.vehiculo_color AS recepcion_vehiculo_color,
+            r.placas AS recepcion_placas,
+            r.kilometraje AS recepcion_kilometraje,
+            r.seguro AS recepcion_seguro,
+            h.id AS historico_id,
+            h.folio_recep AS historico_folio_recep,
+            h.nb_cliente AS historico_nb_cliente,
+            h.tel_cliente AS historico_tel_cliente,
+            h.marca_vehiculo AS historico_marca_vehiculo,
+            h.modelo_vehiculo AS historico_modelo_vehiculo,
+            h.tipo_carroceria AS historico_tipo_carroceria,
+            h.color AS historico_color,
+            h.placas AS historico_placas,
+            h.kilometraje AS historico_kilometraje,
+            h.seguro AS historico_seguro
+        FROM vehiculo_identidades vi
+        LEFT JOIN orden_admision o ON o.id = vi.orden_admision_id
+        LEFT JOIN recepciones r ON r.id = vi.recepcion_id
+        LEFT JOIN historical_entries h ON h.id = vi.historical_entry_id
+        WHERE {condition}
+        ORDER BY vi.updated_at DESC
+        LIMIT 1
+        """,
+        (key,),
+    ).fetchone()
@@ -1,12 +1,38 @@
+import threading
+import time
 from typing import Any, List
 
-from fastapi import APIRouter, Body, HTTPException, Query, Request, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field
 from psycopg.rows import dict_row
 
+from app.core.config import settings
 from app.core.db import get_connection
+from app.core.events import event_broker
 
-router = APIRouter(prefix="/taller", tags=["taller"])
+# Caché en memoria del tablero de áreas (lo consultan las pantallas del piso cada pocos segundos).
+_areas_board_cache: dict[str, Any] = {"expires_at": 0.0, "value": None}
+_areas_board_lock = threading.Lock()
+
+
+def invalidate_areas_board_cache() -> None:
+    with _areas_board_lock:
+        _areas_board_cache["expires_at"] = 0.0
+        _areas_board_cache["value"] = None
+
+
+def _invalidate_board_on_write(request: Request):
+    # Cualquier escritura del módulo (asignaciones, etapas de OT, estaciones, áreas)
+    # descarta el tablero en caché una vez que el endpoint terminó.
+    yield
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        invalidate_areas_board_cache()
+
+
+# Los cambios hechos por otros workers llegan por NOTIFY.
+event_broker.add_handler("taller", lambda _event: invalidate_areas_board_cache())
+
+router = APIRouter(prefix="/taller", tags=["taller"], dependencies=[Depends(_invalidate_board_on_write)])
 
 
 class EtapaPayload(BaseModel):
@@ -125,195 +151,194 @@ DEFAULT_CHECKLISTS = {
 }
 
 
-def _ensure_taller_schema() -> None:
-    with get_connection() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_etapas (
-                id BIGSERIAL PRIMARY KEY,
-                clave VARCHAR(50) NOT NULL UNIQUE,
-                nb_etapa VARCHAR(120) NOT NULL,
-                orden INTEGER NOT NULL,
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_etapas_orden_unique UNIQUE (orden)
-            )
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_checklist_items (
-                id BIGSERIAL PRIMARY KEY,
-                etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE CASCADE,
-                descripcion VARCHAR(255) NOT NULL,
-                orden INTEGER NOT NULL DEFAULT 1,
-                obligatorio BOOLEAN NOT NULL DEFAULT TRUE,
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_checklist_items_unique UNIQUE (etapa_id, descripcion)
-            )
-            """
+def _ensure_taller_schema(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_etapas (
+            id BIGSERIAL PRIMARY KEY,
+            clave VARCHAR(50) NOT NULL UNIQUE,
+            nb_etapa VARCHAR(120) NOT NULL,
+            orden INTEGER NOT NULL,
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_etapas_orden_unique UNIQUE (orden)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_areas (
-                id BIGSERIAL PRIMARY KEY,
-                nb_area VARCHAR(120) NOT NULL,
-                etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
-                capacidad_maxima INTEGER NOT NULL DEFAULT 1,
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_areas_unique UNIQUE (nb_area)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_checklist_items (
+            id BIGSERIAL PRIMARY KEY,
+            etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE CASCADE,
+            descripcion VARCHAR(255) NOT NULL,
+            orden INTEGER NOT NULL DEFAULT 1,
+            obligatorio BOOLEAN NOT NULL DEFAULT TRUE,
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_checklist_items_unique UNIQUE (etapa_id, descripcion)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_estaciones (
-                id BIGSERIAL PRIMARY KEY,
-                area_id BIGINT NOT NULL REFERENCES taller_areas(id) ON DELETE CASCADE,
-                nb_estacion VARCHAR(120) NOT NULL,
-                tipo_estacion VARCHAR(120),
-                estatus VARCHAR(40) NOT NULL DEFAULT 'ACTIVA',
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_estaciones_unique UNIQUE (area_id, nb_estacion)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_areas (
+            id BIGSERIAL PRIMARY KEY,
+            nb_area VARCHAR(120) NOT NULL,
+            etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
+            capacidad_maxima INTEGER NOT NULL DEFAULT 1,
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_areas_unique UNIQUE (nb_area)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_puestos (
-                id BIGSERIAL PRIMARY KEY,
-                nb_puesto VARCHAR(120) NOT NULL,
-                etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_puestos_unique UNIQUE (etapa_id, nb_puesto)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_estaciones (
+            id BIGSERIAL PRIMARY KEY,
+            area_id BIGINT NOT NULL REFERENCES taller_areas(id) ON DELETE CASCADE,
+            nb_estacion VARCHAR(120) NOT NULL,
+            tipo_estacion VARCHAR(120),
+            estatus VARCHAR(40) NOT NULL DEFAULT 'ACTIVA',
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_estaciones_unique UNIQUE (area_id, nb_estacion)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_personal (
-                id BIGSERIAL PRIMARY KEY,
-                nb_personal VARCHAR(150) NOT NULL,
-                puesto_id BIGINT NOT NULL REFERENCES taller_puestos(id) ON DELETE RESTRICT,
-                activo BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_puestos (
+            id BIGSERIAL PRIMARY KEY,
+            nb_puesto VARCHAR(120) NOT NULL,
+            etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_puestos_unique UNIQUE (etapa_id, nb_puesto)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_ot_etapas (
-                id BIGSERIAL PRIMARY KEY,
-                recepcion_id BIGINT NOT NULL REFERENCES recepciones(id) ON DELETE CASCADE,
-                folio_ot VARCHAR(20),
-                etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
-                estatus VARCHAR(40) NOT NULL DEFAULT 'PENDIENTE',
-                progreso INTEGER NOT NULL DEFAULT 0,
-                area_id BIGINT REFERENCES taller_areas(id) ON DELETE SET NULL,
-                estacion_id BIGINT REFERENCES taller_estaciones(id) ON DELETE SET NULL,
-                personal_id_responsable BIGINT REFERENCES taller_personal(id) ON DELETE SET NULL,
-                fecha_inicio TIMESTAMP WITHOUT TIME ZONE,
-                fecha_fin TIMESTAMP WITHOUT TIME ZONE,
-                updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_ot_etapas_unique UNIQUE (recepcion_id, etapa_id)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_personal (
+            id BIGSERIAL PRIMARY KEY,
+            nb_personal VARCHAR(150) NOT NULL,
+            puesto_id BIGINT NOT NULL REFERENCES taller_puestos(id) ON DELETE RESTRICT,
+            activo BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_ot_checklist (
-                id BIGSERIAL PRIMARY KEY,
-                ot_etapa_id BIGINT NOT NULL REFERENCES taller_ot_etapas(id) ON DELETE CASCADE,
-                checklist_item_id BIGINT NOT NULL REFERENCES taller_checklist_items(id) ON DELETE CASCADE,
-                completado BOOLEAN NOT NULL DEFAULT FALSE,
-                completado_por VARCHAR(150),
-                completado_en TIMESTAMP WITHOUT TIME ZONE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-                CONSTRAINT taller_ot_checklist_unique UNIQUE (ot_etapa_id, checklist_item_id)
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_ot_etapas (
+            id BIGSERIAL PRIMARY KEY,
+            recepcion_id BIGINT NOT NULL REFERENCES recepciones(id) ON DELETE CASCADE,
+            folio_ot VARCHAR(20),
+            etapa_id BIGINT NOT NULL REFERENCES taller_etapas(id) ON DELETE RESTRICT,
+            estatus VARCHAR(40) NOT NULL DEFAULT 'PENDIENTE',
+            progreso INTEGER NOT NULL DEFAULT 0,
+            area_id BIGINT REFERENCES taller_areas(id) ON DELETE SET NULL,
+            estacion_id BIGINT REFERENCES taller_estaciones(id) ON DELETE SET NULL,
+            personal_id_responsable BIGINT REFERENCES taller_personal(id) ON DELETE SET NULL,
+            fecha_inicio TIMESTAMP WITHOUT TIME ZONE,
+            fecha_fin TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_ot_etapas_unique UNIQUE (recepcion_id, etapa_id)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_ot_notas (
-                id BIGSERIAL PRIMARY KEY,
-                ot_etapa_id BIGINT NOT NULL REFERENCES taller_ot_etapas(id) ON DELETE CASCADE,
-                nota TEXT NOT NULL,
-                creado_por VARCHAR(150),
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_ot_checklist (
+            id BIGSERIAL PRIMARY KEY,
+            ot_etapa_id BIGINT NOT NULL REFERENCES taller_ot_etapas(id) ON DELETE CASCADE,
+            checklist_item_id BIGINT NOT NULL REFERENCES taller_checklist_items(id) ON DELETE CASCADE,
+            completado BOOLEAN NOT NULL DEFAULT FALSE,
+            completado_por VARCHAR(150),
+            completado_en TIMESTAMP WITHOUT TIME ZONE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT taller_ot_checklist_unique UNIQUE (ot_etapa_id, checklist_item_id)
         )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS taller_estacion_asignaciones (
-                id BIGSERIAL PRIMARY KEY,
-                estacion_id BIGINT NOT NULL REFERENCES taller_estaciones(id) ON DELETE CASCADE,
-                personal_id BIGINT NOT NULL REFERENCES taller_personal(id) ON DELETE CASCADE,
-                recepcion_id BIGINT REFERENCES recepciones(id) ON DELETE SET NULL,
-                folio_ot VARCHAR(20),
-                etapa_id BIGINT REFERENCES taller_etapas(id) ON DELETE SET NULL,
-                fecha_inicio TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
-                fecha_fin TIMESTAMP WITHOUT TIME ZONE,
-                activa BOOLEAN NOT NULL DEFAULT TRUE,
-                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
-            )
-            """
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_ot_notas (
+            id BIGSERIAL PRIMARY KEY,
+            ot_etapa_id BIGINT NOT NULL REFERENCES taller_ot_etapas(id) ON DELETE CASCADE,
+            nota TEXT NOT NULL,
+            creado_por VARCHAR(150),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
         )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_taller_ot_etapas_recepcion ON taller_ot_etapas(recepcion_id)"
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taller_estacion_asignaciones (
+            id BIGSERIAL PRIMARY KEY,
+            estacion_id BIGINT NOT NULL REFERENCES taller_estaciones(id) ON DELETE CASCADE,
+            personal_id BIGINT NOT NULL REFERENCES taller_personal(id) ON DELETE CASCADE,
+            recepcion_id BIGINT REFERENCES recepciones(id) ON DELETE SET NULL,
+            folio_ot VARCHAR(20),
+            etapa_id BIGINT REFERENCES taller_etapas(id) ON DELETE SET NULL,
+            fecha_inicio TIMESTAMP WITHOUT TIME ZONE DEFAULT NOW(),
+            fecha_fin TIMESTAMP WITHOUT TIME ZONE,
+            activa BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
         )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_taller_ot_etapas_estatus ON taller_ot_etapas(estatus)"
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_taller_ot_etapas_recepcion ON taller_ot_etapas(recepcion_id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_taller_ot_etapas_estatus ON taller_ot_etapas(estatus)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_taller_estacion_asignaciones_activa ON taller_estacion_asignaciones(estacion_id, activa)"
+    )
+
+    # Migración: recalcular ordenes si hay duplicados (asignar orden temporal muy alto)
+    conn.execute("""
+        WITH duplicates AS (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY orden ORDER BY id) as rn
+            FROM taller_etapas
         )
+        UPDATE taller_etapas SET orden = 100000 + duplicates.rn
+        FROM duplicates
+        WHERE taller_etapas.id = duplicates.id AND duplicates.rn > 1
+    """)
+
+    for clave, nb_etapa, orden in DEFAULT_STAGES:
+        # Solo insertar si no existe, no actualizar el orden para evitar conflictos
         conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_taller_estacion_asignaciones_activa ON taller_estacion_asignaciones(estacion_id, activa)"
+            """
+            INSERT INTO taller_etapas (clave, nb_etapa, orden, activo)
+            VALUES (%s, %s, %s, TRUE)
+            ON CONFLICT (clave) DO NOTHING
+            """,
+            (clave, nb_etapa, orden),
         )
 
-        # Migración: recalcular ordenes si hay duplicados (asignar orden temporal muy alto)
-        conn.execute("""
-            WITH duplicates AS (
-                SELECT id, ROW_NUMBER() OVER (PARTITION BY orden ORDER BY id) as rn
-                FROM taller_etapas
-            )
-            UPDATE taller_etapas SET orden = 100000 + duplicates.rn
-            FROM duplicates
-            WHERE taller_etapas.id = duplicates.id AND duplicates.rn > 1
-        """)
-
-        for clave, nb_etapa, orden in DEFAULT_STAGES:
-            # Solo insertar si no existe, no actualizar el orden para evitar conflictos
+    conn.row_factory = dict_row
+    etapa_rows = conn.execute("SELECT id, clave FROM taller_etapas").fetchall()
+    etapa_ids = {row["clave"]: row["id"] for row in etapa_rows}
+    for clave, items in DEFAULT_CHECKLISTS.items():
+        etapa_id = etapa_ids.get(clave)
+        if not etapa_id:
+            continue
+        for descripcion, orden in items:
             conn.execute(
                 """
-                INSERT INTO taller_etapas (clave, nb_etapa, orden, activo)
-                VALUES (%s, %s, %s, TRUE)
-                ON CONFLICT (clave) DO NOTHING
+                INSERT INTO taller_checklist_items (etapa_id, descripcion, orden, obligatorio, activo)
+                VALUES (%s, %s, %s, TRUE, TRUE)
+                ON CONFLICT (etapa_id, descripcion) DO NOTHING
                 """,
-                (clave, nb_etapa, orden),
+                (etapa_id, descripcion, orden),
             )
 
-        conn.row_factory = dict_row
-        etapa_rows = conn.execute("SELECT id, clave FROM taller_etapas").fetchall()
-        etapa_ids = {row["clave"]: row["id"] for row in etapa_rows}
-        for clave, items in DEFAULT_CHECKLISTS.items():
-            etapa_id = etapa_ids.get(clave)
-            if not etapa_id:
-                continue
-            for descripcion, orden in items:
-                conn.execute(
-                    """
-                    INSERT INTO taller_checklist_items (etapa_id, descripcion, orden, obligatorio, activo)
-                    VALUES (%s, %s, %s, TRUE, TRUE)
-                    ON CONFLICT (etapa_id, descripcion) DO NOTHING
-                    """,
-                    (etapa_id, descripcion, orden),
-                )
-
 
 def _fetch_catalog_row(sql: str, params: tuple[Any, ...]) -> dict[str, Any]:
     with get_connection() as conn:
@@ -378,6 +403,14 @@ def _is_workshop_status(status_value: str | None) -> bool:
     return any(value in normalized for value in ("recepcion", "valuacion", "autorizacion", "taller"))
 
 
+def _workshop_status_sql(column: str) -> str:
+    # Misma regla que _is_workshop_status, evaluada en la base de datos.
+    return f"""(
+        NULLIF(BTRIM(COALESCE({column}, '')), '') IS NULL
+        OR LOWER({column}) ~ '(recepcion|valuacion|autorizacion|taller)'
+    )"""
+
+
 def _sync_assignment_to_ot_stage(
     conn,
     recepcion_id: int | None,
@@ -422,8 +455,8 @@ def _clear_assignment_from_ot_stage(conn, recepcion_id: int | None, etapa_id: in
     )
 
 
-def _sync_ot_stages(conn, recepcion_id: int) -> list[dict[str, Any]]:
-    reference = _get_recepcion_reference(conn, recepcion_id)
+def materialize_ot_stages(conn, recepcion_id: int, folio_ot: str | None) -> None:
+    """Crea las etapas de la OT de una recepción; se llama al registrar la recepción."""
     conn.execute(
         """
         INSERT INTO taller_ot_etapas (recepcion_id, folio_ot, etapa_id, estatus, progreso)
@@ -434,8 +467,88 @@ def _sync_ot_stages(conn, recepcion_id: int) -> list[dict[str, Any]]:
         WHERE te.activo = TRUE
         ON CONFLICT (recepcion_id, etapa_id) DO NOTHING
         """,
-        (recepcion_id, reference["folio_ot"]),
+        (recepcion_id, folio_ot),
+    )
+
+
+def _materialize_stage_for_open_ots(conn, etapa_id: int) -> None:
+    # Una etapa nueva (o reactivada) se agrega a las OT que siguen en taller.
+    conn.execute(
+        f"""
+        INSERT INTO taller_ot_etapas (recepcion_id, folio_ot, etapa_id, estatus, progreso)
+        SELECT ot.recepcion_id, ot.folio_ot, te.id,
+               CASE WHEN te.clave = 'recepcionado' THEN 'EN_PROCESO' ELSE 'PENDIENTE' END,
+               CASE WHEN te.clave = 'recepcionado' THEN 10 ELSE 0 END
+        FROM (
+            SELECT DISTINCT ON (ote.recepcion_id) ote.recepcion_id, ote.folio_ot
+            FROM taller_ot_etapas ote
+            JOIN recepciones r ON r.id = ote.recepcion_id
+            WHERE {_workshop_status_sql("r.estatus")}
+            ORDER BY ote.recepcion_id, ote.id
+        ) ot
+        JOIN taller_etapas te ON te.id = %s AND te.activo = TRUE
+        ON CONFLICT (recepcion_id, etapa_id) DO NOTHING
+        """,
+        (etapa_id,),
+    )
+
+
+def _backfill_ot_stages(conn) -> None:
+    """Materializa las etapas de todas las recepciones registradas antes de crearlas al recibir."""
+    conn.execute(
+        """
+        INSERT INTO taller_ot_etapas (recepcion_id, folio_ot, etapa_id, estatus, progreso)
+        SELECT r.id, COALESCE(NULLIF(he.folio_ot, ''), r.folio_recep), te.id,
+               CASE WHEN te.clave = 'recepcionado' THEN 'EN_PROCESO' ELSE 'PENDIENTE' END,
+               CASE WHEN te.clave = 'recepcionado' THEN 10 ELSE 0 END
+        FROM recepciones r
+        LEFT JOIN LATERAL (
+            SELECT folio_ot
+            FROM historical_entries
+            WHERE folio_recep = r.folio_recep
+            ORDER BY id DESC
+            LIMIT 1
+        ) he ON TRUE
+        CROSS JOIN taller_etapas te
+        WHERE te.activo = TRUE
+        ON CONFLICT (recepcion_id, etapa_id) DO NOTHING
+        """
+    )
+
+
+def _ensure_taller_dashboard_indexes(conn) -> None:
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historical_entries_folio_recep ON historical_entries(folio_recep, id DESC)"
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_taller_estacion_asignaciones_recepcion_activa
+        ON taller_estacion_asignaciones(recepcion_id, created_at DESC, id DESC)
+        WHERE activa = TRUE
+        """
     )
+
+
+def _ensure_taller_disponibles_indexes(conn) -> None:
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_taller_ot_etapas_sin_estacion
+        ON taller_ot_etapas(etapa_id, recepcion_id)
+        WHERE estacion_id IS NULL
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_taller_estacion_asignaciones_etapa_activa
+        ON taller_estacion_asignaciones(recepcion_id, etapa_id)
+        WHERE activa = TRUE
+        """
+    )
+
+
+def _sync_ot_stages(conn, recepcion_id: int) -> list[dict[str, Any]]:
+    reference = _get_recepcion_reference(conn, recepcion_id)
+    materialize_ot_stages(conn, recepcion_id, reference["folio_ot"])
     conn.row_factory = dict_row
     return conn.execute(
         """
@@ -507,13 +620,11 @@ def _sync_ot_checklist(conn, ot_etapa_id: int, etapa_id: int) -> list[dict[str,
 
 @router.get("/health")
 def health_check():
-    _ensure_taller_schema()
     return {"module": "taller", "status": "ok"}
 
 
 @router.get("/catalogos/bootstrap")
 def get_taller_bootstrap():
-    _ensure_taller_schema()
     with get_connection() as conn:
         conn.row_factory = dict_row
         etapas = conn.execute(
@@ -573,7 +684,6 @@ def get_taller_bootstrap():
 
 @router.get("/catalogos/etapas")
 def list_etapas(activo: bool | None = None):
-    _ensure_taller_schema()
     where_clause = ""
     params: list[Any] = []
     if activo is not None:
@@ -596,7 +706,6 @@ def list_etapas(activo: bool | None = None):
 
 @router.post("/catalogos/etapas", status_code=status.HTTP_201_CREATED)
 def create_etapa(payload: EtapaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         exists = conn.execute(
             "SELECT 1 FROM taller_etapas WHERE LOWER(clave) = LOWER(%s) OR LOWER(nb_etapa) = LOWER(%s) LIMIT 1",
@@ -614,12 +723,13 @@ def create_etapa(payload: EtapaPayload):
             """,
             (payload.clave.strip(), payload.nb_etapa.strip(), payload.orden, payload.activo),
         ).fetchone()
+        if row["activo"]:
+            _materialize_stage_for_open_ots(conn, row["id"])
     return row
 
 
 @router.put("/catalogos/etapas/{etapa_id}")
 def update_etapa(etapa_id: int, payload: EtapaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         conn.row_factory = dict_row
         row = conn.execute(
@@ -631,6 +741,8 @@ def update_etapa(etapa_id: int, payload: EtapaPayload):
             """,
             (payload.clave.strip(), payload.nb_etapa.strip(), payload.orden, payload.activo, etapa_id),
         ).fetchone()
+        if row and row["activo"]:
+            _materialize_stage_for_open_ots(conn, row["id"])
     if not row:
         raise HTTPException(status_code=404, detail="Etapa no encontrada")
     return row
@@ -639,7 +751,6 @@ def update_etapa(etapa_id: int, payload: EtapaPayload):
 @router.post("/catalogos/etapas/reordenar", response_model=None)
 async def reorder_etapas(request: Request):
     """Reordena las etapas. Acepta un array de IDs o un objeto {ordered_ids: [...]}."""
-    _ensure_taller_schema()
     
     # Obtener el body crudo como JSON
     try:
@@ -735,7 +846,6 @@ async def reorder_etapas(request: Request):
 
 @router.delete("/catalogos/etapas/{etapa_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_etapa(etapa_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_etapas WHERE id = %s", (etapa_id,))
     if result.rowcount == 0:
@@ -745,7 +855,6 @@ def delete_etapa(etapa_id: int):
 
 @router.get("/catalogos/checklist-items")
 def list_checklist_items(etapa_id: int | None = None, activo: bool | None = None):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if etapa_id is not None:
@@ -777,7 +886,6 @@ async def reorder_checklist_items(request: Request):
     """Reordena los items del checklist dentro de una etapa específica.
     Body: { etapa_id: number, ordered_ids: number[] }
     """
-    _ensure_taller_schema()
     
     try:
         body = await request.json()
@@ -802,48 +910,48 @@ async def reorder_checklist_items(request: Request):
     
     print(f"[reorder_checklist] Etapa: {etapa_id}, IDs: {parsed_ids}", flush=True)
     
-    conn = get_connection()
-    conn.row_factory = dict_row
-    
     try:
-        with conn.transaction():
-            # Verificar que todos los items pertenecen a esta etapa
-            current_rows = conn.execute(
-                "SELECT id FROM taller_checklist_items WHERE etapa_id = %s ORDER BY orden ASC",
-                (etapa_id,)
-            ).fetchall()
-            current_ids = [int(row["id"]) for row in current_rows]
+        with get_connection() as conn:
+            conn.row_factory = dict_row
+
+            with conn.transaction():
+                # Verificar que todos los items pertenecen a esta etapa
+                current_rows = conn.execute(
+                    "SELECT id FROM taller_checklist_items WHERE etapa_id = %s ORDER BY orden ASC",
+                    (etapa_id,)
+                ).fetchall()
+                current_ids = [int(row["id"]) for row in current_rows]
             
-            if set(current_ids) != set(parsed_ids):
-                raise HTTPException(status_code=400, detail="Los IDs no coinciden con los items de esta etapa")
+                if set(current_ids) != set(parsed_ids):
+                    raise HTTPException(status_code=400, detail="Los IDs no coinciden con los items de esta etapa")
             
-            # Reordenar usando offset para evitar constraint unique
-            offset = 100000
-            for index, item_id in enumerate(parsed_ids, start=1):
-                conn.execute(
-                    "UPDATE taller_checklist_items SET orden = %s WHERE id = %s AND etapa_id = %s",
-                    (offset + index, item_id, etapa_id),
-                )
+                # Reordenar usando offset para evitar constraint unique
+                offset = 100000
+                for index, item_id in enumerate(parsed_ids, start=1):
+                    conn.execute(
+                        "UPDATE taller_checklist_items SET orden = %s WHERE id = %s AND etapa_id = %s",
+                        (offset + index, item_id, etapa_id),
+                    )
             
-            for index, item_id in enumerate(parsed_ids, start=1):
-                conn.execute(
-                    "UPDATE taller_checklist_items SET orden = %s WHERE id = %s AND etapa_id = %s",
-                    (index, item_id, etapa_id),
-                )
+                for index, item_id in enumerate(parsed_ids, start=1):
+                    conn.execute(
+                        "UPDATE taller_checklist_items SET orden = %s WHERE id = %s AND etapa_id = %s",
+                        (index, item_id, etapa_id),
+                    )
         
-        # Retornar los items actualizados de esta etapa (fuera de la transacción)
-        rows = conn.execute(
-            """
-            SELECT tci.id, tci.etapa_id, te.nb_etapa, te.clave, tci.descripcion, tci.orden,
-                   tci.obligatorio, tci.activo, tci.created_at
-            FROM taller_checklist_items tci
-            JOIN taller_etapas te ON te.id = tci.etapa_id
-            WHERE tci.etapa_id = %s
-            ORDER BY tci.orden ASC
-            """,
-            (etapa_id,)
-        ).fetchall()
-        return rows
+            # Retornar los items actualizados de esta etapa (fuera de la transacción)
+            rows = conn.execute(
+                """
+                SELECT tci.id, tci.etapa_id, te.nb_etapa, te.clave, tci.descripcion, tci.orden,
+                       tci.obligatorio, tci.activo, tci.created_at
+                FROM taller_checklist_items tci
+                JOIN taller_etapas te ON te.id = tci.etapa_id
+                WHERE tci.etapa_id = %s
+                ORDER BY tci.orden ASC
+                """,
+                (etapa_id,)
+            ).fetchall()
+            return rows
             
     except HTTPException:
         raise
@@ -856,7 +964,6 @@ async def reorder_checklist_items(request: Request):
 
 @router.post("/catalogos/checklist-items", status_code=status.HTTP_201_CREATED)
 def create_checklist_item(payload: ChecklistItemPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -879,7 +986,6 @@ def create_checklist_item(payload: ChecklistItemPayload):
 
 @router.put("/catalogos/checklist-items/{item_id}")
 def update_checklist_item(item_id: int, payload: ChecklistItemPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -906,7 +1012,6 @@ def update_checklist_item(item_id: int, payload: ChecklistItemPayload):
 
 @router.delete("/catalogos/checklist-items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_checklist_item(item_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_checklist_items WHERE id = %s", (item_id,))
     if result.rowcount == 0:
@@ -916,7 +1021,6 @@ def delete_checklist_item(item_id: int):
 
 @router.get("/catalogos/areas")
 def list_areas(etapa_id: int | None = None, activo: bool | None = None):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if etapa_id is not None:
@@ -943,7 +1047,6 @@ def list_areas(etapa_id: int | None = None, activo: bool | None = None):
 
 @router.post("/catalogos/areas", status_code=status.HTTP_201_CREATED)
 def create_area(payload: AreaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -960,7 +1063,6 @@ def create_area(payload: AreaPayload):
 
 @router.put("/catalogos/areas/{area_id}")
 def update_area(area_id: int, payload: AreaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -980,7 +1082,6 @@ def update_area(area_id: int, payload: AreaPayload):
 
 @router.delete("/catalogos/areas/{area_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_area(area_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_areas WHERE id = %s", (area_id,))
     if result.rowcount == 0:
@@ -990,7 +1091,6 @@ def delete_area(area_id: int):
 
 @router.get("/catalogos/estaciones")
 def list_estaciones(area_id: int | None = None, activo: bool | None = None):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if area_id is not None:
@@ -1026,7 +1126,6 @@ def list_estaciones(area_id: int | None = None, activo: bool | None = None):
 
 @router.post("/catalogos/estaciones", status_code=status.HTTP_201_CREATED)
 def create_estacion(payload: EstacionPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_areas", payload.area_id, "Area no encontrada")
         conn.row_factory = dict_row
@@ -1049,7 +1148,6 @@ def create_estacion(payload: EstacionPayload):
 
 @router.put("/catalogos/estaciones/{estacion_id}")
 def update_estacion(estacion_id: int, payload: EstacionPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_areas", payload.area_id, "Area no encontrada")
         conn.row_factory = dict_row
@@ -1076,7 +1174,6 @@ def update_estacion(estacion_id: int, payload: EstacionPayload):
 
 @router.delete("/catalogos/estaciones/{estacion_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_estacion(estacion_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_estaciones WHERE id = %s", (estacion_id,))
     if result.rowcount == 0:
@@ -1086,7 +1183,6 @@ def delete_estacion(estacion_id: int):
 
 @router.get("/catalogos/puestos")
 def list_puestos(etapa_id: int | None = None, activo: bool | None = None):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if etapa_id is not None:
@@ -1114,7 +1210,6 @@ def list_puestos(etapa_id: int | None = None, activo: bool | None = None):
 
 @router.post("/catalogos/puestos", status_code=status.HTTP_201_CREATED)
 def create_puesto(payload: PuestoPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -1131,7 +1226,6 @@ def create_puesto(payload: PuestoPayload):
 
 @router.put("/catalogos/puestos/{puesto_id}")
 def update_puesto(puesto_id: int, payload: PuestoPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_etapas", payload.etapa_id, "Etapa no encontrada")
         conn.row_factory = dict_row
@@ -1151,7 +1245,6 @@ def update_puesto(puesto_id: int, payload: PuestoPayload):
 
 @router.delete("/catalogos/puestos/{puesto_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_puesto(puesto_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_puestos WHERE id = %s", (puesto_id,))
     if result.rowcount == 0:
@@ -1161,7 +1254,6 @@ def delete_puesto(puesto_id: int):
 
 @router.get("/catalogos/personal")
 def list_personal(puesto_id: int | None = None, activo: bool | None = None):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if puesto_id is not None:
@@ -1191,7 +1283,6 @@ def list_personal(puesto_id: int | None = None, activo: bool | None = None):
 
 @router.post("/catalogos/personal", status_code=status.HTTP_201_CREATED)
 def create_personal(payload: PersonalPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_puestos", payload.puesto_id, "Puesto no encontrado")
         conn.row_factory = dict_row
@@ -1208,7 +1299,6 @@ def create_personal(payload: PersonalPayload):
 
 @router.put("/catalogos/personal/{personal_id}")
 def update_personal(personal_id: int, payload: PersonalPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _validate_reference(conn, "taller_puestos", payload.puesto_id, "Puesto no encontrado")
         conn.row_factory = dict_row
@@ -1228,7 +1318,6 @@ def update_personal(personal_id: int, payload: PersonalPayload):
 
 @router.delete("/catalogos/personal/{personal_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_personal(personal_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         result = conn.execute("DELETE FROM taller_personal WHERE id = %s", (personal_id,))
     if result.rowcount == 0:
@@ -1242,7 +1331,6 @@ def list_estacion_asignaciones(
     estacion_id: int | None = None,
     personal_id: int | None = None,
 ):
-    _ensure_taller_schema()
     filters: list[str] = []
     params: list[Any] = []
     if activa is not None:
@@ -1278,7 +1366,6 @@ def list_estacion_asignaciones(
 
 @router.post("/estaciones/asignaciones", status_code=status.HTTP_201_CREATED)
 def create_estacion_asignacion(payload: EstacionAsignacionPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         station_context = _get_station_context(conn, payload.estacion_id)
         _validate_reference(conn, "taller_personal", payload.personal_id, "Personal no encontrado")
@@ -1340,7 +1427,6 @@ def create_estacion_asignacion(payload: EstacionAsignacionPayload):
 
 @router.put("/estaciones/asignaciones/{asignacion_id}")
 def update_estacion_asignacion(asignacion_id: int, payload: EstacionAsignacionPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         station_context = _get_station_context(conn, payload.estacion_id)
         _validate_reference(conn, "taller_personal", payload.personal_id, "Personal no encontrado")
@@ -1419,7 +1505,6 @@ def update_estacion_asignacion(asignacion_id: int, payload: EstacionAsignacionPa
 
 @router.delete("/estaciones/asignaciones/{asignacion_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_estacion_asignacion(asignacion_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         row = conn.execute(
             """
@@ -1440,7 +1525,6 @@ def delete_estacion_asignacion(asignacion_id: int):
 
 @router.get("/areas/{area_id}/ots-disponibles")
 def list_ots_disponibles_por_area(area_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         conn.row_factory = dict_row
         area = conn.execute(
@@ -1457,12 +1541,15 @@ def list_ots_disponibles_por_area(area_id: int):
             raise HTTPException(status_code=404, detail="Area no encontrada")
 
         recepciones = conn.execute(
-            """
+            f"""
             SELECT r.id, r.folio_recep, r.fecha_recep, r.nb_cliente, r.placas,
                    r.vehiculo, r.vehiculo_marca, r.vehiculo_modelo, r.vehiculo_anio, r.estatus,
                    he.folio_seguro,
-                   COALESCE(NULLIF(he.folio_ot, ''), r.folio_recep) AS folio_ot
-            FROM recepciones r
+                   COALESCE(NULLIF(he.folio_ot, ''), r.folio_recep) AS folio_ot,
+                   UPPER(COALESCE(ote.estatus, '')) AS estatus_etapa,
+                   ote.progreso
+            FROM taller_ot_etapas ote
+            JOIN recepciones r ON r.id = ote.recepcion_id
             LEFT JOIN LATERAL (
                 SELECT folio_seguro, folio_ot
                 FROM historical_entries
@@ -1470,44 +1557,35 @@ def list_ots_disponibles_por_area(area_id: int):
                 ORDER BY id DESC
                 LIMIT 1
             ) he ON TRUE
+            WHERE ote.etapa_id = %(etapa_id)s
+              AND ote.estacion_id IS NULL
+              AND UPPER(COALESCE(ote.estatus, '')) <> 'COMPLETADO'
+              AND {_workshop_status_sql("r.estatus")}
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM taller_estacion_asignaciones tea
+                  WHERE tea.recepcion_id = ote.recepcion_id
+                    AND tea.etapa_id = ote.etapa_id
+                    AND tea.activa = TRUE
+              )
+              AND (
+                  %(orden)s <= 1
+                  OR EXISTS (
+                      SELECT 1
+                      FROM taller_ot_etapas prev
+                      JOIN taller_etapas pe ON pe.id = prev.etapa_id
+                      WHERE prev.recepcion_id = ote.recepcion_id
+                        AND pe.orden = %(orden)s - 1
+                        AND UPPER(prev.estatus) = 'COMPLETADO'
+                  )
+              )
             ORDER BY r.fecha_recep ASC, r.id ASC
-            """
+            """,
+            {"etapa_id": area["etapa_id"], "orden": area["orden"]},
         ).fetchall()
 
         candidates: list[dict[str, Any]] = []
         for recepcion in recepciones:
-            if not _is_workshop_status(recepcion.get("estatus")):
-                continue
-
-            stages = _sync_ot_stages(conn, recepcion["id"])
-            current_stage = next((stage for stage in stages if stage["etapa_id"] == area["etapa_id"]), None)
-            if not current_stage:
-                continue
-
-            current_status = str(current_stage.get("estatus") or "").upper()
-            if current_status == "COMPLETADO":
-                continue
-
-            if current_stage.get("estacion_id"):
-                continue
-
-            active_assignment = conn.execute(
-                """
-                SELECT 1
-                FROM taller_estacion_asignaciones
-                WHERE recepcion_id = %s AND etapa_id = %s AND activa = TRUE
-                LIMIT 1
-                """,
-                (recepcion["id"], area["etapa_id"]),
-            ).fetchone()
-            if active_assignment:
-                continue
-
-            if area["orden"] > 1:
-                previous_stage = next((stage for stage in stages if stage["orden"] == area["orden"] - 1), None)
-                if not previous_stage or str(previous_stage.get("estatus") or "").upper() != "COMPLETADO":
-                    continue
-
             candidates.append(
                 {
                     "recepcion_id": recepcion["id"],
@@ -1526,8 +1604,8 @@ def list_ots_disponibles_por_area(area_id: int):
                     ),
                     "etapa_objetivo_id": area["etapa_id"],
                     "etapa_objetivo": area["nb_etapa"],
-                    "estatus_etapa": current_status,
-                    "progreso": current_stage.get("progreso") or 0,
+                    "estatus_etapa": recepcion["estatus_etapa"],
+                    "progreso": recepcion.get("progreso") or 0,
                     "fecha_recep": recepcion.get("fecha_recep"),
                 }
             )
@@ -1540,7 +1618,6 @@ def list_ots_disponibles_por_area(area_id: int):
 
 @router.get("/ordenes/{recepcion_id}/etapas")
 def list_ot_etapas(recepcion_id: int, sync: bool = Query(default=True)):
-    _ensure_taller_schema()
     with get_connection() as conn:
         rows = _sync_ot_stages(conn, recepcion_id) if sync else None
         if rows is None:
@@ -1550,7 +1627,6 @@ def list_ot_etapas(recepcion_id: int, sync: bool = Query(default=True)):
 
 @router.post("/ordenes/{recepcion_id}/etapas/sync")
 def sync_ot_etapas(recepcion_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         rows = _sync_ot_stages(conn, recepcion_id)
     return {"recepcion_id": recepcion_id, "items": rows}
@@ -1558,7 +1634,6 @@ def sync_ot_etapas(recepcion_id: int):
 
 @router.get("/ordenes/{recepcion_id}/etapas/{etapa_id}")
 def get_ot_etapa(recepcion_id: int, etapa_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         return _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1566,7 +1641,6 @@ def get_ot_etapa(recepcion_id: int, etapa_id: int):
 
 @router.put("/ordenes/{recepcion_id}/etapas/{etapa_id}")
 def update_ot_etapa(recepcion_id: int, etapa_id: int, payload: OtEtapaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1610,7 +1684,6 @@ def update_ot_etapa(recepcion_id: int, etapa_id: int, payload: OtEtapaPayload):
 
 @router.get("/ordenes/{recepcion_id}/etapas/{etapa_id}/checklist")
 def list_ot_checklist(recepcion_id: int, etapa_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         ot_stage = _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1625,7 +1698,6 @@ def update_ot_checklist(
     checklist_item_id: int,
     payload: OtChecklistPayload,
 ):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         ot_stage = _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1656,7 +1728,6 @@ def update_ot_checklist(
 
 @router.get("/ordenes/{recepcion_id}/etapas/{etapa_id}/notas")
 def list_ot_notas(recepcion_id: int, etapa_id: int):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         ot_stage = _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1675,7 +1746,6 @@ def list_ot_notas(recepcion_id: int, etapa_id: int):
 
 @router.post("/ordenes/{recepcion_id}/etapas/{etapa_id}/notas", status_code=status.HTTP_201_CREATED)
 def create_ot_nota(recepcion_id: int, etapa_id: int, payload: OtNotaPayload):
-    _ensure_taller_schema()
     with get_connection() as conn:
         _sync_ot_stages(conn, recepcion_id)
         ot_stage = _get_ot_stage(conn, recepcion_id, etapa_id)
@@ -1693,225 +1763,236 @@ def create_ot_nota(recepcion_id: int, etapa_id: int, payload: OtNotaPayload):
 
 @router.get("/dashboard/autos-en-sitio")
 def get_autos_en_sitio_dashboard():
-    _ensure_taller_schema()
-    items: list[dict[str, Any]] = []
+    # Etapa actual por OT, misma prioridad que el frontend:
+    #   1. EN_PROCESO (si la recepción ya tiene folio de seguro y OT se omite "recepcionado")
+    #   2. EN_PROCESO "recepcionado"
+    #   3. primera PENDIENTE
+    #   4. última etapa
     with get_connection() as conn:
         conn.row_factory = dict_row
-        recepciones = conn.execute(
-            """
-            SELECT r.id, r.folio_recep, r.fecha_recep, r.nb_cliente, r.tel_cliente, r.seguro, r.placas,
-                   r.vehiculo, r.vehiculo_marca, r.vehiculo_modelo, r.vehiculo_anio, r.vehiculo_tipo,
-                   r.vehiculo_color, r.estatus,
-                   he.folio_seguro,
-                   COALESCE(NULLIF(he.folio_ot, ''), r.folio_recep) AS folio_ot
-            FROM recepciones r
+        items = conn.execute(
+            f"""
+            WITH ots AS (
+                SELECT r.id, r.folio_recep, r.fecha_recep, r.nb_cliente, r.tel_cliente, r.seguro, r.placas,
+                       r.vehiculo, r.vehiculo_marca, r.vehiculo_modelo, r.vehiculo_anio, r.vehiculo_tipo,
+                       r.vehiculo_color, r.estatus,
+                       he.folio_seguro,
+                       COALESCE(NULLIF(he.folio_ot, ''), r.folio_recep) AS folio_ot
+                FROM recepciones r
+                LEFT JOIN LATERAL (
+                    SELECT folio_seguro, folio_ot
+                    FROM historical_entries
+                    WHERE folio_recep = r.folio_recep
+                    ORDER BY id DESC
+                    LIMIT 1
+                ) he ON TRUE
+                WHERE {_workshop_status_sql("r.estatus")}
+            )
+            SELECT ots.*,
+                   cur.clave AS etapa_actual,
+                   cur.nb_etapa AS etapa_actual_nombre,
+                   COALESCE(cur.progreso, 0) AS progreso_actual,
+                   COALESCE(cur.estatus, 'PENDIENTE') AS taller_estatus,
+                   COALESCE(cur.personal_responsable, asig.nb_personal) AS personal_responsable,
+                   COALESCE(cur.nb_estacion, asig.nb_estacion) AS estacion_actual,
+                   ((NOW() AT TIME ZONE 'America/Mazatlan')::date - ots.fecha_recep::date) AS dias_taller
+            FROM ots
             LEFT JOIN LATERAL (
-                SELECT folio_seguro, folio_ot
-                FROM historical_entries
-                WHERE folio_recep = r.folio_recep
-                ORDER BY id DESC
+                SELECT te.clave, te.nb_etapa, ote.progreso, ote.estatus,
+                       es.nb_estacion, p.nb_personal AS personal_responsable
+                FROM taller_ot_etapas ote
+                JOIN taller_etapas te ON te.id = ote.etapa_id
+                LEFT JOIN taller_estaciones es ON es.id = ote.estacion_id
+                LEFT JOIN taller_personal p ON p.id = ote.personal_id_responsable
+                WHERE ote.recepcion_id = ots.id
+                ORDER BY
+                    CASE
+                        WHEN UPPER(ote.estatus) = 'EN_PROCESO'
+                             AND NOT (
+                                 te.clave = 'recepcionado'
+                                 AND NULLIF(BTRIM(COALESCE(ots.folio_seguro, '')), '') IS NOT NULL
+                                 AND NULLIF(BTRIM(COALESCE(ots.folio_ot, '')), '') IS NOT NULL
+                             ) THEN 0
+                        WHEN UPPER(ote.estatus) = 'EN_PROCESO' THEN 1
+                        WHEN UPPER(ote.estatus) = 'PENDIENTE' THEN 2
+                        ELSE 3
+                    END,
+                    CASE WHEN UPPER(ote.estatus) IN ('EN_PROCESO', 'PENDIENTE') THEN te.orden ELSE -te.orden END
                 LIMIT 1
-            ) he ON TRUE
-            ORDER BY r.fecha_recep DESC, r.id DESC
-            """
-        ).fetchall()
-
-        for recepcion in recepciones:
-            if not _is_workshop_status(recepcion.get("estatus")):
-                continue
-            stages = _sync_ot_stages(conn, recepcion["id"])
-            
-            # Determinar etapa actual con lógica similar al frontend
-            # Recepción está completada si tiene folio_seguro y folio_ot
-            recepcion_completada = bool(
-                str(recepcion.get("folio_seguro") or "").strip() and 
-                str(recepcion.get("folio_ot") or "").strip()
-            )
-            
-            # Buscar etapas EN_PROCESO
-            etapas_en_proceso = [row for row in stages if str(row.get("estatus") or "").upper() == "EN_PROCESO"]
-            
-            if etapas_en_proceso:
-                # Si hay múltiples etapas EN_PROCESO, filtrar recepcionado si está completada
-                if recepcion_completada:
-                    etapas_filtradas = [row for row in etapas_en_proceso if row.get("clave") != "recepcionado"]
-                    if etapas_filtradas:
-                        current_stage = etapas_filtradas[0]
-                    else:
-                        # Solo queda recepcionado, tomar la primera
-                        current_stage = etapas_en_proceso[0]
-                else:
-                    # Recepción no completada, tomar la primera EN_PROCESO (normalmente recepcionado)
-                    current_stage = etapas_en_proceso[0]
-            else:
-                # No hay etapas EN_PROCESO, buscar PENDIENTE
-                current_stage = next((row for row in stages if str(row.get("estatus") or "").upper() == "PENDIENTE"), None)
-            
-            if current_stage is None and stages:
-                current_stage = stages[-1]
-
-            active_assignment = conn.execute(
-                """
-                SELECT tea.id, tea.estacion_id, es.nb_estacion, tea.personal_id, tp.nb_personal
+            ) cur ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT es.nb_estacion, tp.nb_personal
                 FROM taller_estacion_asignaciones tea
                 JOIN taller_estaciones es ON es.id = tea.estacion_id
                 JOIN taller_personal tp ON tp.id = tea.personal_id
-                WHERE tea.recepcion_id = %s AND tea.activa = TRUE
+                WHERE tea.recepcion_id = ots.id AND tea.activa = TRUE
                 ORDER BY tea.created_at DESC, tea.id DESC
                 LIMIT 1
-                """,
-                (recepcion["id"],),
-            ).fetchone()
-
-            summary = dict(recepcion)
-            summary["etapa_actual"] = current_stage["clave"] if current_stage else None
-            summary["etapa_actual_nombre"] = current_stage["nb_etapa"] if current_stage else None
-            summary["progreso_actual"] = current_stage["progreso"] if current_stage else 0
-            summary["taller_estatus"] = current_stage["estatus"] if current_stage else "PENDIENTE"
-            summary["personal_responsable"] = (
-                current_stage.get("personal_responsable")
-                or (active_assignment["nb_personal"] if active_assignment else None)
-            )
-            summary["estacion_actual"] = (
-                current_stage.get("nb_estacion")
-                or (active_assignment["nb_estacion"] if active_assignment else None)
-            )
-            summary["dias_taller"] = None
-            items.append(summary)
+            ) asig ON TRUE
+            ORDER BY ots.fecha_recep DESC, ots.id DESC
+            """
+        ).fetchall()
 
     return items
 
 
 @router.get("/dashboard/areas-trabajo")
 def get_areas_trabajo_dashboard():
-    _ensure_taller_schema()
+    ttl = max(0.0, float(settings.taller_board_cache_ttl_seconds or 0))
+    if ttl:
+        with _areas_board_lock:
+            if _areas_board_cache["value"] is not None and _areas_board_cache["expires_at"] > time.monotonic():
+                return _areas_board_cache["value"]
+
+    board = _build_areas_trabajo_board()
+    if ttl:
+        with _areas_board_lock:
+            _areas_board_cache["value"] = board
+            _areas_board_cache["expires_at"] = time.monotonic() + ttl
+    return board
+
+
+def _build_areas_trabajo_board() -> dict[str, Any]:
     with get_connection() as conn:
         conn.row_factory = dict_row
-        areas = conn.execute(
+        rows = conn.execute(
             """
-            SELECT ta.id, ta.nb_area, ta.capacidad_maxima, ta.activo, ta.etapa_id, te.clave, te.nb_etapa, te.orden
+            SELECT ta.id AS area_id, ta.nb_area, ta.capacidad_maxima, ta.etapa_id,
+                   te.clave, te.nb_etapa, te.orden,
+                   es.id, es.nb_estacion, es.tipo_estacion, es.estatus, es.activo,
+                   tea.id AS asignacion_id,
+                   tea.recepcion_id, tea.folio_ot, tea.fecha_inicio,
+                   tp.nb_personal,
+                   r.vehiculo, r.vehiculo_marca, r.vehiculo_modelo, r.vehiculo_anio,
+                   ote.progreso, ote.estatus AS ot_estatus
             FROM taller_areas ta
             JOIN taller_etapas te ON te.id = ta.etapa_id
+            LEFT JOIN taller_estaciones es ON es.area_id = ta.id AND es.activo = TRUE
+            LEFT JOIN LATERAL (
+                SELECT tea.*
+                FROM taller_estacion_asignaciones tea
+                WHERE tea.estacion_id = es.id AND tea.activa = TRUE
+                ORDER BY tea.created_at DESC, tea.id DESC
+                LIMIT 1
+            ) tea ON TRUE
+            LEFT JOIN taller_personal tp ON tp.id = tea.personal_id
+            LEFT JOIN recepciones r ON r.id = tea.recepcion_id
+            LEFT JOIN LATERAL (
+                SELECT ote.progreso, ote.estatus
+                FROM taller_ot_etapas ote
+                WHERE ote.recepcion_id = tea.recepcion_id
+                  AND ote.estacion_id = es.id
+                  AND ote.etapa_id = ta.etapa_id
+                ORDER BY ote.updated_at DESC, ote.id DESC
+                LIMIT 1
+            ) ote ON TRUE
             WHERE ta.activo = TRUE
-            ORDER BY te.orden ASC, ta.nb_area ASC
+            ORDER BY te.orden ASC, ta.nb_area ASC, ta.id ASC, es.nb_estacion ASC
             """
         ).fetchall()
 
-        result_areas: list[dict[str, Any]] = []
-        total_stations = 0
-        total_occupied = 0
-        total_free = 0
-        delayed_count = 0
-
-        for area in areas:
-            estaciones = conn.execute(
-                """
-                SELECT es.id, es.nb_estacion, es.tipo_estacion, es.estatus, es.activo,
-                       tea.id AS asignacion_id,
-                       tea.recepcion_id, tea.folio_ot, tea.fecha_inicio,
-                       tp.nb_personal,
-                       r.vehiculo, r.vehiculo_marca, r.vehiculo_modelo, r.vehiculo_anio,
-                       ote.progreso, ote.estatus AS ot_estatus
-                FROM taller_estaciones es
-                LEFT JOIN LATERAL (
-                    SELECT tea.*
-                    FROM taller_estacion_asignaciones tea
-                    WHERE tea.estacion_id = es.id AND tea.activa = TRUE
-                    ORDER BY tea.created_at DESC, tea.id DESC
-                    LIMIT 1
-                ) tea ON TRUE
-                LEFT JOIN taller_personal tp ON tp.id = tea.personal_id
-                LEFT JOIN recepciones r ON r.id = tea.recepcion_id
-                LEFT JOIN LATERAL (
-                    SELECT ote.progreso, ote.estatus
-                    FROM taller_ot_etapas ote
-                    WHERE ote.recepcion_id = tea.recepcion_id
-                      AND ote.estacion_id = es.id
-                      AND ote.etapa_id = %s
-                    ORDER BY ote.updated_at DESC, ote.id DESC
-                    LIMIT 1
-                ) ote ON TRUE
-                WHERE es.area_id = %s AND es.activo = TRUE
-                ORDER BY es.nb_estacion ASC
-                """,
-                (area["etapa_id"], area["id"]),
-            ).fetchall()
+    areas: list[dict[str, Any]] = []
+    estaciones_por_area: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        if row["area_id"] not in estaciones_por_area:
+            estaciones_por_area[row["area_id"]] = []
+            areas.append(
+                {
+                    "id": row["area_id"],
+                    "nb_area": row["nb_area"],
+                    "capacidad_maxima": row["capacidad_maxima"],
+                    "etapa_id": row["etapa_id"],
+                    "clave": row["clave"],
+                    "nb_etapa": row["nb_etapa"],
+                }
+            )
+        if row["id"] is not None:
+            estaciones_por_area[row["area_id"]].append(row)
+
+    result_areas: list[dict[str, Any]] = []
+    total_stations = 0
+    total_occupied = 0
+    total_free = 0
+    delayed_count = 0
+
+    for area in areas:
+        estaciones = estaciones_por_area[area["id"]]
+
+        mapped_stations: list[dict[str, Any]] = []
+        occupied_count = 0
+        for station in estaciones:
+            is_occupied = bool(station.get("recepcion_id"))
+            total_stations += 1
+            if is_occupied:
+                occupied_count += 1
+                total_occupied += 1
+            else:
+                total_free += 1
 
-            mapped_stations: list[dict[str, Any]] = []
-            occupied_count = 0
-            for station in estaciones:
-                is_occupied = bool(station.get("recepcion_id"))
-                total_stations += 1
-                if is_occupied:
-                    occupied_count += 1
-                    total_occupied += 1
-                else:
-                    total_free += 1
-
-                progress = int(station.get("progreso") or 0)
-                station_status = "free"
-                if is_occupied:
-                    station_status = "occupied"
-                    if progress >= 90 and str(station.get("ot_estatus") or "").upper() != "COMPLETADO":
-                        station_status = "delayed"
-                        delayed_count += 1
-
-                mapped_stations.append(
-                    {
-                        "id": station["id"],
-                        "assignment_id": station.get("asignacion_id"),
-                        "recepcion_id": station.get("recepcion_id"),
-                        "area_id": area["id"],
-                        "etapa_id": area["etapa_id"],
-                        "etapa_clave": area["clave"],
-                        "name": station["nb_estacion"],
-                        "subtitle": station.get("tipo_estacion") or ("Disponible para asignacion" if not is_occupied else area["nb_etapa"]),
-                        "status": station_status,
-                        "order": f"OT #{station['folio_ot']}" if station.get("folio_ot") else None,
-                        "vehicle": (
-                            " ".join(
-                                part for part in [station.get("vehiculo_marca"), station.get("vehiculo_modelo"), station.get("vehiculo_anio")] if part
-                            ).strip()
-                            or station.get("vehiculo")
-                        ),
-                        "task": area["nb_etapa"],
-                        "progress": progress,
-                        "tech": station.get("nb_personal"),
-                    }
-                )
+            progress = int(station.get("progreso") or 0)
+            station_status = "free"
+            if is_occupied:
+                station_status = "occupied"
+                if progress >= 90 and str(station.get("ot_estatus") or "").upper() != "COMPLETADO":
+                    station_status = "delayed"
+                    delayed_count += 1
 
-            result_areas.append(
+            mapped_stations.append(
                 {
-                    "id": area["id"],
+                    "id": station["id"],
+                    "assignment_id": station.get("asignacion_id"),
+                    "recepcion_id": station.get("recepcion_id"),
+                    "area_id": area["id"],
                     "etapa_id": area["etapa_id"],
                     "etapa_clave": area["clave"],
-                    "etapa_nombre": area["nb_etapa"],
-                    "icon": (
-                        "format_paint"
-                        if area["clave"] == "pintura"
-                        else "construction"
-                        if area["clave"] == "carroceria"
-                        else "auto_fix_high"
-                    ),
-                    "iconClass": (
-                        "text-violet-400"
-                        if area["clave"] == "pintura"
-                        else "text-blue-400"
-                        if area["clave"] == "carroceria"
-                        else "text-amber-400"
+                    "name": station["nb_estacion"],
+                    "subtitle": station.get("tipo_estacion") or ("Disponible para asignacion" if not is_occupied else area["nb_etapa"]),
+                    "status": station_status,
+                    "order": f"OT #{station['folio_ot']}" if station.get("folio_ot") else None,
+                    "vehicle": (
+                        " ".join(
+                            part for part in [station.get("vehiculo_marca"), station.get("vehiculo_modelo"), station.get("vehiculo_anio")] if part
+                        ).strip()
+                        or station.get("vehiculo")
                     ),
-                    "title": area["nb_area"],
-                    "capacity": f"{occupied_count}/{len(estaciones) or area['capacidad_maxima']}",
-                    "stations": mapped_stations,
+                    "task": area["nb_etapa"],
+                    "progress": progress,
+                    "tech": station.get("nb_personal"),
                 }
             )
 
-        return {
-            "areas": result_areas,
-            "totals": {
-                "occupied": total_occupied,
-                "free": total_free,
-                "stations": total_stations,
-                "delayed": delayed_count,
-            },
-        }
+        result_areas.append(
+            {
+                "id": area["id"],
+                "etapa_id": area["etapa_id"],
+                "etapa_clave": area["clave"],
+                "etapa_nombre": area["nb_etapa"],
+                "icon": (
+                    "format_paint"
+                    if area["clave"] == "pintura"
+                    else "construction"
+                    if area["clave"] == "carroceria"
+                    else "auto_fix_high"
+                ),
+                "iconClass": (
+                    "text-violet-400"
+                    if area["clave"] == "pintura"
+                    else "text-blue-400"
+                    if area["clave"] == "carroceria"
+                    else "text-amber-400"
+                ),
+                "title": area["nb_area"],
+                "capacity": f"{occupied_count}/{len(estaciones) or area['capacidad_maxima']}",
+                "stations": mapped_stations,
+            }
+        )
+
+    return {
+        "areas": result_areas,
+        "totals": {
+            "occupied": total_occupied,
+            "free": total_free,
+            "stations": total_stations,
+            "delayed": delayed_count,
+        },
+    }
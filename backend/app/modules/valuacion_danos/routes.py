@@ -12,8 +12,9 @@ from pydantic import BaseModel
 from psycopg.rows import dict_row
 import xlsxwriter
 
+from app.core import rendering
 from app.core.db import get_connection
-from app.modules.recepcion.routes import ensure_inventario_recepcion_table, _upsert_inventario_recepcion
+from app.modules.recepcion.routes import _upsert_inventario_recepcion
 
 router = APIRouter(prefix="/valuacion", tags=["valuacion"])
 
@@ -238,7 +239,6 @@ def get_inventario_valuacion(orden_id: int):
     with get_connection() as conn:
         linked = _resolve_recepcion_for_valuacion(conn, orden_id)
         recepcion = linked["recepcion"]
-        ensure_inventario_recepcion_table(conn)
         conn.row_factory = dict_row
         inventory_row = conn.execute(
             """
@@ -715,7 +715,6 @@ def suggest_valuacion_by_orden(
 @router.get("/ordenes/{orden_id}")
 def get_valuacion_by_orden(orden_id: int):
     with get_connection() as conn:
-        _ensure_detalle_columns(conn)
         conn.row_factory = dict_row
         valuacion = conn.execute(
             """
@@ -751,7 +750,6 @@ def get_valuacion_by_orden(orden_id: int):
 @router.post("/ordenes/{orden_id}", status_code=status.HTTP_201_CREATED)
 def upsert_valuacion_by_orden(orden_id: int, payload: ValuacionPayload):
     with get_connection() as conn:
-        _ensure_detalle_columns(conn)
         conn.row_factory = dict_row
         orden = conn.execute(
             "SELECT id FROM orden_admision WHERE id = %s",
@@ -840,8 +838,8 @@ def upsert_valuacion_by_orden(orden_id: int, payload: ValuacionPayload):
     return {"id": valuacion_id, "estatus": "Borrador"}
 
 
-@router.post("/ordenes/{orden_id}/export-qualitas")
-def export_qualitas_budget(orden_id: int, payload: QualitasExportPayload):
+def _build_qualitas_budget_xlsx(payload: QualitasExportPayload) -> bytes:
+    """Formato de presupuesto Qualitas; corre en el pool de app.core.rendering."""
     detalle = payload.detalle[:8]
 
     mano_obra_total = round(sum(_safe_float(item.mano_obra) for item in detalle), 2)
@@ -1018,13 +1016,18 @@ def export_qualitas_budget(orden_id: int, payload: QualitasExportPayload):
     sheet.write("A41", "_" * 120, no_border)
 
     workbook.close()
-    output.seek(0)
+    return output.getvalue()
+
+
+@router.post("/ordenes/{orden_id}/export-qualitas")
+def export_qualitas_budget(orden_id: int, payload: QualitasExportPayload):
+    content = rendering.render(_build_qualitas_budget_xlsx, payload)
 
     reporte = re.sub(r"[^A-Za-z0-9_-]", "", str(payload.reporte_siniestro or "")) or f"orden_{orden_id}"
     filename = f"{reporte}_presupuesto_qualitas.xlsx"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
     return StreamingResponse(
-        output,
+        BytesIO(content),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers=headers,
     )
@@ -1,7 +1,10 @@
 import { useEffect, useMemo, useRef, useState } from "react";
 import { createPortal } from "react-dom";
 
-const POLL_MS = 8000;
+import { useLiveEvents } from "../utils/liveEvents.js";
+
+// Los mensajes nuevos llegan por /events/stream; el polling queda como respaldo.
+const POLL_MS = 60000;
 const PHONE_INPUT_PATTERN = /^[\d+\s\-()]*$/;
 
 const formatTime = (value) => {
@@ -232,6 +235,17 @@ export default function WhatsAppChatWidget() {
     return () => window.clearInterval(timer);
   }, [open, activeWaId, view]);
 
+  useLiveEvents(
+    ["whatsapp"],
+    () => {
+      loadConversations();
+      if (view === "chat" && activeWaId) {
+        loadMessages(activeWaId, { showLoader: false, preserveScroll: true, stickToBottom: false });
+      }
+    },
+    { enabled: open }
+  );
+
   useEffect(() => {
     if (!clientDropdownOpen) return undefined;
     const onPointerDown = (event) => {
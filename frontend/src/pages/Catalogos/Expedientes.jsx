@@ -25,6 +25,11 @@ function fileUrl(file) {
   return resolveMediaUrl(path);
 }
 
+function thumbUrl(file) {
+  const thumb = file?.derivatives?.thumb;
+  return thumb ? resolveMediaUrl(thumb) : fileUrl(file);
+}
+
 export default function CatalogoExpedientes() {
   const [reporte, setReporte] = useState("");
   const [loading, setLoading] = useState(false);
@@ -508,7 +513,7 @@ export default function CatalogoExpedientes() {
                       <div key={file.id} className="bg-background-dark/40 border border-border-dark rounded-lg overflow-hidden">
                         <div className="aspect-video bg-background-dark/70 flex items-center justify-center">
                           {isImageFile(file) ? (
-                            <img src={fileUrl(file)} alt={file.archivo_nombre || "archivo"} className="w-full h-full object-cover" />
+                            <img src={thumbUrl(file)} alt={file.archivo_nombre || "archivo"} loading="lazy" className="w-full h-full object-cover" />
                           ) : (
                             <span className="material-symbols-outlined text-3xl text-slate-500">insert_drive_file</span>
                           )}
@@ -619,15 +619,30 @@ export default function OrdenAdmision() {
       
       const formData = new FormData();
       formData.append("file", file);
-      const response = await fetch(
-        `${import.meta.env.VITE_API_URL}/recepcion/ordenes/extract-fields`,
-        { method: "POST", body: formData }
-      );
+      // Extracción asíncrona: el backend responde con un job y el OCR corre en segundo plano
+      const jobsUrl = `${import.meta.env.VITE_API_URL}/recepcion/ordenes/extract-fields/jobs`;
+      const response = await fetch(jobsUrl, { method: "POST", body: formData });
       if (!response.ok) {
         const payload = await response.json().catch(() => null);
         throw new Error(payload?.detail || "No se pudo extraer información del archivo");
       }
-      const payload = await response.json();
+      let job = await response.json();
+      const deadline = Date.now() + 120000;
+      while (job?.status !== "completed") {
+        if (job?.status === "failed") {
+          throw new Error(job?.error || "No se pudo extraer información del archivo");
+        }
+        if (Date.now() > deadline) {
+          throw new Error("La extracción tardó demasiado, intenta de nuevo");
+        }
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const pollResponse = await fetch(`${jobsUrl}/${job.job_id}`);
+        if (!pollResponse.ok) {
+          throw new Error("No se pudo consultar la extracción del archivo");
+        }
+        job = await pollResponse.json();
+      }
+      const payload = job.result || {};
       const campos = payload?.campos || {};
       const fieldDebug = payload?.field_debug || {};
       const ocrLines = payload?.ocr_lines || [];
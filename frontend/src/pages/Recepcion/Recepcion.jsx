@@ -582,8 +582,9 @@ export default function Recepcion() {
                     title="Abrir en pantalla completa"
                   >
                     <img
-                      src={resolveMediaUrl(item.file_path)}
+                      src={resolveMediaUrl(item.derivatives?.thumb || item.file_path)}
                       alt={item.original_name}
+                      loading="lazy"
                       className="w-full h-44 object-cover rounded-lg border border-border-dark"
                     />
                     <span className="absolute left-2 top-2 rounded-full bg-black/70 border border-white/10 px-2 py-0.5 text-[10px] font-bold text-white">
@@ -3,6 +3,7 @@ import { useEffect, useMemo, useState } from "react";
 import Sidebar from "../../components/Sidebar.jsx";
 import AppHeader from "../../components/AppHeader.jsx";
 import Toast from "../../components/Toast.jsx";
+import { useLiveEvents } from "../../utils/liveEvents.js";
 
 function statusBadge(status) {
   if (status === "delayed") return "bg-alert-red text-white";
@@ -24,9 +25,9 @@ export default function AreasTrabajo() {
   const [assignmentSaving, setAssignmentSaving] = useState(false);
   const [confirmDialog, setConfirmDialog] = useState(null);
 
-  const loadDashboard = async () => {
+  const loadDashboard = async ({ silent = false } = {}) => {
     try {
-      setLoading(true);
+      if (!silent) setLoading(true);
       setError("");
       const response = await fetch(`${import.meta.env.VITE_API_URL}/taller/dashboard/areas-trabajo`);
       if (!response.ok) {
@@ -48,6 +49,9 @@ export default function AreasTrabajo() {
     loadDashboard();
   }, []);
 
+  // Asignaciones y avances de OT hechos desde otras pantallas refrescan el tablero sin polling.
+  useLiveEvents(["taller"], () => loadDashboard({ silent: true }));
+
   useEffect(() => {
     if (!toast) return;
     const timer = window.setTimeout(() => setToast(null), 4000);
@@ -0,0 +1,62 @@
+import { useEffect, useRef } from "react";
+
+import { resolveApiBaseUrl } from "./media.js";
+
+// Una sola conexion SSE por pestana; cada pantalla se suscribe a los topicos que le interesan.
+let source = null;
+const listeners = new Set();
+
+function ensureSource() {
+  if (source || typeof window === "undefined" || typeof window.EventSource === "undefined") return;
+  source = new window.EventSource(`${resolveApiBaseUrl()}/events/stream`);
+  source.onmessage = (message) => {
+    let event;
+    try {
+      event = JSON.parse(message.data);
+    } catch {
+      return;
+    }
+    listeners.forEach((listener) => {
+      if (!listener.topics || listener.topics.includes(event.topic)) {
+        listener.handler(event);
+      }
+    });
+  };
+}
+
+function releaseSource() {
+  if (source && listeners.size === 0) {
+    source.close();
+    source = null;
+  }
+}
+
+export function subscribeLiveEvents(topics, handler) {
+  const listener = { topics: topics && topics.length ? topics : null, handler };
+  listeners.add(listener);
+  ensureSource();
+  return () => {
+    listeners.delete(listener);
+    releaseSource();
+  };
+}
+
+// Llama a onEvent (agrupando rafagas en debounceMs) cuando llega un evento de los topicos indicados.
+export function useLiveEvents(topics, onEvent, { debounceMs = 500, enabled = true } = {}) {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+  const topicsKey = (topics || []).join(",");
+
+  useEffect(() => {
+    if (!enabled) return undefined;
+    let timer = null;
+    const unsubscribe = subscribeLiveEvents(topicsKey ? topicsKey.split(",") : null, (event) => {
+      window.clearTimeout(timer);
+      timer = window.setTimeout(() => handlerRef.current(event), debounceMs);
+    });
+    return () => {
+      window.clearTimeout(timer);
+      unsubscribe();
+    };
+  }, [topicsKey, debounceMs, enabled]);
+}